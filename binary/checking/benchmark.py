@@ -0,0 +1,583 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from binary.checking.kernel_backend import get_kernel_backend
+from binary.checking.one_sample.simulation import simulation_sprt as one_sample_simulation_sprt
+from binary.checking.one_sample_classic_sample_size import \
+    classic_sample_size_array as one_sample_classic_sample_size_array
+from binary.checking.one_sample_one_sided_sprt import one_sample_one_sided_sprt
+from binary.checking.one_sample_sequential_sample_size import \
+    sequential_sample_size as one_sample_sequential_sample_size, \
+    sequential_sample_size_array as one_sample_sequential_sample_size_array, \
+    max_sequential_sample_size_array as one_sample_max_sequential_sample_size_array
+from binary.checking.one_sample_two_sided_sprt import one_sample_two_sided_sprt
+from binary.checking.two_sample.simulation import simulation_sprt as two_sample_simulation_sprt
+from binary.checking.two_sample_classic_sample_size import \
+    classic_sample_size_array as two_sample_classic_sample_size_array
+from binary.checking.two_sample_one_sided_sprt import two_sample_one_sided_sprt
+from binary.checking.two_sample_sequential_sample_size import \
+    sequential_sample_size_array as two_sample_sequential_sample_size_array
+from binary.checking.two_sample_two_sided_sprt import two_sample_two_sided_sprt
+from binary.sprt.one_sample_sprt import BinaryOneSampleSprt
+from binary.sprt.two_sample_sprt import BinaryTwoSampleSprt
+
+
+# Версия формата файла результатов
+RESULT_FORMAT_VERSION = 1
+
+# Количество замеров времени каждого бенчмарка, в результат идёт наименьшее время
+REPEAT_CNT = 5
+
+# Допустимое относительное ухудшение времени и пиковой памяти при сравнении запусков
+TIME_RTOL = 0.2
+MEMORY_RTOL = 0.2
+
+# Изменение пиковой памяти меньше этого количества байт не считается ухудшением
+MEMORY_ATOL = 1 << 16
+
+# Параметры дизайна тестов во всех бенчмарках
+BENCHMARK_P0 = 0.3
+BENCHMARK_D = 0.02
+BENCHMARK_ALPHA = 0.05
+BENCHMARK_BETA = 0.2
+
+# Количество элементов выборки в бенчмарках онлайн тестов
+ONLINE_SAMPLE_SIZE = 20000
+# Размер списка в одном вызове append_list
+ONLINE_CHUNK_SIZE = 100
+
+# Сетки количества тестов и размера батча для ядер
+KERNEL_ITER_SIZE_LIST = (1000, 10000)
+KERNEL_BATCH_SIZE_LIST = (64, 512)
+
+# Количество тестов и размер батча моделирования
+SIMULATION_ITER_SIZE = 5000
+SIMULATION_BATCH_SIZE = 256
+
+# Размер стороны сетки (p0, d) калькуляторов размера выборки
+CALCULATOR_GRID_SIZE = 100
+# Размер стороны сетки для калькуляторов, считающих по одному значению
+SCALAR_CALCULATOR_GRID_SIZE = 10
+
+# Уменьшенные размеры для быстрого запуска
+QUICK_SCALE = 10
+
+# Модули онлайн тестов и ядер, время импорта которых ограничено
+IMPORT_TIME_MODULES = (
+    "binary.sprt",
+    "binary.checking.one_sample_one_sided_sprt",
+    "binary.checking.one_sample_two_sided_sprt",
+    "binary.checking.one_sample_mixture_sprt",
+    "binary.checking.two_sample_one_sided_sprt",
+    "binary.checking.two_sample_two_sided_sprt",
+)
+# Ограничение на время импорта модуля в новом интерпретаторе вместе с numpy в секундах
+IMPORT_TIME_BUDGET = 0.5
+# Пакеты, которые не должны загружаться при импорте этих модулей:
+# они импортируются при первом использовании графиков, доверительных интервалов и numba
+IMPORT_FORBIDDEN_PACKAGES = ("scipy", "plotly", "numba", "pandas")
+
+# Директория, из которой импортируется пакет binary в новом интерпретаторе
+PACKAGE_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Программа замера импорта в новом интерпретаторе
+IMPORT_TIME_SCRIPT = """
+import json
+import sys
+import time
+
+start_time = time.perf_counter()
+import {module}
+import_time = time.perf_counter() - start_time
+
+forbidden_packages = {forbidden_packages!r}
+print(json.dumps({{
+    "time": import_time,
+    "forbidden_modules": sorted(name for name in sys.modules if name.split(".")[0] in forbidden_packages)
+}}))
+"""
+
+
+def get_online_benchmarks(sample_size):
+    """
+    Бенчмарки добавления элементов в онлайн тесты
+
+    :param sample_size: количество элементов выборки (каждой вариации для двух выборок)
+    :return: список бенчмарков (наименование, параметры, функция, количество операций)
+    """
+    rng = np.random.default_rng(0)
+    p = BENCHMARK_P0 + BENCHMARK_D / 2
+    x_list = rng.binomial(1, p, sample_size).tolist()
+    y_list = rng.binomial(1, BENCHMARK_P0, sample_size).tolist()
+    chunk_range = range(0, sample_size, ONLINE_CHUNK_SIZE)
+
+    def one_sample_append(alternative):
+        sprt = BinaryOneSampleSprt(BENCHMARK_P0, BENCHMARK_D, BENCHMARK_ALPHA, BENCHMARK_BETA, alternative)
+        for x in x_list:
+            sprt.append(x)
+
+    def one_sample_append_list(alternative):
+        sprt = BinaryOneSampleSprt(BENCHMARK_P0, BENCHMARK_D, BENCHMARK_ALPHA, BENCHMARK_BETA, alternative)
+        for start in chunk_range:
+            sprt.append_list(x_list[start:start + ONLINE_CHUNK_SIZE])
+
+    def two_sample_append(alternative, second_step):
+        # На каждый элемент первой выборки приходится 1 / second_step элементов второй
+        sprt = BinaryTwoSampleSprt(BENCHMARK_P0, BENCHMARK_D, BENCHMARK_ALPHA, BENCHMARK_BETA, alternative)
+        for i, x in enumerate(x_list):
+            sprt.append(x, first_sample_flg=True)
+            if i % second_step == 0:
+                sprt.append(y_list[i], first_sample_flg=False)
+
+    def two_sample_append_list(alternative, second_step):
+        sprt = BinaryTwoSampleSprt(BENCHMARK_P0, BENCHMARK_D, BENCHMARK_ALPHA, BENCHMARK_BETA, alternative)
+        for start in chunk_range:
+            sprt.append_list(x_list[start:start + ONLINE_CHUNK_SIZE],
+                             y_list[start:start + ONLINE_CHUNK_SIZE:second_step])
+
+    benchmark_list = []
+    for alternative in ["greater", "less", "two-sided"]:
+        params = dict(alternative=alternative, sample_size=sample_size)
+        benchmark_list += [
+            (f"online/one_sample/append/{alternative}", params,
+             lambda alternative=alternative: one_sample_append(alternative), sample_size),
+            (f"online/one_sample/append_list/{alternative}", dict(params, chunk_size=ONLINE_CHUNK_SIZE),
+             lambda alternative=alternative: one_sample_append_list(alternative), sample_size)
+        ]
+        for arms, second_step in [("balanced", 1), ("imbalanced", 2)]:
+            op_cnt = sample_size + (sample_size + second_step - 1) // second_step
+            arm_params = dict(params, arms=arms, second_step=second_step)
+            benchmark_list += [
+                (f"online/two_sample/append/{alternative}/{arms}", arm_params,
+                 lambda alternative=alternative, second_step=second_step:
+                 two_sample_append(alternative, second_step), op_cnt),
+                (f"online/two_sample/append_list/{alternative}/{arms}",
+                 dict(arm_params, chunk_size=ONLINE_CHUNK_SIZE),
+                 lambda alternative=alternative, second_step=second_step:
+                 two_sample_append_list(alternative, second_step), op_cnt)
+            ]
+
+    return benchmark_list
+
+
+def get_kernel_benchmarks(iter_size_list, batch_size_list):
+    """
+    Бенчмарки векторизованных ядер последовательного анализа на сетке размеров батча
+
+    :param iter_size_list: список количеств тестов
+    :param batch_size_list: список размеров батча
+    :return: список бенчмарков (наименование, параметры, функция, количество операций)
+    """
+    rng = np.random.default_rng(0)
+    p = BENCHMARK_P0 + BENCHMARK_D / 2
+    design = (BENCHMARK_P0, BENCHMARK_D, BENCHMARK_ALPHA, BENCHMARK_BETA)
+
+    benchmark_list = []
+    for iter_size in iter_size_list:
+        for batch_size in batch_size_list:
+            x = rng.binomial(1, p, [iter_size, batch_size]).astype(np.uint8)
+            y = rng.binomial(1, BENCHMARK_P0, [iter_size, batch_size]).astype(np.uint8)
+            params = dict(iter_size=iter_size, batch_size=batch_size)
+            op_cnt = iter_size * batch_size
+            benchmark_list += [
+                (f"kernel/one_sample_one_sided/{iter_size}x{batch_size}", params,
+                 lambda x=x: one_sample_one_sided_sprt(x, *design, alternative="greater", kernel_backend="numpy"),
+                 op_cnt),
+                (f"kernel/one_sample_two_sided/{iter_size}x{batch_size}", params,
+                 lambda x=x: one_sample_two_sided_sprt(x, *design, kernel_backend="numpy"),
+                 op_cnt),
+                (f"kernel/two_sample_one_sided/{iter_size}x{batch_size}", params,
+                 lambda x=x, y=y: two_sample_one_sided_sprt(x, y, *design, alternative="greater",
+                                                            kernel_backend="numpy"),
+                 2 * op_cnt),
+                (f"kernel/two_sample_two_sided/{iter_size}x{batch_size}", params,
+                 lambda x=x, y=y: two_sample_two_sided_sprt(x, y, *design, kernel_backend="numpy"),
+                 2 * op_cnt)
+            ]
+
+    return benchmark_list
+
+
+def get_simulation_benchmarks(iter_size, batch_size):
+    """
+    Бенчмарки моделирования simulation_sprt от начала до конца
+
+    :param iter_size: количество тестов в моделировании
+    :param batch_size: размер батча
+    :return: список бенчмарков (наименование, параметры, функция, количество операций)
+    """
+    p = BENCHMARK_P0 + BENCHMARK_D
+    design = (BENCHMARK_P0, BENCHMARK_D, BENCHMARK_ALPHA, BENCHMARK_BETA)
+
+    benchmark_list = []
+    for alternative in ["greater", "less", "two-sided"]:
+        params = dict(alternative=alternative, iter_size=iter_size, batch_size=batch_size)
+        benchmark_list += [
+            (f"simulation/one_sample/{alternative}", params,
+             lambda alternative=alternative:
+             one_sample_simulation_sprt(p, iter_size, batch_size, *design, alternative,
+                                        random_state=0, summary=True),
+             iter_size),
+            (f"simulation/two_sample/{alternative}", params,
+             lambda alternative=alternative:
+             two_sample_simulation_sprt(p, BENCHMARK_P0, iter_size, batch_size, *design, alternative,
+                                        random_state=0, summary=True),
+             iter_size)
+        ]
+
+    return benchmark_list
+
+
+def get_calculator_benchmarks(grid_size, scalar_grid_size):
+    """
+    Бенчмарки калькуляторов размера выборки на сетке (p0, d)
+
+    :param grid_size: размер стороны сетки для калькуляторов массивов значений
+    :param scalar_grid_size: размер стороны сетки для калькуляторов одного значения
+    :return: список бенчмарков (наименование, параметры, функция, количество операций)
+    """
+    p0_list, lift_list = np.meshgrid(np.linspace(0.05, 0.8, grid_size), np.geomspace(0.01, 0.2, grid_size))
+    d_list = p0_list * lift_list
+    p_list = p0_list + d_list / 2
+    scalar_grid = [(float(p0), float(d)) for p0 in np.linspace(0.05, 0.8, scalar_grid_size)
+                   for d in np.linspace(0.005, 0.04, scalar_grid_size)]
+    design = (BENCHMARK_ALPHA, BENCHMARK_BETA, "greater")
+    params = dict(grid_size=grid_size)
+
+    return [
+        ("calculator/one_sample/classic_array", params,
+         lambda: one_sample_classic_sample_size_array(p0_list, d_list, *design), d_list.size),
+        ("calculator/one_sample/sequential_array", params,
+         lambda: one_sample_sequential_sample_size_array(p_list, p0_list, d_list, *design), d_list.size),
+        ("calculator/one_sample/max_sequential_array", params,
+         lambda: one_sample_max_sequential_sample_size_array(p0_list, d_list, *design), d_list.size),
+        ("calculator/one_sample/sequential", dict(grid_size=scalar_grid_size),
+         lambda: [one_sample_sequential_sample_size(p0 + d / 2, p0, d, *design) for p0, d in scalar_grid],
+         len(scalar_grid)),
+        ("calculator/two_sample/classic_array", params,
+         lambda: two_sample_classic_sample_size_array(p0_list, d_list, *design), d_list.size),
+        ("calculator/two_sample/sequential_array", params,
+         lambda: two_sample_sequential_sample_size_array(p_list, p0_list, d_list, *design), d_list.size)
+    ]
+
+
+def get_benchmarks(quick=False):
+    """
+    Список всех бенчмарков
+
+    :param quick: флаг быстрого запуска с уменьшенными размерами
+    :return: список бенчмарков (наименование, параметры, функция, количество операций)
+    """
+    scale = QUICK_SCALE if quick else 1
+    return get_online_benchmarks(ONLINE_SAMPLE_SIZE // scale) \
+        + get_kernel_benchmarks(KERNEL_ITER_SIZE_LIST[:1] if quick else KERNEL_ITER_SIZE_LIST,
+                                KERNEL_BATCH_SIZE_LIST) \
+        + get_simulation_benchmarks(SIMULATION_ITER_SIZE // scale, SIMULATION_BATCH_SIZE) \
+        + get_calculator_benchmarks(CALCULATOR_GRID_SIZE // scale, SCALAR_CALCULATOR_GRID_SIZE // (2 if quick else 1))
+
+
+def measure(func, repeat_cnt=REPEAT_CNT):
+    """
+    Замер времени и пиковой памяти
+
+    Время замеряется без трассировки памяти,
+    а пиковая память - отдельным запуском под tracemalloc
+
+    :param func: функция без аргументов
+    :param repeat_cnt: количество замеров времени
+    :return: список времён в секундах, пиковый объём выделенной памяти в байтах
+    """
+    time_list = []
+    for _ in range(repeat_cnt):
+        start_time = time.perf_counter()
+        func()
+        time_list.append(time.perf_counter() - start_time)
+
+    tracing_flg = tracemalloc.is_tracing()
+    if not tracing_flg:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    start_memory = tracemalloc.get_traced_memory()[0]
+    func()
+    peak_memory = tracemalloc.get_traced_memory()[1] - start_memory
+    if not tracing_flg:
+        tracemalloc.stop()
+
+    return time_list, max(0, peak_memory)
+
+
+def measure_import(module, repeat_cnt=REPEAT_CNT, forbidden_packages=IMPORT_FORBIDDEN_PACKAGES):
+    """
+    Замер времени импорта модуля, каждый раз в новом интерпретаторе,
+    чтобы в замер входили numpy и все зависимости модуля
+
+    :param module: наименование модуля
+    :param repeat_cnt: количество замеров
+    :param forbidden_packages: пакеты, загрузка которых проверяется
+    :return: список времён в секундах, список загруженных модулей запрещённых пакетов
+    """
+    script = IMPORT_TIME_SCRIPT.format(module=module, forbidden_packages=tuple(forbidden_packages))
+
+    time_list = []
+    forbidden_module_list = []
+    for _ in range(repeat_cnt):
+        output = subprocess.run([sys.executable, "-c", script], cwd=PACKAGE_ROOT_DIR,
+                                capture_output=True, text=True, check=True).stdout
+        measure_res = json.loads(output.strip().splitlines()[-1])
+        time_list.append(measure_res["time"])
+        forbidden_module_list = measure_res["forbidden_modules"]
+
+    return time_list, forbidden_module_list
+
+
+def check_import_times(module_list=IMPORT_TIME_MODULES, budget=IMPORT_TIME_BUDGET, repeat_cnt=REPEAT_CNT):
+    """
+    Проверка времени импорта модулей онлайн тестов и ядер
+
+    :param module_list: список наименований модулей
+    :param budget: ограничение на время импорта в секундах
+    :param repeat_cnt: количество замеров каждого модуля, в проверку идёт наименьшее время
+    :return: список словарей по модулям:
+             module, time, time_list, budget, forbidden_modules,
+             budget_violation - время больше ограничения
+             или загружены модули запрещённых пакетов
+    """
+    check_list = []
+    for module in module_list:
+        time_list, forbidden_module_list = measure_import(module, repeat_cnt)
+        best_time = min(time_list)
+        check_list.append({
+            "module": module,
+            "time": best_time,
+            "time_list": time_list,
+            "budget": budget,
+            "forbidden_modules": forbidden_module_list,
+            "budget_violation": best_time > budget or len(forbidden_module_list) > 0
+        })
+
+    return check_list
+
+
+def format_import_check(check_list):
+    """
+    Текстовая таблица проверки времени импорта
+
+    :param check_list: результат check_import_times
+    :return: строка таблицы, нарушения отмечены VIOLATION
+    """
+    line_list = [f"{'модуль':<56}{'время, с':>10}{'лимит, с':>10}"]
+    for row in check_list:
+        flag_desc = ""
+        if row["budget_violation"]:
+            forbidden_desc = ", ".join(row["forbidden_modules"][:3])
+            flag_desc = f"  VIOLATION{': ' + forbidden_desc if forbidden_desc else ''}"
+        line_list.append(f"{row['module']:<56}{row['time']:>10.3f}{row['budget']:>10.3f}{flag_desc}")
+    return "\n".join(line_list)
+
+
+def run_benchmarks(path=None, quick=False, repeat_cnt=REPEAT_CNT, name_filter=None, verbose=False):
+    """
+    Запуск бенчмарков и запись результатов в файл json
+
+    :param path: путь к файлу результатов, None - результаты не записываются
+    :param quick: флаг быстрого запуска с уменьшенными размерами
+    :param repeat_cnt: количество замеров времени каждого бенчмарка
+    :param name_filter: подстрока наименования, если задана,
+                        то запускаются только бенчмарки с ней
+    :param verbose: флаг вывода результата каждого бенчмарка
+    :return: словарь результатов
+             res["environment"] - словарь параметров окружения
+             res["benchmarks"] - список словарей результатов бенчмарков:
+                                 name, params, time (наименьшее время), time_list,
+                                 peak_memory, op_cnt, throughput (операций в секунду);
+                                 время импорта модулей записывается под наименованием
+                                 import/<модуль> с пиковой памятью 0
+    """
+    res = {
+        "version": RESULT_FORMAT_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "kernel_backend": get_kernel_backend(),
+            "quick": quick,
+            "repeat_cnt": repeat_cnt
+        },
+        "benchmarks": []
+    }
+
+    for name, params, func, op_cnt in get_benchmarks(quick):
+        if name_filter is not None and name_filter not in name:
+            continue
+
+        time_list, peak_memory = measure(func, repeat_cnt)
+        best_time = min(time_list)
+        res["benchmarks"].append({
+            "name": name,
+            "params": params,
+            "time": best_time,
+            "time_list": time_list,
+            "peak_memory": peak_memory,
+            "op_cnt": op_cnt,
+            "throughput": op_cnt / best_time if best_time > 0 else None
+        })
+        if verbose:
+            print(f"{name:<56}{best_time:>12.6f} с{peak_memory:>14} байт", flush=True)
+
+    import_module_list = [module for module in IMPORT_TIME_MODULES
+                          if name_filter is None or name_filter in f"import/{module}"]
+    for row in check_import_times(import_module_list, repeat_cnt=repeat_cnt):
+        name = f"import/{row['module']}"
+        res["benchmarks"].append({
+            "name": name,
+            "params": {"module": row["module"], "budget": row["budget"]},
+            "time": row["time"],
+            "time_list": row["time_list"],
+            "peak_memory": 0,
+            "op_cnt": 1,
+            "throughput": 1 / row["time"] if row["time"] > 0 else None
+        })
+        if verbose:
+            flag_desc = "  VIOLATION" if row["budget_violation"] else ""
+            print(f"{name:<56}{row['time']:>12.6f} с{flag_desc}", flush=True)
+
+    if path is not None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(res, f, indent=2)
+
+    return res
+
+
+def compare_results(base_res, new_res, time_rtol=TIME_RTOL, memory_rtol=MEMORY_RTOL):
+    """
+    Сравнение результатов двух запусков бенчмарков
+
+    :param base_res: словарь результатов или путь к файлу результатов базового запуска
+    :param new_res: словарь результатов или путь к файлу результатов нового запуска
+    :param time_rtol: допустимое относительное ухудшение времени
+    :param memory_rtol: допустимое относительное ухудшение пиковой памяти
+    :return: список словарей по бенчмаркам обоих запусков:
+             name, base_time, new_time, time_ratio, base_peak_memory, new_peak_memory,
+             memory_ratio, time_regression, memory_regression
+    """
+    base_res, new_res = [read_results(res) if isinstance(res, str) else res for res in (base_res, new_res)]
+    base_dict = {benchmark["name"]: benchmark for benchmark in base_res["benchmarks"]}
+
+    comparison_list = []
+    for new_benchmark in new_res["benchmarks"]:
+        base_benchmark = base_dict.get(new_benchmark["name"])
+        if base_benchmark is None:
+            continue
+
+        time_ratio = new_benchmark["time"] / base_benchmark["time"] if base_benchmark["time"] > 0 else 1.0
+        memory_ratio = new_benchmark["peak_memory"] / base_benchmark["peak_memory"] \
+            if base_benchmark["peak_memory"] > 0 else 1.0
+        memory_diff = new_benchmark["peak_memory"] - base_benchmark["peak_memory"]
+        comparison_list.append({
+            "name": new_benchmark["name"],
+            "base_time": base_benchmark["time"],
+            "new_time": new_benchmark["time"],
+            "time_ratio": time_ratio,
+            "base_peak_memory": base_benchmark["peak_memory"],
+            "new_peak_memory": new_benchmark["peak_memory"],
+            "memory_ratio": memory_ratio,
+            "time_regression": time_ratio > 1 + time_rtol,
+            "memory_regression": memory_diff > MEMORY_ATOL
+                                 and memory_diff > memory_rtol * base_benchmark["peak_memory"]
+        })
+
+    return comparison_list
+
+
+def read_results(path):
+    """
+    Чтение файла результатов бенчмарков
+
+    :param path: путь к файлу результатов
+    :return: словарь результатов
+    """
+    with open(path, encoding="utf-8") as f:
+        res = json.load(f)
+    if res.get("version") != RESULT_FORMAT_VERSION:
+        raise ValueError(f"Неправильная версия файла результатов: {res.get('version')}")
+    return res
+
+
+def format_comparison(comparison_list):
+    """
+    Текстовая таблица сравнения запусков
+
+    :param comparison_list: результат compare_results
+    :return: строка таблицы, ухудшения отмечены REGRESSION
+    """
+    line_list = [f"{'бенчмарк':<56}{'время':>10}{'память':>10}"]
+    for row in comparison_list:
+        flag_list = [flag for flag, regression_flg in [("time", row["time_regression"]),
+                                                       ("memory", row["memory_regression"])]
+                     if regression_flg]
+        flag_desc = f"  REGRESSION: {', '.join(flag_list)}" if len(flag_list) > 0 else ""
+        line_list.append(f"{row['name']:<56}{row['time_ratio']:>10.3f}{row['memory_ratio']:>10.3f}{flag_desc}")
+    return "\n".join(line_list)
+
+
+def main(argv=None):
+    """
+    Запуск из командной строки:
+    python -m binary.checking.benchmark run results.json [--quick] [--filter kernel/]
+    python -m binary.checking.benchmark compare base.json new.json [--time-rtol 0.2]
+    python -m binary.checking.benchmark imports [--budget 0.5]
+
+    :param argv: список аргументов, None - аргументы командной строки
+    :return: код возврата: 1, если при сравнении есть ухудшения
+             или импорт модулей не укладывается в ограничение, иначе 0
+    """
+    parser = argparse.ArgumentParser(prog="python -m binary.checking.benchmark")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="запуск бенчмарков")
+    run_parser.add_argument("output", help="путь к файлу результатов json")
+    run_parser.add_argument("--quick", action="store_true", help="уменьшенные размеры")
+    run_parser.add_argument("--repeat", type=int, default=REPEAT_CNT, help="количество замеров времени")
+    run_parser.add_argument("--filter", default=None, help="подстрока наименования бенчмарков")
+
+    compare_parser = subparsers.add_parser("compare", help="сравнение двух запусков")
+    compare_parser.add_argument("base", help="файл результатов базового запуска")
+    compare_parser.add_argument("new", help="файл результатов нового запуска")
+    compare_parser.add_argument("--time-rtol", type=float, default=TIME_RTOL,
+                                help="допустимое относительное ухудшение времени")
+    compare_parser.add_argument("--memory-rtol", type=float, default=MEMORY_RTOL,
+                                help="допустимое относительное ухудшение пиковой памяти")
+
+    imports_parser = subparsers.add_parser("imports", help="проверка времени импорта онлайн тестов и ядер")
+    imports_parser.add_argument("--budget", type=float, default=IMPORT_TIME_BUDGET,
+                                help="ограничение на время импорта модуля в секундах")
+    imports_parser.add_argument("--repeat", type=int, default=REPEAT_CNT, help="количество замеров времени")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        run_benchmarks(args.output, quick=args.quick, repeat_cnt=args.repeat,
+                       name_filter=args.filter, verbose=True)
+        return 0
+
+    if args.command == "imports":
+        check_list = check_import_times(budget=args.budget, repeat_cnt=args.repeat)
+        print(format_import_check(check_list))
+        return int(any(row["budget_violation"] for row in check_list))
+
+    comparison_list = compare_results(args.base, args.new, args.time_rtol, args.memory_rtol)
+    print(format_comparison(comparison_list))
+    return int(any(row["time_regression"] or row["memory_regression"] for row in comparison_list))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
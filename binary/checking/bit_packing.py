@@ -0,0 +1,144 @@
+import numpy as np
+
+from .dtype_policy import get_packed_count_dtype
+
+
+# Количество значений выборки в одном машинном слове
+WORD_SIZE = 64
+
+# Тип машинного слова, порядок байт фиксирован,
+# чтобы i-й бит слова k был значением 64 * k + i выборки
+WORD_DTYPE = np.dtype("<u8")
+
+# Маски младших битов: LOW_BIT_MASK[j] содержит биты 0, ..., j
+LOW_BIT_MASK = np.array([(1 << (j + 1)) - 1 for j in range(WORD_SIZE)], dtype=WORD_DTYPE)
+
+# Количество единичных битов для каждого значения байта
+BYTE_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def get_word_cnt(sample_size):
+    """
+    Количество машинных слов для хранения sample_size значений
+
+    :param sample_size: размер выборки
+    :return: количество машинных слов
+    """
+    return (sample_size + WORD_SIZE - 1) // WORD_SIZE
+
+
+def popcount(x):
+    """
+    Количество единичных битов в каждом машинном слове
+
+    :param x: массив машинных слов
+    :return: массив того же размера из количеств единичных битов
+    """
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+
+    # Для старых версий numpy считаем по байтам
+    x = np.ascontiguousarray(x, dtype=WORD_DTYPE)
+    byte_popcount = BYTE_POPCOUNT[x.view(np.uint8)]
+    return byte_popcount.reshape(*x.shape, 8).sum(axis=-1, dtype=np.uint8)
+
+
+def pack_bits(x):
+    """
+    Упаковка выборки из {0, 1} по 64 значения в машинное слово
+
+    :param x: массив размера [iter_size, sample_size] из значений {0, 1}
+    :return: массив размера [iter_size, ceil(sample_size / 64)] машинных слов
+    """
+    iter_size, sample_size = x.shape
+    word_cnt = get_word_cnt(sample_size)
+
+    x_packed = np.zeros([iter_size, word_cnt], dtype=WORD_DTYPE)
+    byte_packed = np.packbits(np.asarray(x, dtype=bool), axis=1, bitorder="little")
+    x_packed.view(np.uint8)[:, :byte_packed.shape[1]] = byte_packed
+
+    return x_packed
+
+
+def unpack_bits(x_packed, sample_size):
+    """
+    Распаковка машинных слов в выборку из {0, 1}
+
+    :param x_packed: массив размера [iter_size, ceil(sample_size / 64)] машинных слов
+    :param sample_size: размер выборки
+    :return: массив размера [iter_size, sample_size] из значений {0, 1} типа uint8
+    """
+    x_packed = np.ascontiguousarray(x_packed, dtype=WORD_DTYPE)
+    return np.unpackbits(x_packed.view(np.uint8), axis=1, count=sample_size, bitorder="little")
+
+
+def packed_cumsum(x_packed, sample_size, dtype=None):
+    """
+    Расчёт накопленной суммы S(n) по упакованной выборке:
+    сумма единичных битов предыдущих слов
+    плюс количество единичных битов в начале текущего слова
+
+    :param x_packed: массив размера [iter_size, ceil(sample_size / 64)] машинных слов
+    :param sample_size: размер выборки
+    :param dtype: тип накопленных сумм, None - get_packed_count_dtype
+    :return: массив размера [iter_size, sample_size] из накопленных сумм S(n)
+    """
+    iter_size, word_cnt = x_packed.shape
+    dtype = dtype or get_packed_count_dtype(sample_size)
+
+    # Количество "успехов" до начала каждого слова
+    word_popcount = popcount(x_packed)
+    word_prefix = np.cumsum(word_popcount, axis=1, dtype=dtype)
+    word_prefix -= word_popcount
+
+    # Накопленная сумма внутри слова для каждой позиции бита
+    s_list = np.empty([iter_size, word_cnt * WORD_SIZE], dtype=dtype)
+    s_block = s_list.reshape(iter_size, word_cnt, WORD_SIZE)
+    for j in range(WORD_SIZE):
+        s_block[:, :, j] = popcount(x_packed & LOW_BIT_MASK[j])
+        s_block[:, :, j] += word_prefix
+
+    return s_list[:, :sample_size]
+
+
+def packed_sum_at_duration(x_packed, duration_list):
+    """
+    Функция для расчёта суммы значений упакованной выборки
+    на момент длительности теста
+
+    :param x_packed: массив размера [iter_size, ceil(sample_size / 64)] машинных слов
+    :param duration_list: список размера iter_size из длительностей теста
+    :return: список размера iter_size из сумм первых duration значений выборки
+    """
+    iter_index = np.arange(x_packed.shape[0])
+    word_index, bit_index = np.divmod(duration_list - 1, WORD_SIZE)
+
+    # Количество "успехов" до начала слова, в котором закончился тест
+    word_popcount = popcount(x_packed)
+    word_prefix = np.cumsum(word_popcount, axis=1, dtype=np.int64)
+    word_prefix -= word_popcount
+
+    word = x_packed[iter_index, word_index]
+    return word_prefix[iter_index, word_index] + popcount(word & LOW_BIT_MASK[bit_index])
+
+
+def packed_discordant_cumsum(x_packed, y_packed, sample_size):
+    """
+    Функция для перехода от двухвыборочной задачи к одновыборочной
+    по упакованным выборкам: несовпадающие пары находятся через XOR,
+    пары вида (1, 0) через AND
+
+    :param x_packed: массив машинных слов первой выборки
+    :param y_packed: массив машинных слов второй выборки
+    :param sample_size: размер выборки
+    :return: массив накопленных сумм S(n) пар вида (1, 0),
+             массив накопленного количества несовпадающих пар
+    """
+    discordant_packed = x_packed ^ y_packed
+    success_packed = x_packed & discordant_packed
+
+    s_list = packed_cumsum(success_packed, sample_size, dtype=np.int32)
+    del success_packed
+    n_list = packed_cumsum(discordant_packed, sample_size, dtype=np.int32)
+
+    return s_list, n_list
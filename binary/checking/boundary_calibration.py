@@ -0,0 +1,152 @@
+from functools import lru_cache
+
+from binary.checking.design_table import CACHE_SIZE
+from binary.sprt.one_sample_sprt import BinaryOneSampleSprt
+from binary.sprt.two_sample_sprt import BinaryTwoSampleSprt
+
+
+# Максимальное количество итераций подбора границ
+CALIBRATION_MAX_ITER = 30
+
+# Относительная точность, с которой точные вероятности ошибок
+# подводятся снизу к требуемым
+CALIBRATION_RTOL = 1e-3
+
+# Наибольшее номинальное значение вероятности ошибки
+MAX_NOMINAL_ERROR = 0.5
+
+
+def calibrate_bounds(p0, d, alpha, beta, alternative, sample_cnt=1,
+                     max_iter=CALIBRATION_MAX_ITER, rtol=CALIBRATION_RTOL):
+    """
+    Подбор границ последовательного теста по точным вероятностям ошибок
+
+    Границы Вальда log(beta / (1 - alpha)) и log((1 - beta) / alpha) гарантируют
+    вероятности ошибок не больше alpha и beta, но на практике они бывают заметно меньше,
+    и тест длится дольше необходимого. Границы ищутся в том же виде,
+    но с номинальными значениями alpha' и beta', которые подбираются так,
+    чтобы точные вероятности ошибок, рассчитанные exact_error_rates,
+    были не больше alpha и beta и отличались от них не больше, чем на rtol.
+    Номинальные значения можно передавать вместо alpha и beta
+    в классы теста, ядра и моделирование.
+    Из-за целочисленности S(n) вероятности ошибок меняются скачками,
+    поэтому среди просмотренных номинальных значений выбираются те,
+    при которых вероятности ошибок не больше требуемых, а средняя длительность наименьшая
+
+    :param p0: значение вероятности при гипотезе
+    :param d: абсолютное значение MDE
+    :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+    :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
+    :param alternative: наименование альтернативы: "less", "greater" или "two-sided"
+    :param sample_cnt: количество выборок: 1 или 2
+    :param max_iter: максимальное количество итераций подбора
+    :param rtol: относительная точность вероятностей ошибок
+    :return: словарь res
+             res["nominal_alpha"] - номинальное значение alpha'
+             res["nominal_beta"] - номинальное значение beta'
+             res["bounds"] - кортеж из наименования односторонней альтернативы,
+                             нижней и верхней границ для каждой односторонней проверки
+             res["alpha"] - точная вероятность ошибки I рода с подобранными границами
+             res["beta"] - точная вероятность ошибки II рода с подобранными границами
+             res["hypothesis_duration"] - средняя длительность при p = p0
+             res["alternative_duration"] - средняя длительность при альтернативе
+             res["wald_alpha"], res["wald_beta"],
+             res["wald_hypothesis_duration"], res["wald_alternative_duration"] -
+             те же величины для границ Вальда
+             res["hypothesis_saving"] - относительное сокращение средней длительности при p = p0
+             res["alternative_saving"] - относительное сокращение средней длительности при альтернативе
+             res["feasible_flg"] - признак того, что вероятности ошибок не больше требуемых,
+                                   иначе возвращаются границы Вальда
+    """
+    from binary.checking.truncated_sprt import exact_error_rates
+
+    def calc_error_rates(nominal_alpha, nominal_beta):
+        return exact_error_rates(p0, d, nominal_alpha, nominal_beta, alternative, sample_cnt)
+
+    def is_feasible(res):
+        return res["alpha"] <= alpha and res["beta"] <= beta
+
+    def calc_duration(res):
+        return res["hypothesis_duration"] + res["alternative_duration"]
+
+    wald_res = calc_error_rates(alpha, beta)
+    best_nominal_alpha, best_nominal_beta, best_res = alpha, beta, wald_res
+    feasible_flg = is_feasible(wald_res)
+
+    # Точные вероятности ошибок почти пропорциональны номинальным,
+    # поэтому номинальные значения поправляются на отношение требуемых к точным,
+    # причём требуемые уменьшены на rtol, чтобы подходить к ним снизу
+    nominal_alpha, nominal_beta, res = alpha, beta, wald_res
+    for _ in range(max_iter):
+        if (1 - 2 * rtol) * alpha <= res["alpha"] <= alpha and (1 - 2 * rtol) * beta <= res["beta"] <= beta:
+            break
+
+        nominal_alpha = min(nominal_alpha * (1 - rtol) * alpha / res["alpha"], MAX_NOMINAL_ERROR)
+        nominal_beta = min(nominal_beta * (1 - rtol) * beta / res["beta"], MAX_NOMINAL_ERROR)
+        res = calc_error_rates(nominal_alpha, nominal_beta)
+
+        if is_feasible(res) and (not feasible_flg or calc_duration(res) < calc_duration(best_res)):
+            best_nominal_alpha, best_nominal_beta, best_res = nominal_alpha, nominal_beta, res
+            feasible_flg = True
+
+    return {
+        "nominal_alpha": best_nominal_alpha,
+        "nominal_beta": best_nominal_beta,
+        "bounds": get_bounds(p0, d, best_nominal_alpha, best_nominal_beta, alternative, sample_cnt),
+        "alpha": best_res["alpha"],
+        "beta": best_res["beta"],
+        "hypothesis_duration": best_res["hypothesis_duration"],
+        "alternative_duration": best_res["alternative_duration"],
+        "wald_alpha": wald_res["alpha"],
+        "wald_beta": wald_res["beta"],
+        "wald_hypothesis_duration": wald_res["hypothesis_duration"],
+        "wald_alternative_duration": wald_res["alternative_duration"],
+        "hypothesis_saving": 1 - best_res["hypothesis_duration"] / wald_res["hypothesis_duration"],
+        "alternative_saving": 1 - best_res["alternative_duration"] / wald_res["alternative_duration"],
+        "feasible_flg": feasible_flg
+    }
+
+
+def get_bounds(p0, d, alpha, beta, alternative, sample_cnt=1):
+    """
+    Границы односторонних проверок, из которых состоит последовательный тест
+
+    :param p0: значение вероятности при гипотезе
+    :param d: абсолютное значение MDE
+    :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+    :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
+    :param alternative: наименование альтернативы: "less", "greater" или "two-sided"
+    :param sample_cnt: количество выборок: 1 или 2
+    :return: кортеж из наименования односторонней альтернативы,
+             нижней и верхней границ для каждой односторонней проверки
+    """
+    if sample_cnt == 1:
+        sprt = BinaryOneSampleSprt(p0, d, alpha, beta, alternative)
+    elif sample_cnt == 2:
+        sprt = BinaryTwoSampleSprt(p0, d, alpha, beta, alternative)
+    else:
+        raise ValueError(f"Неправильное количество выборок: {sample_cnt}")
+
+    if alternative == "two-sided":
+        alpha_dict = {"greater": alpha / 2, "less": alpha / 2}
+    else:
+        alpha_dict = {alternative: alpha}
+
+    return tuple(
+        (one_sided_alternative, *(float(bound) for bound in sprt.calc_one_sided_bounds(one_sided_alpha, beta,
+                                                                                        one_sided_alternative)))
+        for one_sided_alternative, one_sided_alpha in alpha_dict.items()
+    )
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _cached_calibration(p0, d, alpha, beta, alternative, sample_cnt):
+    return tuple(calibrate_bounds(p0, d, alpha, beta, alternative, sample_cnt).items())
+
+
+def cached_calibrate_bounds(p0, d, alpha, beta, alternative, sample_cnt=1):
+    """
+    Подбор границ последовательного теста с запоминанием результатов по дизайну,
+    аналог calibrate_bounds
+    """
+    return dict(_cached_calibration(p0, d, alpha, beta, alternative, sample_cnt))
@@ -0,0 +1,250 @@
+import json
+import os
+
+import numpy as np
+
+from .counter_rng import CounterRandomState
+
+
+# Версия формата файла контрольной точки
+CHECKPOINT_VERSION = 4
+
+
+class SimulationCheckpoint(object):
+    """
+    Контрольная точка цикла моделирования
+
+    Состояние цикла (кривые и флаги незаконченных тестов, накопленные суммы,
+    характеристики законченных тестов, пройденная длительность)
+    и состояние генератора случайных чисел сохраняются в сжатый файл .npz.
+    Продолжение с контрольной точки даёт тот же результат,
+    что и моделирование без прерывания
+    """
+
+    def __init__(self, path, params, every=1):
+        """
+        :param path: путь к файлу контрольной точки
+        :param params: словарь параметров моделирования,
+                       при продолжении они должны совпадать с сохранёнными
+        :param every: количество батчей между сохранениями
+        """
+        if every < 1:
+            raise ValueError(f"Неправильное количество батчей между сохранениями: {every}")
+
+        self.path = path
+        self.params = {
+            key: value.item() if isinstance(value, np.generic) else value
+            for key, value in params.items()
+        }
+        self.every = every
+        self.batch_cnt = 0
+
+    def exists(self):
+        """
+        Наличие сохранённой контрольной точки
+        """
+        return os.path.exists(self.path)
+
+    def due(self, remain_iter_cnt):
+        """
+        Необходимость сохранения после очередного батча:
+        файл записывается раз в every батчей и после последнего батча,
+        поэтому состояние собирается только перед записью
+
+        :param remain_iter_cnt: количество незаконченных тестов после батча
+        :return: флаг сохранения
+        """
+        self.batch_cnt += 1
+        return self.batch_cnt % self.every == 0 or remain_iter_cnt == 0
+
+    def save(self, random_state, **state):
+        """
+        Сохранение состояния после очередного батча, для которого due вернул True
+
+        :param random_state: генератор случайных чисел np.random.Generator,
+                             генератор на основе счётчика CounterRandomState
+                             или None - глобальный генератор numpy
+        :param state: переменные цикла моделирования: None, числа,
+                      массивы numpy и словари из них
+        """
+        array_dict = {}
+        value_dict = {}
+        _flatten(state, "", array_dict, value_dict)
+
+        if random_state is None:
+            bit_generator_name, key, pos, has_gauss, cached_gaussian = np.random.get_state(legacy=True)
+            array_dict["random_state/key"] = key
+            rng_state = {
+                "kind": "global",
+                "state": [bit_generator_name, int(pos), int(has_gauss), float(cached_gaussian)]
+            }
+        elif isinstance(random_state, CounterRandomState):
+            # У генератора на основе счётчика нет состояния кроме seed,
+            # номера тестов и батчей сохраняются в переменных цикла
+            rng_state = {"kind": "counter", "state": [random_state.seed, random_state.index_offset]}
+        else:
+            rng_state = {"kind": "generator", "state": random_state.bit_generator.state}
+
+        meta = {
+            "version": CHECKPOINT_VERSION,
+            "params": self.params,
+            "random_state": rng_state,
+            "values": value_dict
+        }
+
+        # Запись через временный файл, чтобы прерывание во время записи
+        # не испортило предыдущую контрольную точку
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, meta=np.array(json.dumps(meta)), **array_dict)
+        os.replace(tmp_path, self.path)
+
+    def load(self, random_state):
+        """
+        Загрузка состояния цикла моделирования
+        и восстановление состояния генератора случайных чисел
+
+        :param random_state: генератор случайных чисел np.random.Generator,
+                             None - глобальный генератор numpy
+                             или новый генератор, если сохранён генератор,
+                             для генератора на основе счётчика не используется
+        :return: словарь переменных цикла моделирования
+                 и генератор случайных чисел для продолжения
+        """
+        meta, array_dict = _read(self.path)
+
+        if meta["params"] != self.params:
+            raise ValueError(f"Параметры моделирования не совпадают с контрольной точкой: {meta['params']}")
+
+        rng_state = meta["random_state"]
+        if rng_state["kind"] == "global":
+            bit_generator_name, pos, has_gauss, cached_gaussian = rng_state["state"]
+            np.random.set_state((bit_generator_name, array_dict.pop("random_state/key"),
+                                 pos, has_gauss, cached_gaussian))
+            random_state = None
+        elif rng_state["kind"] == "counter":
+            random_state = CounterRandomState(*rng_state["state"])
+        else:
+            if random_state is None:
+                bit_generator = getattr(np.random, rng_state["state"]["bit_generator"])()
+                random_state = np.random.Generator(bit_generator)
+            random_state.bit_generator.state = rng_state["state"]
+
+        return _unflatten(array_dict, meta["values"]), random_state
+
+
+def read_checkpoint_params(path):
+    """
+    Параметры моделирования, сохранённые в контрольной точке
+
+    :param path: путь к файлу контрольной точки
+    :return: словарь параметров моделирования
+    """
+    meta, _ = _read(path)
+    return meta["params"]
+
+
+def _read(path):
+    """
+    Чтение метаданных и массивов контрольной точки
+    """
+    with np.load(path) as f:
+        meta = json.loads(str(f["meta"]))
+        array_dict = {key: f[key] for key in f.files if key != "meta"}
+
+    if meta["version"] != CHECKPOINT_VERSION:
+        raise ValueError(f"Неподдерживаемая версия контрольной точки: {meta['version']}")
+
+    return meta, array_dict
+
+
+def _flatten(state, prefix, array_dict, value_dict):
+    """
+    Разделение вложенного словаря состояния на массивы и скалярные значения,
+    ключи вложенных словарей соединяются через "/"
+    """
+    for key, value in state.items():
+        full_key = f"{prefix}{key}"
+        if isinstance(value, dict):
+            _flatten(value, f"{full_key}/", array_dict, value_dict)
+        elif isinstance(value, np.ndarray):
+            array_dict[full_key] = value
+        elif isinstance(value, (bool, np.bool_)):
+            value_dict[full_key] = bool(value)
+        elif isinstance(value, (int, np.integer)):
+            value_dict[full_key] = int(value)
+        elif isinstance(value, (float, np.floating)):
+            value_dict[full_key] = float(value)
+        else:
+            value_dict[full_key] = value
+
+
+def _unflatten(array_dict, value_dict):
+    """
+    Сборка вложенного словаря состояния из массивов и скалярных значений
+    """
+    state = {}
+    for full_key, value in list(array_dict.items()) + list(value_dict.items()):
+        *prefix_list, key = full_key.split("/")
+        node = state
+        for prefix in prefix_list:
+            node = node.setdefault(prefix, {})
+        node[key] = value
+    return state
+
+
+def get_completed_state(completed_summary, completed_records, **completed_list_dict):
+    """
+    Состояние характеристик законченных тестов для контрольной точки
+
+    :param completed_summary: накопитель SimulationSummary или None
+    :param completed_records: приёмник ResultSink или None,
+                              если записи отображаются на файл .npy,
+                              то сохраняются только их количество и путь к файлу
+    :param completed_list_dict: списки характеристик законченных тестов
+    :return: словарь состояния
+    """
+    if completed_summary is not None:
+        return {"summary": completed_summary.get_state()}
+    if completed_records is not None and completed_records.path is not None:
+        return {"records": {"size": completed_records.size, "path": completed_records.path}}
+    if completed_records is not None:
+        return {
+            "records": {
+                key: completed_records.records[key][:completed_records.size]
+                for key in completed_list_dict
+            }
+        }
+    return {
+        "lists": {
+            key: np.array(value_list)
+            for key, value_list in completed_list_dict.items()
+        }
+    }
+
+
+def restore_completed_state(state, completed_summary, completed_records):
+    """
+    Восстановление характеристик законченных тестов из контрольной точки
+
+    :param state: словарь состояния из get_completed_state
+    :param completed_summary: накопитель SimulationSummary или None
+    :param completed_records: приёмник ResultSink или None,
+                              сохранённые записи дописываются в него,
+                              а записи в файле .npy остаются в нём
+    :return: восстановленный накопитель SimulationSummary или None
+             и словарь списков характеристик законченных тестов
+    """
+    if (completed_summary is not None) != ("summary" in state) \
+            or (completed_records is not None) != ("records" in state):
+        raise ValueError("Режим моделирования не совпадает с контрольной точкой")
+
+    if completed_summary is not None:
+        return type(completed_summary).from_state(state["summary"]), {}
+    if completed_records is not None and "path" in state["records"]:
+        completed_records.size = state["records"]["size"]
+        return None, {}
+    if completed_records is not None:
+        completed_records.write(**state["records"])
+        return None, {}
+    return None, {key: list(value_list) for key, value_list in state["lists"].items()}
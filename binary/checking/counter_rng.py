@@ -0,0 +1,226 @@
+import numpy as np
+
+from .dtype_policy import DRAW_BLOCK_SIZE
+
+
+# Константы умножения и приращения ключа генератора Philox4x32
+PHILOX_MULTIPLIERS = (0xD2511F53, 0xCD9E8D57)
+PHILOX_KEY_INCREMENTS = (0x9E3779B9, 0xBB67AE85)
+
+# Количество раундов генератора Philox4x32
+PHILOX_ROUND_CNT = 10
+
+# Маска 32-битного машинного слова
+WORD_MASK = np.uint64(0xFFFFFFFF)
+
+
+def philox4x32(counter, key, round_cnt=PHILOX_ROUND_CNT):
+    """
+    Генератор Philox4x32 на основе счётчика:
+    каждое значение счётчика независимо отображается в четыре случайных 32-битных слова
+
+    Salmon J. K., Moraes M. A., Dror R. O., Shaw D. E.
+    Parallel random numbers: as easy as 1, 2, 3.
+    – Proceedings of the International Conference for High Performance Computing,
+    Networking, Storage and Analysis, 2011. – P. 1-12.
+
+    :param counter: массив размера [..., 4] из 32-битных слов счётчика
+    :param key: пара 32-битных слов ключа
+    :param round_cnt: количество раундов
+    :return: массив размера [..., 4] из случайных 32-битных слов в типе uint64
+    """
+    counter = np.asarray(counter, dtype=np.uint64)
+    ctr = [counter[..., i] & WORD_MASK for i in range(4)]
+    key_0, key_1 = (int(word) & 0xFFFFFFFF for word in key)
+
+    multiplier_0, multiplier_1 = (np.uint64(multiplier) for multiplier in PHILOX_MULTIPLIERS)
+    for round_index in range(round_cnt):
+        # Произведения 32-битных слов помещаются в uint64 без переполнения
+        product_0 = ctr[0] * multiplier_0
+        product_1 = ctr[2] * multiplier_1
+        ctr = [(product_1 >> np.uint64(32)) ^ ctr[1] ^ np.uint64(key_0),
+               product_1 & WORD_MASK,
+               (product_0 >> np.uint64(32)) ^ ctr[3] ^ np.uint64(key_1),
+               product_0 & WORD_MASK]
+
+        if round_index < round_cnt - 1:
+            key_0 = (key_0 + PHILOX_KEY_INCREMENTS[0]) & 0xFFFFFFFF
+            key_1 = (key_1 + PHILOX_KEY_INCREMENTS[1]) & 0xFFFFFFFF
+
+    return np.stack(ctr, axis=-1)
+
+
+class CounterRandomState(object):
+    """
+    Генератор случайных чисел моделирования на основе счётчика
+
+    Значения выборки теста в батче - функция от seed, номера теста,
+    номера батча и номера потока розыгрыша внутри батча,
+    а не от порядка предыдущих розыгрышей. Поэтому траекторию любого теста
+    можно разыграть заново отдельно от остальных, а результат теста не зависит
+    от количества тестов в моделировании, разбиения на части и контрольных точек.
+    Номера тестов, батчей и потоков должны быть меньше 2^32
+    """
+
+    def __init__(self, seed, index_offset=0):
+        """
+        :param seed: целое неотрицательное число меньше 2^64, ключ генератора
+        :param index_offset: номер первого теста моделирования
+        """
+        if seed is None or int(seed) != seed or not 0 <= int(seed) < 1 << 64:
+            raise ValueError(f"Неправильный seed генератора на основе счётчика: {seed}")
+
+        self.seed = int(seed)
+        self.index_offset = int(index_offset)
+        self.key = (self.seed & 0xFFFFFFFF, self.seed >> 32)
+
+    def shift(self, offset):
+        """
+        Генератор для части моделирования, начинающейся с теста offset
+
+        :param offset: смещение номеров тестов
+        :return: генератор с тем же seed
+        """
+        return CounterRandomState(self.seed, self.index_offset + offset)
+
+    def for_batch(self, test_index, batch_index):
+        """
+        Генератор одного батча для заданных тестов
+
+        :param test_index: список номеров тестов внутри моделирования (без index_offset)
+        :param batch_index: номер батча
+        :return: генератор батча CounterBatchRandomState
+        """
+        return CounterBatchRandomState(self, self.index_offset + np.asarray(test_index, dtype=np.int64),
+                                       batch_index)
+
+    def random(self, test_index, batch_index, stream, sample_size):
+        """
+        Равномерно распределённые на (0, 1) значения
+        с точностью 53 бита, по два значения на значение счётчика
+
+        :param test_index: список абсолютных номеров тестов
+        :param batch_index: номер батча
+        :param stream: номер потока розыгрыша внутри батча
+        :param sample_size: количество значений для каждого теста
+        :return: массив размера [len(test_index), sample_size]
+        """
+        test_index = np.asarray(test_index, dtype=np.uint64)
+        block_cnt = (sample_size + 1) // 2
+        u = np.empty([len(test_index), 2 * block_cnt], dtype=np.float64)
+
+        # Счётчики разыгрываются блоками строк, чтобы не создавать
+        # промежуточные массивы слов для всего батча
+        block_iter_size = max(1, DRAW_BLOCK_SIZE // max(1, 4 * block_cnt))
+        for start in range(0, len(test_index), block_iter_size):
+            stop = min(start + block_iter_size, len(test_index))
+            counter = np.empty([stop - start, block_cnt, 4], dtype=np.uint64)
+            counter[..., 0] = np.arange(block_cnt, dtype=np.uint64)
+            counter[..., 1] = batch_index
+            counter[..., 2] = test_index[start:stop, np.newaxis]
+            counter[..., 3] = stream
+            word = philox4x32(counter, self.key)
+
+            # 53-битное значение из пары слов, сдвинутое на половину шага от нуля
+            high = (word[..., 0::2] >> np.uint64(5)).astype(np.float64)
+            low = (word[..., 1::2] >> np.uint64(6)).astype(np.float64)
+            u[start:stop] = ((high * 2.0**26 + low + 0.5) * 2.0**-53).reshape(stop - start, -1)
+
+        return u[:, :sample_size]
+
+
+class CounterBatchRandomState(object):
+    """
+    Генератор одного батча для заданных тестов
+
+    Повторяет интерфейс np.random.Generator, который используют функции розыгрыша:
+    каждый вызов разыгрывает следующий поток батча, так что розыгрыши двух выборок
+    или последовательных биномиальных распределений независимы
+    """
+
+    def __init__(self, random_state, test_index, batch_index):
+        """
+        :param random_state: генератор CounterRandomState
+        :param test_index: список абсолютных номеров тестов
+        :param batch_index: номер батча
+        """
+        self.random_state = random_state
+        self.test_index = test_index
+        self.batch_index = batch_index
+        self.stream = 0
+
+    def random(self, size):
+        """
+        Равномерно распределённые на (0, 1) значения следующего потока
+
+        :param size: размер [len(test_index), sample_size]
+        :return: массив размера size
+        """
+        iter_size, sample_size = size
+        if iter_size != len(self.test_index):
+            raise ValueError(f"Неправильный размер розыгрыша: {size}")
+
+        u = self.random_state.random(self.test_index, self.batch_index, self.stream, sample_size)
+        self.stream += 1
+        return u
+
+    def split_rows(self, block_iter_size):
+        """
+        Генераторы блоков строк батча для следующего потока:
+        значения каждого теста те же, что и при розыгрыше всего батча,
+        а поток исходного генератора сдвигается один раз
+
+        :param block_iter_size: количество строк в блоке
+        :return: список генераторов CounterBatchRandomState блоков строк
+        """
+        block_list = []
+        for start in range(0, len(self.test_index), block_iter_size):
+            block = CounterBatchRandomState(self.random_state, self.test_index[start:start + block_iter_size],
+                                            self.batch_index)
+            block.stream = self.stream
+            block_list.append(block)
+        self.stream += 1
+        return block_list
+
+    def bernoulli(self, p, size, dtype=None):
+        """
+        Выборка из распределения Бернулли
+
+        :param p: вероятность "успеха"
+        :param size: размер выборки [len(test_index), sample_size]
+        :param dtype: тип значений выборки, None - int64
+        :return: массив размера size из значений {0, 1}
+        """
+        return (self.random(size) < p).astype(dtype or np.int64)
+
+    def binomial(self, n, p, size=None):
+        """
+        Выборка из биномиального распределения методом обратной функции распределения
+
+        :param n: количество испытаний, число или массив, приводимый к размеру size
+        :param p: вероятность "успеха"
+        :param size: размер выборки [len(test_index), sample_size],
+                     None - размер массива n
+        :return: массив размера size
+        """
+        from scipy.stats import binom
+
+        size = np.shape(n) if size is None else size
+        n = np.broadcast_to(n, size)
+        return binom.ppf(self.random(size), n, p).astype(np.int64)
+
+
+def get_batch_random_state(random_state, test_index, batch_index):
+    """
+    Генератор для розыгрыша батча незаконченных тестов
+
+    :param random_state: генератор CounterRandomState, np.random.Generator
+                         или None - глобальный генератор numpy
+    :param test_index: список номеров незаконченных тестов внутри моделирования
+    :param batch_index: номер батча
+    :return: генератор батча CounterBatchRandomState для генератора на основе счётчика,
+             иначе тот же random_state
+    """
+    if isinstance(random_state, CounterRandomState):
+        return random_state.for_batch(test_index, batch_index)
+    return random_state
@@ -0,0 +1,162 @@
+import numpy as np
+from scipy.optimize import bisect
+from scipy.sparse import csr_matrix, identity
+from scipy.sparse.linalg import spsolve
+
+from binary.sprt.cusum_monitor import BinaryCusumMonitor
+
+
+# Количество узлов решётки значений статистики CUSUM ниже порога
+DEFAULT_GRID_SIZE = 4000
+
+# Количество шагов, разыгрываемых за один раз при моделировании
+SIMULATION_BLOCK_SIZE = 256
+
+# Точность порога при подборе по средней длине серии
+THRESHOLD_XTOL = 1e-4
+
+
+def one_sided_cusum_arl(p, p0, d, threshold, alternative, grid_size=DEFAULT_GRID_SIZE):
+    """
+    Средняя длина серии (ARL) до сигнала односторонней процедуры CUSUM,
+    запущенной с нулевой статистики, методом цепи Маркова (Брук и Эванс)
+
+    Статистика рассматривается на решётке из около grid_size узлов ниже порога,
+    шаг которой укладывается целое число раз в меньшее по модулю приращение,
+    большее приращение округляется до ближайшего кратного шага,
+    и для полученной цепи Маркова средняя длина серии находится точно
+    из системы линейных уравнений L = 1 + Q L
+
+    Brook D., Evans D. A.
+    An approach to the probability distribution of cusum run length.
+    – Biometrika, 1972. – Vol. 59, No. 3. – P. 539-549.
+
+    :param p: реальное значение вероятности
+    :param p0: значение вероятности до разладки
+    :param d: абсолютное значение изменения вероятности при разладке
+    :param threshold: порог статистики CUSUM
+    :param alternative: наименование односторонней альтернативы: "less" или "greater"
+    :param grid_size: количество узлов решётки ниже порога
+    :return: средняя длина серии
+    """
+    if alternative not in ("greater", "less"):
+        raise ValueError(f"Неправильная альтернатива: {alternative}")
+
+    monitor = BinaryCusumMonitor(p0, d, threshold, alternative)
+    increments = monitor.increments[0]
+    min_increment = np.abs(increments).min()
+    step = min_increment / max(1, np.round(min_increment * grid_size / threshold))
+    shift_list = np.round(increments / step).astype(np.int64)
+
+    # Переходы между узлами решётки без сигнала: узел grid_size и выше - сигнал
+    grid_size = int(np.ceil(threshold / step - 1e-9))
+    row_list, col_list, prob_list = [], [], []
+    state = np.arange(grid_size)
+    for shift, prob in zip(shift_list, [1 - p, p]):
+        next_state = np.maximum(state + shift, 0)
+        continue_flg = next_state < grid_size
+        row_list.append(state[continue_flg])
+        col_list.append(next_state[continue_flg])
+        prob_list.append(np.full(continue_flg.sum(), prob))
+
+    transition = csr_matrix((np.concatenate(prob_list), (np.concatenate(row_list), np.concatenate(col_list))),
+                            shape=(grid_size, grid_size))
+    arl = spsolve((identity(grid_size, format="csr") - transition).tocsc(), np.ones(grid_size))
+
+    return arl[0]
+
+
+def cusum_arl(p, p0, d, threshold, alternative="less", grid_size=DEFAULT_GRID_SIZE):
+    """
+    Средняя длина серии (ARL) до сигнала процедуры CUSUM методом цепи Маркова
+
+    Для двусторонней альтернативы две односторонние статистики
+    комбинируются по приближению 1 / ARL = 1 / ARL(greater) + 1 / ARL(less)
+
+    :param p: реальное значение вероятности:
+              p0 - средняя длина серии до ложного сигнала,
+              p0 - d или p0 + d - средняя задержка обнаружения разладки
+    :param p0: значение вероятности до разладки
+    :param d: абсолютное значение изменения вероятности при разладке
+    :param threshold: порог статистики CUSUM
+    :param alternative: наименование альтернативы: "less", "greater" или "two-sided"
+    :param grid_size: количество узлов решётки ниже порога
+    :return: средняя длина серии
+    """
+    if alternative == "two-sided":
+        return 1 / (1 / one_sided_cusum_arl(p, p0, d, threshold, "greater", grid_size)
+                    + 1 / one_sided_cusum_arl(p, p0, d, threshold, "less", grid_size))
+
+    return one_sided_cusum_arl(p, p0, d, threshold, alternative, grid_size)
+
+
+def simulate_cusum_arl(p, p0, d, threshold, alternative="less", iter_cnt=1000,
+                       max_sample_size=10**6, random_state=None):
+    """
+    Средняя длина серии (ARL) до сигнала процедуры CUSUM
+    методом Монте-Карло: iter_cnt независимых потоков
+    обрабатываются одним экземпляром BinaryCusumMonitor
+
+    :param p: реальное значение вероятности
+    :param p0: значение вероятности до разладки
+    :param d: абсолютное значение изменения вероятности при разладке
+    :param threshold: порог статистики CUSUM
+    :param alternative: наименование альтернативы: "less", "greater" или "two-sided"
+    :param iter_cnt: количество потоков
+    :param max_sample_size: максимальная длина потока,
+                            потоки без сигнала учитываются с этой длиной
+    :param random_state: генератор случайных чисел np.random.Generator,
+                         None - глобальный генератор numpy
+    :return: словарь res
+             res["arl"] - оценка средней длины серии
+             res["std"] - стандартная ошибка оценки
+             res["censored_share"] - доля потоков без сигнала
+    """
+    random_state = np.random if random_state is None else random_state
+    monitor = BinaryCusumMonitor(p0, d, threshold, alternative, metric_cnt=iter_cnt)
+
+    sample_size = 0
+    while sample_size < max_sample_size and not monitor.alarm_flg.all():
+        metric_index = np.nonzero(~monitor.alarm_flg)[0]
+        block_size = min(SIMULATION_BLOCK_SIZE, max_sample_size - sample_size)
+        sample = (random_state.random((block_size, len(metric_index))) < p).astype(np.int64)
+        for x in sample:
+            monitor.append_batch(x, metric_index)
+        sample_size += block_size
+
+    run_length = np.where(monitor.alarm_flg, monitor.alarm_time, max_sample_size)
+    return {
+        "arl": run_length.mean(),
+        "std": run_length.std(ddof=1) / np.sqrt(iter_cnt) if iter_cnt > 1 else np.nan,
+        "censored_share": 1 - monitor.alarm_flg.mean()
+    }
+
+
+def cusum_threshold(p0, d, target_arl, alternative="less", grid_size=DEFAULT_GRID_SIZE):
+    """
+    Подбор порога процедуры CUSUM, при котором
+    средняя длина серии до ложного сигнала (при p = p0) равна target_arl
+
+    :param p0: значение вероятности до разладки
+    :param d: абсолютное значение изменения вероятности при разладке
+    :param target_arl: требуемая средняя длина серии до ложного сигнала
+    :param alternative: наименование альтернативы: "less", "greater" или "two-sided"
+    :param grid_size: количество узлов решётки ниже порога
+    :return: порог статистики CUSUM
+    """
+    def helper(threshold):
+        return np.log(cusum_arl(p0, p0, d, threshold, alternative, grid_size) / target_arl)
+
+    # При почти нулевом пороге средняя длина серии минимальна,
+    # меньшую длину серии подобрать нельзя
+    if target_arl <= 0 or helper(THRESHOLD_XTOL) >= 0:
+        raise ValueError(f"Неправильная средняя длина серии: {target_arl}")
+
+    # Средняя длина серии до ложного сигнала односторонней процедуры не меньше exp(threshold),
+    # поэтому искомый порог обычно не превосходит log(2 * target_arl),
+    # а при грубой решётке отрезок расширяется
+    high_threshold = np.log(2 * target_arl)
+    while helper(high_threshold) < 0:
+        high_threshold *= 2
+
+    return bisect(helper, THRESHOLD_XTOL, high_threshold, xtol=THRESHOLD_XTOL)
@@ -0,0 +1,334 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+
+
+# Максимальное количество запомненных результатов каждого калькулятора
+CACHE_SIZE = 4096
+
+# Директория с заранее построенными таблицами
+DESIGN_TABLE_DIR = os.path.join(os.path.dirname(__file__), "design_tables")
+
+# Сетки таблиц: значения вероятности при гипотезе и относительного MDE (d / p0)
+DESIGN_TABLE_P0_LIST = np.round(np.arange(0.01, 0.96, 0.02), 2)
+DESIGN_TABLE_LIFT_LIST = np.geomspace(0.005, 0.5, 41)
+
+# Распространённые значения alpha и beta, для которых построены таблицы
+DESIGN_TABLE_ALPHA_LIST = (0.01, 0.05)
+DESIGN_TABLE_BETA_LIST = (0.1, 0.2)
+
+# Допустимая относительная погрешность интерполяции по таблице
+DESIGN_TABLE_RTOL = 0.01
+
+# Доли ячейки по каждой оси, в которых измеряется погрешность интерполяции
+DESIGN_TABLE_CHECK_FRACTIONS = (0.1, 0.3, 0.5, 0.7, 0.9)
+# Запас по погрешности: таблица используется в ячейках с измеренной погрешностью
+# не больше rtol * DESIGN_TABLE_ERROR_MARGIN, так как между точками измерения
+# точная длительность меняется скачками и погрешность бывает больше измеренной
+DESIGN_TABLE_ERROR_MARGIN = 0.5
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def cached_one_sample_sequential_sample_size(p, p0, d, alpha, beta, alternative):
+    """
+    Средняя длительность последовательного одновыборочного теста
+    с запоминанием результатов, аналог sequential_sample_size
+    """
+    from binary.checking.one_sample_sequential_sample_size import sequential_sample_size
+
+    return sequential_sample_size(p, p0, d, alpha, beta, alternative)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def cached_one_sample_max_sequential_sample_size(p0, d, alpha, beta, alternative):
+    """
+    Максимальная средняя длительность последовательного одновыборочного теста
+    с запоминанием результатов, аналог max_sequential_sample_size
+    """
+    from binary.checking.one_sample_sequential_sample_size import max_sequential_sample_size
+
+    return tuple(max_sequential_sample_size(p0, d, alpha, beta, alternative))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def cached_two_sample_sequential_sample_size(p, p0, d, alpha, beta, alternative):
+    """
+    Средняя длительность последовательного двухвыборочного теста
+    с запоминанием результатов, аналог sequential_sample_size
+    """
+    from binary.checking.two_sample_sequential_sample_size import sequential_sample_size
+
+    return tuple(sequential_sample_size(p, p0, d, alpha, beta, alternative))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def cached_two_sample_max_sequential_sample_size(p0, d, alpha, beta, alternative):
+    """
+    Максимальная средняя длительность последовательного двухвыборочного теста
+    с запоминанием результатов, аналог max_sequential_sample_size
+    """
+    from binary.checking.two_sample_sequential_sample_size import max_sequential_sample_size
+
+    return tuple(max_sequential_sample_size(p0, d, alpha, beta, alternative))
+
+
+def exact_max_sample_size(p0, d, alpha, beta, alternative, sample_cnt):
+    """
+    Точная максимальная средняя длительность теста (размер одной выборки)
+
+    :param p0: значение вероятности при гипотезе
+    :param d: абсолютное значение MDE
+    :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+    :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
+    :param alternative: наименование односторонней альтернативы
+    :param sample_cnt: количество выборок: 1 или 2
+    :return: максимальная средняя длительность теста
+    """
+    if sample_cnt == 1:
+        return cached_one_sample_max_sequential_sample_size(p0, d, alpha, beta, alternative)[0]
+    elif sample_cnt == 2:
+        return cached_two_sample_max_sequential_sample_size(p0, d, alpha, beta, alternative)[0]
+    else:
+        raise ValueError(f"Неправильное количество выборок: {sample_cnt}")
+
+
+class DesignTable(object):
+    """
+    Таблица максимальной средней длительности теста
+    на сетке значений вероятности при гипотезе и относительного MDE
+
+    Значения интерполируются билинейно по logit(p0) и log(lift)
+    в логарифмической шкале длительности,
+    в этих координатах длительность близка к линейной и у краёв отрезка [0, 1].
+    Погрешность интерполяции округлённой вверх длительности измеряется при построении
+    в нескольких точках внутри каждой ячейки сетки, наибольшая хранится вместе с таблицей:
+    у границы области определения и при малых длительностях
+    (где сказывается округление) она велика,
+    и для таких ячеек используется точный расчёт
+    """
+
+    def __init__(self, p0_list, lift_list, log_sample_size, rel_error):
+        """
+        :param p0_list: возрастающая сетка значений вероятности при гипотезе
+        :param lift_list: возрастающая сетка значений относительного MDE
+        :param log_sample_size: матрица логарифмов длительности размера [len(p0_list), len(lift_list)],
+                                nan - вне области определения
+        :param rel_error: матрица относительных погрешностей интерполяции в ячейках
+                          размера [len(p0_list) - 1, len(lift_list) - 1],
+                          nan - ячейка не целиком в области определения
+        """
+        self.p0_list = np.asarray(p0_list, dtype=np.float64)
+        self.lift_list = np.asarray(lift_list, dtype=np.float64)
+        self.logit_p0_list = _logit(self.p0_list)
+        self.log_lift_list = np.log(self.lift_list)
+        self.log_sample_size = np.asarray(log_sample_size, dtype=np.float64)
+        self.rel_error = np.asarray(rel_error, dtype=np.float64)
+
+    @classmethod
+    def build(cls, alpha, beta, alternative, sample_cnt,
+              p0_list=DESIGN_TABLE_P0_LIST, lift_list=DESIGN_TABLE_LIFT_LIST):
+        """
+        Построение таблицы по точным значениям на сетке
+        и измерение погрешности интерполяции в точках внутри ячеек
+
+        :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+        :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
+        :param alternative: наименование односторонней альтернативы
+        :param sample_cnt: количество выборок: 1 или 2
+        :param p0_list: сетка значений вероятности при гипотезе
+        :param lift_list: сетка значений относительного MDE
+        :return: таблица DesignTable
+        """
+        def calc_log_sample_size(p0_grid, lift_grid):
+            log_sample_size = np.full([len(p0_grid), len(lift_grid)], np.nan)
+            for i, p0 in enumerate(p0_grid):
+                for j, lift in enumerate(lift_grid):
+                    if _is_valid(p0, p0 * lift, alternative):
+                        log_sample_size[i, j] = np.log(exact_max_sample_size(float(p0), float(p0 * lift),
+                                                                             alpha, beta, alternative,
+                                                                             sample_cnt))
+            return log_sample_size
+
+        p0_list = np.asarray(p0_list, dtype=np.float64)
+        lift_list = np.asarray(lift_list, dtype=np.float64)
+        table = cls(p0_list, lift_list, calc_log_sample_size(p0_list, lift_list),
+                    np.zeros([len(p0_list) - 1, len(lift_list) - 1]))
+
+        # Наибольшая погрешность округлённых вверх значений, как их возвращает max_sample_size_lookup,
+        # по точкам внутри ячеек: nan в любой точке делает nan всю ячейку
+        rel_error = np.zeros_like(table.rel_error)
+        for p0_fraction in DESIGN_TABLE_CHECK_FRACTIONS:
+            check_p0_list = _expit((1 - p0_fraction) * _logit(p0_list[:-1]) + p0_fraction * _logit(p0_list[1:]))
+            for lift_fraction in DESIGN_TABLE_CHECK_FRACTIONS:
+                check_lift_list = np.exp((1 - lift_fraction) * np.log(lift_list[:-1])
+                                         + lift_fraction * np.log(lift_list[1:]))
+                exact = np.ceil(np.exp(calc_log_sample_size(check_p0_list, check_lift_list)))
+                interpolated = np.ceil(table._interpolate(check_p0_list.reshape(-1, 1),
+                                                          check_lift_list.reshape(1, -1)))
+                rel_error = np.maximum(rel_error, np.abs(interpolated - exact) / exact)
+        table.rel_error = rel_error
+
+        return table
+
+    @classmethod
+    def load(cls, path):
+        """
+        Загрузка таблицы из файла .npz
+        """
+        with np.load(path) as f:
+            return cls(f["p0_list"], f["lift_list"], f["log_sample_size"], f["rel_error"])
+
+    def save(self, path):
+        """
+        Сохранение таблицы в файл .npz
+        """
+        np.savez_compressed(path,
+                            p0_list=self.p0_list,
+                            lift_list=self.lift_list,
+                            log_sample_size=self.log_sample_size,
+                            rel_error=self.rel_error)
+
+    @property
+    def max_rel_error(self):
+        """
+        Максимальная относительная погрешность интерполяции по всем ячейкам
+        """
+        return np.nanmax(self.rel_error)
+
+    def interpolate(self, p0, lift, rtol=DESIGN_TABLE_RTOL):
+        """
+        Интерполяция максимальной средней длительности теста
+
+        :param p0: значение или массив значений вероятности при гипотезе
+        :param lift: значение или массив значений относительного MDE
+        :param rtol: допустимая относительная погрешность интерполяции в ячейке
+        :return: значение или массив значений длительности,
+                 nan - вне сетки таблицы, вне области определения
+                 или в ячейке с погрешностью больше rtol
+        """
+        return self._interpolate(p0, lift, rtol)
+
+    def _interpolate(self, p0, lift, rtol=np.inf):
+        """
+        Билинейная интерполяция логарифма длительности
+        """
+        logit_p0, log_lift = np.broadcast_arrays(_logit(np.asarray(p0, dtype=np.float64)),
+                                                 np.log(np.asarray(lift, dtype=np.float64)))
+
+        i = np.clip(np.searchsorted(self.logit_p0_list, logit_p0, side="right") - 1,
+                    0, len(self.logit_p0_list) - 2)
+        j = np.clip(np.searchsorted(self.log_lift_list, log_lift, side="right") - 1,
+                    0, len(self.log_lift_list) - 2)
+
+        u = (logit_p0 - self.logit_p0_list[i]) / (self.logit_p0_list[i + 1] - self.logit_p0_list[i])
+        v = (log_lift - self.log_lift_list[j]) / (self.log_lift_list[j + 1] - self.log_lift_list[j])
+
+        log_sample_size = (1 - u) * (1 - v) * self.log_sample_size[i, j] \
+            + u * (1 - v) * self.log_sample_size[i + 1, j] \
+            + (1 - u) * v * self.log_sample_size[i, j + 1] \
+            + u * v * self.log_sample_size[i + 1, j + 1]
+
+        # Сравнение с nan ложно, поэтому ячейки вне области определения тоже отбрасываются
+        outside_flg = (u < 0) | (u > 1) | (v < 0) | (v > 1) | ~(self.rel_error[i, j] <= rtol)
+        return np.where(outside_flg, np.nan, np.exp(log_sample_size))
+
+
+def get_design_table_path(alpha, beta, alternative, sample_cnt, directory=DESIGN_TABLE_DIR):
+    """
+    Путь к файлу таблицы для заданных параметров
+    """
+    return os.path.join(directory, f"{sample_cnt}_sample_{alternative}_alpha_{alpha}_beta_{beta}.npz")
+
+
+@lru_cache(maxsize=None)
+def get_design_table(alpha, beta, alternative, sample_cnt):
+    """
+    Заранее построенная таблица для заданных параметров
+
+    :return: таблица DesignTable или None, если таблицы нет
+    """
+    path = get_design_table_path(alpha, beta, alternative, sample_cnt)
+    return DesignTable.load(path) if os.path.exists(path) else None
+
+
+def build_design_tables(directory=DESIGN_TABLE_DIR,
+                        alpha_list=DESIGN_TABLE_ALPHA_LIST, beta_list=DESIGN_TABLE_BETA_LIST):
+    """
+    Построение и сохранение таблиц для распространённых значений alpha и beta,
+    обеих односторонних альтернатив и одно- и двухвыборочного теста
+
+    :param directory: директория для сохранения таблиц
+    :param alpha_list: список значений alpha
+    :param beta_list: список значений beta
+    :return: словарь долей ячеек, в которых используется таблица
+             (погрешность интерполяции не больше DESIGN_TABLE_RTOL * DESIGN_TABLE_ERROR_MARGIN),
+             по ключам (alpha, beta, alternative, sample_cnt)
+    """
+    os.makedirs(directory, exist_ok=True)
+    res = {}
+
+    for alpha in alpha_list:
+        for beta in beta_list:
+            for alternative in ("greater", "less"):
+                for sample_cnt in (1, 2):
+                    table = DesignTable.build(alpha, beta, alternative, sample_cnt)
+                    table.save(get_design_table_path(alpha, beta, alternative, sample_cnt, directory))
+                    res[(alpha, beta, alternative, sample_cnt)] = \
+                        np.mean(table.rel_error[np.isfinite(table.rel_error)]
+                                <= DESIGN_TABLE_RTOL * DESIGN_TABLE_ERROR_MARGIN)
+
+    get_design_table.cache_clear()
+    return res
+
+
+def max_sample_size_lookup(p0, d, alpha, beta, alternative, sample_cnt=1, rtol=DESIGN_TABLE_RTOL):
+    """
+    Максимальная средняя длительность теста (размер одной выборки), округлённая вверх,
+    по заранее построенной таблице,
+    если таблица есть, точка лежит внутри сетки,
+    измеренная погрешность в её ячейке не больше rtol * DESIGN_TABLE_ERROR_MARGIN
+    и длительность не меньше 1 / rtol (при меньших длительностях округление
+    само по себе даёт погрешность больше rtol),
+    иначе точный расчёт с запоминанием результата
+
+    :param p0: значение вероятности при гипотезе
+    :param d: абсолютное значение MDE
+    :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+    :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
+    :param alternative: наименование односторонней альтернативы
+    :param sample_cnt: количество выборок: 1 или 2
+    :param rtol: допустимая относительная погрешность интерполяции
+    :return: максимальная средняя длительность теста, целое число
+    """
+    table = get_design_table(alpha, beta, alternative, sample_cnt)
+    if table is not None:
+        sample_size = table.interpolate(p0, np.abs(d) / p0, rtol * DESIGN_TABLE_ERROR_MARGIN)
+        if np.isfinite(sample_size) and sample_size * rtol >= 1:
+            return int(np.ceil(sample_size))
+
+    return int(np.ceil(exact_max_sample_size(p0, np.abs(d), alpha, beta, alternative, sample_cnt)))
+
+
+def _is_valid(p0, d, alternative):
+    """
+    Принадлежность параметров области определения калькулятора
+    """
+    if alternative == "greater":
+        return p0 + d < 1
+    else:
+        return p0 - d > 0
+
+
+def _logit(p):
+    """
+    Логит вероятности
+    """
+    return np.log(p / (1 - p))
+
+
+def _expit(x):
+    """
+    Функция, обратная логиту
+    """
+    return 1 / (1 + np.exp(-x))
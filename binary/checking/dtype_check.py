@@ -0,0 +1,71 @@
+import numpy as np
+
+from binary.checking.one_sample.simulation import simulation_sprt as one_sample_simulation_sprt
+from binary.checking.two_sample.simulation import simulation_sprt as two_sample_simulation_sprt
+
+
+# Эталонные значения seed для проверки узких типов данных
+REFERENCE_SEEDS = (0, 1, 2)
+
+
+def check_narrow_dtype(p0=0.2, d=0.02, alpha=0.05, beta=0.2,
+                       iter_size=2_000, batch_size=500, seeds=REFERENCE_SEEDS):
+    """
+    Проверка того, что моделирование с узкими типами данных
+    принимает те же решения, что и моделирование в int64 и float64
+
+    Для каждого seed, альтернативы и значения p из {p0 - d, p0, p0 + d}
+    моделирование проводится дважды на одних и тех же данных,
+    после чего сравниваются длительности, результаты и значения S(n)
+
+    :param p0: значение вероятности при гипотезе
+    :param d: абсолютное значение MDE
+    :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+    :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
+    :param iter_size: количество параллельных тестов в моделировании
+    :param batch_size: размер одного батча генерирования данных и моделирования
+    :param seeds: список значений seed
+    :return: словарь res, где для каждого моделирования
+             res[(sample_cnt, alternative, p, seed)] - количество тестов с разными решениями
+    """
+    res = {}
+
+    for seed in seeds:
+        for alternative in ("greater", "less", "two-sided"):
+            for p in (p0 - d, p0, p0 + d):
+                sim_res_list = []
+                for narrow_dtype in (False, True):
+                    np.random.seed(seed)
+                    sim_res_list.append(one_sample_simulation_sprt(p, iter_size, batch_size, p0, d, alpha, beta,
+                                                                   alternative=alternative,
+                                                                   narrow_dtype=narrow_dtype))
+                res[(1, alternative, p, seed)] = _mismatch_cnt(*sim_res_list)
+
+                sim_res_list = []
+                for narrow_dtype in (False, True):
+                    np.random.seed(seed)
+                    sim_res_list.append(two_sample_simulation_sprt(p, p0, iter_size, batch_size, p0, d, alpha, beta,
+                                                                   alternative=alternative,
+                                                                   fused=narrow_dtype,
+                                                                   narrow_dtype=narrow_dtype))
+                res[(2, alternative, p, seed)] = _mismatch_cnt(*sim_res_list)
+
+    mismatch_list = [key for key, mismatch_cnt in res.items() if mismatch_cnt > 0]
+    if len(mismatch_list) > 0:
+        raise ValueError(f"Неправильные решения с узкими типами данных: {mismatch_list}")
+
+    return res
+
+
+def _mismatch_cnt(wide_res, narrow_res):
+    """
+    Количество тестов, в которых отличаются результаты моделирования
+
+    :param wide_res: результат моделирования в int64 и float64
+    :param narrow_res: результат моделирования с узкими типами данных
+    :return: количество тестов с разными значениями
+    """
+    mismatch_flg = np.zeros(len(wide_res["duration"]), dtype=bool)
+    for key in wide_res:
+        mismatch_flg |= wide_res[key] != narrow_res[key]
+    return int(np.sum(mismatch_flg))
@@ -0,0 +1,86 @@
+import numpy as np
+
+
+# Тип значений выборки из {0, 1}
+OUTCOME_DTYPE = np.uint8
+
+# Тип накопленных сумм S(n) и длительностей внутри батча,
+# длительность батча много меньше 2^31
+COUNT_DTYPE = np.int32
+
+# Допустимая абсолютная погрешность логарифмического отношения правдоподобий,
+# при которой кривую можно хранить в float32
+CURVE_ATOL = 1e-4
+
+# Количество элементов в одном блоке розыгрыша выборки,
+# чтобы не создавать int64 матрицу размера [iter_size, sample_size] целиком
+DRAW_BLOCK_SIZE = 1 << 20
+
+# Количество элементов в одном блоке строк расчёта теста по упакованной выборке,
+# чтобы не создавать матрицы S(n) и кривой размера [iter_size, sample_size] целиком
+PACKED_BLOCK_SIZE = 1 << 20
+
+# Тип накопленных сумм S(n) упакованной выборки внутри батча,
+# если длительность батча помещается в него
+PACKED_COUNT_DTYPE = np.uint16
+
+
+def get_count_dtype(narrow_dtype):
+    """
+    Функция для определения типа накопленных сумм
+
+    :param narrow_dtype: флаг использования узких типов данных
+    :return: тип накопленных сумм, None - тип по умолчанию
+    """
+    return COUNT_DTYPE if narrow_dtype else None
+
+
+def get_packed_count_dtype(sample_size):
+    """
+    Функция для определения типа накопленных сумм упакованной выборки:
+    S(n) внутри батча не больше его длительности
+
+    :param sample_size: длительность батча
+    :return: тип накопленных сумм
+    """
+    return PACKED_COUNT_DTYPE if sample_size <= np.iinfo(PACKED_COUNT_DTYPE).max else COUNT_DTYPE
+
+
+def get_outcome_dtype(narrow_dtype):
+    """
+    Функция для определения типа значений выборки
+
+    :param narrow_dtype: флаг использования узких типов данных
+    :return: тип значений выборки, None - тип по умолчанию
+    """
+    return OUTCOME_DTYPE if narrow_dtype else None
+
+
+def get_curve_dtype(sample_size, p_low, p_high, low_bound, high_bound, narrow_dtype):
+    """
+    Функция для определения типа кривой логарифмического отношения правдоподобий
+
+    Кривая хранится в float32, если оценка сверху абсолютной погрешности
+    её вычисления на батче длины sample_size не больше CURVE_ATOL,
+    иначе в float64
+
+    :param sample_size: длительность батча
+    :param p_low: нижнее значение вероятности
+    :param p_high: верхнее значение вероятности
+    :param low_bound: нижняя граница для логарифмического отношения правдоподобий
+    :param high_bound: верхняя граница для логарифмического отношения правдоподобий
+    :param narrow_dtype: флаг использования узких типов данных
+    :return: тип кривой, None - тип по умолчанию
+    """
+    if not narrow_dtype:
+        return None
+
+    # Максимальный модуль слагаемых кривой на батче
+    # с учётом значения кривой к началу батча, лежащего между границами
+    step = max(np.abs(np.log(p_high / p_low)), np.abs(np.log((1 - p_high) / (1 - p_low))))
+    magnitude = sample_size * step + max(np.abs(low_bound), np.abs(high_bound))
+
+    if 2 * magnitude * np.finfo(np.float32).eps <= CURVE_ATOL:
+        return np.float32
+    else:
+        return np.float64
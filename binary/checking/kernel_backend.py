@@ -0,0 +1,491 @@
+import os
+import threading
+import time
+from importlib.util import find_spec
+
+import numpy as np
+
+from .simulation_curve import TRUNCATION_RULES, get_curve_params, get_truncation_index
+
+
+# Флаг установленной numba: сама numba импортируется
+# только при первом расчёте бэкендом numba
+NUMBA_AVAILABLE = find_spec("numba") is not None
+
+
+# Вычислительные бэкенды ядер последовательного анализа:
+# numpy - векторные операции над матрицами батча,
+# numba - построчный цикл с ранней остановкой, если numba установлена
+KERNEL_BACKENDS = ("numpy", "numba")
+
+# Переменная окружения для выбора бэкенда: numpy, numba или auto
+KERNEL_BACKEND_ENV = "SPRT_KERNEL_BACKEND"
+
+# Размер батча [iter_size, sample_size] для однократного замера скорости бэкендов
+BENCHMARK_SIZE = (2_000, 512)
+
+# Количество повторов замера скорости, берётся наименьшее время
+BENCHMARK_REPEAT_CNT = 3
+
+# Коды правил принятия решения при усечении теста для построчного цикла:
+# номера правил в TRUNCATION_RULES
+TRUNCATION_RULE_CODES = {rule: code for code, rule in enumerate(TRUNCATION_RULES)}
+
+# Выбранный бэкенд, None - ещё не выбран
+_kernel_backend = None
+
+# Флаг компиляции построчных циклов и блокировка для неё
+_rows_compiled = False
+_rows_compile_lock = threading.Lock()
+
+
+def _compile_rows():
+    """
+    Компиляция построчных циклов numba при первом расчёте бэкендом numba:
+    функции модуля заменяются скомпилированными, поэтому вложенный вызов
+    _side_crossing в циклах тоже компилируется
+    """
+    global _side_crossing, _one_sided_rows, _two_sided_rows, _rows_compiled
+
+    with _rows_compile_lock:
+        if _rows_compiled:
+            return
+
+        import numba
+
+        jit = numba.njit(cache=True, nogil=True)
+        _side_crossing = jit(_side_crossing)
+        _one_sided_rows = jit(_one_sided_rows)
+        _two_sided_rows = jit(_two_sided_rows)
+        _rows_compiled = True
+
+
+def _side_crossing(curve, low_bound, high_bound, truncation_flg, terminal_code, terminal_threshold, terminal_high):
+    """
+    Пересечение границ односторонней проверки в одном столбце
+
+    :return: код пересечения: 1 - верхней границы, -1 - нижней границы, 0 - нет пересечения
+    """
+    high_flg = curve > high_bound
+    low_flg = curve < low_bound
+
+    # В столбце усечения решение принимается всегда
+    if truncation_flg and not high_flg and not low_flg:
+        if terminal_code == 2:
+            high_flg = terminal_high
+        else:
+            high_flg = curve > terminal_threshold
+        low_flg = not high_flg
+
+    if high_flg:
+        return 1
+    if low_flg:
+        return -1
+    return 0
+
+
+def _one_sided_rows(value_list, cumulative, n_list, initial_curve,
+                    log_high, log_low, low_bound, high_bound,
+                    truncation_index, terminal_code, terminal_threshold, terminal_high,
+                    duration_list, result_list, result_s_list, last_curve_list):
+    """
+    Построчный цикл односторонней проверки с остановкой строки
+    на первом пересечении границы
+    """
+    iter_size, sample_size = value_list.shape
+    for i in range(iter_size):
+        s = 0
+        duration = sample_size
+        result = 0
+        result_s = 0
+        stop_index = sample_size
+        for j in range(sample_size):
+            if cumulative:
+                s = value_list[i, j]
+            else:
+                s += value_list[i, j]
+
+            # Порядок операций совпадает с calc_curve, поэтому значения совпадают побитово
+            curve = s * log_high
+            curve += (n_list[i, j] - s) * log_low
+            curve += initial_curve[i]
+
+            crossing = _side_crossing(curve, low_bound, high_bound, j == truncation_index,
+                                      terminal_code, terminal_threshold, terminal_high)
+            if crossing != 0:
+                duration = j + 1
+                result = crossing
+                result_s = s
+                stop_index = j + 1
+                break
+
+        # Кривая в последний момент батча нужна для продолжения теста,
+        # после остановки досчитывается только накопленная сумма
+        if cumulative:
+            s = value_list[i, sample_size - 1]
+        else:
+            for j in range(stop_index, sample_size):
+                s += value_list[i, j]
+        if result == 0:
+            result_s = s
+
+        last_curve = s * log_high
+        last_curve += (n_list[i, sample_size - 1] - s) * log_low
+        last_curve += initial_curve[i]
+
+        duration_list[i] = duration
+        result_list[i] = result
+        result_s_list[i] = result_s
+        last_curve_list[i] = last_curve
+
+
+def _two_sided_rows(value_list, cumulative, n_list,
+                    greater_initial_curve, less_initial_curve, greater_stop_list, less_stop_list,
+                    greater_params, less_params,
+                    truncation_index, terminal_code,
+                    duration_list, result_list, result_s_list,
+                    greater_last_curve_list, less_last_curve_list,
+                    greater_stop_out_list, less_stop_out_list):
+    """
+    Построчный цикл двусторонней проверки: каждая односторонняя проверка
+    просматривается до первого пересечения границы, а строка останавливается,
+    как только решение теста больше не зависит от продолжения
+    """
+    iter_size, sample_size = value_list.shape
+    greater_log_high, greater_log_low, greater_low_bound, greater_high_bound, \
+        greater_terminal_threshold, greater_terminal_high = greater_params
+    less_log_high, less_log_low, less_low_bound, less_high_bound, \
+        less_terminal_threshold, less_terminal_high = less_params
+
+    for i in range(iter_size):
+        # Длительности и коды пересечения односторонних проверок,
+        # остановленная ранее проверка считается пересёкшей границу гипотезы в момент 0
+        greater_resolved = greater_stop_list[i]
+        greater_duration = 0 if greater_resolved else sample_size
+        greater_crossing = -1 if greater_resolved else 0
+        less_resolved = less_stop_list[i]
+        less_duration = 0 if less_resolved else sample_size
+        less_crossing = 1 if less_resolved else 0
+
+        s = 0
+        stop_index = sample_size
+        for j in range(sample_size):
+            if cumulative:
+                s = value_list[i, j]
+            else:
+                s += value_list[i, j]
+            n = n_list[i, j]
+
+            if not greater_resolved:
+                curve = s * greater_log_high
+                curve += (n - s) * greater_log_low
+                curve += greater_initial_curve[i]
+                crossing = _side_crossing(curve, greater_low_bound, greater_high_bound, j == truncation_index,
+                                          terminal_code, greater_terminal_threshold, greater_terminal_high)
+                if crossing != 0:
+                    greater_resolved = True
+                    greater_duration = j + 1
+                    greater_crossing = crossing
+
+            if not less_resolved:
+                curve = s * less_log_high
+                curve += (n - s) * less_log_low
+                curve += less_initial_curve[i]
+                crossing = _side_crossing(curve, less_low_bound, less_high_bound, j == truncation_index,
+                                          terminal_code, less_terminal_threshold, less_terminal_high)
+                if crossing != 0:
+                    less_resolved = True
+                    less_duration = j + 1
+                    less_crossing = crossing
+
+            # Пересечение границы альтернативы одной из проверок
+            # или остановка обеих проверок определяют решение
+            if (greater_resolved and (less_resolved or greater_crossing == 1)) \
+                    or (less_resolved and less_crossing == -1):
+                stop_index = j + 1
+                break
+
+        greater_high_flg = greater_crossing == 1
+        greater_low_flg = greater_crossing == -1
+        less_high_flg = less_crossing == 1
+        less_low_flg = less_crossing == -1
+
+        # Те же правила выбора решения, что и в one_sample_two_sided_sprt
+        duration = sample_size
+        result = 0
+        if greater_duration <= less_duration:
+            if greater_high_flg:
+                duration = greater_duration
+                result = 1
+            if not greater_high_flg and less_low_flg:
+                duration = less_duration
+                result = 1
+            if greater_low_flg and less_high_flg:
+                duration = less_duration
+                result = -1
+        if greater_duration >= less_duration:
+            if less_low_flg:
+                duration = less_duration
+                result = 1
+            if not less_low_flg and greater_high_flg:
+                duration = greater_duration
+                result = 1
+            if less_high_flg and greater_low_flg:
+                duration = greater_duration
+                result = -1
+
+        # Значение S(n) на момент длительности теста
+        if cumulative:
+            result_s = value_list[i, duration - 1]
+            s = value_list[i, sample_size - 1]
+        else:
+            result_s = s
+            for j in range(duration, stop_index):
+                result_s -= value_list[i, j]
+            for j in range(stop_index, sample_size):
+                s += value_list[i, j]
+
+        greater_last_curve = s * greater_log_high
+        greater_last_curve += (n_list[i, sample_size - 1] - s) * greater_log_low
+        greater_last_curve += greater_initial_curve[i]
+        less_last_curve = s * less_log_high
+        less_last_curve += (n_list[i, sample_size - 1] - s) * less_log_low
+        less_last_curve += less_initial_curve[i]
+
+        duration_list[i] = duration
+        result_list[i] = result
+        result_s_list[i] = result_s
+        greater_last_curve_list[i] = greater_last_curve
+        less_last_curve_list[i] = less_last_curve
+        greater_stop_out_list[i] = greater_resolved
+        less_stop_out_list[i] = less_resolved
+
+
+def _get_terminal_params(truncation_index, truncation_rule, low_bound, high_bound, alternative):
+    """
+    Параметры решения при усечении теста для построчного цикла
+    в соответствии с get_terminal_high_flg
+
+    :return: порог кривой для решения в пользу верхней границы
+             и решение для правила hypothesis
+    """
+    if truncation_index is not None and truncation_rule not in TRUNCATION_RULE_CODES:
+        raise ValueError(f"Неправильное правило усечения теста: {truncation_rule}")
+
+    terminal_threshold = (low_bound + high_bound) / 2 if truncation_rule == "midpoint" else 0.0
+    return float(terminal_threshold), alternative == "less"
+
+
+def _prepare_rows(x, s_list, n_list, look_list, max_sample_size):
+    """
+    Приведение входных массивов ядра к виду построчного цикла
+
+    :return: массив выборки или накопленных сумм, флаг накопленных сумм,
+             матрица прошедшей длительности без копирования и номер столбца усечения
+    """
+    cumulative = s_list is not None
+    value_list = np.asarray(s_list if cumulative else x)
+    iter_size, sample_size = value_list.shape
+
+    if n_list is None:
+        n_list = np.asarray(look_list) if look_list is not None else np.arange(1, sample_size + 1)
+    n_list = np.broadcast_to(np.asarray(n_list), (iter_size, sample_size))
+
+    truncation_index = get_truncation_index(max_sample_size, sample_size, look_list)
+    return value_list, cumulative, n_list, -1 if truncation_index is None else truncation_index
+
+
+def numba_one_sample_one_sided_sprt(x, p0, d, alpha, beta, alternative,
+                                    initial_curve=None, n_list=None, s_list=None, look_list=None,
+                                    max_sample_size=None, truncation_rule="curve"):
+    """
+    Последовательный анализ в случае одновыборочной задачи
+    и односторонней альтернативы построчным циклом с ранней остановкой,
+    аналог one_sample_one_sided_sprt с тем же результатом
+    """
+    _compile_rows()
+    value_list, cumulative, n_list, truncation_index = _prepare_rows(x, s_list, n_list, look_list,
+                                                                     max_sample_size)
+    iter_size = value_list.shape[0]
+
+    p_low, p_high, low_bound, high_bound = get_curve_params(p0, np.abs(d), alpha, beta, alternative)
+    terminal_threshold, terminal_high = _get_terminal_params(None if truncation_index < 0 else truncation_index,
+                                                             truncation_rule, low_bound, high_bound, alternative)
+    initial_curve = np.zeros(iter_size) if initial_curve is None else np.asarray(initial_curve, dtype=np.float64)
+
+    duration_list = np.empty(iter_size, dtype=np.int64)
+    result_list = np.empty(iter_size, dtype=np.int64)
+    result_s_list = np.empty(iter_size, dtype=np.int64)
+    last_curve_list = np.empty(iter_size, dtype=np.float64)
+    _one_sided_rows(value_list, cumulative, n_list, initial_curve,
+                    np.log(p_high / p_low), np.log((1 - p_high) / (1 - p_low)), low_bound, high_bound,
+                    truncation_index, TRUNCATION_RULE_CODES.get(truncation_rule, 0),
+                    terminal_threshold, terminal_high,
+                    duration_list, result_list, result_s_list, last_curve_list)
+
+    res = {
+        "duration": duration_list,
+        "result": result_list,
+        "result_s": result_s_list,
+        "last_curve": last_curve_list
+    }
+
+    # Переход от номеров просмотров к длительностям
+    if look_list is not None:
+        res["look_duration"] = duration_list
+        res["duration"] = np.asarray(look_list)[duration_list - 1]
+
+    return res
+
+
+def numba_one_sample_two_sided_sprt(x, p0, d_low, d_high, alpha, beta,
+                                    greater_initial_curve=None, less_initial_curve=None,
+                                    greater_stop_flg=None, less_stop_flg=None,
+                                    n_list=None, s_list=None, look_list=None,
+                                    max_sample_size=None, truncation_rule="curve"):
+    """
+    Последовательный анализ в случае одновыборочной задачи
+    и двусторонней альтернативы построчным циклом с ранней остановкой,
+    аналог one_sample_two_sided_sprt с тем же результатом.
+    Флаги остановки односторонних проверок законченных тестов учитывают
+    пересечения границ только до остановки теста
+    """
+    _compile_rows()
+    value_list, cumulative, n_list, truncation_index = _prepare_rows(x, s_list, n_list, look_list,
+                                                                     max_sample_size)
+    iter_size = value_list.shape[0]
+
+    side_params = {}
+    for alternative, d in [("greater", d_high), ("less", d_low)]:
+        p_low, p_high, low_bound, high_bound = get_curve_params(p0, d, alpha / 2, beta, alternative)
+        side_params[alternative] = (np.log(p_high / p_low), np.log((1 - p_high) / (1 - p_low)),
+                                    low_bound, high_bound,
+                                    *_get_terminal_params(None if truncation_index < 0 else truncation_index,
+                                                          truncation_rule, low_bound, high_bound, alternative))
+
+    def get_initial_curve(initial_curve):
+        return np.zeros(iter_size) if initial_curve is None else np.asarray(initial_curve, dtype=np.float64)
+
+    def get_stop_flg(stop_flg):
+        return np.zeros(iter_size, dtype=bool) if stop_flg is None else np.asarray(stop_flg, dtype=bool)
+
+    duration_list = np.empty(iter_size, dtype=np.int64)
+    result_list = np.empty(iter_size, dtype=np.int64)
+    result_s_list = np.empty(iter_size, dtype=np.int64)
+    greater_last_curve_list = np.empty(iter_size, dtype=np.float64)
+    less_last_curve_list = np.empty(iter_size, dtype=np.float64)
+    greater_stop_list = np.empty(iter_size, dtype=bool)
+    less_stop_list = np.empty(iter_size, dtype=bool)
+    _two_sided_rows(value_list, cumulative, n_list,
+                    get_initial_curve(greater_initial_curve), get_initial_curve(less_initial_curve),
+                    get_stop_flg(greater_stop_flg), get_stop_flg(less_stop_flg),
+                    side_params["greater"], side_params["less"],
+                    truncation_index, TRUNCATION_RULE_CODES.get(truncation_rule, 0),
+                    duration_list, result_list, result_s_list,
+                    greater_last_curve_list, less_last_curve_list,
+                    greater_stop_list, less_stop_list)
+
+    res = {
+        "duration": duration_list,
+        "result": result_list,
+        "result_s": result_s_list,
+        "greater_last_curve": greater_last_curve_list,
+        "less_last_curve": less_last_curve_list,
+        "greater_stop": greater_stop_list,
+        "less_stop": less_stop_list
+    }
+
+    # Переход от номеров просмотров к длительностям
+    if look_list is not None:
+        res["look_duration"] = duration_list
+        res["duration"] = np.asarray(look_list)[duration_list - 1]
+
+    return res
+
+
+def set_kernel_backend(backend):
+    """
+    Выбор вычислительного бэкенда ядер последовательного анализа
+
+    :param backend: наименование бэкенда из KERNEL_BACKENDS
+                    или "auto" - выбор по однократному замеру скорости при первом вызове ядра
+    """
+    global _kernel_backend
+
+    if backend == "auto":
+        _kernel_backend = None
+        return
+    if backend not in KERNEL_BACKENDS:
+        raise ValueError(f"Неправильный бэкенд ядер: {backend}")
+    if backend == "numba" and not NUMBA_AVAILABLE:
+        raise ValueError("Неправильный бэкенд ядер: numba не установлена")
+
+    _kernel_backend = backend
+
+
+def get_kernel_backend():
+    """
+    Текущий вычислительный бэкенд ядер последовательного анализа
+
+    Если бэкенд не выбран через set_kernel_backend, то он берётся
+    из переменной окружения KERNEL_BACKEND_ENV, а при значении auto
+    или её отсутствии выбирается select_kernel_backend один раз за процесс
+
+    :return: наименование бэкенда из KERNEL_BACKENDS
+    """
+    global _kernel_backend
+
+    if _kernel_backend is None:
+        backend = os.environ.get(KERNEL_BACKEND_ENV, "auto")
+        if backend == "auto":
+            _kernel_backend = select_kernel_backend()
+        else:
+            set_kernel_backend(backend)
+
+    return _kernel_backend
+
+
+def resolve_kernel_backend(backend=None):
+    """
+    Бэкенд, которым ядро выполняет расчёт
+
+    :param backend: наименование бэкенда из KERNEL_BACKENDS,
+                    None - текущий бэкенд get_kernel_backend
+    :return: наименование бэкенда
+    """
+    if backend is None:
+        return get_kernel_backend()
+    if backend not in KERNEL_BACKENDS:
+        raise ValueError(f"Неправильный бэкенд ядер: {backend}")
+    if backend == "numba" and not NUMBA_AVAILABLE:
+        raise ValueError("Неправильный бэкенд ядер: numba не установлена")
+    return backend
+
+
+def select_kernel_backend(size=BENCHMARK_SIZE, repeat_cnt=BENCHMARK_REPEAT_CNT):
+    """
+    Выбор бэкенда по замеру скорости ядра двусторонней проверки
+    на батче размера size, в котором большая часть тестов останавливается
+
+    :param size: размер батча [iter_size, sample_size]
+    :param repeat_cnt: количество повторов замера
+    :return: наименование более быстрого бэкенда, numpy, если numba не установлена
+    """
+    if not NUMBA_AVAILABLE:
+        return "numpy"
+
+    from .one_sample_two_sided_sprt import one_sample_two_sided_sprt
+
+    x = np.random.default_rng(0).binomial(1, 0.45, size=size).astype(np.uint8)
+    duration_dict = {}
+    for backend in KERNEL_BACKENDS:
+        # Первый вызов компилирует построчный цикл и не замеряется
+        one_sample_two_sided_sprt(x[:1], 0.5, 0.05, 0.05, 0.2, kernel_backend=backend)
+        duration_list = []
+        for _ in range(repeat_cnt):
+            start = time.perf_counter()
+            one_sample_two_sided_sprt(x, 0.5, 0.05, 0.05, 0.2, kernel_backend=backend)
+            duration_list.append(time.perf_counter() - start)
+        duration_dict[backend] = min(duration_list)
+
+    return min(duration_dict, key=duration_dict.get)
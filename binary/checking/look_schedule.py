@@ -0,0 +1,82 @@
+import numpy as np
+
+
+def get_look_sizes(look_schedule, start, look_cnt):
+    """
+    Накопленные размеры выборки в моменты просмотров,
+    только в которые проверяется пересечение границ
+
+    :param look_schedule: расписание просмотров:
+                          целое число k - просмотр после каждых k наблюдений,
+                          возрастающий список размеров выборки в моменты просмотров,
+                          после последнего из них просмотры продолжаются
+                          с последним интервалом списка
+    :param start: номер первого просмотра, начиная с нуля
+    :param look_cnt: количество просмотров
+    :return: массив размера look_cnt из размеров выборки
+             в моменты просмотров с номерами от start до start + look_cnt - 1
+    """
+    look_schedule = normalize_look_schedule(look_schedule)
+    look_index = np.arange(start, start + look_cnt, dtype=np.int64)
+
+    if isinstance(look_schedule, int):
+        return (look_index + 1) * look_schedule
+
+    look_schedule = np.asarray(look_schedule, dtype=np.int64)
+
+    # Интервал между просмотрами после последнего просмотра из списка
+    last_step = look_schedule[-1] - look_schedule[-2] if len(look_schedule) > 1 else look_schedule[0]
+
+    return np.where(look_index < len(look_schedule),
+                    look_schedule[np.minimum(look_index, len(look_schedule) - 1)],
+                    look_schedule[-1] + (look_index - len(look_schedule) + 1) * last_step)
+
+
+def normalize_look_schedule(look_schedule):
+    """
+    Проверка расписания просмотров и приведение его к виду,
+    пригодному для сохранения в контрольной точке
+
+    :param look_schedule: расписание просмотров, как в get_look_sizes, или None
+    :return: целое число, список целых чисел или None
+    """
+    if look_schedule is None:
+        return None
+
+    if isinstance(look_schedule, (int, np.integer)):
+        if look_schedule < 1:
+            raise ValueError(f"Неправильный интервал между просмотрами: {look_schedule}")
+        return int(look_schedule)
+
+    look_array = np.asarray(look_schedule, dtype=np.int64)
+    if look_array.ndim != 1 or len(look_array) == 0 \
+            or look_array[0] < 1 or np.any(np.diff(look_array) < 1):
+        raise ValueError(f"Неправильное расписание просмотров: {look_schedule}")
+    return [int(look_size) for look_size in look_array]
+
+
+def is_look_size(look_schedule, sample_size, look_set=None):
+    """
+    Функция для определения, является ли момент просмотром,
+    в который проверяется пересечение границ, как в get_look_sizes
+
+    :param look_schedule: расписание просмотров из normalize_look_schedule,
+                          None - просмотр в каждый момент
+    :param sample_size: размер выборки
+    :param look_set: множество размеров выборки из списка расписания
+                     для поиска без перебора списка
+    :return: флаг просмотра
+    """
+    if look_schedule is None:
+        return True
+
+    if isinstance(look_schedule, int):
+        return sample_size % look_schedule == 0
+
+    # После последнего просмотра из списка
+    # просмотры продолжаются с последним интервалом списка
+    last_look = look_schedule[-1]
+    if sample_size <= last_look:
+        return sample_size in (look_schedule if look_set is None else look_set)
+    last_step = last_look - look_schedule[-2] if len(look_schedule) > 1 else last_look
+    return (sample_size - last_look) % last_step == 0
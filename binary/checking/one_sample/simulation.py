@@ -1,11 +1,105 @@
+import os
+
 import numpy as np
-from scipy.stats import bernoulli
 
+from binary.checking.bit_packing import packed_cumsum
+from binary.checking.boundary_calibration import get_bounds
+from binary.checking.checkpoint import SimulationCheckpoint, get_completed_state, read_checkpoint_params, \
+    restore_completed_state
+from binary.checking.counter_rng import CounterRandomState, get_batch_random_state
+from binary.checking.dtype_policy import PACKED_BLOCK_SIZE, get_count_dtype, get_outcome_dtype
+from binary.checking.look_schedule import get_look_sizes, normalize_look_schedule
+from binary.checking.one_sample_mixture_sprt import one_sample_mixture_sprt
 from binary.checking.one_sample_one_sided_sprt import one_sample_one_sided_sprt
 from binary.checking.one_sample_two_sided_sprt import one_sample_two_sided_sprt
+from binary.checking.parallel_simulation import process_simulation, threaded_simulation
+from binary.checking.profiling import profile_mark, profile_run
+from binary.checking.sampling import bernoulli_sample, look_sample, packed_bernoulli_sample
+from binary.checking.result_sink import ResultSink, allocate_records, check_records, get_record_dtype
+from binary.checking.simulation_summary import SimulationSummary
+from binary.sprt.mixture_sprt import get_prior_params, mixture_curve
+from binary.sprt.one_sample_sprt import BinaryOneSampleSprt
+
+
+# Типы полей результата моделирования для записи в разделяемую память
+RESULT_FIELDS = {
+    "duration": np.int64,
+    "result": np.int64,
+    "result_s": np.int64,
+    "test_index": np.int64
+}
+
+# Тип записи о законченном тесте, поля совпадают с ключами словаря результата
+RECORD_DTYPE = get_record_dtype(RESULT_FIELDS)
+
+
+def draw_sample(p, size, narrow_dtype=False, packed=False, random_state=None):
+    """
+    Розыгрыш батча выборки для незаконченных тестов
+
+    :param p: реальное значение вероятности
+    :param size: размер батча [remain_iter_cnt, batch_size]
+    :param narrow_dtype: флаг использования узких типов данных
+    :param packed: флаг хранения выборки в упакованном виде
+    :param random_state: генератор случайных чисел np.random.Generator,
+                         None - глобальный генератор numpy
+    :return: выборка, упакованная по 64 значения в машинное слово, если packed
+    """
+    if packed:
+        return packed_bernoulli_sample(p, size, random_state=random_state)
+    else:
+        return bernoulli_sample(p, size, dtype=get_outcome_dtype(narrow_dtype),
+                                random_state=random_state)
+
+
+def packed_sprt(sprt, x_packed, sample_size, sprt_args, row_kwargs, **kwargs):
+    """
+    Расчёт теста по упакованной выборке блоками строк
+
+    Накопленные суммы S(n) распаковываются только для блока строк
+    из PACKED_BLOCK_SIZE значений, поэтому матрицы S(n) и кривой
+    размера [iter_size, sample_size] целиком не создаются.
+    Тесты независимы, поэтому результат совпадает с расчётом по всей матрице
+
+    :param sprt: функция последовательного анализа с параметром s_list
+    :param x_packed: массив размера [iter_size, ceil(sample_size / 64)] машинных слов
+    :param sample_size: размер выборки
+    :param sprt_args: позиционные параметры функции после выборки
+    :param row_kwargs: параметры функции со значениями для каждого теста,
+                       None и числа передаются в каждый блок целиком
+    :param kwargs: остальные параметры функции
+    :return: словарь res функции с объединёнными списками блоков
+    """
+    iter_size = x_packed.shape[0]
+
+    # Количество строк в одном блоке расчёта
+    block_iter_size = max(1, PACKED_BLOCK_SIZE // max(1, sample_size))
+
+    res_list = []
+    for start in range(0, iter_size, block_iter_size):
+        rows = slice(start, start + block_iter_size)
+        s_list = packed_cumsum(x_packed[rows], sample_size)
+        profile_mark("cumsum")
+        block_kwargs = {
+            key: value if value is None or np.ndim(value) == 0 else value[rows]
+            for key, value in row_kwargs.items()
+        }
+        res_list.append(sprt(None, *sprt_args, s_list=s_list, **block_kwargs, **kwargs))
+
+    res = {
+        key: None if res_list[0][key] is None else np.concatenate([block_res[key] for block_res in res_list])
+        for key in res_list[0]
+    }
+    # S(n) батча в узком типе накапливается по батчам в int64
+    res["result_s"] = res["result_s"].astype(np.int64)
+    return res
 
 
-def one_sided_simulation_sprt(p, iter_size, batch_size, p0, d, alpha, beta, alternative):
+def one_sided_simulation_sprt(p, iter_size, batch_size, p0, d, alpha, beta, alternative,
+                              narrow_dtype=False, packed=False, random_state=None, summary=False,
+                              records=None, checkpoint=None, look_schedule=None,
+                              max_sample_size=None, truncation_rule="curve", prior_size=None,
+                              profiler=None, kernel_backend=None):
     """
     Моделирование последовательного анализа
     параллельно в iter_size тестах
@@ -19,7 +113,37 @@ def one_sided_simulation_sprt(p, iter_size, batch_size, p0, d, alpha, beta, alte
     :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
     :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
     :param alternative: наименование односторонней альтернативы
-    :return: словарь res
+    :param narrow_dtype: флаг использования узких типов данных:
+                         выборка в uint8, накопленные суммы в int32,
+                         кривая в float32, если это позволяет величина границ
+    :param packed: флаг хранения выборки в упакованном виде по 64 значения в машинное слово,
+                   накопленные суммы и кривая считаются по количеству единичных битов блоками строк
+    :param random_state: генератор случайных чисел np.random.Generator,
+                         None - глобальный генератор numpy
+    :param summary: флаг сводного режима: вместо списков характеристик тестов
+                    накапливается сводная статистика, объём памяти не зависит от iter_size
+    :param records: режим записи характеристик тестов в структурный массив RECORD_DTYPE:
+                    True - массив в памяти или во временном файле, если он больше MEMMAP_THRESHOLD,
+                    путь к файлу .npy - массив отображается на этот файл,
+                    массив - запись в заранее выделенный массив,
+                    None - словарь списков
+    :param checkpoint: контрольная точка SimulationCheckpoint,
+                       если она уже сохранена, то моделирование продолжается с неё
+    :param look_schedule: расписание просмотров для get_look_sizes, если задано,
+                          то пересечение границ проверяется только в моменты просмотров,
+                          batch_size - количество просмотров в батче,
+                          а разыгрываются только накопленные суммы в моменты просмотров
+    :param max_sample_size: максимальная длительность теста, в которую тест усекается,
+                            None - тест не усекается
+    :param truncation_rule: правило принятия решения при усечении из TRUNCATION_RULES
+    :param prior_size: сумма параметров бета-распределения со средним p0, если задана,
+                       то моделируется тест отношения смешанного правдоподобия
+                       one_sample_mixture_sprt, в том числе для alternative = "two-sided",
+                       а beta и truncation_rule не используются
+    :param profiler: профилировщик SimulationProfiler, которому сообщается о каждом раунде
+    :param kernel_backend: вычислительный бэкенд ядер из KERNEL_BACKENDS, None - выбранный get_kernel_backend
+    :return: накопитель SimulationSummary в сводном режиме,
+             структурный массив записей в режиме records, иначе словарь res
              res["duration"] - список длительностей теста
              res["result"] - список результатов теста
                              для alternative = "less"
@@ -29,56 +153,178 @@ def one_sided_simulation_sprt(p, iter_size, batch_size, p0, d, alpha, beta, alte
                                 -1: тест закончился, нет стат. значимого повышения вероятности
                                 1: тест закончился, есть стат. значимое повышение вероятности
              res["result_s"] - список значений S(n) на момент длительности теста
+             res["test_index"] - список номеров тестов в порядке их окончания
     """
+    # Параметры априорного распределения теста отношения смешанного правдоподобия
+    if prior_size is not None:
+        prior_a, prior_b = get_prior_params(p0, prior_size=prior_size)
+
     # Суммарная длительность незаконченных тестов
     total_duration = 0
+    # Количество прошедших просмотров при расписании просмотров
+    total_look_cnt = 0
+    # Количество прошедших батчей
+    total_batch_cnt = 0
 
     # Характеристики законченных тестов
+    completed_summary = SimulationSummary() if summary else None
+    completed_records = None
+    if records is not None:
+        completed_records = ResultSink(iter_size, RECORD_DTYPE, records,
+                                       resume=checkpoint is not None and checkpoint.exists())
     completed_duration_list = []
     completed_result_list = []
     completed_s_list = []
+    completed_index_list = []
 
     # Характеристики незаконченных тестов
     remain_iter_cnt = iter_size
+    remain_index = np.arange(iter_size)
     remain_last_curve = None
     remain_s_list = 0
 
+    # Восстанавливаем состояние из контрольной точки
+    if checkpoint is not None and checkpoint.exists():
+        state, random_state = checkpoint.load(random_state)
+        total_duration = state["total_duration"]
+        total_look_cnt = state.get("total_look_cnt", 0)
+        total_batch_cnt = state.get("total_batch_cnt", 0)
+        remain_iter_cnt = state["remain_iter_cnt"]
+        remain_index = state.get("remain_index", np.arange(remain_iter_cnt))
+        remain_last_curve = state["remain_last_curve"]
+        remain_s_list = state["remain_s_list"]
+        completed_summary, completed_list_dict = restore_completed_state(state["completed"],
+                                                                         completed_summary,
+                                                                         completed_records)
+        completed_duration_list = completed_list_dict.get("duration", [])
+        completed_result_list = completed_list_dict.get("result", [])
+        completed_s_list = completed_list_dict.get("result_s", [])
+        completed_index_list = completed_list_dict.get("test_index", [])
+
     # Итерируемся пока есть незаконченные тесты
     while remain_iter_cnt > 0:
+        if profiler is not None:
+            profiler.start_round(remain_iter_cnt, batch_size)
+
+        # Усечение теста отсчитывается от начала батча
+        truncation_kwargs = dict(max_sample_size=None if max_sample_size is None
+                                 else max_sample_size - total_duration,
+                                 truncation_rule=truncation_rule)
+
+        # Генератор батча для незаконченных тестов
+        batch_random_state = get_batch_random_state(random_state, remain_index, total_batch_cnt)
+
         # Разыгрываем батч выборки для незаконченных тестов
         # и собираем статистику по этому батчу
-        x = bernoulli.rvs(p, size=[remain_iter_cnt, batch_size])
-        res = one_sample_one_sided_sprt(x, p0, d, alpha, beta,
-                                        alternative=alternative,
-                                        initial_curve=remain_last_curve)
+        look_list = None
+        batch_duration = batch_size
+        if look_schedule is None:
+            x, s_list = draw_sample(p, [remain_iter_cnt, batch_size], narrow_dtype, packed, batch_random_state), None
+        else:
+            # Разыгрываем только накопленные суммы в моменты просмотров батча
+            look_list = get_look_sizes(look_schedule, total_look_cnt, batch_size)
+            if max_sample_size is not None:
+                # Последний просмотр - в момент усечения теста
+                look_list = np.minimum(look_list, max_sample_size)
+            look_list = look_list - total_duration
+            x, s_list = None, look_sample(p, look_list, remain_iter_cnt,
+                                          get_count_dtype(narrow_dtype), batch_random_state)
+            batch_duration = look_list[-1]
+            total_look_cnt += batch_size
+        profile_mark("sample")
+
+        if prior_size is None:
+            sprt, sprt_args = one_sample_one_sided_sprt, (p0, d, alpha, beta)
+            row_kwargs = dict(initial_curve=remain_last_curve)
+            sprt_kwargs = dict(alternative=alternative, kernel_backend=kernel_backend, **truncation_kwargs)
+        else:
+            sprt, sprt_args = one_sample_mixture_sprt, (p0, alpha, alternative, prior_a, prior_b)
+            row_kwargs = dict(initial_s=remain_s_list)
+            sprt_kwargs = dict(initial_n=total_duration, max_sample_size=truncation_kwargs["max_sample_size"])
+
+        if packed and look_list is None:
+            res = packed_sprt(sprt, x, batch_size, sprt_args, row_kwargs,
+                              narrow_dtype=narrow_dtype, **sprt_kwargs)
+        else:
+            res = sprt(x, *sprt_args,
+                       s_list=s_list,
+                       narrow_dtype=narrow_dtype,
+                       look_list=look_list,
+                       **row_kwargs,
+                       **sprt_kwargs)
+        profile_mark("kernel")
 
         remain_duration_list = total_duration + res["duration"]
         remain_result_list = res["result"]
-        last_curve = res["last_curve"]
+        last_curve = res.get("last_curve")
         remain_s_list += res["result_s"]
 
         # Определяем незаконченные тесты
         remain_test_flg = remain_result_list == 0
         remain_iter_cnt = np.sum(remain_test_flg)
+        completed_index = remain_index[~remain_test_flg]
+        remain_index = remain_index[remain_test_flg]
 
         # Рассчитываем характеристики законченных тестов
-        completed_duration_list += list(remain_duration_list[~remain_test_flg])
-        completed_result_list += list(remain_result_list[~remain_test_flg])
-        completed_s_list += list(remain_s_list[~remain_test_flg])
+        if completed_summary is not None:
+            completed_summary.update(remain_duration_list[~remain_test_flg],
+                                     remain_result_list[~remain_test_flg])
+        elif completed_records is not None:
+            completed_records.write(duration=remain_duration_list[~remain_test_flg],
+                                    result=remain_result_list[~remain_test_flg],
+                                    result_s=remain_s_list[~remain_test_flg],
+                                    test_index=completed_index)
+        else:
+            completed_duration_list += list(remain_duration_list[~remain_test_flg])
+            completed_result_list += list(remain_result_list[~remain_test_flg])
+            completed_s_list += list(remain_s_list[~remain_test_flg])
+            completed_index_list += list(completed_index)
 
         # Рассчитываем характеристики незаконченных тестов
-        remain_last_curve = last_curve[remain_test_flg]
+        remain_last_curve = None if last_curve is None else last_curve[remain_test_flg]
         remain_s_list = remain_s_list[remain_test_flg]
-        total_duration += batch_size
+        total_duration += batch_duration
+        total_batch_cnt += 1
+        profile_mark("bookkeeping")
+
+        # Сохраняем контрольную точку
+        if checkpoint is not None and checkpoint.due(remain_iter_cnt):
+            checkpoint.save(random_state,
+                            total_duration=total_duration,
+                            total_look_cnt=total_look_cnt,
+                            total_batch_cnt=total_batch_cnt,
+                            remain_iter_cnt=remain_iter_cnt,
+                            remain_index=remain_index,
+                            remain_last_curve=remain_last_curve,
+                            remain_s_list=remain_s_list,
+                            completed=get_completed_state(completed_summary, completed_records,
+                                                          duration=completed_duration_list,
+                                                          result=completed_result_list,
+                                                          result_s=completed_s_list,
+                                                          test_index=completed_index_list))
+        profile_mark("checkpoint")
+
+        if profiler is not None:
+            profiler.end_round(len(remain_test_flg) * batch_duration)
+
+    if completed_summary is not None:
+        return completed_summary
+    if completed_records is not None:
+        return completed_records.records
 
     return {
         "duration": np.array(completed_duration_list),
         "result": np.array(completed_result_list),
-        "result_s": np.array(completed_s_list)
+        "result_s": np.array(completed_s_list),
+        "test_index": np.array(completed_index_list, dtype=np.int64)
     }
 
 
-def two_sided_simulation_sprt(p, iter_size, batch_size, p0, d, alpha, beta):
+def two_sided_simulation_sprt(p, iter_size, batch_size, p0, d, alpha, beta,
+                              narrow_dtype=False, packed=False, random_state=None, summary=False,
+                              records=None, checkpoint=None, look_schedule=None,
+                              max_sample_size=None, truncation_rule="curve", profiler=None,
+                              kernel_backend=None):
     """
     Моделирование последовательного анализа
     параллельно в iter_size тестах
@@ -91,36 +337,135 @@ def two_sided_simulation_sprt(p, iter_size, batch_size, p0, d, alpha, beta):
     :param d: абсолютное значение MDE
     :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
     :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
-    :return: словарь res
+    :param narrow_dtype: флаг использования узких типов данных:
+                         выборка в uint8, накопленные суммы в int32,
+                         кривая в float32, если это позволяет величина границ
+    :param packed: флаг хранения выборки в упакованном виде по 64 значения в машинное слово,
+                   накопленные суммы и кривая считаются по количеству единичных битов блоками строк
+    :param random_state: генератор случайных чисел np.random.Generator,
+                         None - глобальный генератор numpy
+    :param summary: флаг сводного режима: вместо списков характеристик тестов
+                    накапливается сводная статистика, объём памяти не зависит от iter_size
+    :param records: режим записи характеристик тестов в структурный массив RECORD_DTYPE:
+                    True - массив в памяти или во временном файле, если он больше MEMMAP_THRESHOLD,
+                    путь к файлу .npy - массив отображается на этот файл,
+                    массив - запись в заранее выделенный массив,
+                    None - словарь списков
+    :param checkpoint: контрольная точка SimulationCheckpoint,
+                       если она уже сохранена, то моделирование продолжается с неё
+    :param look_schedule: расписание просмотров для get_look_sizes, если задано,
+                          то пересечение границ проверяется только в моменты просмотров,
+                          batch_size - количество просмотров в батче,
+                          а разыгрываются только накопленные суммы в моменты просмотров
+    :param max_sample_size: максимальная длительность теста, в которую тест усекается,
+                            None - тест не усекается
+    :param truncation_rule: правило принятия решения при усечении из TRUNCATION_RULES
+    :param profiler: профилировщик SimulationProfiler, которому сообщается о каждом раунде
+    :param kernel_backend: вычислительный бэкенд ядер из KERNEL_BACKENDS, None - выбранный get_kernel_backend
+    :return: накопитель SimulationSummary в сводном режиме,
+             структурный массив записей в режиме records, иначе словарь res
              res["duration"] - список длительностей теста
              res["result"] - список результатов теста
                                 -1: тест закончился, нет стат. значимого изменения вероятности
                                 1: тест закончился, есть стат. значимое изменение вероятности
              res["result_s"] - список значений S(n) на момент длительности теста
+             res["test_index"] - список номеров тестов в порядке их окончания
     """
     # Суммарная длительность незаконченных тестов
     total_duration = 0
+    # Количество прошедших просмотров при расписании просмотров
+    total_look_cnt = 0
+    # Количество прошедших батчей
+    total_batch_cnt = 0
 
     # Характеристики законченных тестов
+    completed_summary = SimulationSummary() if summary else None
+    completed_records = None
+    if records is not None:
+        completed_records = ResultSink(iter_size, RECORD_DTYPE, records,
+                                       resume=checkpoint is not None and checkpoint.exists())
     completed_duration_list = []
     completed_result_list = []
     completed_s_list = []
+    completed_index_list = []
 
     # Характеристики незаконченных тестов
     remain_iter_cnt = iter_size
+    remain_index = np.arange(iter_size)
     remain_greater_last_curve = None
     remain_less_last_curve = None
     remain_greater_stop_flg = None
     remain_less_stop_flg = None
     remain_s_list = 0
 
+    # Восстанавливаем состояние из контрольной точки
+    if checkpoint is not None and checkpoint.exists():
+        state, random_state = checkpoint.load(random_state)
+        total_duration = state["total_duration"]
+        total_look_cnt = state.get("total_look_cnt", 0)
+        total_batch_cnt = state.get("total_batch_cnt", 0)
+        remain_iter_cnt = state["remain_iter_cnt"]
+        remain_index = state.get("remain_index", np.arange(remain_iter_cnt))
+        remain_greater_last_curve = state["remain_greater_last_curve"]
+        remain_less_last_curve = state["remain_less_last_curve"]
+        remain_greater_stop_flg = state["remain_greater_stop_flg"]
+        remain_less_stop_flg = state["remain_less_stop_flg"]
+        remain_s_list = state["remain_s_list"]
+        completed_summary, completed_list_dict = restore_completed_state(state["completed"],
+                                                                         completed_summary,
+                                                                         completed_records)
+        completed_duration_list = completed_list_dict.get("duration", [])
+        completed_result_list = completed_list_dict.get("result", [])
+        completed_s_list = completed_list_dict.get("result_s", [])
+        completed_index_list = completed_list_dict.get("test_index", [])
+
     while remain_iter_cnt > 0:
-        x = bernoulli.rvs(p, size=[remain_iter_cnt, batch_size])
-        res = one_sample_two_sided_sprt(x, p0, d, alpha, beta,
-                                        greater_initial_curve=remain_greater_last_curve,
-                                        less_initial_curve=remain_less_last_curve,
-                                        greater_stop_flg=remain_greater_stop_flg,
-                                        less_stop_flg=remain_less_stop_flg)
+        if profiler is not None:
+            profiler.start_round(remain_iter_cnt, batch_size)
+
+        # Усечение теста отсчитывается от начала батча
+        truncation_kwargs = dict(max_sample_size=None if max_sample_size is None
+                                 else max_sample_size - total_duration,
+                                 truncation_rule=truncation_rule)
+
+        # Генератор батча для незаконченных тестов
+        batch_random_state = get_batch_random_state(random_state, remain_index, total_batch_cnt)
+
+        look_list = None
+        batch_duration = batch_size
+        if look_schedule is None:
+            x, s_list = draw_sample(p, [remain_iter_cnt, batch_size], narrow_dtype, packed, batch_random_state), None
+        else:
+            # Разыгрываем только накопленные суммы в моменты просмотров батча
+            look_list = get_look_sizes(look_schedule, total_look_cnt, batch_size)
+            if max_sample_size is not None:
+                # Последний просмотр - в момент усечения теста
+                look_list = np.minimum(look_list, max_sample_size)
+            look_list = look_list - total_duration
+            x, s_list = None, look_sample(p, look_list, remain_iter_cnt,
+                                          get_count_dtype(narrow_dtype), batch_random_state)
+            batch_duration = look_list[-1]
+            total_look_cnt += batch_size
+        profile_mark("sample")
+
+        row_kwargs = dict(greater_initial_curve=remain_greater_last_curve,
+                          less_initial_curve=remain_less_last_curve,
+                          greater_stop_flg=remain_greater_stop_flg,
+                          less_stop_flg=remain_less_stop_flg)
+        if packed and look_list is None:
+            res = packed_sprt(one_sample_two_sided_sprt, x, batch_size, (p0, d, alpha, beta), row_kwargs,
+                              narrow_dtype=narrow_dtype,
+                              kernel_backend=kernel_backend,
+                              **truncation_kwargs)
+        else:
+            res = one_sample_two_sided_sprt(x, p0, d, alpha, beta,
+                                            s_list=s_list,
+                                            narrow_dtype=narrow_dtype,
+                                            look_list=look_list,
+                                            kernel_backend=kernel_backend,
+                                            **row_kwargs,
+                                            **truncation_kwargs)
+        profile_mark("kernel")
 
         remain_duration_list = total_duration + res["duration"]
         remain_result_list = res["result"]
@@ -132,26 +477,74 @@ def two_sided_simulation_sprt(p, iter_size, batch_size, p0, d, alpha, beta):
 
         remain_test_flg = remain_result_list == 0
         remain_iter_cnt = np.sum(remain_test_flg)
+        completed_index = remain_index[~remain_test_flg]
+        remain_index = remain_index[remain_test_flg]
 
-        completed_duration_list += list(remain_duration_list[~remain_test_flg])
-        completed_result_list += list(remain_result_list[~remain_test_flg])
-        completed_s_list += list(remain_s_list[~remain_test_flg])
+        if completed_summary is not None:
+            completed_summary.update(remain_duration_list[~remain_test_flg],
+                                     remain_result_list[~remain_test_flg])
+        elif completed_records is not None:
+            completed_records.write(duration=remain_duration_list[~remain_test_flg],
+                                    result=remain_result_list[~remain_test_flg],
+                                    result_s=remain_s_list[~remain_test_flg],
+                                    test_index=completed_index)
+        else:
+            completed_duration_list += list(remain_duration_list[~remain_test_flg])
+            completed_result_list += list(remain_result_list[~remain_test_flg])
+            completed_s_list += list(remain_s_list[~remain_test_flg])
+            completed_index_list += list(completed_index)
 
         remain_greater_last_curve = remain_greater_last_curve[remain_test_flg]
         remain_less_last_curve = remain_less_last_curve[remain_test_flg]
         remain_s_list = remain_s_list[remain_test_flg]
-        total_duration += batch_size
+        total_duration += batch_duration
+        total_batch_cnt += 1
         remain_greater_stop_flg = remain_greater_stop_flg[remain_test_flg]
         remain_less_stop_flg = remain_less_stop_flg[remain_test_flg]
+        profile_mark("bookkeeping")
+
+        # Сохраняем контрольную точку
+        if checkpoint is not None and checkpoint.due(remain_iter_cnt):
+            checkpoint.save(random_state,
+                            total_duration=total_duration,
+                            total_look_cnt=total_look_cnt,
+                            total_batch_cnt=total_batch_cnt,
+                            remain_iter_cnt=remain_iter_cnt,
+                            remain_index=remain_index,
+                            remain_greater_last_curve=remain_greater_last_curve,
+                            remain_less_last_curve=remain_less_last_curve,
+                            remain_greater_stop_flg=remain_greater_stop_flg,
+                            remain_less_stop_flg=remain_less_stop_flg,
+                            remain_s_list=remain_s_list,
+                            completed=get_completed_state(completed_summary, completed_records,
+                                                          duration=completed_duration_list,
+                                                          result=completed_result_list,
+                                                          result_s=completed_s_list,
+                                                          test_index=completed_index_list))
+        profile_mark("checkpoint")
+
+        if profiler is not None:
+            profiler.end_round(len(remain_test_flg) * batch_duration)
+
+    if completed_summary is not None:
+        return completed_summary
+    if completed_records is not None:
+        return completed_records.records
 
     return {
         "duration": np.array(completed_duration_list),
         "result": np.array(completed_result_list),
-        "result_s": np.array(completed_s_list)
+        "result_s": np.array(completed_s_list),
+        "test_index": np.array(completed_index_list, dtype=np.int64)
     }
 
 
-def simulation_sprt(p, iter_size, batch_size, p0, d, alpha, beta, alternative):
+def simulation_sprt(p, iter_size, batch_size, p0, d, alpha, beta, alternative,
+                    narrow_dtype=False, packed=False, random_state=None,
+                    n_jobs=None, chunk_size=None, backend="threads", summary=False,
+                    records=None, checkpoint_path=None, checkpoint_every=1, look_schedule=None,
+                    max_sample_size=None, truncation_rule="curve", mixture=False, prior_size=None,
+                    counter_rng=False, profiler=None, kernel_backend=None):
     """
     Моделирование последовательного анализа
     параллельно в iter_size тестах
@@ -164,7 +557,76 @@ def simulation_sprt(p, iter_size, batch_size, p0, d, alpha, beta, alternative):
     :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
     :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
     :param alternative: наименование альтернативы
-    :return: словарь res
+    :param narrow_dtype: флаг использования узких типов данных:
+                         выборка в uint8, накопленные суммы в int32,
+                         кривая в float32, если это позволяет величина границ
+    :param packed: флаг хранения выборки в упакованном виде по 64 значения в машинное слово,
+                   накопленные суммы и кривая считаются по количеству единичных битов блоками строк
+    :param random_state: seed или np.random.SeedSequence при n_jobs,
+                         иначе также может быть генератором np.random.Generator,
+                         None - глобальный генератор numpy (без n_jobs),
+                         при counter_rng - целое число seed или CounterRandomState
+    :param n_jobs: количество потоков или процессов, если задано,
+                   то тесты разбиваются на части по chunk_size
+                   и моделируются в пуле,
+                   результат не зависит от количества потоков или процессов
+    :param chunk_size: количество тестов в одной части при n_jobs
+    :param backend: пул для моделирования при n_jobs
+                    "threads" - пул потоков
+                    "processes" - пул процессов, результаты записываются
+                                  в разделяемую память и возвращаются без копирования
+    :param summary: флаг сводного режима: вместо списков характеристик тестов
+                    накапливается сводная статистика, объём памяти не зависит от iter_size,
+                    накопители частей моделирования объединяются
+    :param records: режим записи характеристик тестов в структурный массив RECORD_DTYPE:
+                    True - массив в памяти или во временном файле, если он больше MEMMAP_THRESHOLD,
+                    путь к файлу .npy - массив отображается на этот файл,
+                    массив размера iter_size типа RECORD_DTYPE - запись в заранее выделенный массив,
+                    None - словарь списков,
+                    в пуле потоков каждая часть пишет в свой срез общего массива
+    :param checkpoint_path: путь к файлу контрольной точки, если задан,
+                            то состояние моделирования сохраняется в него,
+                            а если файл уже есть, то моделирование продолжается с него
+                            с тем же результатом, что и без прерывания (без n_jobs)
+    :param checkpoint_every: количество батчей между сохранениями контрольной точки
+    :param look_schedule: расписание просмотров: целое число k - просмотр после каждых k наблюдений,
+                          возрастающий список размеров выборки в моменты просмотров,
+                          после последнего из них просмотры продолжаются с последним интервалом,
+                          None - решение принимается после каждого наблюдения;
+                          при заданном расписании batch_size - количество просмотров в батче,
+                          packed не используется, длительность теста - размер выборки
+                          в момент просмотра с принятием решения
+    :param max_sample_size: максимальная длительность теста (количество наблюдений),
+                            в которую незаконченный тест усекается с решением
+                            по правилу truncation_rule, None - тест не усекается,
+                            значение по умолчанию можно получить из get_max_sample_size
+    :param truncation_rule: правило принятия решения при усечении из TRUNCATION_RULES:
+                            "curve" - по знаку логарифмического отношения правдоподобий,
+                            "midpoint" - по середине между границами,
+                            "hypothesis" - в пользу гипотезы
+    :param mixture: флаг моделирования теста отношения смешанного правдоподобия
+                    с бета-распределением значения вероятности при альтернативе
+                    вместо фиксированного MDE, тест останавливается при пересечении
+                    границы log(1 / alpha) или усекается в max_sample_size с принятием гипотезы,
+                    поэтому max_sample_size обязателен, а beta и truncation_rule не используются
+    :param prior_size: сумма параметров бета-распределения со средним p0 при mixture,
+                       None - подбирается так, чтобы стандартное отклонение
+                       бета-распределения было равно d
+    :param counter_rng: флаг розыгрыша выборки генератором на основе счётчика CounterRandomState:
+                        значения выборки теста зависят только от seed, номера теста и номера батча,
+                        поэтому результат не зависит от n_jobs и chunk_size,
+                        а траекторию любого теста восстанавливает reconstruct_trajectory
+    :param profiler: профилировщик SimulationProfiler: каждый раунд (батч) сообщает ему
+                     количество незаконченных тестов, размер батча, время стадий,
+                     объём выделенной памяти и скорость моделирования в наблюдениях в секунду,
+                     сводный отчёт после моделирования - profiler.report(),
+                     запущенная им трассировка памяти останавливается в конце моделирования,
+                     в пуле процессов не поддерживается
+    :param kernel_backend: вычислительный бэкенд ядер из KERNEL_BACKENDS (в отличие от backend - пула при n_jobs):
+                           numpy - матрицы батча, numba - построчный цикл с тем же результатом,
+                           None - выбранный get_kernel_backend, в пуле процессов - в каждом процессе
+    :return: накопитель SimulationSummary в сводном режиме,
+             структурный массив записей в режиме records, иначе словарь res
              res["duration"] - список длительностей теста
              res["result"] - список результатов теста
                              для alternative = "less"
@@ -177,8 +639,215 @@ def simulation_sprt(p, iter_size, batch_size, p0, d, alpha, beta, alternative):
                                 -1: тест закончился, нет стат. значимого изменения вероятности
                                 1: тест закончился, есть стат. значимое изменение вероятности
              res["result_s"] - список значений S(n) на момент длительности теста
+             res["test_index"] - список номеров тестов в моделировании: строки идут в порядке
+                                 окончания тестов, номер считается с нуля в пределах вызова
+                                 (при n_jobs - с учётом смещения части) и при counter_rng
+                                 передаётся в reconstruct_trajectory как test_index
+                                 вместе с тем же random_state
+    """
+    if mixture:
+        if max_sample_size is None:
+            raise ValueError("Неправильная максимальная длительность теста: "
+                             "тест отношения смешанного правдоподобия требует max_sample_size")
+        prior_size = sum(get_prior_params(p0, np.abs(d), prior_size))
+
+    if counter_rng and not isinstance(random_state, CounterRandomState):
+        random_state = CounterRandomState(random_state)
+
+    if n_jobs is not None:
+        if checkpoint_path is not None:
+            raise ValueError("Контрольные точки не поддерживаются при n_jobs")
+
+        kwargs = dict(p=p, batch_size=batch_size, p0=p0, d=d, alpha=alpha, beta=beta,
+                      alternative=alternative, narrow_dtype=narrow_dtype, packed=packed,
+                      summary=summary, look_schedule=look_schedule,
+                      max_sample_size=max_sample_size, truncation_rule=truncation_rule,
+                      mixture=mixture, prior_size=prior_size, kernel_backend=kernel_backend)
+        if backend == "threads":
+            kwargs["profiler"] = profiler
+            if summary:
+                records = None
+            elif isinstance(records, np.ndarray):
+                records = check_records(records, iter_size, RECORD_DTYPE)
+            elif records is not None:
+                records = allocate_records(iter_size, RECORD_DTYPE, None if records is True else records)
+            with profile_run(profiler):
+                return threaded_simulation(simulation_sprt, iter_size,
+                                           random_state=random_state, n_jobs=n_jobs, chunk_size=chunk_size,
+                                           records=records, **kwargs)
+        elif backend == "processes":
+            if records is not None:
+                raise ValueError("Запись в массив записей не поддерживается в пуле процессов")
+            if profiler is not None:
+                raise ValueError("Профилирование не поддерживается в пуле процессов")
+            return process_simulation(simulation_sprt, iter_size, None if summary else RESULT_FIELDS,
+                                      random_state=random_state, n_jobs=n_jobs, chunk_size=chunk_size,
+                                      **kwargs)
+        else:
+            raise ValueError(f"Неправильный пул для моделирования: {backend}")
+
+    if random_state is not None and not isinstance(random_state, CounterRandomState):
+        random_state = np.random.default_rng(random_state)
+
+    checkpoint = None
+    if checkpoint_path is not None:
+        params = dict(p=p, iter_size=iter_size, batch_size=batch_size,
+                      p0=p0, d=d, alpha=alpha, beta=beta, alternative=alternative,
+                      narrow_dtype=narrow_dtype, packed=packed, summary=summary,
+                      records=records is not None)
+        if isinstance(records, (str, os.PathLike)):
+            params["records"] = os.fspath(records)
+        if look_schedule is not None:
+            params["look_schedule"] = normalize_look_schedule(look_schedule)
+        if max_sample_size is not None:
+            params["max_sample_size"] = int(max_sample_size)
+            params["truncation_rule"] = truncation_rule
+        if mixture:
+            params["mixture"] = True
+            params["prior_size"] = float(prior_size)
+        if counter_rng:
+            params["counter_rng"] = True
+            params["random_state"] = random_state.seed
+        checkpoint = SimulationCheckpoint(checkpoint_path, params, checkpoint_every)
+
+    with profile_run(profiler):
+        if alternative == "two-sided" and not mixture:
+            return two_sided_simulation_sprt(p, iter_size, batch_size, p0, d, alpha, beta,
+                                             narrow_dtype=narrow_dtype, packed=packed,
+                                             random_state=random_state, summary=summary, records=records,
+                                             checkpoint=checkpoint, look_schedule=look_schedule,
+                                             max_sample_size=max_sample_size, truncation_rule=truncation_rule,
+                                             profiler=profiler, kernel_backend=kernel_backend)
+        else:
+            return one_sided_simulation_sprt(p, iter_size, batch_size, p0, d, alpha, beta, alternative,
+                                             narrow_dtype=narrow_dtype, packed=packed,
+                                             random_state=random_state, summary=summary, records=records,
+                                             checkpoint=checkpoint, look_schedule=look_schedule,
+                                             max_sample_size=max_sample_size, truncation_rule=truncation_rule,
+                                             prior_size=prior_size if mixture else None, profiler=profiler,
+                                             kernel_backend=kernel_backend)
+
+
+def resume_simulation_sprt(checkpoint_path, checkpoint_every=1):
+    """
+    Продолжение прерванного моделирования с контрольной точки
+    с параметрами, сохранёнными в ней
+
+    :param checkpoint_path: путь к файлу контрольной точки
+    :param checkpoint_every: количество батчей между сохранениями контрольной точки
+    :return: результат simulation_sprt
+    """
+    params = read_checkpoint_params(checkpoint_path)
+    records = params.pop("records")
+    return simulation_sprt(**params,
+                           records=records or None,
+                           checkpoint_path=checkpoint_path,
+                           checkpoint_every=checkpoint_every)
+
+
+def reconstruct_trajectory(test_index, p, batch_size, p0, d, alpha, beta, alternative, random_state,
+                           narrow_dtype=False, look_schedule=None, max_sample_size=None,
+                           truncation_rule="curve", mixture=False, prior_size=None):
+    """
+    Восстановление траектории одного теста из моделирования с counter_rng
+
+    Выборка теста разыгрывается заново тем же генератором на основе счётчика
+    отдельно от остальных тестов, поэтому результат совпадает с результатом теста
+    в исходном моделировании, а траектории всех тестов хранить не нужно.
+    Параметры совпадают с параметрами simulation_sprt, кроме iter_size и параметров пула
+
+    :param test_index: номер теста в моделировании (поле test_index результата simulation_sprt)
+    :param p: реальное значение вероятности
+    :param batch_size: размер одного батча генерирования данных и моделирования
+    :param p0: значение вероятности при гипотезе
+    :param d: абсолютное значение MDE
+    :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+    :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
+    :param alternative: наименование альтернативы
+    :param random_state: seed моделирования или CounterRandomState
+    :param narrow_dtype: флаг использования узких типов данных
+    :param look_schedule: расписание просмотров
+    :param max_sample_size: максимальная длительность теста
+    :param truncation_rule: правило принятия решения при усечении из TRUNCATION_RULES
+    :param mixture: флаг моделирования теста отношения смешанного правдоподобия
+    :param prior_size: сумма параметров бета-распределения со средним p0 при mixture
+    :return: словарь res
+             res["duration"] - длительность теста
+             res["result"] - результат теста, как в simulation_sprt
+             res["result_s"] - значение S(n) на момент длительности теста
+             res["sample_size"] - список размеров выборки в моменты проверки границ
+                                  до длительности теста включительно
+             res["success_cnt"] - список значений S(n) в эти моменты
+             res["curve"] - словарь из списков значений логарифмического отношения правдоподобий
+                            в эти моменты по наименованиям односторонних проверок,
+                            при mixture - логарифма отношения смешанного правдоподобия
+                            по наименованию альтернативы
+             res["bounds"] - словарь из нижней и верхней границ по тем же наименованиям,
+                             при mixture нижней границы нет (None)
     """
-    if alternative == "two-sided":
-        return two_sided_simulation_sprt(p, iter_size, batch_size, p0, d, alpha, beta)
+    if not isinstance(random_state, CounterRandomState):
+        random_state = CounterRandomState(random_state)
+    random_state = random_state.shift(test_index)
+
+    res = simulation_sprt(p, 1, batch_size, p0, d, alpha, beta, alternative,
+                          narrow_dtype=narrow_dtype, random_state=random_state,
+                          look_schedule=look_schedule, max_sample_size=max_sample_size,
+                          truncation_rule=truncation_rule, mixture=mixture, prior_size=prior_size,
+                          counter_rng=True)
+    duration = int(res["duration"][0])
+
+    # Разыгрываем батчи теста заново до его длительности
+    sample_size_list = []
+    success_cnt_list = []
+    total_duration = 0
+    total_look_cnt = 0
+    total_success_cnt = 0
+    batch_index = 0
+    while total_duration < duration:
+        batch_random_state = random_state.for_batch([0], batch_index)
+        if look_schedule is None:
+            look_list = np.arange(1, batch_size + 1)
+            s_list = np.cumsum(bernoulli_sample(p, [1, batch_size], random_state=batch_random_state), axis=1)
+        else:
+            look_list = get_look_sizes(look_schedule, total_look_cnt, batch_size)
+            if max_sample_size is not None:
+                look_list = np.minimum(look_list, max_sample_size)
+            look_list = look_list - total_duration
+            s_list = look_sample(p, look_list, 1, random_state=batch_random_state)
+            total_look_cnt += batch_size
+
+        sample_size_list.append(total_duration + look_list)
+        success_cnt_list.append(total_success_cnt + s_list[0])
+        total_duration += look_list[-1]
+        total_success_cnt += s_list[0, -1]
+        batch_index += 1
+
+    sample_size_list = np.concatenate(sample_size_list)
+    success_cnt_list = np.concatenate(success_cnt_list)
+    duration_flg = sample_size_list <= duration
+    sample_size_list = sample_size_list[duration_flg]
+    success_cnt_list = success_cnt_list[duration_flg]
+
+    if mixture:
+        prior_a, prior_b = get_prior_params(p0, np.abs(d), prior_size)
+        curve_dict = {alternative: mixture_curve(success_cnt_list, sample_size_list,
+                                                 p0, prior_a, prior_b, alternative)}
+        bound_dict = {alternative: (None, np.log(1 / alpha))}
     else:
-        return one_sided_simulation_sprt(p, iter_size, batch_size, p0, d, alpha, beta, alternative)
+        sprt = BinaryOneSampleSprt(p0, d, alpha, beta, alternative)
+        curve_dict = {}
+        bound_dict = {}
+        for one_sided_alternative, low_bound, high_bound in get_bounds(p0, d, alpha, beta, alternative):
+            curve_dict[one_sided_alternative] = sprt.calc_one_sided_curve(success_cnt_list, sample_size_list,
+                                                                          one_sided_alternative)
+            bound_dict[one_sided_alternative] = (low_bound, high_bound)
+
+    return {
+        "duration": duration,
+        "result": int(res["result"][0]),
+        "result_s": int(res["result_s"][0]),
+        "sample_size": sample_size_list,
+        "success_cnt": success_cnt_list,
+        "curve": curve_dict,
+        "bounds": bound_dict
+    }
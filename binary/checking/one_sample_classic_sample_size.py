@@ -51,3 +51,56 @@ def classic_sample_size(p0, d, alpha, beta, alternative):
                    one_sided_classic_sample_size(p0, p0+np.abs(d), alpha/2, beta))
     else:
         raise ValueError(f"Неправильная альтернатива: {alternative}")
+
+
+def one_sided_classic_sample_size_array(p_low, p_high, alpha_low, alpha_high):
+    """
+    Расчёт размера выборки в классическом дизайне
+    одновыборочного теста с фиксированной длительностью теста
+    и односторонней альтернативой для массивов значений,
+    аналог one_sided_classic_sample_size
+
+    :param p_low: массив нижних порогов вероятности
+    :param p_high: массив верхних порогов вероятности
+    :param alpha_low: вероятность ошибки для нижнего порога
+    :param alpha_high: вероятность ошибки для верхнего порога
+    :return: массив размеров выборки
+    """
+    p_low = np.asarray(p_low)
+    p_high = np.asarray(p_high)
+
+    assert np.all((0 <= p_low) & (p_low <= 1)), "Вероятности p_low вне [0, 1]"
+    assert np.all((0 <= p_high) & (p_high <= 1)), "Вероятности p_high вне [0, 1]"
+
+    d = p_high - p_low
+    summand_low = norm.ppf(1-alpha_low) * np.sqrt(p_low * (1-p_low))
+    summand_high = norm.ppf(1-alpha_high) * np.sqrt(p_high * (1-p_high))
+
+    return np.ceil(((summand_low + summand_high)**2) / (d**2)).astype(np.int64)
+
+
+def classic_sample_size_array(p0, d, alpha, beta, alternative):
+    """
+    Расчёт размера выборки в классическом дизайне
+    одновыборочного теста с фиксированной длительностью теста
+    для массивов значений, аналог classic_sample_size
+
+    :param p0: массив значений вероятности при гипотезе
+    :param d: массив абсолютных значений MDE
+    :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+    :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
+    :param alternative: наименование альтернативы
+    :return: массив размеров выборки
+    """
+    p0 = np.asarray(p0)
+    d = np.abs(np.asarray(d))
+
+    if alternative == "less":
+        return one_sided_classic_sample_size_array(p0 - d, p0, beta, alpha)
+    elif alternative == "greater":
+        return one_sided_classic_sample_size_array(p0, p0 + d, alpha, beta)
+    elif alternative == "two-sided":
+        return np.maximum(one_sided_classic_sample_size_array(p0 - d, p0, beta, alpha/2),
+                          one_sided_classic_sample_size_array(p0, p0 + d, alpha/2, beta))
+    else:
+        raise ValueError(f"Неправильная альтернатива: {alternative}")
@@ -0,0 +1,108 @@
+import numpy as np
+
+from binary.checking.dtype_policy import get_count_dtype
+from binary.checking.profiling import profile_mark
+from binary.checking.simulation_curve import get_truncation_index
+from binary.checking.tools import get_duration_from_bound_crossing, get_value_at_duration
+from binary.sprt.mixture_sprt import mixture_curve
+
+
+def one_sample_mixture_sprt(x, p0, alpha, alternative, prior_a, prior_b,
+                            initial_s=None, initial_n=0, n_list=None, s_list=None,
+                            narrow_dtype=False, look_list=None, max_sample_size=None):
+    """
+    Последовательный анализ отношения смешанного правдоподобия
+    в случае одновыборочной задачи
+
+    В отличие от теста Вальда кривая зависит не от приращений, а от накопленных
+    S(n) и n с начала теста, поэтому вместо значения кривой
+    в начале батча передаются накопленные значения initial_s и initial_n
+
+    :param x: массив размера [iter_size, sample_size],
+              где каждая строка - значение выборки теста из {0, 1} размера sample_size,
+              а iter_size - количество итераций моделирования (тестов)
+    :param p0: значение вероятности при гипотезе
+    :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+    :param alternative: наименование альтернативы: "less", "greater" или "two-sided"
+    :param prior_a: параметр a бета-распределения значения вероятности при альтернативе
+    :param prior_b: параметр b бета-распределения значения вероятности при альтернативе
+    :param initial_s: список длины iter_size из значений S(n) к началу батча
+    :param initial_n: длительность тестов к началу батча
+    :param n_list: массив значений прошедшей длительности внутри батча
+    :param s_list: заранее рассчитанный массив накопленных сумм S(n) внутри батча,
+                   если задан, то x не используется
+    :param narrow_dtype: флаг использования узких типов данных для накопленных сумм
+    :param look_list: возрастающий список длительностей внутри батча в моменты просмотров,
+                      если задан, то столбцы s_list - значения S(n) в моменты просмотров,
+                      а n_list по умолчанию равен look_list
+    :param max_sample_size: максимальная длительность теста от начала батча,
+                            в которую незаконченный тест усекается с принятием гипотезы,
+                            None - тест не усекается
+    :return: словарь res
+             res["duration"] - список длительностей теста
+             res["result"] - список результатов теста
+                             для alternative = "less"
+                                -1: есть стат. значимое снижение вероятности
+                                1: тест усечён, нет стат. значимого снижения вероятности
+                             для alternative = "greater" и "two-sided"
+                                -1: тест усечён, нет стат. значимого изменения вероятности
+                                1: есть стат. значимое изменение вероятности
+             res["result_s"] - список значений S(n) внутри батча на момент длительности теста
+             res["look_duration"] - список количеств просмотров до остановки теста,
+                                    только если задан look_list
+    """
+    # Расчёт накопленной суммы S(n) из X(i), i <= n
+    if s_list is None:
+        x = np.asarray(x)
+        s_list = np.cumsum(x, axis=1, dtype=get_count_dtype(narrow_dtype))
+    profile_mark("cumsum")
+
+    if n_list is None:
+        n_list = np.asarray(look_list) if look_list is not None else np.arange(1, s_list.shape[1] + 1)
+
+    initial_s = 0 if initial_s is None else np.asarray(initial_s).reshape(-1, 1)
+
+    # Логарифм отношения смешанного правдоподобия с начала теста
+    curve = mixture_curve(initial_s + s_list.astype(np.int64), initial_n + np.asarray(n_list),
+                          p0, prior_a, prior_b, alternative)
+    profile_mark("curve")
+    high_bound_crossing_flg = curve >= np.log(1 / alpha)
+
+    # Номер столбца, в котором тест усекается
+    truncation_index = get_truncation_index(max_sample_size, s_list.shape[1], look_list)
+    truncation_flg = np.zeros(s_list.shape[1], dtype=bool)
+    if truncation_index is not None:
+        truncation_flg[truncation_index] = True
+
+    bound_crossing_flg = high_bound_crossing_flg | truncation_flg
+
+    # Определение длительности теста
+    duration_list = get_duration_from_bound_crossing(bound_crossing_flg)
+
+    # Значение флагов на момент длительности теста
+    high_bound_duration_crossing_flg = get_value_at_duration(value_list=high_bound_crossing_flg,
+                                                             duration_list=duration_list)
+    truncation_duration_flg = truncation_flg[duration_list - 1] & ~high_bound_duration_crossing_flg
+
+    # Значение S(n), где n - момент длительности теста
+    result_s_list = get_value_at_duration(value_list=s_list,
+                                          duration_list=duration_list)
+
+    # Определение финального результата теста
+    sign = -1 if alternative == "less" else 1
+    result_list = sign * (np.where(high_bound_duration_crossing_flg, 1, 0)
+                          - np.where(truncation_duration_flg, 1, 0))
+
+    res = {
+        "duration": duration_list,
+        "result": result_list,
+        "result_s": result_s_list
+    }
+
+    # Переход от номеров просмотров к длительностям
+    if look_list is not None:
+        res["look_duration"] = duration_list
+        res["duration"] = np.asarray(look_list)[duration_list - 1]
+
+    profile_mark("crossing")
+    return res
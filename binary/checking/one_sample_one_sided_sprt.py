@@ -1,11 +1,16 @@
 import numpy as np
 
-from .simulation_curve import one_sample_curve
+from .dtype_policy import get_count_dtype
+from .kernel_backend import numba_one_sample_one_sided_sprt, resolve_kernel_backend
+from .profiling import profile_mark
+from .simulation_curve import get_truncation_index, one_sample_curve
 from .tools import get_duration_from_bound_crossing, get_value_at_duration
 
 
 def one_sample_one_sided_sprt(x, p0, d, alpha, beta, alternative,
-                              initial_curve=None, n_list=None):
+                              initial_curve=None, n_list=None, s_list=None,
+                              narrow_dtype=False, look_list=None,
+                              max_sample_size=None, truncation_rule="curve", kernel_backend=None):
     """
     Последовательный анализ в случае одновыборочной задачи
     и односторонней альтернативы
@@ -22,16 +27,48 @@ def one_sample_one_sided_sprt(x, p0, d, alpha, beta, alternative,
                           логарифмического отношения правдоподобий
                           к моменту применения последовательного анализа
     :param n_list: массив значений прошедшей длительности
+    :param s_list: заранее рассчитанный массив накопленных сумм S(n),
+                   если задан, то x не используется
+    :param narrow_dtype: флаг использования узких типов данных:
+                         накопленные суммы в int32, кривая в float32,
+                         если это позволяет величина границ
+    :param look_list: возрастающий список длительностей в моменты просмотров,
+                      если задан, то столбцы s_list - значения S(n) в моменты просмотров,
+                      пересечение границ проверяется только в них,
+                      а n_list по умолчанию равен look_list
+    :param max_sample_size: максимальная длительность теста от начала выборки,
+                            в которую тест усекается с решением по правилу truncation_rule,
+                            None - тест не усекается
+    :param truncation_rule: правило принятия решения при усечении из TRUNCATION_RULES
+    :param kernel_backend: вычислительный бэкенд из KERNEL_BACKENDS: numpy - матрицы батча,
+                           numba - построчный цикл с ранней остановкой и тем же результатом,
+                           None - выбранный get_kernel_backend
     :return: словарь res
              res["duration"] - список длительностей теста
              res["result"] - список результатов теста
              res["result_s"] - список значений S(n) на момент длительности теста
              res["last_curve"] - список значений кривой в последний момент времени
+             res["look_duration"] - список количеств просмотров до остановки теста,
+                                    только если задан look_list
     """
 
+    if resolve_kernel_backend(kernel_backend) == "numba":
+        return numba_one_sample_one_sided_sprt(x, p0, d, alpha, beta, alternative,
+                                               initial_curve=initial_curve, n_list=n_list, s_list=s_list,
+                                               look_list=look_list, max_sample_size=max_sample_size,
+                                               truncation_rule=truncation_rule)
+
     # Расчёт накопленной суммы S(n) из X(i), i <= n
-    x = np.array(x)
-    s_list = np.cumsum(x, axis=1)
+    if s_list is None:
+        x = np.asarray(x)
+        s_list = np.cumsum(x, axis=1, dtype=get_count_dtype(narrow_dtype))
+    profile_mark("cumsum")
+
+    if look_list is not None and n_list is None:
+        n_list = np.asarray(look_list)
+
+    # Номер столбца, в котором тест усекается
+    truncation_index = get_truncation_index(max_sample_size, s_list.shape[1], look_list)
 
     # Получение логарифмического отношения правдоподобий
     # и границ для принятия решений
@@ -41,19 +78,15 @@ def one_sample_one_sided_sprt(x, p0, d, alpha, beta, alternative,
                            alpha=alpha,
                            beta=beta,
                            alternative=alternative,
-                           n_list=n_list)
-    curve = res["curve"]
-    low_bound = res["low_bound"]
-    high_bound = res["high_bound"]
-
-    # Если заданы значения кривой,
-    # корректируем логарифмическое отношение правдоподобий
-    if initial_curve is not None:
-        curve += initial_curve.reshape(-1, 1)
-
-    # Расчёт индикаторов пересечения границ
-    high_bound_crossing_flg = curve > high_bound
-    low_bound_crossing_flg = curve < low_bound
+                           n_list=n_list,
+                           initial_curve=initial_curve,
+                           narrow_dtype=narrow_dtype,
+                           truncation_index=truncation_index,
+                           truncation_rule=truncation_rule)
+
+    # Индикаторы пересечения границ
+    high_bound_crossing_flg = res["high_bound_crossing"]
+    low_bound_crossing_flg = res["low_bound_crossing"]
     bound_crossing_flg = low_bound_crossing_flg | high_bound_crossing_flg
 
     # Определение длительности теста
@@ -73,9 +106,17 @@ def one_sample_one_sided_sprt(x, p0, d, alpha, beta, alternative,
     result_list = np.where(high_bound_duration_crossing_flg, 1, 0) \
                   - np.where(low_bound_duration_crossing_flg, 1, 0)
 
-    return {
+    res = {
         "duration": duration_list,
         "result": result_list,
         "result_s": result_s_list,
-        "last_curve": curve[:, -1]
+        "last_curve": res["last_curve"]
     }
+
+    # Переход от номеров просмотров к длительностям
+    if look_list is not None:
+        res["look_duration"] = duration_list
+        res["duration"] = np.asarray(look_list)[duration_list - 1]
+
+    profile_mark("crossing")
+    return res
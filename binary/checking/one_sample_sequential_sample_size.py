@@ -2,6 +2,18 @@ import numpy as np
 from scipy.optimize import bisect, minimize_scalar
 
 
+# Максимальное количество итераций метода Ньютона
+# для корня операционной характеристики
+NEWTON_MAX_ITER = 100
+
+# Точность корня операционной характеристики
+NEWTON_XTOL = 1e-12
+
+# Количество итераций метода золотого сечения
+# для максимума средней длительности теста, точность (0.618^60) * 2
+GOLDEN_MAX_ITER = 60
+
+
 def p_critical(p_low, p_high):
     """
     Определение критического значения, при котором равно нулю
@@ -267,3 +279,289 @@ def max_sequential_sample_size(p0, d, alpha, beta, alternative):
         return max_one_sided_sequential_sample_size(p_low, p_high, beta, alpha)
     else:
         raise ValueError(f"Неправильная альтернатива: {alternative}")
+
+
+def operation_characteristic_root_array(p, p_low, p_high):
+    """
+    Значение параметра для определения значения
+    операционной характеристики для массивов значений,
+    аналог operation_characteristic_root
+
+    Корень функции helper(h) ищется методом Ньютона с защитой бисекцией
+    на том же отрезке, что и в operation_characteristic_root, одновременно для всех значений.
+    Функция выпукла, поэтому итерации от внешнего конца отрезка монотонно сходятся к корню,
+    а значения p = p_low, p_crit, p_high не требуют отдельных ветвлений
+
+    :param p: массив истинных значений вероятности,
+              лежащих в отрезке [p_low, p_high]
+    :param p_low: массив нижних порогов вероятности
+    :param p_high: массив верхних порогов вероятности
+    :return: массив значений параметра, лежащих в [-1, 1]
+    """
+    p, p_low, p_high = np.broadcast_arrays(*map(np.asarray, (p, p_low, p_high)))
+    p = p.astype(np.float64)
+
+    if np.any(p < p_low) or np.any(p > p_high):
+        raise ValueError("Величины p должны находиться в отрезках [p_low, p_high]")
+
+    log_high = np.log(p_high / p_low)
+    log_low = np.log((1-p_low) / (1-p_high))
+
+    def helper(h):
+        return -1 + p * np.exp(h * log_high) + (1-p) * np.exp(-h * log_low)
+
+    def helper_derivative(h):
+        return p * log_high * np.exp(h * log_high) - (1-p) * log_low * np.exp(-h * log_low)
+
+    # Значение параметра h, при котором
+    # производная функции helper(h) равна нулю
+    with np.errstate(divide="ignore"):
+        h_crit = np.log(((1-p) * log_low) / (p * log_high)) / (log_low + log_high)
+    h_crit = np.clip(h_crit, -1, 1)
+
+    # Критическое значение параметра p
+    p_crit = p_critical(p_low, p_high)
+
+    # Отрезок с корнем: [h_crit, 1] при p < p_crit, [-1, h_crit] при p > p_crit,
+    # итерации начинаются с внешнего конца отрезка
+    left_flg = p > p_crit
+    outer = np.where(left_flg, -1., 1.)
+    lo = np.where(left_flg, -1., h_crit)
+    hi = np.where(left_flg, h_crit, 1.)
+    h = outer.copy()
+
+    active_flg = np.ones(h.shape, dtype=bool)
+    for _ in range(NEWTON_MAX_ITER):
+        value = helper(h)
+        derivative = helper_derivative(h)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            h_next = h - value / derivative
+
+        # Если шаг Ньютона выходит за отрезок, то делаем шаг бисекции,
+        # а найденный точно корень не меняем
+        bisect_flg = ~np.isfinite(h_next) | (h_next <= lo) | (h_next >= hi)
+        h_next = np.where(bisect_flg, (lo + hi) / 2, h_next)
+        h_next = np.where(value == 0, h, h_next)
+
+        # Сужаем отрезок: со стороны внешнего конца функция положительна
+        positive_flg = helper(h_next) > 0
+        lo = np.where(positive_flg == left_flg, h_next, lo)
+        hi = np.where(positive_flg != left_flg, h_next, hi)
+
+        step = np.abs(h_next - h)
+        h = np.where(active_flg, h_next, h)
+        active_flg &= (step > NEWTON_XTOL) & (hi - lo > NEWTON_XTOL)
+        if not np.any(active_flg):
+            break
+
+    # При p = p_low, p_crit, p_high значения h известны аналитически
+    return np.select([p == p_low, p == p_high, p == p_crit], [1., -1., 0.], h)
+
+
+def prob_array(h, p_low, p_high):
+    """
+    Значение вероятности p = p(h) для массивов значений,
+    аналог prob
+
+    :param h: массив значений корня операционной характеристики
+    :param p_low: массив нижних порогов вероятности
+    :param p_high: массив верхних порогов вероятности
+    :return: массив значений вероятности p = p(h)
+    """
+    h, p_low, p_high = np.broadcast_arrays(*map(np.asarray, (h, p_low, p_high)))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = (1 - np.exp(h * np.log((1-p_high) / (1-p_low)))) \
+            / (np.exp(h * np.log(p_high / p_low)) - np.exp(h * np.log((1-p_high) / (1-p_low))))
+
+    return np.select([h == -1, h == 1, h == 0], [p_high, p_low, p_critical(p_low, p_high)], p)
+
+
+def operation_characteristic_array(h, alpha_low, alpha_high):
+    """
+    Операционная характеристика для массивов значений,
+    аналог operation_characteristic
+
+    :param h: массив значений корня операционной характеристики
+    :param alpha_low: вероятность пересечения нижней границы
+                      при справедливости p = p_high
+    :param alpha_high: вероятность пересечения нижней границы
+                       при справедливости p = p_low
+    :return: массив значений операционной характеристики
+    """
+    h = np.asarray(h)
+
+    # Границы принятия решений
+    low_bound = np.log(alpha_low / (1 - alpha_high))
+    high_bound = np.log((1 - alpha_low) / alpha_high)
+
+    # При h = 0 используется предельная формула
+    with np.errstate(divide="ignore", invalid="ignore"):
+        o_c = (np.exp(high_bound*h) - 1) / (np.exp(high_bound*h) - np.exp(low_bound*h))
+
+    return np.where(h == 0, high_bound / (high_bound - low_bound), o_c)
+
+
+def one_sided_sequential_sample_size_array(p, p_low, p_high, alpha_low, alpha_high):
+    """
+    Расчёт средней длительности
+    последовательного одновыборочного теста
+    при односторонней альтернативе для массивов значений,
+    аналог one_sided_sequential_sample_size
+
+    :param p: массив истинных значений вероятности,
+              лежащих в отрезке [p_low, p_high]
+    :param p_low: массив нижних порогов вероятности
+    :param p_high: массив верхних порогов вероятности
+    :param alpha_low: вероятность пересечения нижней границы
+                      при справедливости p = p_high
+    :param alpha_high: вероятность пересечения нижней границы
+                       при справедливости p = p_low
+    :return: массив средних длительностей теста
+    """
+    p, p_low, p_high, alpha_low, alpha_high = np.broadcast_arrays(
+        *map(np.asarray, (p, p_low, p_high, alpha_low, alpha_high))
+    )
+
+    # Границы принятия решений
+    low_bound = np.log(alpha_low / (1 - alpha_high))
+    high_bound = np.log((1 - alpha_low) / alpha_high)
+
+    # Критическое значение параметра p
+    p_crit = p_critical(p_low, p_high)
+    # Значение корня операционной характеристики
+    h = operation_characteristic_root_array(p, p_low, p_high)
+    # Значение операционной характеристики
+    o_c = operation_characteristic_array(h, alpha_low, alpha_high)
+
+    # Вблизи критического значения используем квадратичную формулу
+    crit_flg = np.abs(p - p_crit) < np.minimum.reduce([np.full(p.shape, 1 / 10_000), p / 1_000,
+                                                       (1 - p) / 1_000, (p_high - p_low) / 100])
+
+    e_z_sqr = p * (np.log(p_high / p_low)**2) + (1 - p) * (np.log((1-p_low) / (1-p_high))**2)
+    e_z = p * np.log(p_high / p_low) - (1 - p) * np.log((1-p_low) / (1-p_high))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sample_size = np.where(crit_flg,
+                               (o_c * (low_bound**2) + (1-o_c) * (high_bound**2)) / e_z_sqr,
+                               (o_c * low_bound + (1-o_c) * high_bound) / e_z)
+
+    return np.ceil(sample_size).astype(np.int64)
+
+
+def sequential_sample_size_array(p, p0, d, alpha, beta, alternative):
+    """
+    Расчёт средней длительности
+    последовательного одновыборочного теста для массивов значений,
+    аналог sequential_sample_size
+
+    :param p: массив истинных значений вероятности,
+              отличающихся от p0 не более чем на d
+    :param p0: массив значений вероятности при гипотезе
+    :param d: массив абсолютных значений MDE
+    :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+    :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
+    :param alternative: наименование альтернативы
+    :return: массив средних длительностей теста
+    """
+    p0 = np.asarray(p0)
+    d = np.asarray(d)
+
+    if alternative == "less":
+        p_low = p0 - np.abs(d)
+        p_high = p0
+        return one_sided_sequential_sample_size_array(p, p_low, p_high, alpha, beta)
+    elif alternative == "greater":
+        p_low = p0
+        p_high = p0 + np.abs(d)
+        return one_sided_sequential_sample_size_array(p, p_low, p_high, beta, alpha)
+    else:
+        raise ValueError(f"Неправильная альтернатива: {alternative}")
+
+
+def max_one_sided_sequential_sample_size_array(p_low, p_high, alpha_low, alpha_high):
+    """
+    Расчёт максимального значения средней длительности
+    последовательного одновыборочного теста
+    при односторонней альтернативе для массивов значений,
+    аналог max_one_sided_sequential_sample_size
+
+    Максимум по h ищется методом золотого сечения на отрезке [-1, 1]
+    одновременно для всех значений: функция на отрезке унимодальна
+
+    :param p_low: массив нижних порогов вероятности
+    :param p_high: массив верхних порогов вероятности
+    :param alpha_low: вероятность пересечения нижней границы
+                      при справедливости p = p_high
+    :param alpha_high: вероятность пересечения нижней границы
+                       при справедливости p = p_low
+    :return: [массив средних длительностей теста, массив значений p]
+    """
+    p_low, p_high, alpha_low, alpha_high = np.broadcast_arrays(
+        *map(np.asarray, (p_low, p_high, alpha_low, alpha_high))
+    )
+
+    low_bound = np.log(alpha_low / (1 - alpha_high))
+    high_bound = np.log((1 - alpha_low) / alpha_high)
+
+    log_high = np.log(p_high / p_low)
+    log_low = np.log((1-p_high) / (1-p_low))
+
+    def f(a, b, h):
+        return (np.exp(a*h) - np.exp(b*h)) / (a * (1 - np.exp(b*h)) + b * (np.exp(a*h) - 1))
+
+    def helper(h):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            value = -f(log_high, log_low, h) / f(high_bound, low_bound, h)
+        return np.where(np.abs(h) < 1e-8, -low_bound * high_bound / (log_high * log_low), value)
+
+    # Метод золотого сечения: на каждой итерации вычисляется одна новая точка
+    ratio = (np.sqrt(5) - 1) / 2
+    a = np.full(p_low.shape, -1.)
+    b = np.full(p_low.shape, 1.)
+    c = b - ratio * (b - a)
+    e = a + ratio * (b - a)
+    f_c = helper(c)
+    f_e = helper(e)
+
+    for _ in range(GOLDEN_MAX_ITER):
+        # Минимум на [a, e], если f(c) < f(e), иначе на [c, b]
+        left_flg = f_c < f_e
+        a, b = np.where(left_flg, a, c), np.where(left_flg, e, b)
+        h_new = np.where(left_flg, b - ratio * (b - a), a + ratio * (b - a))
+        f_new = helper(h_new)
+        c, e, f_c, f_e = np.where(left_flg, h_new, e), np.where(left_flg, c, h_new), \
+            np.where(left_flg, f_new, f_e), np.where(left_flg, f_c, f_new)
+
+    h = (a + b) / 2
+    p = np.where(np.abs(h) < 1e-8, p_critical(p_low, p_high), prob_array(h, p_low, p_high))
+    return np.ceil(-helper(h)).astype(np.int64), p
+
+
+def max_sequential_sample_size_array(p0, d, alpha, beta, alternative):
+    """
+    Расчёт максимального значения средней длительности
+    последовательного одновыборочного теста для массивов значений,
+    аналог max_sequential_sample_size
+
+    :param p0: массив значений вероятности при гипотезе
+    :param d: массив абсолютных значений MDE
+    :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+    :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
+    :param alternative: наименование альтернативы
+    :return: [массив средних длительностей теста, массив значений p]
+    """
+    p0 = np.asarray(p0)
+    d = np.asarray(d)
+
+    if alternative == "less":
+        p_low = p0 - np.abs(d)
+        p_high = p0
+        return max_one_sided_sequential_sample_size_array(p_low, p_high, alpha, beta)
+    elif alternative == "greater":
+        p_low = p0
+        p_high = p0 + np.abs(d)
+        return max_one_sided_sequential_sample_size_array(p_low, p_high, beta, alpha)
+    else:
+        raise ValueError(f"Неправильная альтернатива: {alternative}")
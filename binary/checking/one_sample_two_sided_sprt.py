@@ -1,14 +1,18 @@
 import numpy as np
 from collections.abc import Iterable
 
-from .simulation_curve import one_sample_curve
+from .dtype_policy import get_count_dtype
+from .kernel_backend import numba_one_sample_two_sided_sprt, resolve_kernel_backend
+from .profiling import profile_mark
+from .simulation_curve import get_truncation_index, one_sample_curve
 from .tools import get_duration_from_bound_crossing, get_value_at_duration
 
 
 def one_sample_two_sided_sprt(x, p0, d, alpha, beta,
                               greater_initial_curve=None, less_initial_curve=None,
                               greater_stop_flg=None, less_stop_flg=None,
-                              n_list=None):
+                              n_list=None, s_list=None, narrow_dtype=False, look_list=None,
+                              max_sample_size=None, truncation_rule="curve", kernel_backend=None):
     """
     Последовательный анализ в случае одновыборочной задачи
     и двусторонней альтернативы
@@ -35,6 +39,23 @@ def one_sample_two_sided_sprt(x, p0, d, alpha, beta,
     :param less_stop_flg: список длины iter_size из флагов того,
                           что в конкретном тесте проверка гипотезы p0 - d против p0 приостановлена
     :param n_list: массив значений прошедшей длительности
+    :param s_list: заранее рассчитанный массив накопленных сумм S(n),
+                   если задан, то x не используется
+    :param narrow_dtype: флаг использования узких типов данных:
+                         накопленные суммы в int32, кривая в float32,
+                         если это позволяет величина границ
+    :param look_list: возрастающий список длительностей в моменты просмотров,
+                      если задан, то столбцы s_list - значения S(n) в моменты просмотров,
+                      пересечение границ проверяется только в них,
+                      а n_list по умолчанию равен look_list
+    :param max_sample_size: максимальная длительность теста от начала выборки,
+                            в которую тест усекается с решением по правилу truncation_rule,
+                            None - тест не усекается
+    :param truncation_rule: правило принятия решения при усечении из TRUNCATION_RULES
+    :param kernel_backend: вычислительный бэкенд из KERNEL_BACKENDS: numpy - матрицы батча,
+                           numba - построчный цикл с ранней остановкой и тем же результатом,
+                           флаги остановки законченных тестов учитывают пересечения только до остановки,
+                           None - выбранный get_kernel_backend
     :return: словарь res
              res["duration"] - список длительностей теста
              res["result"] - список результатов теста
@@ -47,12 +68,10 @@ def one_sample_two_sided_sprt(x, p0, d, alpha, beta,
                                    проверка гипотезы p0 против p0 + d приостановлена
              res["less_stop"] - список флагов того, что в конкретном тесте
                                 проверка гипотезы p0 - d против p0 приостановлена
+             res["look_duration"] - список количеств просмотров до остановки теста,
+                                    только если задан look_list
     """
 
-    # Расчёт накопленной суммы S(n) из X(i), i <= n
-    x = np.array(x)
-    s_list = np.cumsum(x, axis=1)
-
     # Определение MDE для односторонних альтернатив
     if isinstance(d, Iterable):
         d_low = d[0]
@@ -61,6 +80,26 @@ def one_sample_two_sided_sprt(x, p0, d, alpha, beta,
         d_low = np.abs(d)
         d_high = np.abs(d)
 
+    if resolve_kernel_backend(kernel_backend) == "numba":
+        return numba_one_sample_two_sided_sprt(x, p0, d_low, d_high, alpha, beta,
+                                               greater_initial_curve=greater_initial_curve,
+                                               less_initial_curve=less_initial_curve,
+                                               greater_stop_flg=greater_stop_flg, less_stop_flg=less_stop_flg,
+                                               n_list=n_list, s_list=s_list, look_list=look_list,
+                                               max_sample_size=max_sample_size, truncation_rule=truncation_rule)
+
+    # Расчёт накопленной суммы S(n) из X(i), i <= n
+    if s_list is None:
+        x = np.asarray(x)
+        s_list = np.cumsum(x, axis=1, dtype=get_count_dtype(narrow_dtype))
+    profile_mark("cumsum")
+
+    if look_list is not None and n_list is None:
+        n_list = np.asarray(look_list)
+
+    # Номер столбца, в котором тест усекается
+    truncation_index = get_truncation_index(max_sample_size, s_list.shape[1], look_list)
+
     # Получение логарифмического отношения правдоподобий
     # и границ для принятия решений
     res = one_sample_curve(s_list=s_list,
@@ -69,10 +108,15 @@ def one_sample_two_sided_sprt(x, p0, d, alpha, beta,
                            alpha=alpha/2,
                            beta=beta,
                            alternative="greater",
-                           n_list=n_list)
-    greater_curve = res["curve"]
-    greater_low_bound = res["low_bound"]
-    greater_high_bound = res["high_bound"]
+                           n_list=n_list,
+                           initial_curve=greater_initial_curve,
+                           narrow_dtype=narrow_dtype,
+                           truncation_index=truncation_index,
+                           truncation_rule=truncation_rule)
+    greater_high_bound_crossing_flg = res["high_bound_crossing"]
+    greater_low_bound_crossing_flg = res["low_bound_crossing"]
+    greater_last_curve = res["last_curve"]
+    del res
 
     res = one_sample_curve(s_list=s_list,
                            p0=p0,
@@ -80,26 +124,18 @@ def one_sample_two_sided_sprt(x, p0, d, alpha, beta,
                            alpha=alpha/2,
                            beta=beta,
                            alternative="less",
-                           n_list=n_list)
-    less_curve = res["curve"]
-    less_low_bound = res["low_bound"]
-    less_high_bound = res["high_bound"]
-
-    # Если заданы значения кривой,
-    # корректируем логарифмическое отношение правдоподобий
-    if greater_initial_curve is not None:
-        greater_curve += greater_initial_curve.reshape(-1, 1)
-
-    if less_initial_curve is not None:
-        less_curve += less_initial_curve.reshape(-1, 1)
+                           n_list=n_list,
+                           initial_curve=less_initial_curve,
+                           narrow_dtype=narrow_dtype,
+                           truncation_index=truncation_index,
+                           truncation_rule=truncation_rule)
+    less_high_bound_crossing_flg = res["high_bound_crossing"]
+    less_low_bound_crossing_flg = res["low_bound_crossing"]
+    less_last_curve = res["last_curve"]
+    del res
 
     # Расчёт индикаторов пересечения границ
-    greater_high_bound_crossing_flg = greater_curve > greater_high_bound
-    greater_low_bound_crossing_flg = greater_curve < greater_low_bound
     greater_bound_crossing_flg = greater_high_bound_crossing_flg | greater_low_bound_crossing_flg
-
-    less_high_bound_crossing_flg = less_curve > less_high_bound
-    less_low_bound_crossing_flg = less_curve < less_low_bound
     less_bound_crossing_flg = less_high_bound_crossing_flg | less_low_bound_crossing_flg
 
     # Определение длительности теста
@@ -141,7 +177,7 @@ def one_sample_two_sided_sprt(x, p0, d, alpha, beta,
 
     # Определяем значения длительности и результата теста по-дефолту
     # как в случае, если тест ещё не завершён
-    duration_list = x.shape[1]
+    duration_list = s_list.shape[1]
     result_list = 0
 
     # Случай, когда длительность проверки гипотезы p0 против p0 + d
@@ -220,12 +256,20 @@ def one_sample_two_sided_sprt(x, p0, d, alpha, beta,
     result_s_list = get_value_at_duration(value_list=s_list,
                                           duration_list=duration_list)
 
-    return {
+    res = {
         "duration": duration_list,
         "result": result_list,
         "result_s": result_s_list,
-        "greater_last_curve": greater_curve[:, -1],
-        "less_last_curve": less_curve[:, -1],
+        "greater_last_curve": greater_last_curve,
+        "less_last_curve": less_last_curve,
         "greater_stop": greater_stop_flg,
         "less_stop": less_stop_flg
     }
+
+    # Переход от номеров просмотров к длительностям
+    if look_list is not None:
+        res["look_duration"] = duration_list
+        res["duration"] = np.asarray(look_list)[duration_list - 1]
+
+    profile_mark("crossing")
+    return res
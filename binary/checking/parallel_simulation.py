@@ -0,0 +1,266 @@
+import ctypes
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .counter_rng import CounterRandomState
+from .simulation_summary import SimulationSummary
+
+
+# Количество тестов в одной части моделирования по умолчанию,
+# разбиение на части не зависит от количества потоков,
+# поэтому результат воспроизводим при любом их количестве
+DEFAULT_CHUNK_SIZE = 10_000
+
+
+def split_iter_size(iter_size, chunk_size=None):
+    """
+    Разбиение количества тестов на части фиксированного размера
+
+    :param iter_size: количество параллельных тестов в моделировании
+    :param chunk_size: количество тестов в одной части,
+                       None - DEFAULT_CHUNK_SIZE
+    :return: список количеств тестов в частях
+    """
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    chunk_cnt, last_chunk_size = divmod(iter_size, chunk_size)
+    chunk_size_list = chunk_cnt * [chunk_size] + ([last_chunk_size] if last_chunk_size > 0 else [])
+    return chunk_size_list or [iter_size]
+
+
+def spawn_random_states(random_state, chunk_cnt):
+    """
+    Независимые генераторы случайных чисел для частей моделирования,
+    порождённые из одного SeedSequence
+
+    :param random_state: seed или np.random.SeedSequence
+    :param chunk_cnt: количество частей моделирования
+    :return: список генераторов np.random.Generator
+    """
+    if not isinstance(random_state, np.random.SeedSequence):
+        random_state = np.random.SeedSequence(random_state)
+    return [np.random.default_rng(seed_seq) for seed_seq in random_state.spawn(chunk_cnt)]
+
+
+def shift_test_index(res, offset):
+    """
+    Перевод номеров тестов части в номера тестов всего моделирования:
+    часть нумерует свои тесты с нуля
+
+    :param res: словарь результатов или массив записей части с полем test_index,
+                накопитель SimulationSummary не меняется
+    :param offset: номер первого теста части
+    :return: тот же результат
+    """
+    if isinstance(res, dict):
+        res["test_index"] = res["test_index"] + offset
+    elif isinstance(res, np.ndarray) and "test_index" in (res.dtype.names or ()):
+        res["test_index"] += offset
+    return res
+
+
+def merge_simulation_results(res_list):
+    """
+    Объединение результатов частей моделирования в порядке частей
+
+    :param res_list: список словарей результатов моделирования
+                     или накопителей SimulationSummary
+    :return: словарь res с теми же ключами из объединённых списков
+             или объединённый накопитель SimulationSummary
+    """
+    if isinstance(res_list[0], SimulationSummary):
+        summary = SimulationSummary(res_list[0].bin_width, res_list[0].relative_accuracy, res_list[0].bin_cnt)
+        for res in res_list:
+            summary.merge(res)
+        return summary
+
+    return {
+        key: np.concatenate([res[key] for res in res_list])
+        for key in res_list[0]
+    }
+
+
+def threaded_simulation(simulation, iter_size, random_state=None, n_jobs=None, chunk_size=None, records=None,
+                        **kwargs):
+    """
+    Моделирование последовательного анализа в пуле потоков
+
+    Тесты разбиваются на части по chunk_size,
+    каждая часть моделируется в отдельном потоке со своим генератором,
+    порождённым из одного SeedSequence.
+    Тяжёлые операции numpy отпускают GIL, поэтому потоки
+    занимают все ядра, а результат не зависит от количества потоков.
+    Генератор на основе счётчика не порождает новые генераторы,
+    а сдвигается на номер первого теста части, поэтому результат
+    не зависит и от размера частей
+
+    :param simulation: функция моделирования с параметрами iter_size и random_state
+    :param iter_size: количество параллельных тестов в моделировании
+    :param random_state: seed, np.random.SeedSequence или CounterRandomState
+    :param n_jobs: количество потоков, None - количество ядер
+    :param chunk_size: количество тестов в одной части,
+                       None - DEFAULT_CHUNK_SIZE
+    :param records: структурный массив записей размера iter_size,
+                    если задан, то каждая часть пишет в свой срез массива
+    :param kwargs: остальные параметры функции моделирования
+    :return: объединённый словарь результатов моделирования
+             или массив записей records
+    """
+    chunk_size_list = split_iter_size(iter_size, chunk_size)
+    offset_list = np.cumsum([0] + chunk_size_list[:-1])
+    if isinstance(random_state, CounterRandomState):
+        random_state_list = [random_state.shift(int(offset)) for offset in offset_list]
+    else:
+        random_state_list = spawn_random_states(random_state, len(chunk_size_list))
+
+    def simulate_chunk(chunk_index):
+        chunk_kwargs = dict(kwargs)
+        if records is not None:
+            offset = offset_list[chunk_index]
+            chunk_kwargs["records"] = records[offset:offset + chunk_size_list[chunk_index]]
+        res = simulation(iter_size=chunk_size_list[chunk_index],
+                         random_state=random_state_list[chunk_index],
+                         **chunk_kwargs)
+        return shift_test_index(res, int(offset_list[chunk_index]))
+
+    with ThreadPoolExecutor(max_workers=n_jobs or os.cpu_count()) as executor:
+        res_list = list(executor.map(simulate_chunk, range(len(chunk_size_list))))
+
+    if records is not None:
+        return records
+
+    return merge_simulation_results(res_list)
+
+
+class SharedMemoryBuffer(object):
+    """
+    Владелец блока разделяемой памяти,
+    на который смотрит массив numpy без копирования
+
+    Массив хранит ссылку на этот объект,
+    поэтому блок освобождается только вместе с последним массивом
+    """
+
+    def __init__(self, shm, dtype, size):
+        """
+        :param shm: блок разделяемой памяти
+        :param dtype: тип значений массива
+        :param size: количество значений массива
+        """
+        self.shm = shm
+
+        # Адрес начала блока, временный объект ctypes сразу удаляется,
+        # чтобы не удерживать экспорт буфера блока
+        pointer = ctypes.c_char.from_buffer(shm.buf)
+        address = ctypes.addressof(pointer)
+        del pointer
+
+        self.__array_interface__ = {
+            "shape": (size,),
+            "typestr": np.dtype(dtype).str,
+            "data": (address, False),
+            "version": 3
+        }
+
+
+def simulate_chunk_to_shared_memory(simulation, shm_name_dict, result_fields, total_size,
+                                    offset, iter_size, random_state, kwargs):
+    """
+    Моделирование одной части тестов в процессе-исполнителе
+    с записью результатов в разделяемую память по смещению offset
+
+    :param simulation: функция моделирования с параметрами iter_size и random_state
+    :param shm_name_dict: словарь имён блоков разделяемой памяти для каждого поля результата
+    :param result_fields: словарь типов полей результата моделирования
+    :param total_size: общее количество тестов в моделировании
+    :param offset: смещение части в массивах результата
+    :param iter_size: количество тестов в части
+    :param random_state: np.random.SeedSequence или CounterRandomState части
+    :param kwargs: остальные параметры функции моделирования
+    :return: результат части, если поля результата не заданы
+    """
+    if not isinstance(random_state, CounterRandomState):
+        random_state = np.random.default_rng(random_state)
+    res = shift_test_index(simulation(iter_size=iter_size,
+                                      random_state=random_state,
+                                      **kwargs), offset)
+
+    # Сводная статистика имеет постоянный размер и возвращается целиком
+    if result_fields is None:
+        return res
+
+    for key, dtype in result_fields.items():
+        shm = shared_memory.SharedMemory(name=shm_name_dict[key])
+        value_list = np.ndarray((total_size,), dtype=dtype, buffer=shm.buf)
+        value_list[offset:offset + iter_size] = res[key]
+        del value_list
+        shm.close()
+
+
+def process_simulation(simulation, iter_size, result_fields, random_state=None, n_jobs=None, chunk_size=None,
+                       **kwargs):
+    """
+    Моделирование последовательного анализа в пуле процессов
+    с записью результатов в разделяемую память
+
+    Тесты разбиваются на части по chunk_size так же, как в threaded_simulation,
+    с теми же генераторами, поэтому результаты двух режимов совпадают.
+    Каждый процесс записывает результаты своей части
+    в заранее выделенные массивы разделяемой памяти по своему смещению,
+    списки результатов между процессами не передаются
+
+    :param simulation: функция моделирования с параметрами iter_size и random_state,
+                       определённая на уровне модуля
+    :param iter_size: количество параллельных тестов в моделировании
+    :param result_fields: словарь типов полей результата моделирования,
+                          None - результаты частей постоянного размера
+                          (SimulationSummary) возвращаются из процессов и объединяются
+    :param random_state: seed, np.random.SeedSequence или CounterRandomState
+    :param n_jobs: количество процессов, None - количество ядер
+    :param chunk_size: количество тестов в одной части,
+                       None - DEFAULT_CHUNK_SIZE
+    :param kwargs: остальные параметры функции моделирования
+    :return: словарь результатов моделирования из массивов,
+             смотрящих на разделяемую память без копирования,
+             или объединённый результат, если поля результата не заданы
+    """
+    chunk_size_list = split_iter_size(iter_size, chunk_size)
+    offset_list = np.cumsum([0] + chunk_size_list[:-1])
+    if isinstance(random_state, CounterRandomState):
+        random_state_list = [random_state.shift(int(offset)) for offset in offset_list]
+    else:
+        if not isinstance(random_state, np.random.SeedSequence):
+            random_state = np.random.SeedSequence(random_state)
+        random_state_list = random_state.spawn(len(chunk_size_list))
+
+    # Выделение разделяемой памяти под каждое поле результата
+    shm_dict = {
+        key: shared_memory.SharedMemory(create=True, size=max(1, iter_size * np.dtype(dtype).itemsize))
+        for key, dtype in (result_fields or {}).items()
+    }
+    shm_name_dict = {key: shm.name for key, shm in shm_dict.items()}
+
+    try:
+        with ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count()) as executor:
+            future_list = [
+                executor.submit(simulate_chunk_to_shared_memory, simulation, shm_name_dict, result_fields,
+                                iter_size, int(offset), chunk_iter_size, chunk_random_state, kwargs)
+                for offset, chunk_iter_size, chunk_random_state in zip(offset_list,
+                                                                       chunk_size_list,
+                                                                       random_state_list)
+            ]
+            res_list = [future.result() for future in future_list]
+    finally:
+        # Имена блоков больше не нужны, память освободится вместе с массивами
+        for shm in shm_dict.values():
+            shm.unlink()
+
+    if result_fields is None:
+        return merge_simulation_results(res_list)
+
+    return {
+        key: np.asarray(SharedMemoryBuffer(shm_dict[key], dtype, iter_size))
+        for key, dtype in result_fields.items()
+    }
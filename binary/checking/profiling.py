@@ -0,0 +1,249 @@
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+# Стадии раунда моделирования в порядке отчёта:
+# sample - розыгрыш выборки,
+# cumsum - накопленные суммы,
+# curve - кривая логарифмического отношения правдоподобий,
+# crossing - пересечение границ и результаты тестов на момент длительности,
+# kernel - остальная работа функции последовательного анализа,
+# bookkeeping - учёт законченных и незаконченных тестов,
+# checkpoint - сохранение контрольной точки
+PROFILE_STAGES = ("sample", "cumsum", "curve", "crossing", "kernel", "bookkeeping", "checkpoint")
+
+# Состояние текущего раунда в потоке моделирования
+_local = threading.local()
+
+
+def profile_mark(stage):
+    """
+    Отметка окончания стадии раунда: время с предыдущей отметки
+    относится к стадии stage, если в потоке идёт профилируемый раунд,
+    иначе ничего не делает
+
+    :param stage: наименование стадии из PROFILE_STAGES
+    """
+    profiler = getattr(_local, "profiler", None)
+    if profiler is not None:
+        profiler.mark(stage)
+
+
+@contextmanager
+def profile_run(profiler):
+    """
+    Прогон моделирования с профилировщиком: время прогона входит в сводку,
+    а трассировка памяти, запущенная профилировщиком, останавливается в конце прогона.
+    Прогоны частей в пуле потоков вложены во внешний прогон и отдельно не учитываются
+
+    :param profiler: профилировщик SimulationProfiler или None
+    """
+    if profiler is None:
+        yield
+        return
+
+    profiler.start_run()
+    try:
+        yield
+    finally:
+        profiler.end_run()
+
+
+class SimulationProfiler(object):
+    """
+    Профилирование раундов моделирования
+
+    Моделирование сообщает о начале и окончании каждого раунда (батча),
+    а стадии внутри раунда отмечаются функцией profile_mark в моделировании
+    и в функциях последовательного анализа. Профилировщик можно передать
+    в моделирование в пуле потоков, тогда раунды частей записываются вперемешку,
+    а объём выделенной памяти общий для всех потоков
+    """
+
+    def __init__(self, callback=None, trace_memory=False):
+        """
+        :param callback: функция callback(round_info), вызываемая после каждого раунда
+                         со словарём раунда, как в rounds
+        :param trace_memory: флаг измерения объёма памяти, выделенной за раунд,
+                             через tracemalloc: трассировка запускается в первом раунде,
+                             если она ещё не запущена, и останавливается в конце прогона
+                             моделирования или методом stop
+        """
+        self.callback = callback
+        self.trace_memory = trace_memory
+        self.tracing_started = False
+        self.rounds = []
+        self.lock = threading.Lock()
+
+        # Глубина вложенности текущего прогона, время его начала
+        # и суммарное время законченных прогонов
+        self.run_depth = 0
+        self.run_start_time = None
+        self.elapsed_time = 0.0
+
+    def start_run(self):
+        """
+        Начало прогона моделирования
+        """
+        with self.lock:
+            if self.run_depth == 0:
+                self.run_start_time = time.perf_counter()
+            self.run_depth += 1
+
+    def end_run(self):
+        """
+        Окончание прогона моделирования: после внешнего прогона
+        его время добавляется в сводку, а трассировка памяти останавливается
+        """
+        with self.lock:
+            self.run_depth -= 1
+            if self.run_depth > 0:
+                return
+            self.elapsed_time += time.perf_counter() - self.run_start_time
+        self.stop()
+
+    def start_round(self, remain_iter_cnt, batch_size):
+        """
+        Начало раунда моделирования
+
+        :param remain_iter_cnt: количество незаконченных тестов
+        :param batch_size: размер батча (количество просмотров при расписании просмотров)
+        """
+        start_memory = None
+        if self.trace_memory:
+            with self.lock:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    self.tracing_started = True
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+
+        _local.profiler = self
+        _local.round_info = {
+            "remain_iter_cnt": int(remain_iter_cnt),
+            "batch_shape": (int(remain_iter_cnt), int(batch_size)),
+            "stage_time": dict.fromkeys(PROFILE_STAGES, 0.0),
+            "allocated_bytes": start_memory
+        }
+        _local.start_time = _local.mark_time = time.perf_counter()
+
+    def mark(self, stage):
+        """
+        Отметка окончания стадии текущего раунда
+
+        :param stage: наименование стадии из PROFILE_STAGES
+        """
+        mark_time = time.perf_counter()
+        _local.round_info["stage_time"][stage] += mark_time - _local.mark_time
+        _local.mark_time = mark_time
+
+    def end_round(self, observation_cnt):
+        """
+        Окончание раунда моделирования
+
+        :param observation_cnt: количество разыгранных за раунд наблюдений
+        :return: словарь раунда, как в rounds
+        """
+        wall_time = time.perf_counter() - _local.start_time
+        round_info = _local.round_info
+        _local.profiler = None
+
+        if round_info["allocated_bytes"] is not None:
+            round_info["allocated_bytes"] = max(0, tracemalloc.get_traced_memory()[1] - round_info["allocated_bytes"])
+        round_info["wall_time"] = wall_time
+        round_info["observation_cnt"] = int(observation_cnt)
+        round_info["throughput"] = observation_cnt / wall_time if wall_time > 0 else float("inf")
+
+        with self.lock:
+            round_info["round"] = len(self.rounds)
+            self.rounds.append(round_info)
+
+        if self.callback is not None:
+            self.callback(round_info)
+
+        return round_info
+
+    def stop(self):
+        """
+        Остановка трассировки памяти, если её запустил профилировщик
+        """
+        if self.tracing_started:
+            tracemalloc.stop()
+            self.tracing_started = False
+
+    def summary(self):
+        """
+        Сводка по всем раундам
+
+        :return: словарь res
+                 res["round_cnt"] - количество раундов
+                 res["wall_time"] - суммарное время раундов в секундах
+                 res["elapsed_time"] - время прогонов моделирования в секундах:
+                                       в пуле потоков раунды идут одновременно,
+                                       поэтому оно меньше суммарного времени раундов,
+                                       0 - раунды записаны вне прогона
+                 res["observation_cnt"] - количество разыгранных наблюдений
+                 res["throughput"] - количество наблюдений в секунду времени прогонов,
+                                     а если его нет, то суммарного времени раундов
+                 res["stage_time"] - словарь суммарных времён стадий в секундах
+                 res["max_allocated_bytes"] - наибольший объём памяти, выделенной за раунд,
+                                              None - память не измерялась
+        """
+        with self.lock:
+            round_list = list(self.rounds)
+            elapsed_time = self.elapsed_time
+
+        wall_time = sum(round_info["wall_time"] for round_info in round_list)
+        observation_cnt = sum(round_info["observation_cnt"] for round_info in round_list)
+        throughput_time = elapsed_time if elapsed_time > 0 else wall_time
+        allocated_list = [round_info["allocated_bytes"] for round_info in round_list
+                          if round_info["allocated_bytes"] is not None]
+
+        return {
+            "round_cnt": len(round_list),
+            "wall_time": wall_time,
+            "elapsed_time": elapsed_time,
+            "observation_cnt": observation_cnt,
+            "throughput": observation_cnt / throughput_time if throughput_time > 0 else float("inf"),
+            "stage_time": {stage: sum(round_info["stage_time"][stage] for round_info in round_list)
+                           for stage in PROFILE_STAGES},
+            "max_allocated_bytes": max(allocated_list) if len(allocated_list) > 0 else None
+        }
+
+    def report(self, per_round=False):
+        """
+        Текстовый отчёт по раундам моделирования
+
+        :param per_round: флаг вывода строки по каждому раунду
+        :return: строка отчёта
+        """
+        res = self.summary()
+        wall_time = res["wall_time"]
+
+        line_list = [f"Раундов: {res['round_cnt']}, время: {wall_time:.4f} с, "
+                     f"время прогона: {res['elapsed_time']:.4f} с, "
+                     f"наблюдений: {res['observation_cnt']}, "
+                     f"скорость: {res['throughput']:.4g} набл./с"]
+        if res["max_allocated_bytes"] is not None:
+            line_list.append(f"Наибольший объём памяти, выделенной за раунд: {res['max_allocated_bytes']} байт")
+
+        line_list.append(f"{'стадия':<12}{'время, с':>12}{'доля':>8}")
+        for stage, stage_time in res["stage_time"].items():
+            share = stage_time / wall_time if wall_time > 0 else 0
+            line_list.append(f"{stage:<12}{stage_time:>12.4f}{share:>8.1%}")
+
+        if per_round:
+            line_list.append(f"{'раунд':>6}{'тестов':>10}{'батч':>16}{'время, с':>12}"
+                             f"{'набл./с':>12}{'память, байт':>14}")
+            with self.lock:
+                round_list = list(self.rounds)
+            for round_info in round_list:
+                batch_desc = "x".join(map(str, round_info["batch_shape"]))
+                allocated_desc = "-" if round_info["allocated_bytes"] is None else round_info["allocated_bytes"]
+                line_list.append(f"{round_info['round']:>6}{round_info['remain_iter_cnt']:>10}{batch_desc:>16}"
+                                 f"{round_info['wall_time']:>12.4f}{round_info['throughput']:>12.4g}"
+                                 f"{allocated_desc:>14}")
+
+        return "\n".join(line_list)
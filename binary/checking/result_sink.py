@@ -0,0 +1,117 @@
+import os
+import tempfile
+
+import numpy as np
+
+
+# Размер массива записей в байтах, начиная с которого
+# он хранится в файле на диске, а не в оперативной памяти
+MEMMAP_THRESHOLD = 1 << 30
+
+
+def get_record_dtype(result_fields):
+    """
+    Структурный тип записи о законченном тесте
+
+    :param result_fields: словарь типов полей результата моделирования
+    :return: np.dtype с полями в порядке result_fields
+    """
+    return np.dtype([(key, dtype) for key, dtype in result_fields.items()])
+
+
+def allocate_records(iter_size, record_dtype, path=None, memmap_threshold=MEMMAP_THRESHOLD):
+    """
+    Выделение массива записей о законченных тестах
+
+    Если задан путь или размер массива превышает memmap_threshold,
+    то массив отображается на файл .npy через np.memmap
+    и подгружается с диска по мере обращения
+
+    :param iter_size: количество тестов
+    :param record_dtype: структурный тип записи
+    :param path: путь к файлу .npy, None - временный файл,
+                 который удаляется вместе с отображением
+    :param memmap_threshold: размер массива в байтах для перехода на файл
+    :return: структурный массив или np.memmap размера iter_size
+    """
+    if path is None and iter_size * record_dtype.itemsize <= memmap_threshold:
+        return np.empty(iter_size, dtype=record_dtype)
+
+    if path is not None:
+        return np.lib.format.open_memmap(path, mode="w+", dtype=record_dtype, shape=(iter_size,))
+
+    # Временный файл удаляется сразу: данные доступны, пока жив массив
+    fd, path = tempfile.mkstemp(suffix=".npy")
+    os.close(fd)
+    try:
+        return np.lib.format.open_memmap(path, mode="w+", dtype=record_dtype, shape=(iter_size,))
+    finally:
+        os.remove(path)
+
+
+def check_records(records, iter_size, record_dtype):
+    """
+    Проверка заранее выделенного массива записей
+
+    :param records: структурный массив записей
+    :param iter_size: количество тестов
+    :param record_dtype: структурный тип записи
+    :return: тот же массив records
+    """
+    if records.dtype != record_dtype or records.shape != (iter_size,):
+        raise ValueError(f"Неправильный массив записей: {records.dtype}, {records.shape}")
+    return records
+
+
+def load_records(path):
+    """
+    Ленивая загрузка массива записей, сохранённого моделированием
+
+    :param path: путь к файлу .npy
+    :return: np.memmap только для чтения
+    """
+    return np.load(path, mmap_mode="r")
+
+
+class ResultSink(object):
+    """
+    Приёмник характеристик законченных тестов
+
+    Характеристики записываются построчно в заранее выделенный
+    структурный массив, без промежуточных списков объектов Python
+    """
+
+    def __init__(self, iter_size, record_dtype, records=True, resume=False):
+        """
+        :param iter_size: количество тестов
+        :param record_dtype: структурный тип записи
+        :param records: заранее выделенный массив записей размера iter_size,
+                        путь к файлу .npy для отображения массива
+                        или True - массив выделяется через allocate_records
+        :param resume: флаг продолжения с контрольной точки:
+                       существующий файл .npy открывается без перезаписи
+        """
+        # Путь к файлу .npy, на который отображаются записи
+        self.path = None
+        if isinstance(records, np.ndarray):
+            self.records = check_records(records, iter_size, record_dtype)
+        elif isinstance(records, (str, os.PathLike)):
+            self.path = os.fspath(records)
+            if resume and os.path.exists(self.path):
+                self.records = check_records(np.load(self.path, mmap_mode="r+"), iter_size, record_dtype)
+            else:
+                self.records = allocate_records(iter_size, record_dtype, self.path)
+        else:
+            self.records = allocate_records(iter_size, record_dtype)
+        self.size = 0
+
+    def write(self, **value_lists):
+        """
+        Запись законченных тестов в следующие строки массива
+
+        :param value_lists: списки значений для каждого поля записи
+        """
+        row_cnt = len(next(iter(value_lists.values())))
+        for key, value_list in value_lists.items():
+            self.records[key][self.size:self.size + row_cnt] = value_list
+        self.size += row_cnt
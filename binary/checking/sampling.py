@@ -0,0 +1,162 @@
+import numpy as np
+
+from .bit_packing import WORD_DTYPE, get_word_cnt, pack_bits
+from .counter_rng import CounterBatchRandomState
+from .dtype_policy import DRAW_BLOCK_SIZE
+
+
+def bernoulli_sample(p, size, dtype=None, random_state=None):
+    """
+    Розыгрыш выборки из распределения Бернулли
+
+    Если задан тип, то выборка разыгрывается блоками строк
+    сразу в массив этого типа, без int64 матрицы целиком.
+    Значения совпадают с bernoulli.rvs(p, size=size),
+    так как блоки строк разыгрываются последовательно
+
+    :param p: вероятность "успеха"
+    :param size: размер выборки [iter_size, sample_size]
+    :param dtype: тип значений выборки, None - тип по умолчанию
+    :param random_state: генератор случайных чисел np.random.Generator,
+                         генератор батча CounterBatchRandomState
+                         или None - глобальный генератор numpy
+    :return: массив размера size из значений {0, 1}
+    """
+    if isinstance(random_state, CounterBatchRandomState):
+        return random_state.bernoulli(p, size, dtype=dtype)
+
+    from scipy.stats import bernoulli
+
+    if dtype is None:
+        return bernoulli.rvs(p, size=size, random_state=random_state)
+
+    iter_size, sample_size = size
+    x = np.empty(size, dtype=dtype)
+
+    # Количество строк в одном блоке розыгрыша
+    block_iter_size = max(1, DRAW_BLOCK_SIZE // max(1, sample_size))
+
+    for start in range(0, iter_size, block_iter_size):
+        stop = min(start + block_iter_size, iter_size)
+        x[start:stop] = bernoulli.rvs(p, size=[stop - start, sample_size],
+                                       random_state=random_state)
+
+    return x
+
+
+def packed_bernoulli_sample(p, size, random_state=None):
+    """
+    Розыгрыш выборки из распределения Бернулли
+    сразу в упакованном виде по 64 значения в машинное слово
+
+    Выборка разыгрывается блоками строк, каждый блок сразу упаковывается,
+    поэтому распакованная матрица целиком не создаётся.
+    Значения совпадают с bernoulli.rvs(p, size=size),
+    а для генератора батча - с его розыгрышем целиком
+
+    :param p: вероятность "успеха"
+    :param size: размер выборки [iter_size, sample_size]
+    :param random_state: генератор случайных чисел np.random.Generator,
+                         генератор батча CounterBatchRandomState
+                         или None - глобальный генератор numpy
+    :return: массив размера [iter_size, ceil(sample_size / 64)] машинных слов
+    """
+    iter_size, sample_size = size
+    x_packed = np.empty([iter_size, get_word_cnt(sample_size)], dtype=WORD_DTYPE)
+
+    # Количество строк в одном блоке розыгрыша
+    block_iter_size = max(1, DRAW_BLOCK_SIZE // max(1, sample_size))
+
+    if isinstance(random_state, CounterBatchRandomState):
+        if iter_size != len(random_state.test_index):
+            raise ValueError(f"Неправильный размер розыгрыша: {size}")
+        block_random_state_list = random_state.split_rows(block_iter_size)
+        for start, block_random_state in zip(range(0, iter_size, block_iter_size), block_random_state_list):
+            stop = min(start + block_iter_size, iter_size)
+            x_packed[start:stop] = pack_bits(block_random_state.bernoulli(p, [stop - start, sample_size],
+                                                                          dtype=np.uint8))
+        return x_packed
+
+    from scipy.stats import bernoulli
+
+    for start in range(0, iter_size, block_iter_size):
+        stop = min(start + block_iter_size, iter_size)
+        x_packed[start:stop] = pack_bits(bernoulli.rvs(p, size=[stop - start, sample_size],
+                                                       random_state=random_state))
+
+    return x_packed
+
+
+def look_sample(p, look_list, iter_size, dtype=None, random_state=None):
+    """
+    Розыгрыш накопленных сумм S(n) выборки из распределения Бернулли
+    только в моменты просмотров
+
+    Количество "успехов" между соседними просмотрами
+    имеет биномиальное распределение, поэтому отдельные значения выборки
+    не разыгрываются, а объём памяти пропорционален количеству просмотров
+
+    :param p: вероятность "успеха"
+    :param look_list: возрастающий список размеров выборки в моменты просмотров
+    :param iter_size: количество тестов
+    :param dtype: тип накопленных сумм, None - тип по умолчанию
+    :param random_state: генератор случайных чисел np.random.Generator,
+                         генератор батча CounterBatchRandomState
+                         или None - глобальный генератор numpy
+    :return: массив размера [iter_size, len(look_list)] накопленных сумм
+    """
+    random_state = np.random if random_state is None else random_state
+    look_step_list = np.diff(look_list, prepend=0)
+    return np.cumsum(random_state.binomial(look_step_list, p, size=[iter_size, len(look_list)]),
+                     axis=1, dtype=dtype)
+
+
+def discordant_look_sample(p_x, p_y, look_list, iter_size, dtype=None, random_state=None):
+    """
+    Розыгрыш накопленных сумм двух выборок и несовпадающих пар
+    только в моменты просмотров
+
+    Количества пар (1, 0), (0, 1) и (1, 1) между соседними просмотрами
+    имеют полиномиальное распределение и разыгрываются
+    последовательными биномиальными распределениями
+
+    :param p_x: вероятность "успеха" в первой выборке
+    :param p_y: вероятность "успеха" во второй выборке
+    :param look_list: возрастающий список количеств пар в моменты просмотров
+    :param iter_size: количество тестов
+    :param dtype: тип накопленных сумм, None - тип по умолчанию
+    :param random_state: генератор случайных чисел np.random.Generator,
+                         генератор батча CounterBatchRandomState
+                         или None - глобальный генератор numpy
+    :return: массивы размера [iter_size, len(look_list)] накопленных сумм
+             первой выборки, второй выборки, пар вида (1, 0) и несовпадающих пар
+    """
+    random_state = np.random if random_state is None else random_state
+    size = [iter_size, len(look_list)]
+    look_step_list = np.diff(look_list, prepend=0)
+
+    # Вероятности пар (1, 0), (0, 1) и (1, 1)
+    p_10 = p_x * (1 - p_y)
+    p_01 = (1 - p_x) * p_y
+    p_11 = p_x * p_y
+
+    cnt_10 = random_state.binomial(look_step_list, p_10, size=size)
+    cnt_01 = random_state.binomial(look_step_list - cnt_10, _conditional_prob(p_01, 1 - p_10))
+    cnt_11 = random_state.binomial(look_step_list - cnt_10 - cnt_01, _conditional_prob(p_11, 1 - p_10 - p_01))
+
+    x_s_list = np.cumsum(cnt_10 + cnt_11, axis=1, dtype=dtype)
+    y_s_list = np.cumsum(cnt_01 + cnt_11, axis=1, dtype=dtype)
+    s_list = np.cumsum(cnt_10, axis=1, dtype=dtype)
+    n_list = np.cumsum(cnt_10 + cnt_01, axis=1, dtype=dtype)
+
+    return x_s_list, y_s_list, s_list, n_list
+
+
+def _conditional_prob(p, remain_p):
+    """
+    Условная вероятность p / remain_p при последовательном розыгрыше,
+    0 - если оставшаяся масса нулевая (тогда все оставшиеся количества нулевые)
+    """
+    if remain_p <= 0:
+        return 0.0
+    return min(p / remain_p, 1.0)
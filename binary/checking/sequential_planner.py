@@ -0,0 +1,325 @@
+import numpy as np
+
+from binary.checking.tools import transform_two_sample_one_sided_mde
+from binary.checking.one_sample_sequential_sample_size import \
+    sequential_sample_size_array as one_sample_sequential_sample_size_array, \
+    max_sequential_sample_size_array as one_sample_max_sequential_sample_size_array
+from binary.checking.two_sample_sequential_sample_size import \
+    max_sequential_sample_size_array as two_sample_max_sequential_sample_size_array
+
+
+# Относительная точность найденного значения MDE или beta
+PLANNER_RTOL = 1e-4
+
+# Максимальное количество итераций поиска корня
+PLANNER_MAX_ITER = 100
+
+# Максимальное количество расширений начального отрезка
+PLANNER_MAX_EXPAND = 40
+
+# Начальная полуширина отрезка в логарифмической шкале
+# при начальном приближении по соседней точке сетки и без него
+WARM_LOG_WIDTH = 0.05
+COLD_LOG_WIDTH = 1.
+
+# Шаг опорных точек сетки, которые решаются без начального приближения
+WARM_STEP = 8
+
+# Значения beta, между которыми ищется минимальное beta
+PLANNER_MIN_BETA = 1e-8
+PLANNER_MAX_BETA = 0.5
+
+
+def sequential_durations(p0, d, alpha, beta, alternative, sample_cnt=1):
+    """
+    Средние длительности последовательного теста (размер одной выборки)
+    для массивов значений
+
+    Для двусторонней альтернативы тест состоит из двух односторонних
+    с уровнем значимости alpha / 2, и длительности оцениваются
+    как максимум длительностей односторонних тестов
+
+    :param p0: массив значений вероятности при гипотезе
+    :param d: массив абсолютных значений MDE
+    :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+    :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
+    :param alternative: наименование альтернативы: "less", "greater" или "two-sided"
+    :param sample_cnt: количество выборок: 1 или 2
+    :return: словарь res
+             res["hypothesis_duration"] - массив средних длительностей при p = p0
+             res["alternative_duration"] - массив средних длительностей при p = p0 +- d
+             res["max_duration"] - массив максимальных средних длительностей
+    """
+    if alternative == "two-sided":
+        less_res = sequential_durations(p0, d, alpha / 2, beta, "less", sample_cnt)
+        greater_res = sequential_durations(p0, d, alpha / 2, beta, "greater", sample_cnt)
+        return {
+            key: np.maximum(less_res[key], greater_res[key])
+            for key in less_res
+        }
+    elif alternative not in ("less", "greater"):
+        raise ValueError(f"Неправильная альтернатива: {alternative}")
+
+    p0, d = np.broadcast_arrays(np.asarray(p0, dtype=np.float64), np.abs(np.asarray(d, dtype=np.float64)))
+    sign = 1 if alternative == "greater" else -1
+
+    if sample_cnt == 1:
+        hypothesis_duration = one_sample_sequential_sample_size_array(p0, p0, d, alpha, beta, alternative)
+        alternative_duration = one_sample_sequential_sample_size_array(p0 + sign * d, p0, d,
+                                                                       alpha, beta, alternative)
+        max_duration = one_sample_max_sequential_sample_size_array(p0, d, alpha, beta, alternative)[0]
+    elif sample_cnt == 2:
+        # Длительности при p = p0 и p = p0 +- d считаются сразу в одновыборочной задаче
+        # по несовпадающим парам, где им соответствуют 1/2 и 1/2 +- d_transformed
+        d_transformed = transform_two_sample_one_sided_mde(p0, d, alternative=alternative)
+        p_high = p0 + sign * d
+        scale = p0 * (1 - p_high) + p_high * (1 - p0)
+
+        hypothesis_duration = one_sample_sequential_sample_size_array(1 / 2, 1 / 2, d_transformed,
+                                                                      alpha, beta, alternative) / scale
+        alternative_duration = one_sample_sequential_sample_size_array(1 / 2 + sign * d_transformed, 1 / 2,
+                                                                       d_transformed, alpha, beta,
+                                                                       alternative) / scale
+        max_duration = two_sample_max_sequential_sample_size_array(p0, d, alpha, beta, alternative)[0]
+    else:
+        raise ValueError(f"Неправильное количество выборок: {sample_cnt}")
+
+    return {
+        "hypothesis_duration": hypothesis_duration,
+        "alternative_duration": alternative_duration,
+        "max_duration": max_duration
+    }
+
+
+def plan_mde(p0, budget, alpha, beta, alternative, sample_cnt=1, rtol=PLANNER_RTOL):
+    """
+    Минимальное MDE, при котором максимальная средняя длительность
+    последовательного теста не превосходит бюджет трафика
+
+    Корень ищется одновременно для всех точек методом Иллинойс
+    (модификация метода ложного положения) по log(d):
+    в этих координатах логарифм длительности близок к линейной функции.
+    Соседние вдоль последней оси точки считаются соседними точками сетки:
+    сначала решаются опорные точки (каждая WARM_STEP-я),
+    затем остальные с узким начальным отрезком вокруг решения в ближайшей опорной точке
+    с учётом d ~ sqrt(p0 * (1 - p0) / budget), что сокращает количество итераций
+
+    :param p0: значение или массив значений вероятности при гипотезе
+    :param budget: значение или массив значений бюджета -
+                   допустимой максимальной средней длительности теста (размера одной выборки)
+    :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+    :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
+    :param alternative: наименование альтернативы: "less", "greater" или "two-sided"
+    :param sample_cnt: количество выборок: 1 или 2
+    :param rtol: относительная точность MDE
+    :return: словарь res
+             res["d"] - массив абсолютных значений MDE,
+                        nan - если бюджет недостижим при любом d
+             res["hypothesis_duration"] - массив средних длительностей при p = p0
+             res["alternative_duration"] - массив средних длительностей при p = p0 +- d
+             res["max_duration"] - массив максимальных средних длительностей
+    """
+    p0, budget = np.broadcast_arrays(np.asarray(p0, dtype=np.float64), np.asarray(budget, dtype=np.float64))
+
+    if np.any((p0 <= 0) | (p0 >= 1)):
+        raise ValueError("Величины p0 должны находиться в интервале (0, 1)")
+    if np.any(budget <= 0):
+        raise ValueError("Бюджет должен быть положительным")
+
+    # Наибольшее допустимое d, при котором p0 +- d лежит в (0, 1)
+    if alternative == "greater":
+        d_max = 1 - p0
+    elif alternative == "less":
+        d_max = p0
+    elif alternative == "two-sided":
+        d_max = np.minimum(p0, 1 - p0)
+    else:
+        raise ValueError(f"Неправильная альтернатива: {alternative}")
+    d_max = d_max * (1 - 1e-6)
+
+    def log_duration(p0_part, log_d):
+        return np.log(sequential_durations(p0_part, np.exp(log_d), alpha, beta,
+                                           alternative, sample_cnt)["max_duration"])
+
+    # Начальное приближение без соседей: d ~ sqrt(p0 * (1 - p0) / budget)
+    d_guess = np.minimum(np.sqrt(p0 * (1 - p0) / budget), d_max / 2)
+
+    p0_flat, budget_flat, d_max_flat, d_guess_flat = (value.reshape(-1, p0.shape[-1] if p0.ndim else 1)
+                                                       for value in (p0, budget, d_max, d_guess))
+    d = np.full(p0_flat.shape, np.nan)
+
+    # Сначала решаются опорные точки - каждая WARM_STEP-я вдоль последней оси
+    # и последняя точка, без начального приближения
+    seed_flg = np.zeros(p0_flat.shape[-1], dtype=bool)
+    seed_flg[::WARM_STEP] = True
+    seed_flg[-1] = True
+    d[:, seed_flg] = np.exp(_solve_decreasing(log_duration, p0_flat[:, seed_flg], np.log(budget_flat[:, seed_flg]),
+                                              np.log(d_guess_flat[:, seed_flg]), np.log(d_max_flat[:, seed_flg]),
+                                              COLD_LOG_WIDTH, rtol))
+
+    # Остальные точки решаются все сразу с начальным приближением
+    # по ближайшей слева опорной точке
+    if not np.all(seed_flg):
+        seed_index = np.maximum.accumulate(np.where(seed_flg, np.arange(len(seed_flg)), 0))[~seed_flg]
+        seed_d = d[:, seed_index]
+        p0_rest, budget_rest, d_max_rest = p0_flat[:, ~seed_flg], budget_flat[:, ~seed_flg], d_max_flat[:, ~seed_flg]
+        scale = p0_rest * (1 - p0_rest) * budget_flat[:, seed_index] \
+            / (p0_flat[:, seed_index] * (1 - p0_flat[:, seed_index]) * budget_rest)
+        warm_flg = np.isfinite(seed_d)
+        log_guess = np.log(np.where(warm_flg, np.minimum(seed_d * np.sqrt(scale), d_max_rest / 2),
+                                    d_guess_flat[:, ~seed_flg]))
+        d[:, ~seed_flg] = np.exp(_solve_decreasing(log_duration, p0_rest, np.log(budget_rest), log_guess,
+                                                   np.log(d_max_rest),
+                                                   np.where(warm_flg, WARM_LOG_WIDTH, COLD_LOG_WIDTH), rtol))
+
+    d = d.reshape(p0.shape)
+
+    res = sequential_durations(p0, np.where(np.isfinite(d), d, d_max), alpha, beta, alternative, sample_cnt)
+    res = {key: np.where(np.isfinite(d), value, np.nan) for key, value in res.items()}
+    res["d"] = d
+    return res
+
+
+def plan_beta(p0, d, budget, alpha, alternative, sample_cnt=1, rtol=PLANNER_RTOL):
+    """
+    Минимальное beta (максимальная мощность), при котором максимальная средняя длительность
+    последовательного теста не превосходит бюджет трафика
+
+    Корень ищется одновременно для всех точек методом Иллинойс по log(beta)
+    на отрезке [PLANNER_MIN_BETA, PLANNER_MAX_BETA]
+
+    :param p0: значение или массив значений вероятности при гипотезе
+    :param d: значение или массив абсолютных значений MDE
+    :param budget: значение или массив значений бюджета -
+                   допустимой максимальной средней длительности теста (размера одной выборки)
+    :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+    :param alternative: наименование альтернативы: "less", "greater" или "two-sided"
+    :param sample_cnt: количество выборок: 1 или 2
+    :param rtol: относительная точность beta
+    :return: словарь res
+             res["beta"] - массив значений beta,
+                           nan - если бюджет недостижим при beta не больше PLANNER_MAX_BETA,
+                           PLANNER_MIN_BETA - если бюджет достаточен при любом beta
+             res["hypothesis_duration"] - массив средних длительностей при p = p0
+             res["alternative_duration"] - массив средних длительностей при p = p0 +- d
+             res["max_duration"] - массив максимальных средних длительностей
+    """
+    p0, d, budget = np.broadcast_arrays(np.asarray(p0, dtype=np.float64),
+                                        np.abs(np.asarray(d, dtype=np.float64)),
+                                        np.asarray(budget, dtype=np.float64))
+
+    if np.any(budget <= 0):
+        raise ValueError("Бюджет должен быть положительным")
+
+    # Корень ищется по одномерным массивам, чтобы скалярные значения индексировались,
+    # затем beta приводится к общему размеру p0, d и budget
+    p0_flat, d_flat, budget_flat = (np.atleast_1d(value).reshape(-1) for value in (p0, d, budget))
+
+    def log_duration(index, log_beta):
+        return np.log(sequential_durations(p0_flat[index], d_flat[index], alpha, np.exp(log_beta),
+                                           alternative, sample_cnt)["max_duration"])
+
+    index = np.arange(p0_flat.size)
+    log_beta = _solve_decreasing(log_duration, index, np.log(budget_flat),
+                                 np.full(p0_flat.shape, np.log(0.2)), np.log(PLANNER_MAX_BETA),
+                                 COLD_LOG_WIDTH, rtol, np.log(PLANNER_MIN_BETA))
+    beta = np.exp(log_beta).reshape(p0.shape)
+
+    res = sequential_durations(p0, d, alpha, np.where(np.isfinite(beta), beta, PLANNER_MAX_BETA),
+                               alternative, sample_cnt)
+    res = {key: np.where(np.isfinite(beta), value, np.nan) for key, value in res.items()}
+    res["beta"] = beta
+    return res
+
+
+def _solve_decreasing(func, arg, target, x_guess, x_max, width, rtol, x_min=-np.inf):
+    """
+    Наименьший x из [x_min, x_max], при котором убывающая функция func(arg, x) не больше target
+
+    Сначала от x_guess расширяется отрезок [lo, hi] с func(lo) > target >= func(hi),
+    затем он сужается методом Иллинойс до ширины log(1 + rtol).
+    Возвращается правый конец отрезка, на котором ограничение выполнено
+
+    :param func: векторизованная функция func(arg, x)
+    :param arg: массив параметров функции
+    :param target: массив значений ограничения
+    :param x_guess: массив начальных приближений
+    :param x_max: наибольшее допустимое значение x (число или массив)
+    :param width: начальная полуширина отрезка (число или массив)
+    :param rtol: относительная точность
+    :param x_min: наименьшее допустимое значение x
+    :return: массив значений x,
+             nan - если ограничение не выполнено при x = x_max,
+             x_min - если ограничение выполнено при x = x_min
+    """
+    arg = np.asarray(arg)
+    target = np.asarray(target, dtype=np.float64)
+    x_max = np.broadcast_to(x_max, target.shape)
+    width = np.broadcast_to(width, target.shape).astype(np.float64)
+
+    lo = np.maximum(x_guess - width, x_min)
+    hi = np.minimum(x_guess + width, x_max)
+    f_lo = func(arg, lo) - target
+    f_hi = func(arg, hi) - target
+
+    # Расширение отрезка: если ограничение выполнено уже в lo, то lo становится правым концом,
+    # если не выполнено в hi, то hi становится левым концом
+    for _ in range(PLANNER_MAX_EXPAND):
+        low_flg = (f_lo <= 0) & (lo > x_min)
+        high_flg = (f_hi > 0) & (hi < x_max)
+        if not np.any(low_flg | high_flg):
+            break
+
+        width = np.where(low_flg | high_flg, 2 * width, width)
+        hi, f_hi = np.where(low_flg, lo, hi), np.where(low_flg, f_lo, f_hi)
+        lo, f_lo = np.where(high_flg, hi, lo), np.where(high_flg, f_hi, f_lo)
+        lo = np.where(low_flg, np.maximum(lo - width, x_min), lo)
+        hi = np.where(high_flg, np.minimum(hi + width, x_max), hi)
+
+        # Функция пересчитывается только в точках, где отрезок менялся
+        f_lo = np.where(low_flg, _evaluate_where(func, arg, lo, low_flg) - target, f_lo)
+        f_hi = np.where(high_flg, _evaluate_where(func, arg, hi, high_flg) - target, f_hi)
+
+    unreachable_flg = f_hi > 0
+    below_flg = f_lo <= 0
+
+    # Метод Иллинойс: при повторном сдвиге одного конца
+    # значение функции на другом конце уменьшается вдвое
+    active_flg = ~unreachable_flg & ~below_flg & (hi - lo > np.log1p(rtol))
+    last_side = np.zeros(target.shape, dtype=np.int8)
+    for _ in range(PLANNER_MAX_ITER):
+        if not np.any(active_flg):
+            break
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x = hi - f_hi * (hi - lo) / (f_hi - f_lo)
+        # Шаг бисекции, если точка вне отрезка или слишком близко к концам
+        margin = (hi - lo) * 1e-3
+        x = np.where(np.isfinite(x) & (x > lo + margin) & (x < hi - margin), x, (lo + hi) / 2)
+
+        f_x = np.where(active_flg, _evaluate_where(func, arg, x, active_flg) - target, 0)
+
+        move_hi_flg = active_flg & (f_x <= 0)
+        move_lo_flg = active_flg & (f_x > 0)
+
+        f_lo = np.where(move_hi_flg & (last_side == 1), f_lo / 2, f_lo)
+        f_hi = np.where(move_lo_flg & (last_side == -1), f_hi / 2, f_hi)
+
+        hi, f_hi = np.where(move_hi_flg, x, hi), np.where(move_hi_flg, f_x, f_hi)
+        lo, f_lo = np.where(move_lo_flg, x, lo), np.where(move_lo_flg, f_x, f_lo)
+        last_side = np.where(move_hi_flg, 1, np.where(move_lo_flg, -1, last_side))
+
+        active_flg &= hi - lo > np.log1p(rtol)
+
+    res = np.where(below_flg, lo, hi)
+    return np.where(unreachable_flg, np.nan, res)
+
+
+def _evaluate_where(func, arg, x, flg):
+    """
+    Значения функции только в точках, где flg истинен, в остальных nan
+    """
+    value = np.full(x.shape, np.nan)
+    if np.any(flg):
+        value[flg] = func(arg[flg], x[flg])
+    return value
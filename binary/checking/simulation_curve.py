@@ -1,31 +1,80 @@
 import numpy as np
 
+from .dtype_policy import get_curve_dtype
+from .profiling import profile_mark
 
-def one_sample_curve(s_list, p0, d, alpha, beta, alternative, n_list=None):
+
+# Правила принятия решения при усечении теста:
+# curve - по знаку логарифмического отношения правдоподобий,
+# midpoint - по положению кривой относительно середины между границами,
+# hypothesis - всегда в пользу гипотезы (p = p0 или равенства вероятностей вариаций)
+TRUNCATION_RULES = ("curve", "midpoint", "hypothesis")
+
+
+def get_truncation_index(max_sample_size, sample_size, look_list=None):
     """
-    Определение кривой логарифмического отношения правдоподобий
+    Номер столбца, в котором тест усекается
+
+    :param max_sample_size: максимальная длительность теста
+                            от начала выборки размера sample_size,
+                            None - тест не усекается
+    :param sample_size: количество столбцов выборки
+    :param look_list: возрастающий список длительностей в моменты просмотров,
+                      если задан, то тест усекается в первый просмотр
+                      с длительностью не меньше max_sample_size
+    :return: номер столбца, начиная с нуля,
+             или None, если усечение не попадает в выборку
+    """
+    if max_sample_size is None:
+        return None
+    if max_sample_size < 1:
+        raise ValueError(f"Неправильная максимальная длительность теста: {max_sample_size}")
+
+    if look_list is None:
+        truncation_index = max_sample_size - 1
+    else:
+        truncation_index = int(np.searchsorted(look_list, max_sample_size))
+
+    return truncation_index if truncation_index < sample_size else None
+
+
+def get_terminal_high_flg(curve, low_bound, high_bound, alternative, truncation_rule="curve"):
+    """
+    Решение в момент усечения теста, если кривая не пересекла границы
+
+    :param curve: значения логарифмического отношения правдоподобий в момент усечения
+    :param low_bound: нижняя граница для логарифмического отношения правдоподобий
+    :param high_bound: верхняя граница для логарифмического отношения правдоподобий
+    :param alternative: наименование односторонней альтернативы
+    :param truncation_rule: правило принятия решения из TRUNCATION_RULES
+    :return: индикаторы решения, соответствующего верхней границе,
+             иначе решение соответствует нижней границе
+    """
+    curve = np.asarray(curve)
+    if truncation_rule == "curve":
+        return curve > 0
+    elif truncation_rule == "midpoint":
+        return curve > (low_bound + high_bound) / 2
+    elif truncation_rule == "hypothesis":
+        # Гипотезе p = p0 соответствует нижняя граница для "greater"
+        # и верхняя граница для "less"
+        return np.full(curve.shape, alternative == "less")
+    else:
+        raise ValueError(f"Неправильное правило усечения теста: {truncation_rule}")
+
+
+def get_curve_params(p0, d, alpha, beta, alternative):
+    """
+    Параметры односторонней проверки последовательного теста
 
-    :param s_list: массив размера [iter_size, sample_size],
-                   где каждая строка - накопленная сумма S(n) данных из {0, 1}
-                   для каждого n <= sample_size,
-                   а iter_size - количество итераций моделирования
     :param p0: значение вероятности при гипотезе
     :param d: абсолютное значение MDE
     :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
     :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
     :param alternative: наименование односторонней альтернативы
-    :param n_list: массив значений прошедшей длительности
-    :return: словарь res
-             res["curve"] - кривая логарифмического отношения правдоподобий
-             res["low_bound"] - нижняя граница для логарифмического отношения правдоподобий
-             res["high_bound"] - верхняя граница для логарифмического отношения правдоподобий
+    :return: нижнее и верхнее значения вероятности,
+             нижняя и верхняя границы для логарифмического отношения правдоподобий
     """
-
-    # Количество итераций моделирования и длительность получения данных
-    iter_size = s_list.shape[0]
-    sample_size = s_list.shape[1]
-
-    # Определение параметров последовательного теста
     if alternative == "greater":
         p_low = p0
         p_high = p0 + d
@@ -39,21 +88,146 @@ def one_sample_curve(s_list, p0, d, alpha, beta, alternative, n_list=None):
     else:
         raise ValueError(f"Неправильная альтернатива: {alternative}")
 
+    low_bound = np.log(alpha_low / (1 - alpha_high))
+    high_bound = np.log((1 - alpha_low) / alpha_high)
+
+    return p_low, p_high, low_bound, high_bound
+
+
+def calc_curve(s_list, n_list, p_low, p_high, initial_curve=None, curve_dtype=None):
+    """
+    Расчёт логарифмического отношения правдоподобий для бернуллиевских величин
+
+    :param s_list: массив накопленных сумм S(n)
+    :param n_list: массив значений прошедшей длительности
+    :param p_low: нижнее значение вероятности
+    :param p_high: верхнее значение вероятности
+    :param initial_curve: список длины iter_size из значений
+                          логарифмического отношения правдоподобий
+                          к моменту применения последовательного анализа
+    :param curve_dtype: тип кривой, None - тип по умолчанию
+    :return: кривая логарифмического отношения правдоподобий
+    """
+    # Второе слагаемое добавляется на месте, без лишней матрицы суммы
+    curve = np.multiply(s_list, np.log(p_high / p_low), dtype=curve_dtype)
+    curve += np.multiply(n_list - s_list, np.log((1 - p_high) / (1 - p_low)), dtype=curve_dtype)
+
+    # Если заданы значения кривой,
+    # корректируем логарифмическое отношение правдоподобий
+    if initial_curve is not None:
+        curve += initial_curve.reshape(-1, 1)
+
+    return curve
+
+
+def one_sample_curve(s_list, p0, d, alpha, beta, alternative, n_list=None,
+                     initial_curve=None, narrow_dtype=False,
+                     truncation_index=None, truncation_rule="curve"):
+    """
+    Определение кривой логарифмического отношения правдоподобий
+    и моментов пересечения ею границ
+
+    :param s_list: массив размера [iter_size, sample_size],
+                   где каждая строка - накопленная сумма S(n) данных из {0, 1}
+                   для каждого n <= sample_size,
+                   а iter_size - количество итераций моделирования
+    :param p0: значение вероятности при гипотезе
+    :param d: абсолютное значение MDE
+    :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+    :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
+    :param alternative: наименование односторонней альтернативы
+    :param n_list: массив значений прошедшей длительности
+    :param initial_curve: список длины iter_size из значений
+                          логарифмического отношения правдоподобий
+                          к моменту применения последовательного анализа
+    :param narrow_dtype: флаг расчёта кривой в float32,
+                         если это позволяет величина границ и длительность батча,
+                         индикаторы пересечения границ при этом совпадают с float64
+    :param truncation_index: номер столбца, в котором тест усекается:
+                             если кривая не пересекла границы,
+                             то пересечение одной из них назначается по правилу truncation_rule
+    :param truncation_rule: правило принятия решения при усечении из TRUNCATION_RULES
+    :return: словарь res
+             res["curve"] - кривая логарифмического отношения правдоподобий
+             res["low_bound"] - нижняя граница для логарифмического отношения правдоподобий
+             res["high_bound"] - верхняя граница для логарифмического отношения правдоподобий
+             res["low_bound_crossing"] - индикаторы пересечения нижней границы
+             res["high_bound_crossing"] - индикаторы пересечения верхней границы
+             res["last_curve"] - список значений кривой в последний момент времени в float64
+    """
+
     if n_list is None:
-        # Получение массива из строк вида (1, ..., sample_size) в количестве iter_size
-        n_one_dim_list = 1 + np.arange(sample_size)
-        n_list = np.tile(n_one_dim_list.reshape(-1, 1), iter_size).T
+        # Строка вида (1, ..., sample_size), которая транслируется
+        # на все iter_size строк без копирования в матрицу
+        n_list = 1 + np.arange(s_list.shape[1], dtype=s_list.dtype)
+
+    # Длительность получения данных: при просмотрах по расписанию
+    # прошедшая длительность может быть больше количества столбцов,
+    # значения n_list не убывают вдоль строки
+    sample_size = s_list.shape[1]
+    if n_list.size > 0:
+        sample_size = max(sample_size, int(np.max(n_list[..., -1])))
+
+    # Определение параметров последовательного теста
+    # и порогов для логарифмического отношения правдоподобий
+    p_low, p_high, low_bound, high_bound = get_curve_params(p0, d, alpha, beta, alternative)
 
     # Логарифмическое отношение правдоподобий для бернуллиевских величин
-    curve = s_list * np.log(p_high / p_low) \
-            + (n_list - s_list) * np.log((1 - p_high) / (1 - p_low))
+    curve_dtype = get_curve_dtype(sample_size, p_low, p_high, low_bound, high_bound, narrow_dtype)
+    curve = calc_curve(s_list, n_list, p_low, p_high, initial_curve, curve_dtype)
+    profile_mark("curve")
 
-    # Определение порогов для логарифмического отношения правдоподобий
-    low_bound = np.log(alpha_low / (1 - alpha_high))
-    high_bound = np.log((1 - alpha_low) / alpha_high)
+    # Расчёт индикаторов пересечения границ
+    high_bound_crossing_flg = curve > high_bound
+    low_bound_crossing_flg = curve < low_bound
+
+    if curve_dtype == np.float32:
+        # Оценка сверху погрешности расчёта кривой в float32
+        step = max(np.abs(np.log(p_high / p_low)), np.abs(np.log((1 - p_high) / (1 - p_low))))
+        magnitude = sample_size * step + max(np.abs(low_bound), np.abs(high_bound))
+        if initial_curve is not None and len(initial_curve) > 0:
+            magnitude += np.max(np.abs(initial_curve))
+        curve_atol = np.float32(8 * np.finfo(np.float32).eps * magnitude)
+
+        # Тесты, в которых кривая подходит к границе ближе погрешности,
+        # пересчитываются в float64, чтобы решения совпадали
+        ambiguous_flg = np.abs(curve - np.float32(high_bound)) <= curve_atol
+        ambiguous_flg |= np.abs(curve - np.float32(low_bound)) <= curve_atol
+        ambiguous_iter_index = np.nonzero(ambiguous_flg.any(axis=1))[0]
+        del ambiguous_flg
+
+        if len(ambiguous_iter_index) > 0:
+            exact_curve = calc_curve(s_list[ambiguous_iter_index],
+                                     n_list[ambiguous_iter_index] if n_list.ndim == 2 else n_list,
+                                     p_low, p_high,
+                                     None if initial_curve is None else initial_curve[ambiguous_iter_index])
+            high_bound_crossing_flg[ambiguous_iter_index] = exact_curve > high_bound
+            low_bound_crossing_flg[ambiguous_iter_index] = exact_curve < low_bound
+
+        # Значение кривой в последний момент времени
+        # пересчитывается в float64 для переноса в следующий батч
+        last_curve = calc_curve(s_list[:, -1:], n_list[..., -1:], p_low, p_high, initial_curve)[:, 0]
+    else:
+        last_curve = curve[:, -1].copy()
+
+    # Усечение теста: в столбце усечения решение принимается во всех тестах,
+    # кривая для правила пересчитывается в float64
+    if truncation_index is not None:
+        terminal_curve = calc_curve(s_list[:, truncation_index:truncation_index + 1],
+                                    n_list[..., truncation_index:truncation_index + 1],
+                                    p_low, p_high, initial_curve)[:, 0]
+        terminal_high_flg = high_bound_crossing_flg[:, truncation_index] \
+            | (~low_bound_crossing_flg[:, truncation_index]
+               & get_terminal_high_flg(terminal_curve, low_bound, high_bound, alternative, truncation_rule))
+        high_bound_crossing_flg[:, truncation_index] = terminal_high_flg
+        low_bound_crossing_flg[:, truncation_index] = ~terminal_high_flg
 
+    profile_mark("crossing")
     return {
         "curve": curve,
         "low_bound": low_bound,
-        "high_bound": high_bound
+        "high_bound": high_bound,
+        "low_bound_crossing": low_bound_crossing_flg,
+        "high_bound_crossing": high_bound_crossing_flg,
+        "last_curve": last_curve
     }
@@ -0,0 +1,266 @@
+import numpy as np
+
+
+# Значения результата теста: -1, 0 и 1
+RESULT_VALUES = (-1, 0, 1)
+
+# Начальная ширина интервала гистограммы длительностей по умолчанию
+DEFAULT_BIN_WIDTH = 1
+
+# Количество интервалов гистограммы длительностей по умолчанию:
+# если длительность не помещается в гистограмму, ширина интервала удваивается
+DEFAULT_BIN_CNT = 1024
+
+# Относительная точность квантилей длительности по умолчанию
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+
+class SimulationSummary(object):
+    """
+    Накопитель сводной статистики законченных тестов моделирования
+
+    Вместо списков характеристик каждого теста хранятся:
+    количества результатов теста, среднее и дисперсия длительности (метод Уэлфорда),
+    гистограмма длительностей из фиксированного количества интервалов
+    и скетч квантилей длительности с логарифмическими интервалами.
+    Объём памяти не зависит от количества тестов,
+    накопители разных частей моделирования объединяются методом merge
+    """
+
+    def __init__(self, bin_width=DEFAULT_BIN_WIDTH, relative_accuracy=DEFAULT_RELATIVE_ACCURACY,
+                 bin_cnt=DEFAULT_BIN_CNT):
+        """
+        :param bin_width: начальная ширина интервала гистограммы длительностей
+        :param relative_accuracy: относительная точность квантилей длительности
+        :param bin_cnt: чётное количество интервалов гистограммы длительностей
+        """
+        if bin_width < 1:
+            raise ValueError(f"Неправильная ширина интервала гистограммы: {bin_width}")
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"Неправильная относительная точность квантилей: {relative_accuracy}")
+        if bin_cnt < 2 or bin_cnt % 2 != 0:
+            raise ValueError(f"Неправильное количество интервалов гистограммы: {bin_cnt}")
+
+        self.bin_width = bin_width
+        self.bin_cnt = bin_cnt
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+
+        # Количество тестов для каждого значения результата из RESULT_VALUES
+        self.result_cnt = np.zeros(len(RESULT_VALUES), dtype=np.int64)
+
+        # Количество тестов, среднее длительности
+        # и сумма квадратов отклонений длительности от среднего
+        self.iter_cnt = 0
+        self.duration_mean = 0.
+        self.duration_m2 = 0.
+
+        # Гистограмма: интервал i содержит длительности
+        # от i * bin_width + 1 до (i + 1) * bin_width
+        self.duration_hist = np.zeros(bin_cnt, dtype=np.int64)
+
+        # Скетч: интервал i содержит длительности от gamma^(i - 1) до gamma^i
+        self.duration_sketch = np.zeros(0, dtype=np.int64)
+
+    def update(self, duration_list, result_list):
+        """
+        Добавление законченных тестов
+
+        :param duration_list: список длительностей теста
+        :param result_list: список результатов теста
+        """
+        duration_list = np.asarray(duration_list, dtype=np.int64)
+        result_list = np.asarray(result_list, dtype=np.int64)
+        iter_cnt = len(duration_list)
+        if iter_cnt == 0:
+            return
+
+        self.result_cnt += np.bincount(result_list + 1, minlength=len(RESULT_VALUES))
+
+        duration_mean = np.mean(duration_list)
+        duration_m2 = np.sum(np.square(duration_list - duration_mean))
+        self._update_moments(iter_cnt, duration_mean, duration_m2)
+
+        self._widen_hist(np.max(duration_list))
+        self.duration_hist += np.bincount((duration_list - 1) // self.bin_width, minlength=self.bin_cnt)
+        self.duration_sketch = _add_counts(self.duration_sketch,
+                                           np.bincount(self._get_sketch_index(duration_list)))
+
+    def merge(self, other):
+        """
+        Объединение с накопителем другой части моделирования
+
+        :param other: накопитель SimulationSummary с теми же параметрами
+        :return: этот накопитель
+        """
+        if self.bin_cnt != other.bin_cnt or self.relative_accuracy != other.relative_accuracy:
+            raise ValueError("Нельзя объединить накопители с разными параметрами")
+
+        # Гистограммы приводятся к большей ширине интервала
+        other_hist, other_bin_width = other.duration_hist, other.bin_width
+        while self.bin_width < other_bin_width:
+            self.duration_hist = _coarsen_counts(self.duration_hist)
+            self.bin_width *= 2
+        while other_bin_width < self.bin_width:
+            other_hist = _coarsen_counts(other_hist)
+            other_bin_width *= 2
+        if self.bin_width != other_bin_width:
+            raise ValueError("Нельзя объединить накопители с разными параметрами")
+
+        self.result_cnt += other.result_cnt
+        if other.iter_cnt > 0:
+            self._update_moments(other.iter_cnt, other.duration_mean, other.duration_m2)
+        self.duration_hist = self.duration_hist + other_hist
+        self.duration_sketch = _add_counts(self.duration_sketch, other.duration_sketch)
+
+        return self
+
+    def freq(self, result):
+        """
+        Частота результата теста
+
+        :param result: значение результата теста из RESULT_VALUES
+        :return: доля тестов с результатом result
+        """
+        self._check_not_empty()
+        return self.result_cnt[result + 1] / self.iter_cnt
+
+    def duration_std(self):
+        """
+        Выборочное стандартное отклонение длительности теста,
+        nan, если законченных тестов меньше двух
+        """
+        if self.iter_cnt < 2:
+            return np.nan
+        return np.sqrt(self.duration_m2 / (self.iter_cnt - 1))
+
+    def duration_quantile(self, q):
+        """
+        Квантиль длительности теста по скетчу
+        с относительной погрешностью не более relative_accuracy
+
+        :param q: уровень квантиля или список уровней
+        :return: значение квантиля или список значений
+        """
+        self._check_not_empty()
+        rank = np.asarray(q) * (self.iter_cnt - 1)
+        sketch_index = np.searchsorted(np.cumsum(self.duration_sketch), rank, side="right")
+        return 2 * np.power(self.gamma, sketch_index) / (self.gamma + 1)
+
+    def freq_conf_interval(self, result, conf=0.99):
+        """
+        Статистически незначимые отклонения от частоты результата теста
+
+        :param result: значение результата теста из RESULT_VALUES
+        :param conf: уровень доверия
+        :return: нижнее и верхнее статистически незначимые отклонения
+        """
+        from scipy.stats import binomtest
+
+        freq = self.freq(result)
+        res = binomtest(int(self.result_cnt[result + 1]), self.iter_cnt)
+        left_side, right_side = res.proportion_ci(conf)
+        return freq - left_side, right_side - freq
+
+    def duration_conf_interval(self, conf=0.99):
+        """
+        Статистически незначимые отклонения от средней длительности теста,
+        совпадают с доверительным интервалом t-критерия Стьюдента
+
+        :param conf: уровень доверия
+        :return: нижнее и верхнее статистически незначимые отклонения
+        """
+        from scipy.stats import t
+
+        self._check_not_empty()
+        side = t.ppf((1 + conf) / 2, self.iter_cnt - 1) * self.duration_std() / np.sqrt(self.iter_cnt)
+        return side, side
+
+    def get_state(self):
+        """
+        Состояние накопителя для сохранения
+
+        :return: словарь параметров и накопленных значений
+        """
+        return {
+            "bin_width": self.bin_width,
+            "relative_accuracy": self.relative_accuracy,
+            "bin_cnt": self.bin_cnt,
+            "result_cnt": self.result_cnt,
+            "iter_cnt": self.iter_cnt,
+            "duration_mean": self.duration_mean,
+            "duration_m2": self.duration_m2,
+            "duration_hist": self.duration_hist,
+            "duration_sketch": self.duration_sketch
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Накопитель из сохранённого состояния
+
+        :param state: словарь из get_state
+        :return: накопитель SimulationSummary
+        """
+        summary = cls(state["bin_width"], state["relative_accuracy"], state["bin_cnt"])
+        summary.result_cnt = np.asarray(state["result_cnt"], dtype=np.int64)
+        summary.iter_cnt = state["iter_cnt"]
+        summary.duration_mean = state["duration_mean"]
+        summary.duration_m2 = state["duration_m2"]
+        summary.duration_hist = np.asarray(state["duration_hist"], dtype=np.int64)
+        summary.duration_sketch = np.asarray(state["duration_sketch"], dtype=np.int64)
+        return summary
+
+    def _update_moments(self, iter_cnt, duration_mean, duration_m2):
+        """
+        Объединение среднего и суммы квадратов отклонений
+        с характеристиками другой группы тестов (формула Чана)
+        """
+        total_iter_cnt = self.iter_cnt + iter_cnt
+        delta = duration_mean - self.duration_mean
+        self.duration_mean += delta * iter_cnt / total_iter_cnt
+        self.duration_m2 += duration_m2 + delta ** 2 * self.iter_cnt * iter_cnt / total_iter_cnt
+        self.iter_cnt = total_iter_cnt
+
+    def _check_not_empty(self):
+        """
+        Проверка наличия законченных тестов для расчёта статистик
+        """
+        if self.iter_cnt == 0:
+            raise ValueError("Неправильная сводная статистика: нет законченных тестов")
+
+    def _widen_hist(self, max_duration):
+        """
+        Удвоение ширины интервала гистограммы,
+        пока в неё не поместится длительность max_duration
+        """
+        while max_duration > self.bin_cnt * self.bin_width:
+            self.duration_hist = _coarsen_counts(self.duration_hist)
+            self.bin_width *= 2
+
+    def _get_sketch_index(self, duration_list):
+        """
+        Номера интервалов скетча для длительностей теста
+        """
+        return np.ceil(np.log(duration_list) / np.log(self.gamma)).astype(np.int64)
+
+
+def _add_counts(counts, other_counts):
+    """
+    Сложение массивов количеств разной длины
+    """
+    if len(other_counts) > len(counts):
+        counts, other_counts = other_counts, counts
+    counts = counts.copy()
+    counts[:len(other_counts)] += other_counts
+    return counts
+
+
+def _coarsen_counts(counts):
+    """
+    Объединение соседних пар интервалов гистограммы
+    с сохранением количества интервалов
+    """
+    coarse_counts = np.zeros_like(counts)
+    coarse_counts[:len(counts) // 2] = counts.reshape(-1, 2).sum(axis=1)
+    return coarse_counts
@@ -1,7 +1,4 @@
 import numpy as np
-import plotly.graph_objects as go
-import plotly.express as px
-from scipy.stats import binomtest, ttest_1samp
 
 
 def get_duration_from_bound_crossing(bound_crossing_flg):
@@ -40,6 +37,52 @@ def get_value_at_duration(value_list, duration_list):
     return result_list[:, 0]
 
 
+def get_sum_at_duration(x, duration_list):
+    """
+    Функция для расчёта суммы значений выборки
+    на момент длительности теста
+    без построения матрицы накопленных сумм
+
+    :param x: bool массив размера [iter_size, sample_size],
+              где каждая строка - значение выборки теста из {0, 1},
+              а iter_size - количество итераций моделирования (тестов)
+    :param duration_list: список размера iter_size из длительностей теста
+    :return: список размера iter_size из сумм первых duration значений выборки
+    """
+    sample_size = x.shape[1]
+    duration_flg = np.arange(sample_size) < duration_list.reshape(-1, 1)
+    duration_flg &= x
+    return np.count_nonzero(duration_flg, axis=1)
+
+
+def get_discordant_cumsum(x, y):
+    """
+    Функция для перехода от двухвыборочной задачи к одновыборочной:
+    расчёт накопленного количества несовпадающих пар (X(i), Y(i))
+    и накопленного количества пар вида (1, 0)
+
+    Вальд А.
+    Последовательный анализ.
+    – 1960. – С. 143-146.
+
+    :param x: bool массив размера [iter_size, sample_size] первой выборки
+    :param y: bool массив размера [iter_size, sample_size] второй выборки
+    :return: массив накопленных сумм S(n) пар вида (1, 0),
+             массив накопленного количества несовпадающих пар
+    """
+    # Флаги несовпадающих пар и пар вида (1, 0)
+    discordant_flg = np.not_equal(x, y)
+    success_flg = x & discordant_flg
+
+    # Накопленные суммы сразу считаются в int32,
+    # так как длительность батча много меньше 2^31
+    s_list = np.cumsum(success_flg, axis=1, dtype=np.int32)
+    del success_flg
+    n_list = np.cumsum(discordant_flg, axis=1, dtype=np.int32)
+
+    return s_list, n_list
+
+
 def freq_conf_interval(freq_list, sample_size, conf=0.99):
     """
     Функция для построения статистически незначимых
@@ -51,6 +94,8 @@ def freq_conf_interval(freq_list, sample_size, conf=0.99):
     :return: список из нижних и верхних
              статистически незначимых отклонений
     """
+    from scipy.stats import binomtest
+
     left_side_list = []
     right_side_list = []
 
@@ -73,6 +118,8 @@ def duration_conf_interval(duration_matrix, conf=0.99):
     :return: список из нижних и верхних
              статистически незначимых отклонений
     """
+    from scipy.stats import ttest_1samp
+
     left_side_list = []
     right_side_list = []
 
@@ -86,6 +133,51 @@ def duration_conf_interval(duration_matrix, conf=0.99):
     return left_side_list, right_side_list
 
 
+def summary_freq_conf_interval(summary_list, result, conf=0.99):
+    """
+    Функция для построения статистически незначимых
+    отклонений от частоты результата теста
+    по накопителям сводной статистики
+
+    :param summary_list: список накопителей SimulationSummary
+    :param result: значение результата теста
+    :param conf: уровень доверия
+    :return: список из нижних и верхних
+             статистически незначимых отклонений
+    """
+    left_side_list = []
+    right_side_list = []
+
+    for summary in summary_list:
+        left_side, right_side = summary.freq_conf_interval(result, conf)
+        left_side_list.append(left_side)
+        right_side_list.append(right_side)
+
+    return left_side_list, right_side_list
+
+
+def summary_duration_conf_interval(summary_list, conf=0.99):
+    """
+    Функция для построения статистически незначимых
+    отклонений от средней длительности теста
+    по накопителям сводной статистики
+
+    :param summary_list: список накопителей SimulationSummary
+    :param conf: уровень доверия
+    :return: список из нижних и верхних
+             статистически незначимых отклонений
+    """
+    left_side_list = []
+    right_side_list = []
+
+    for summary in summary_list:
+        left_side, right_side = summary.duration_conf_interval(conf)
+        left_side_list.append(left_side)
+        right_side_list.append(right_side)
+
+    return left_side_list, right_side_list
+
+
 def table_show(ratio_duration_matrix, p0_list, lift_list, title, abs_flg=True):
     """
     Функция для визуализации отношений длительностей теста
@@ -96,6 +188,9 @@ def table_show(ratio_duration_matrix, p0_list, lift_list, title, abs_flg=True):
     :param title: название графика
     :return: фигура Plotly
     """
+    import plotly.express as px
+    import plotly.graph_objects as go
+
     def abs_color_matrix(value_matrix):
         min_value = 0.5
         max_value = 2
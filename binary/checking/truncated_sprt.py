@@ -0,0 +1,441 @@
+import numpy as np
+from scipy.stats import binom
+
+from binary.checking.one_sample_classic_sample_size import classic_sample_size as one_sample_classic_sample_size
+from binary.checking.two_sample_classic_sample_size import classic_sample_size as two_sample_classic_sample_size
+from binary.checking.simulation_curve import TRUNCATION_RULES, get_terminal_high_flg
+from binary.checking.tools import transform_two_sample_one_sided_mde
+from binary.sprt.integer_thresholds import IntegerThresholds
+
+
+# Максимальная длительность усечённого теста по умолчанию
+# в количествах размера выборки классического дизайна
+DEFAULT_TRUNCATION_FACTOR = 2
+
+# Вероятность продолжения теста, ниже которой расчёт останавливается
+TRUNCATED_PROB_TOL = 1e-15
+
+# Вероятность продолжения теста, ниже которой останавливается расчёт
+# для неусечённого теста, и ограничение на его длительность
+# в количествах размера выборки классического дизайна
+EXACT_PROB_TOL = 1e-10
+EXACT_TRUNCATION_FACTOR = 50
+
+
+def get_max_sample_size(p0, d, alpha, beta, alternative, sample_cnt=1, factor=DEFAULT_TRUNCATION_FACTOR):
+    """
+    Максимальная длительность усечённого теста
+    как кратное размера выборки классического дизайна
+
+    :param p0: значение вероятности при гипотезе
+    :param d: абсолютное значение MDE
+    :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+    :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
+    :param alternative: наименование альтернативы: "less", "greater" или "two-sided"
+    :param sample_cnt: количество выборок: 1 - размер выборки,
+                       2 - количество пар (размер одной выборки)
+    :param factor: отношение максимальной длительности к размеру выборки классического дизайна
+    :return: максимальная длительность теста
+    """
+    if sample_cnt == 1:
+        sample_size = one_sample_classic_sample_size(p0, d, alpha, beta, alternative)
+    elif sample_cnt == 2:
+        sample_size = two_sample_classic_sample_size(p0, d, alpha, beta, alternative)[0]
+    else:
+        raise ValueError(f"Неправильное количество выборок: {sample_cnt}")
+
+    return int(np.ceil(factor * sample_size))
+
+
+def one_sample_truncated_probability(p, p0, d, alpha, beta, alternative, max_sample_size,
+                                     truncation_rule="curve"):
+    """
+    Точный расчёт вероятностей результатов и средней длительности
+    усечённого одновыборочного последовательного теста
+
+    Распределение S(n) среди продолжающихся тестов пересчитывается
+    на каждом шаге n, пересечение границ проверяется по целочисленным порогам,
+    поэтому результат совпадает с моделированием без погрешности розыгрыша
+
+    :param p: реальное значение вероятности
+    :param p0: значение вероятности при гипотезе
+    :param d: абсолютное значение MDE
+    :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+    :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
+    :param alternative: наименование альтернативы: "less", "greater" или "two-sided"
+    :param max_sample_size: максимальная длительность теста
+    :param truncation_rule: правило принятия решения при усечении из TRUNCATION_RULES
+    :return: словарь res
+             res["low_result_prob"] - вероятность результата теста -1
+             res["high_result_prob"] - вероятность результата теста 1
+             res["truncation_prob"] - вероятность усечения теста
+             res["mean_duration"] - средняя длительность теста
+    """
+    test_list = _get_test_list(p0, np.abs(d), alpha, beta, alternative)
+    stop_prob, terminal_prob = _truncated_chain(p, test_list, max_sample_size, truncation_rule,
+                                                last_terminal_only=True)
+
+    duration_list = np.arange(max_sample_size + 1)
+    return {
+        "low_result_prob": stop_prob[:, 0].sum() + terminal_prob[-1, 0],
+        "high_result_prob": stop_prob[:, 1].sum() + terminal_prob[-1, 1],
+        "truncation_prob": terminal_prob[-1].sum(),
+        "mean_duration": stop_prob.sum(axis=1) @ duration_list + max_sample_size * terminal_prob[-1].sum()
+    }
+
+
+def two_sample_truncated_probability(p_x, p_y, p0, d, alpha, beta, alternative, max_sample_size,
+                                     truncation_rule="curve"):
+    """
+    Точный расчёт вероятностей результатов и средней длительности
+    усечённого двухвыборочного последовательного теста
+
+    Тест проводится по несовпадающим парам, а усекается по количеству всех пар,
+    поэтому количество несовпадающих пар к моменту усечения имеет биномиальное распределение,
+    а номер пары с k-ой несовпадающей парой - отрицательное биномиальное
+
+    :param p_x: реальное значение вероятности для первой вариации
+    :param p_y: реальное значение вероятности для второй вариации
+    :param p0: значение вероятности при гипотезе
+    :param d: абсолютное значение MDE
+    :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+    :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
+    :param alternative: наименование альтернативы: "less", "greater" или "two-sided"
+    :param max_sample_size: максимальное количество пар
+    :param truncation_rule: правило принятия решения при усечении из TRUNCATION_RULES
+    :return: словарь res того же вида, что и у one_sample_truncated_probability,
+             длительность - количество пар
+    """
+    # Вероятности пары вида (1, 0) и несовпадающей пары
+    success_prob = p_x * (1 - p_y)
+    discordant_prob = success_prob + p_y * (1 - p_x)
+
+    # Определение параметров одновыборочного последовательного теста
+    d = np.abs(d)
+    if alternative == "two-sided":
+        d_transformed = [transform_two_sample_one_sided_mde(p0, d, alternative="less"),
+                         transform_two_sample_one_sided_mde(p0, d, alternative="greater")]
+    else:
+        d_transformed = transform_two_sample_one_sided_mde(p0, d, alternative=alternative)
+    test_list = _get_test_list(1 / 2, d_transformed, alpha, beta, alternative)
+
+    stop_prob, terminal_prob = _truncated_chain(success_prob / discordant_prob, test_list,
+                                                max_sample_size, truncation_rule)
+
+    # Распределение количества несовпадающих пар к моменту усечения
+    discordant_cnt_list = np.arange(max_sample_size + 1)
+    discordant_cnt_prob = binom.pmf(discordant_cnt_list, max_sample_size, discordant_prob)
+
+    # Остановка на k-ой несовпадающей паре происходит до усечения,
+    # если к моменту усечения есть хотя бы k несовпадающих пар
+    reach_prob = binom.sf(discordant_cnt_list - 1, max_sample_size, discordant_prob)
+    result_prob = stop_prob.T @ reach_prob + terminal_prob.T @ discordant_cnt_prob
+    truncation_prob = terminal_prob.sum(axis=1) @ discordant_cnt_prob
+
+    # Среднее номера пары с k-ой несовпадающей парой при условии, что он не больше max_sample_size:
+    # E[T(k); T(k) <= N] = k / q * P(Bin(N + 1, q) >= k + 1)
+    stop_duration = discordant_cnt_list / discordant_prob \
+        * binom.sf(discordant_cnt_list, max_sample_size + 1, discordant_prob)
+
+    return {
+        "low_result_prob": result_prob[0],
+        "high_result_prob": result_prob[1],
+        "truncation_prob": truncation_prob,
+        "mean_duration": stop_prob.sum(axis=1) @ stop_duration + max_sample_size * truncation_prob
+    }
+
+
+def truncated_error_rates(p0, d, alpha, beta, alternative, max_sample_size,
+                          truncation_rule="curve", sample_cnt=1):
+    """
+    Точный расчёт вероятностей ошибок и средних длительностей усечённого теста
+
+    :param p0: значение вероятности при гипотезе
+    :param d: абсолютное значение MDE
+    :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+    :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
+    :param alternative: наименование альтернативы: "less", "greater" или "two-sided"
+    :param max_sample_size: максимальная длительность теста
+    :param truncation_rule: правило принятия решения при усечении из TRUNCATION_RULES
+    :param sample_cnt: количество выборок: 1 или 2,
+                       для двух выборок при альтернативе вероятность первой вариации
+                       отличается от p0 на d, а второй равна p0
+    :return: словарь res
+             res["alpha"] - вероятность ошибки I рода
+             res["beta"] - вероятность ошибки II рода,
+                           для двусторонней альтернативы - наибольшая из p0 - d и p0 + d
+             res["hypothesis_duration"] - средняя длительность при p = p0
+             res["alternative_duration"] - средняя длительность при альтернативе,
+                                           для двусторонней альтернативы - наибольшая
+             res["max_duration"] - максимальная длительность теста
+    """
+    d = np.abs(d)
+
+    def calc_probability(p):
+        if sample_cnt == 1:
+            return one_sample_truncated_probability(p, p0, d, alpha, beta, alternative,
+                                                    max_sample_size, truncation_rule)
+        elif sample_cnt == 2:
+            return two_sample_truncated_probability(p, p0, p0, d, alpha, beta, alternative,
+                                                    max_sample_size, truncation_rule)
+        else:
+            raise ValueError(f"Неправильное количество выборок: {sample_cnt}")
+
+    res = _get_error_rates(calc_probability, p0, d, alternative)
+    res["max_duration"] = max_sample_size
+    return res
+
+
+def exact_error_rates(p0, d, alpha, beta, alternative, sample_cnt=1, prob_tol=EXACT_PROB_TOL):
+    """
+    Точный расчёт вероятностей ошибок и средних длительностей неусечённого теста
+
+    Распределение S(n) пересчитывается, пока вероятность продолжения теста
+    не станет меньше prob_tol, поэтому погрешность результата не больше prob_tol.
+    Для двух выборок тест проводится по несовпадающим парам,
+    и средняя длительность в парах равна средней длительности
+    в несовпадающих парах, делённой на вероятность несовпадающей пары
+
+    :param p0: значение вероятности при гипотезе
+    :param d: абсолютное значение MDE
+    :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+    :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
+    :param alternative: наименование альтернативы: "less", "greater" или "two-sided"
+    :param sample_cnt: количество выборок: 1 или 2,
+                       для двух выборок при альтернативе вероятность первой вариации
+                       отличается от p0 на d, а второй равна p0
+    :param prob_tol: вероятность продолжения теста, ниже которой расчёт останавливается
+    :return: словарь res того же вида, что и у truncated_error_rates, без res["max_duration"]
+    """
+    d = np.abs(d)
+    max_sample_size = get_max_sample_size(p0, d, alpha, beta, alternative, sample_cnt,
+                                          factor=EXACT_TRUNCATION_FACTOR)
+
+    if sample_cnt == 1:
+        test_list = _get_test_list(p0, d, alpha, beta, alternative)
+    elif sample_cnt == 2:
+        if alternative == "two-sided":
+            d_transformed = [transform_two_sample_one_sided_mde(p0, d, alternative="less"),
+                             transform_two_sample_one_sided_mde(p0, d, alternative="greater")]
+        else:
+            d_transformed = transform_two_sample_one_sided_mde(p0, d, alternative=alternative)
+        test_list = _get_test_list(1 / 2, d_transformed, alpha, beta, alternative)
+    else:
+        raise ValueError(f"Неправильное количество выборок: {sample_cnt}")
+
+    def calc_probability(p):
+        if sample_cnt == 1:
+            success_prob, discordant_prob = p, 1
+        else:
+            # Вероятности пары вида (1, 0) и несовпадающей пары
+            # для первой вариации с вероятностью p и второй с p0
+            discordant_prob = p * (1 - p0) + p0 * (1 - p)
+            success_prob = p * (1 - p0) / discordant_prob
+
+        stop_prob, terminal_prob = _truncated_chain(success_prob, test_list, max_sample_size, "curve",
+                                                    prob_tol=prob_tol, last_terminal_only=True)
+        duration_list = np.arange(max_sample_size + 1)
+        return {
+            "low_result_prob": stop_prob[:, 0].sum() + terminal_prob[-1, 0],
+            "high_result_prob": stop_prob[:, 1].sum() + terminal_prob[-1, 1],
+            "mean_duration": (stop_prob.sum(axis=1) @ duration_list
+                              + max_sample_size * terminal_prob[-1].sum()) / discordant_prob
+        }
+
+    return _get_error_rates(calc_probability, p0, d, alternative)
+
+
+def _get_error_rates(calc_probability, p0, d, alternative):
+    """
+    Вероятности ошибок и средние длительности теста
+    по функции calc_probability(p) с результатом вида one_sample_truncated_probability
+    """
+    hypothesis_res = calc_probability(p0)
+
+    # Результат теста, означающий принятие гипотезы,
+    # и значения вероятности при альтернативе
+    if alternative == "greater":
+        hypothesis_result = "low_result_prob"
+        p_list = [p0 + d]
+    elif alternative == "less":
+        hypothesis_result = "high_result_prob"
+        p_list = [p0 - d]
+    elif alternative == "two-sided":
+        hypothesis_result = "low_result_prob"
+        p_list = [p0 - d, p0 + d]
+    else:
+        raise ValueError(f"Неправильная альтернатива: {alternative}")
+    alternative_result = "high_result_prob" if hypothesis_result == "low_result_prob" else "low_result_prob"
+
+    alternative_res_list = [calc_probability(p) for p in p_list]
+
+    return {
+        "alpha": hypothesis_res[alternative_result],
+        "beta": max(res[hypothesis_result] for res in alternative_res_list),
+        "hypothesis_duration": hypothesis_res["mean_duration"],
+        "alternative_duration": max(res["mean_duration"] for res in alternative_res_list)
+    }
+
+
+def _get_test_list(p0, d, alpha, beta, alternative):
+    """
+    Параметры односторонних тестов, из которых состоит последовательный тест:
+    список из наименования альтернативы, целочисленных порогов и границ
+    """
+    if alternative == "two-sided":
+        d_low, d_high = d if np.ndim(d) > 0 else (d, d)
+        param_list = [("greater", p0, p0 + d_high, beta, alpha / 2),
+                      ("less", p0 - d_low, p0, alpha / 2, beta)]
+    elif alternative == "greater":
+        param_list = [("greater", p0, p0 + d, beta, alpha)]
+    elif alternative == "less":
+        param_list = [("less", p0 - d, p0, alpha, beta)]
+    else:
+        raise ValueError(f"Неправильная альтернатива: {alternative}")
+
+    test_list = []
+    for one_sided_alternative, p_low, p_high, alpha_low, alpha_high in param_list:
+        low_bound = np.log(alpha_low / (1 - alpha_high))
+        high_bound = np.log((1 - alpha_low) / alpha_high)
+        test_list.append((one_sided_alternative, IntegerThresholds(p_low, p_high, low_bound, high_bound)))
+
+    return test_list
+
+
+def _truncated_chain(p, test_list, max_sample_size, truncation_rule,
+                     prob_tol=TRUNCATED_PROB_TOL, last_terminal_only=False):
+    """
+    Распределение момента и результата остановки теста по шагам n <= max_sample_size
+
+    Для двусторонней альтернативы состояния продолжающегося теста:
+    обе проверки продолжаются, проверка p0 против p0 + d остановлена на нижней границе,
+    проверка p0 - d против p0 остановлена на верхней границе;
+    переходы между ними совпадают с one_sample_two_sided_sprt.
+    Расчёт останавливается, когда вероятность продолжения теста меньше prob_tol,
+    при last_terminal_only решение при усечении рассчитывается только на последнем шаге
+
+    :return: массив размера [max_sample_size + 1, 2] вероятностей остановки на шаге n
+             с результатом -1 и 1 по пересечению границ,
+             массив размера [max_sample_size + 1, 2] вероятностей результатов -1 и 1
+             при усечении теста на шаге n
+    """
+    if max_sample_size < 0:
+        raise ValueError(f"Неправильная максимальная длительность теста: {max_sample_size}")
+    if truncation_rule not in TRUNCATION_RULES:
+        raise ValueError(f"Неправильное правило усечения теста: {truncation_rule}")
+
+    for _, thresholds in test_list:
+        thresholds.extend(max_sample_size + 1)
+
+    stop_prob = np.zeros([max_sample_size + 1, 2])
+    terminal_prob = np.zeros([max_sample_size + 1, 2])
+
+    # Распределения S(n) продолжающихся тестов по состояниям:
+    # вероятности и наименьшее значение S(n)
+    state_dict = {"active": (np.ones(1), 0)}
+
+    for n in range(max_sample_size + 1):
+        if n > 0:
+            for state, (prob, offset) in state_dict.items():
+                next_prob = np.zeros(len(prob) + 1)
+                next_prob[:-1] += prob * (1 - p)
+                next_prob[1:] += prob * p
+                state_dict[state] = (next_prob, offset)
+
+        next_state_dict = {}
+        for state, (prob, offset) in state_dict.items():
+            s = offset + np.arange(len(prob))
+            crossing_list = [_get_crossing(thresholds, s, n) for _, thresholds in test_list]
+
+            # Остановка по пересечению границ и переходы между состояниями
+            result, next_state = _get_transition(state, crossing_list)
+            stop_prob[n, 0] += prob[result == -1].sum()
+            stop_prob[n, 1] += prob[result == 1].sum()
+            next_state_name_list = np.unique(next_state[result == 0])
+            for next_state_name in next_state_name_list:
+                next_state_flg = (result == 0) & (next_state == next_state_name)
+                _add_state(next_state_dict, next_state_name, prob, offset, next_state_flg)
+
+            if last_terminal_only and n < max_sample_size:
+                continue
+
+            terminal_crossing_list = [
+                np.where(crossing != 0, crossing,
+                         np.where(get_terminal_high_flg(thresholds.calc_curve(s, n),
+                                                        thresholds.low_bound, thresholds.high_bound,
+                                                        one_sided_alternative, truncation_rule), 1, -1))
+                for (one_sided_alternative, thresholds), crossing in zip(test_list, crossing_list)
+            ]
+
+            # Решение при усечении теста на шаге n: продолжающиеся тесты
+            # останавливаются с пересечением границ по правилу усечения,
+            # проверка, остановленная на этом шаге, сохраняет своё пересечение
+            for next_state_name in next_state_name_list:
+                next_state_flg = (result == 0) & (next_state == next_state_name)
+                terminal_result, _ = _get_transition(next_state_name, terminal_crossing_list)
+                terminal_prob[n, 0] += prob[next_state_flg & (terminal_result == -1)].sum()
+                terminal_prob[n, 1] += prob[next_state_flg & (terminal_result == 1)].sum()
+
+        state_dict = next_state_dict
+        if sum(prob.sum() for prob, _ in state_dict.values()) < prob_tol:
+            break
+
+    return stop_prob, terminal_prob
+
+
+def _get_crossing(thresholds, s, n):
+    """
+    Пересечение границ при S(n) = s: 1 - верхней, -1 - нижней, 0 - нет пересечения
+    """
+    return np.where(s >= thresholds.reject[n], 1, np.where(s <= thresholds.accept[n], -1, 0))
+
+
+def _get_transition(state, crossing_list):
+    """
+    Результат теста и следующее состояние по пересечениям границ
+    для продолжающихся тестов в состоянии state
+    """
+    if len(crossing_list) == 1:
+        crossing, = crossing_list
+        return crossing, np.full(crossing.shape, "active", dtype=object)
+
+    greater_crossing, less_crossing = crossing_list
+    result = np.zeros(greater_crossing.shape, dtype=np.int64)
+    next_state = np.full(greater_crossing.shape, state, dtype=object)
+
+    if state == "active":
+        # Значимое изменение вероятности при пересечении границы для p0 + d или p0 - d
+        significant_flg = (greater_crossing == 1) | (less_crossing == -1)
+        result[significant_flg] = 1
+        result[~significant_flg & (greater_crossing == -1) & (less_crossing == 1)] = -1
+        next_state[(result == 0) & (greater_crossing == -1)] = "greater_stop"
+        next_state[(result == 0) & (less_crossing == 1)] = "less_stop"
+    elif state == "greater_stop":
+        result = less_crossing.copy()
+        result[less_crossing == -1] = 1
+        result[less_crossing == 1] = -1
+    else:
+        result = greater_crossing.copy()
+
+    return result, next_state
+
+
+def _add_state(state_dict, state, prob, offset, flg):
+    """
+    Добавление вероятностей значений S(n) с флагом flg в распределение состояния state
+    """
+    index_list = np.nonzero(flg)[0]
+    prob = np.where(flg, prob, 0)[index_list[0]:index_list[-1] + 1]
+    offset += index_list[0]
+
+    if state not in state_dict:
+        state_dict[state] = (prob, offset)
+        return
+
+    state_prob, state_offset = state_dict[state]
+    start = min(offset, state_offset)
+    end = max(offset + len(prob), state_offset + len(state_prob))
+    merged_prob = np.zeros(end - start)
+    merged_prob[state_offset - start:state_offset - start + len(state_prob)] += state_prob
+    merged_prob[offset - start:offset - start + len(prob)] += prob
+    state_dict[state] = (merged_prob, start)
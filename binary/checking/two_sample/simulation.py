@@ -1,13 +1,64 @@
+import os
+
 import numpy as np
-from scipy.stats import bernoulli
 
+from binary.checking.boundary_calibration import get_bounds
+from binary.checking.checkpoint import SimulationCheckpoint, get_completed_state, read_checkpoint_params, \
+    restore_completed_state
+from binary.checking.counter_rng import CounterRandomState, get_batch_random_state
+from binary.checking.dtype_policy import get_count_dtype, get_outcome_dtype
+from binary.checking.look_schedule import get_look_sizes, normalize_look_schedule
 from binary.checking.one_sample_one_sided_sprt import one_sample_one_sided_sprt
 from binary.checking.one_sample_two_sided_sprt import one_sample_two_sided_sprt
-from binary.checking.two_sample_one_sided_sprt import two_sample_one_sided_sprt
-from binary.checking.two_sample_two_sided_sprt import two_sample_two_sided_sprt
+from binary.checking.two_sample_one_sided_sprt import two_sample_one_sided_sprt, two_sample_one_sided_fused_sprt, \
+    two_sample_one_sided_look_sprt
+from binary.checking.two_sample_two_sided_sprt import two_sample_two_sided_sprt, two_sample_two_sided_fused_sprt, \
+    two_sample_two_sided_look_sprt
+from binary.checking.parallel_simulation import process_simulation, threaded_simulation
+from binary.checking.profiling import profile_mark, profile_run
+from binary.checking.sampling import bernoulli_sample, discordant_look_sample, packed_bernoulli_sample
+from binary.checking.result_sink import ResultSink, allocate_records, check_records, get_record_dtype
+from binary.checking.simulation_summary import SimulationSummary
+from binary.sprt.two_sample_sprt import BinaryTwoSampleSprt
+
+
+# Типы полей результата моделирования для записи в разделяемую память
+RESULT_FIELDS = {
+    "duration": np.int64,
+    "result": np.int64,
+    "result_x_s": np.int64,
+    "result_y_s": np.int64,
+    "test_index": np.int64
+}
+
+# Тип записи о законченном тесте, поля совпадают с ключами словаря результата
+RECORD_DTYPE = get_record_dtype(RESULT_FIELDS)
+
+
+def draw_sample(p, size, narrow_dtype=False, packed=False, random_state=None):
+    """
+    Розыгрыш батча выборки одной вариации для незаконченных тестов
+
+    :param p: реальное значение вероятности
+    :param size: размер батча [remain_iter_cnt, batch_size]
+    :param narrow_dtype: флаг использования узких типов данных
+    :param packed: флаг хранения выборки в упакованном виде
+    :param random_state: генератор случайных чисел np.random.Generator,
+                         None - глобальный генератор numpy
+    :return: выборка
+    """
+    if packed:
+        return packed_bernoulli_sample(p, size, random_state=random_state)
+    else:
+        return bernoulli_sample(p, size, dtype=get_outcome_dtype(narrow_dtype),
+                                random_state=random_state)
 
 
-def one_sided_simulation_sprt(p_x, p_y, iter_size, batch_size, p0, d, alpha, beta, alternative):
+def one_sided_simulation_sprt(p_x, p_y, iter_size, batch_size, p0, d, alpha, beta, alternative,
+                              fused=False, narrow_dtype=False, packed=False, random_state=None, summary=False,
+                              records=None, checkpoint=None, look_schedule=None,
+                              max_sample_size=None, truncation_rule="curve", profiler=None,
+                              kernel_backend=None):
     """
     Моделирование последовательного анализа
     параллельно в iter_size тестах
@@ -22,7 +73,35 @@ def one_sided_simulation_sprt(p_x, p_y, iter_size, batch_size, p0, d, alpha, bet
     :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
     :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
     :param alternative: наименование односторонней альтернативы
-    :return: словарь res
+    :param fused: флаг использования реализации без матриц накопленных сумм каждой из выборок,
+                  результат совпадает, но требуется в несколько раз меньше памяти
+    :param narrow_dtype: флаг использования узких типов данных:
+                         выборка в uint8, накопленные суммы в int32,
+                         кривая в float32, если это позволяет величина границ
+    :param packed: флаг хранения выборок в упакованном виде по 64 значения в машинное слово,
+                   несовпадающие пары считаются через XOR, всегда используется реализация fused
+    :param random_state: генератор случайных чисел np.random.Generator,
+                         None - глобальный генератор numpy
+    :param summary: флаг сводного режима: вместо списков характеристик тестов
+                    накапливается сводная статистика, объём памяти не зависит от iter_size
+    :param records: режим записи характеристик тестов в структурный массив RECORD_DTYPE:
+                    True - массив в памяти или во временном файле, если он больше MEMMAP_THRESHOLD,
+                    путь к файлу .npy - массив отображается на этот файл,
+                    массив - запись в заранее выделенный массив,
+                    None - словарь списков
+    :param checkpoint: контрольная точка SimulationCheckpoint,
+                       если она уже сохранена, то моделирование продолжается с неё
+    :param look_schedule: расписание просмотров для get_look_sizes, если задано,
+                          то пересечение границ проверяется только в моменты просмотров,
+                          batch_size - количество просмотров в батче,
+                          а разыгрываются только накопленные суммы в моменты просмотров
+    :param max_sample_size: максимальная длительность теста, в которую тест усекается,
+                            None - тест не усекается
+    :param truncation_rule: правило принятия решения при усечении из TRUNCATION_RULES
+    :param profiler: профилировщик SimulationProfiler, которому сообщается о каждом раунде
+    :param kernel_backend: вычислительный бэкенд ядер из KERNEL_BACKENDS, None - выбранный get_kernel_backend
+    :return: накопитель SimulationSummary в сводном режиме,
+             структурный массив записей в режиме records, иначе словарь res
              res["duration"] - список длительностей теста
              res["result"] - список результатов теста
                              для alternative = "less"
@@ -33,31 +112,106 @@ def one_sided_simulation_sprt(p_x, p_y, iter_size, batch_size, p0, d, alpha, bet
                                 1: тест закончился, есть стат. значимое повышение вероятности
              res["result_x_s"] - список значений S(n) на момент длительности теста для первой вариации
              res["result_y_s"] - список значений S(n) на момент длительности теста для второй вариации
+             res["test_index"] - список номеров тестов в порядке их окончания
     """
     # Суммарная длительность незаконченных тестов
     total_duration = 0
+    # Количество прошедших просмотров при расписании просмотров
+    total_look_cnt = 0
+    # Количество прошедших батчей
+    total_batch_cnt = 0
 
     # Характеристики законченных тестов
+    completed_summary = SimulationSummary() if summary else None
+    completed_records = None
+    if records is not None:
+        completed_records = ResultSink(iter_size, RECORD_DTYPE, records,
+                                       resume=checkpoint is not None and checkpoint.exists())
     completed_duration_list = []
     completed_result_list = []
     completed_x_s_list = []
     completed_y_s_list = []
+    completed_index_list = []
 
     # Характеристики незаконченных тестов
     remain_iter_cnt = iter_size
+    remain_index = np.arange(iter_size)
     remain_last_curve = None
     remain_x_s_list = 0
     remain_y_s_list = 0
 
+    sprt = two_sample_one_sided_fused_sprt if fused or packed else two_sample_one_sided_sprt
+    sprt_kwargs = {"packed_sample_size": batch_size} if packed else {}
+
+    # Восстанавливаем состояние из контрольной точки
+    if checkpoint is not None and checkpoint.exists():
+        state, random_state = checkpoint.load(random_state)
+        total_duration = state["total_duration"]
+        total_look_cnt = state.get("total_look_cnt", 0)
+        total_batch_cnt = state.get("total_batch_cnt", 0)
+        remain_iter_cnt = state["remain_iter_cnt"]
+        remain_index = state.get("remain_index", np.arange(remain_iter_cnt))
+        remain_last_curve = state["remain_last_curve"]
+        remain_x_s_list = state["remain_x_s_list"]
+        remain_y_s_list = state["remain_y_s_list"]
+        completed_summary, completed_list_dict = restore_completed_state(state["completed"],
+                                                                         completed_summary,
+                                                                         completed_records)
+        completed_duration_list = completed_list_dict.get("duration", [])
+        completed_result_list = completed_list_dict.get("result", [])
+        completed_x_s_list = completed_list_dict.get("result_x_s", [])
+        completed_y_s_list = completed_list_dict.get("result_y_s", [])
+        completed_index_list = completed_list_dict.get("test_index", [])
+
     # Итерируемся пока есть незаконченные тесты
     while remain_iter_cnt > 0:
+        if profiler is not None:
+            profiler.start_round(remain_iter_cnt, batch_size)
+
+        # Усечение теста отсчитывается от начала батча
+        truncation_kwargs = dict(max_sample_size=None if max_sample_size is None
+                                 else max_sample_size - total_duration,
+                                 truncation_rule=truncation_rule)
+
+        # Генератор батча для незаконченных тестов
+        batch_random_state = get_batch_random_state(random_state, remain_index, total_batch_cnt)
+
         # Разыгрываем батч выборки для незаконченных тестов
         # и собираем статистику по этому батчу
-        x = bernoulli.rvs(p_x, size=[remain_iter_cnt, batch_size])
-        y = bernoulli.rvs(p_y, size=[remain_iter_cnt, batch_size])
-        res = two_sample_one_sided_sprt(x, y, p0, d, alpha, beta,
-                                        alternative=alternative,
-                                        initial_curve=remain_last_curve)
+        if look_schedule is None:
+            x = draw_sample(p_x, [remain_iter_cnt, batch_size], narrow_dtype, packed, batch_random_state)
+            y = draw_sample(p_y, [remain_iter_cnt, batch_size], narrow_dtype, packed, batch_random_state)
+            profile_mark("sample")
+            res = sprt(x, y, p0, d, alpha, beta,
+                       alternative=alternative,
+                       initial_curve=remain_last_curve,
+                       narrow_dtype=narrow_dtype,
+                       **sprt_kwargs,
+                       kernel_backend=kernel_backend,
+                       **truncation_kwargs)
+            profile_mark("kernel")
+            batch_duration = batch_size
+        else:
+            # Разыгрываем только накопленные суммы в моменты просмотров батча
+            look_list = get_look_sizes(look_schedule, total_look_cnt, batch_size)
+            if max_sample_size is not None:
+                # Последний просмотр - в момент усечения теста
+                look_list = np.minimum(look_list, max_sample_size)
+            look_list = look_list - total_duration
+            x_s_list, y_s_list, s_list, n_list = discordant_look_sample(p_x, p_y, look_list, remain_iter_cnt,
+                                                                        get_count_dtype(narrow_dtype),
+                                                                        batch_random_state)
+            profile_mark("sample")
+            res = two_sample_one_sided_look_sprt(x_s_list, y_s_list, s_list, n_list, look_list,
+                                                 p0, d, alpha, beta,
+                                                 alternative=alternative,
+                                                 initial_curve=remain_last_curve,
+                                                 narrow_dtype=narrow_dtype,
+                                                 kernel_backend=kernel_backend,
+                                                 **truncation_kwargs)
+            profile_mark("kernel")
+            batch_duration = look_list[-1]
+            total_look_cnt += batch_size
 
         remain_duration_list = total_duration + res["duration"]
         remain_result_list = res["result"]
@@ -68,28 +222,76 @@ def one_sided_simulation_sprt(p_x, p_y, iter_size, batch_size, p0, d, alpha, bet
         # Определяем незаконченные тесты
         remain_test_flg = remain_result_list == 0
         remain_iter_cnt = np.sum(remain_test_flg)
+        completed_index = remain_index[~remain_test_flg]
+        remain_index = remain_index[remain_test_flg]
 
         # Рассчитываем характеристики законченных тестов
-        completed_duration_list += list(remain_duration_list[~remain_test_flg])
-        completed_result_list += list(remain_result_list[~remain_test_flg])
-        completed_x_s_list += list(remain_x_s_list[~remain_test_flg])
-        completed_y_s_list += list(remain_y_s_list[~remain_test_flg])
+        if completed_summary is not None:
+            completed_summary.update(remain_duration_list[~remain_test_flg],
+                                     remain_result_list[~remain_test_flg])
+        elif completed_records is not None:
+            completed_records.write(duration=remain_duration_list[~remain_test_flg],
+                                    result=remain_result_list[~remain_test_flg],
+                                    result_x_s=remain_x_s_list[~remain_test_flg],
+                                    result_y_s=remain_y_s_list[~remain_test_flg],
+                                    test_index=completed_index)
+        else:
+            completed_duration_list += list(remain_duration_list[~remain_test_flg])
+            completed_result_list += list(remain_result_list[~remain_test_flg])
+            completed_x_s_list += list(remain_x_s_list[~remain_test_flg])
+            completed_y_s_list += list(remain_y_s_list[~remain_test_flg])
+            completed_index_list += list(completed_index)
 
         # Рассчитываем характеристики незаконченных тестов
         remain_last_curve = last_curve[remain_test_flg]
         remain_x_s_list = remain_x_s_list[remain_test_flg]
         remain_y_s_list = remain_y_s_list[remain_test_flg]
-        total_duration += batch_size
+        total_duration += batch_duration
+        total_batch_cnt += 1
+        profile_mark("bookkeeping")
+
+        # Сохраняем контрольную точку
+        if checkpoint is not None and checkpoint.due(remain_iter_cnt):
+            checkpoint.save(random_state,
+                            total_duration=total_duration,
+                            total_look_cnt=total_look_cnt,
+                            total_batch_cnt=total_batch_cnt,
+                            remain_iter_cnt=remain_iter_cnt,
+                            remain_index=remain_index,
+                            remain_last_curve=remain_last_curve,
+                            remain_x_s_list=remain_x_s_list,
+                            remain_y_s_list=remain_y_s_list,
+                            completed=get_completed_state(completed_summary, completed_records,
+                                                          duration=completed_duration_list,
+                                                          result=completed_result_list,
+                                                          result_x_s=completed_x_s_list,
+                                                          result_y_s=completed_y_s_list,
+                                                          test_index=completed_index_list))
+        profile_mark("checkpoint")
+
+        if profiler is not None:
+            # Наблюдения разыгрываются в обеих вариациях
+            profiler.end_round(2 * len(remain_test_flg) * batch_duration)
+
+    if completed_summary is not None:
+        return completed_summary
+    if completed_records is not None:
+        return completed_records.records
 
     return {
         "duration": np.array(completed_duration_list),
         "result": np.array(completed_result_list),
         "result_x_s": np.array(completed_x_s_list),
-        "result_y_s": np.array(completed_y_s_list)
+        "result_y_s": np.array(completed_y_s_list),
+        "test_index": np.array(completed_index_list, dtype=np.int64)
     }
 
 
-def two_sided_simulation_sprt(p_x, p_y, iter_size, batch_size, p0, d, alpha, beta):
+def two_sided_simulation_sprt(p_x, p_y, iter_size, batch_size, p0, d, alpha, beta,
+                              fused=False, narrow_dtype=False, packed=False, random_state=None, summary=False,
+                              records=None, checkpoint=None, look_schedule=None,
+                              max_sample_size=None, truncation_rule="curve", profiler=None,
+                              kernel_backend=None):
     """
     Моделирование последовательного анализа
     параллельно в iter_size тестах
@@ -103,25 +305,65 @@ def two_sided_simulation_sprt(p_x, p_y, iter_size, batch_size, p0, d, alpha, bet
     :param d: абсолютное значение MDE
     :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
     :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
-    :return: словарь res
+    :param fused: флаг использования реализации без матриц накопленных сумм каждой из выборок,
+                  результат совпадает, но требуется в несколько раз меньше памяти
+    :param narrow_dtype: флаг использования узких типов данных:
+                         выборка в uint8, накопленные суммы в int32,
+                         кривая в float32, если это позволяет величина границ
+    :param packed: флаг хранения выборок в упакованном виде по 64 значения в машинное слово,
+                   несовпадающие пары считаются через XOR, всегда используется реализация fused
+    :param random_state: генератор случайных чисел np.random.Generator,
+                         None - глобальный генератор numpy
+    :param summary: флаг сводного режима: вместо списков характеристик тестов
+                    накапливается сводная статистика, объём памяти не зависит от iter_size
+    :param records: режим записи характеристик тестов в структурный массив RECORD_DTYPE:
+                    True - массив в памяти или во временном файле, если он больше MEMMAP_THRESHOLD,
+                    путь к файлу .npy - массив отображается на этот файл,
+                    массив - запись в заранее выделенный массив,
+                    None - словарь списков
+    :param checkpoint: контрольная точка SimulationCheckpoint,
+                       если она уже сохранена, то моделирование продолжается с неё
+    :param look_schedule: расписание просмотров для get_look_sizes, если задано,
+                          то пересечение границ проверяется только в моменты просмотров,
+                          batch_size - количество просмотров в батче,
+                          а разыгрываются только накопленные суммы в моменты просмотров
+    :param max_sample_size: максимальная длительность теста, в которую тест усекается,
+                            None - тест не усекается
+    :param truncation_rule: правило принятия решения при усечении из TRUNCATION_RULES
+    :param profiler: профилировщик SimulationProfiler, которому сообщается о каждом раунде
+    :param kernel_backend: вычислительный бэкенд ядер из KERNEL_BACKENDS, None - выбранный get_kernel_backend
+    :return: накопитель SimulationSummary в сводном режиме,
+             структурный массив записей в режиме records, иначе словарь res
              res["duration"] - список длительностей теста
              res["result"] - список результатов теста
                                 -1: тест закончился, нет стат. значимого изменения вероятности
                                 1: тест закончился, есть стат. значимое изменение вероятности
              res["result_x_s"] - список значений S(n) на момент длительности теста для первой вариации
              res["result_y_s"] - список значений S(n) на момент длительности теста для второй вариации
+             res["test_index"] - список номеров тестов в порядке их окончания
     """
     # Суммарная длительность незаконченных тестов
     total_duration = 0
+    # Количество прошедших просмотров при расписании просмотров
+    total_look_cnt = 0
+    # Количество прошедших батчей
+    total_batch_cnt = 0
 
     # Характеристики законченных тестов
+    completed_summary = SimulationSummary() if summary else None
+    completed_records = None
+    if records is not None:
+        completed_records = ResultSink(iter_size, RECORD_DTYPE, records,
+                                       resume=checkpoint is not None and checkpoint.exists())
     completed_duration_list = []
     completed_result_list = []
     completed_x_s_list = []
     completed_y_s_list = []
+    completed_index_list = []
 
     # Характеристики незаконченных тестов
     remain_iter_cnt = iter_size
+    remain_index = np.arange(iter_size)
     remain_greater_last_curve = None
     remain_less_last_curve = None
     remain_greater_stop_flg = None
@@ -129,14 +371,82 @@ def two_sided_simulation_sprt(p_x, p_y, iter_size, batch_size, p0, d, alpha, bet
     remain_x_s_list = 0
     remain_y_s_list = 0
 
+    sprt = two_sample_two_sided_fused_sprt if fused or packed else two_sample_two_sided_sprt
+    sprt_kwargs = {"packed_sample_size": batch_size} if packed else {}
+
+    # Восстанавливаем состояние из контрольной точки
+    if checkpoint is not None and checkpoint.exists():
+        state, random_state = checkpoint.load(random_state)
+        total_duration = state["total_duration"]
+        total_look_cnt = state.get("total_look_cnt", 0)
+        total_batch_cnt = state.get("total_batch_cnt", 0)
+        remain_iter_cnt = state["remain_iter_cnt"]
+        remain_index = state.get("remain_index", np.arange(remain_iter_cnt))
+        remain_greater_last_curve = state["remain_greater_last_curve"]
+        remain_less_last_curve = state["remain_less_last_curve"]
+        remain_greater_stop_flg = state["remain_greater_stop_flg"]
+        remain_less_stop_flg = state["remain_less_stop_flg"]
+        remain_x_s_list = state["remain_x_s_list"]
+        remain_y_s_list = state["remain_y_s_list"]
+        completed_summary, completed_list_dict = restore_completed_state(state["completed"],
+                                                                         completed_summary,
+                                                                         completed_records)
+        completed_duration_list = completed_list_dict.get("duration", [])
+        completed_result_list = completed_list_dict.get("result", [])
+        completed_x_s_list = completed_list_dict.get("result_x_s", [])
+        completed_y_s_list = completed_list_dict.get("result_y_s", [])
+        completed_index_list = completed_list_dict.get("test_index", [])
+
     while remain_iter_cnt > 0:
-        x = bernoulli.rvs(p_x, size=[remain_iter_cnt, batch_size])
-        y = bernoulli.rvs(p_y, size=[remain_iter_cnt, batch_size])
-        res = two_sample_two_sided_sprt(x, y, p0, d, alpha, beta,
-                                        greater_initial_curve=remain_greater_last_curve,
-                                        less_initial_curve=remain_less_last_curve,
-                                        greater_stop_flg=remain_greater_stop_flg,
-                                        less_stop_flg=remain_less_stop_flg)
+        if profiler is not None:
+            profiler.start_round(remain_iter_cnt, batch_size)
+
+        # Усечение теста отсчитывается от начала батча
+        truncation_kwargs = dict(max_sample_size=None if max_sample_size is None
+                                 else max_sample_size - total_duration,
+                                 truncation_rule=truncation_rule)
+
+        # Генератор батча для незаконченных тестов
+        batch_random_state = get_batch_random_state(random_state, remain_index, total_batch_cnt)
+
+        if look_schedule is None:
+            x = draw_sample(p_x, [remain_iter_cnt, batch_size], narrow_dtype, packed, batch_random_state)
+            y = draw_sample(p_y, [remain_iter_cnt, batch_size], narrow_dtype, packed, batch_random_state)
+            profile_mark("sample")
+            res = sprt(x, y, p0, d, alpha, beta,
+                       greater_initial_curve=remain_greater_last_curve,
+                       less_initial_curve=remain_less_last_curve,
+                       greater_stop_flg=remain_greater_stop_flg,
+                       less_stop_flg=remain_less_stop_flg,
+                       narrow_dtype=narrow_dtype,
+                       **sprt_kwargs,
+                       kernel_backend=kernel_backend,
+                       **truncation_kwargs)
+            profile_mark("kernel")
+            batch_duration = batch_size
+        else:
+            # Разыгрываем только накопленные суммы в моменты просмотров батча
+            look_list = get_look_sizes(look_schedule, total_look_cnt, batch_size)
+            if max_sample_size is not None:
+                # Последний просмотр - в момент усечения теста
+                look_list = np.minimum(look_list, max_sample_size)
+            look_list = look_list - total_duration
+            x_s_list, y_s_list, s_list, n_list = discordant_look_sample(p_x, p_y, look_list, remain_iter_cnt,
+                                                                        get_count_dtype(narrow_dtype),
+                                                                        batch_random_state)
+            profile_mark("sample")
+            res = two_sample_two_sided_look_sprt(x_s_list, y_s_list, s_list, n_list, look_list,
+                                                 p0, d, alpha, beta,
+                                                 greater_initial_curve=remain_greater_last_curve,
+                                                 less_initial_curve=remain_less_last_curve,
+                                                 greater_stop_flg=remain_greater_stop_flg,
+                                                 less_stop_flg=remain_less_stop_flg,
+                                                 narrow_dtype=narrow_dtype,
+                                                 kernel_backend=kernel_backend,
+                                                 **truncation_kwargs)
+            profile_mark("kernel")
+            batch_duration = look_list[-1]
+            total_look_cnt += batch_size
 
         remain_duration_list = total_duration + res["duration"]
         remain_result_list = res["result"]
@@ -149,29 +459,81 @@ def two_sided_simulation_sprt(p_x, p_y, iter_size, batch_size, p0, d, alpha, bet
 
         remain_test_flg = remain_result_list == 0
         remain_iter_cnt = np.sum(remain_test_flg)
+        completed_index = remain_index[~remain_test_flg]
+        remain_index = remain_index[remain_test_flg]
 
-        completed_duration_list += list(remain_duration_list[~remain_test_flg])
-        completed_result_list += list(remain_result_list[~remain_test_flg])
-        completed_x_s_list += list(remain_x_s_list[~remain_test_flg])
-        completed_y_s_list += list(remain_y_s_list[~remain_test_flg])
+        if completed_summary is not None:
+            completed_summary.update(remain_duration_list[~remain_test_flg],
+                                     remain_result_list[~remain_test_flg])
+        elif completed_records is not None:
+            completed_records.write(duration=remain_duration_list[~remain_test_flg],
+                                    result=remain_result_list[~remain_test_flg],
+                                    result_x_s=remain_x_s_list[~remain_test_flg],
+                                    result_y_s=remain_y_s_list[~remain_test_flg],
+                                    test_index=completed_index)
+        else:
+            completed_duration_list += list(remain_duration_list[~remain_test_flg])
+            completed_result_list += list(remain_result_list[~remain_test_flg])
+            completed_x_s_list += list(remain_x_s_list[~remain_test_flg])
+            completed_y_s_list += list(remain_y_s_list[~remain_test_flg])
+            completed_index_list += list(completed_index)
 
         remain_greater_last_curve = remain_greater_last_curve[remain_test_flg]
         remain_less_last_curve = remain_less_last_curve[remain_test_flg]
         remain_x_s_list = remain_x_s_list[remain_test_flg]
         remain_y_s_list = remain_y_s_list[remain_test_flg]
-        total_duration += batch_size
+        total_duration += batch_duration
+        total_batch_cnt += 1
         remain_greater_stop_flg = remain_greater_stop_flg[remain_test_flg]
         remain_less_stop_flg = remain_less_stop_flg[remain_test_flg]
+        profile_mark("bookkeeping")
+
+        # Сохраняем контрольную точку
+        if checkpoint is not None and checkpoint.due(remain_iter_cnt):
+            checkpoint.save(random_state,
+                            total_duration=total_duration,
+                            total_look_cnt=total_look_cnt,
+                            total_batch_cnt=total_batch_cnt,
+                            remain_iter_cnt=remain_iter_cnt,
+                            remain_index=remain_index,
+                            remain_greater_last_curve=remain_greater_last_curve,
+                            remain_less_last_curve=remain_less_last_curve,
+                            remain_greater_stop_flg=remain_greater_stop_flg,
+                            remain_less_stop_flg=remain_less_stop_flg,
+                            remain_x_s_list=remain_x_s_list,
+                            remain_y_s_list=remain_y_s_list,
+                            completed=get_completed_state(completed_summary, completed_records,
+                                                          duration=completed_duration_list,
+                                                          result=completed_result_list,
+                                                          result_x_s=completed_x_s_list,
+                                                          result_y_s=completed_y_s_list,
+                                                          test_index=completed_index_list))
+        profile_mark("checkpoint")
+
+        if profiler is not None:
+            # Наблюдения разыгрываются в обеих вариациях
+            profiler.end_round(2 * len(remain_test_flg) * batch_duration)
+
+    if completed_summary is not None:
+        return completed_summary
+    if completed_records is not None:
+        return completed_records.records
 
     return {
         "duration": np.array(completed_duration_list),
         "result": np.array(completed_result_list),
         "result_x_s": np.array(completed_x_s_list),
-        "result_y_s": np.array(completed_y_s_list)
+        "result_y_s": np.array(completed_y_s_list),
+        "test_index": np.array(completed_index_list, dtype=np.int64)
     }
 
 
-def simulation_sprt(p_x, p_y, iter_size, batch_size, p0, d, alpha, beta, alternative):
+def simulation_sprt(p_x, p_y, iter_size, batch_size, p0, d, alpha, beta, alternative,
+                    fused=False, narrow_dtype=False, packed=False, random_state=None,
+                    n_jobs=None, chunk_size=None, backend="threads", summary=False,
+                    records=None, checkpoint_path=None, checkpoint_every=1, look_schedule=None,
+                    max_sample_size=None, truncation_rule="curve", counter_rng=False, profiler=None,
+                    kernel_backend=None):
     """
     Моделирование последовательного анализа
     параллельно в iter_size тестах
@@ -185,7 +547,70 @@ def simulation_sprt(p_x, p_y, iter_size, batch_size, p0, d, alpha, beta, alterna
     :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
     :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
     :param alternative: наименование альтернативы
-    :return: словарь res
+    :param fused: флаг использования реализации без матриц накопленных сумм каждой из выборок,
+                  результат совпадает, но требуется в несколько раз меньше памяти
+    :param narrow_dtype: флаг использования узких типов данных:
+                         выборка в uint8, накопленные суммы в int32,
+                         кривая в float32, если это позволяет величина границ
+    :param packed: флаг хранения выборок в упакованном виде по 64 значения в машинное слово,
+                   несовпадающие пары считаются через XOR, всегда используется реализация fused
+    :param random_state: seed или np.random.SeedSequence при n_jobs,
+                         иначе также может быть генератором np.random.Generator,
+                         None - глобальный генератор numpy (без n_jobs),
+                         при counter_rng - целое число seed или CounterRandomState
+    :param n_jobs: количество потоков или процессов, если задано,
+                   то тесты разбиваются на части по chunk_size
+                   и моделируются в пуле,
+                   результат не зависит от количества потоков или процессов
+    :param chunk_size: количество тестов в одной части при n_jobs
+    :param backend: пул для моделирования при n_jobs
+                    "threads" - пул потоков
+                    "processes" - пул процессов, результаты записываются
+                                  в разделяемую память и возвращаются без копирования
+    :param summary: флаг сводного режима: вместо списков характеристик тестов
+                    накапливается сводная статистика, объём памяти не зависит от iter_size,
+                    накопители частей моделирования объединяются
+    :param records: режим записи характеристик тестов в структурный массив RECORD_DTYPE:
+                    True - массив в памяти или во временном файле, если он больше MEMMAP_THRESHOLD,
+                    путь к файлу .npy - массив отображается на этот файл,
+                    массив размера iter_size типа RECORD_DTYPE - запись в заранее выделенный массив,
+                    None - словарь списков,
+                    в пуле потоков каждая часть пишет в свой срез общего массива
+    :param checkpoint_path: путь к файлу контрольной точки, если задан,
+                            то состояние моделирования сохраняется в него,
+                            а если файл уже есть, то моделирование продолжается с него
+                            с тем же результатом, что и без прерывания (без n_jobs)
+    :param checkpoint_every: количество батчей между сохранениями контрольной точки
+    :param look_schedule: расписание просмотров: целое число k - просмотр после каждых k пар наблюдений,
+                          возрастающий список количеств пар в моменты просмотров,
+                          после последнего из них просмотры продолжаются с последним интервалом,
+                          None - решение принимается после каждой пары;
+                          при заданном расписании batch_size - количество просмотров в батче,
+                          fused и packed не используются, длительность теста - количество пар
+                          в момент просмотра с принятием решения
+    :param max_sample_size: максимальная длительность теста (количество пар),
+                            в которую незаконченный тест усекается с решением
+                            по правилу truncation_rule, None - тест не усекается,
+                            значение по умолчанию можно получить из get_max_sample_size
+    :param truncation_rule: правило принятия решения при усечении из TRUNCATION_RULES:
+                            "curve" - по знаку логарифмического отношения правдоподобий,
+                            "midpoint" - по середине между границами,
+                            "hypothesis" - в пользу гипотезы
+    :param counter_rng: флаг розыгрыша выборки генератором на основе счётчика CounterRandomState:
+                        значения выборки теста зависят только от seed, номера теста и номера батча,
+                        поэтому результат не зависит от n_jobs и chunk_size,
+                        а траекторию любого теста восстанавливает reconstruct_trajectory
+    :param profiler: профилировщик SimulationProfiler: каждый раунд (батч) сообщает ему
+                     количество незаконченных тестов, размер батча, время стадий,
+                     объём выделенной памяти и скорость моделирования в наблюдениях в секунду,
+                     сводный отчёт после моделирования - profiler.report(),
+                     запущенная им трассировка памяти останавливается в конце моделирования,
+                     в пуле процессов не поддерживается
+    :param kernel_backend: вычислительный бэкенд ядер из KERNEL_BACKENDS (в отличие от backend - пула при n_jobs):
+                           numpy - матрицы батча, numba - построчный цикл с тем же результатом,
+                           None - выбранный get_kernel_backend, в пуле процессов - в каждом процессе
+    :return: накопитель SimulationSummary в сводном режиме,
+             структурный массив записей в режиме records, иначе словарь res
              res["duration"] - список длительностей теста
              res["result"] - список результатов теста
                              для alternative = "less"
@@ -198,8 +623,201 @@ def simulation_sprt(p_x, p_y, iter_size, batch_size, p0, d, alpha, beta, alterna
                                 -1: тест закончился, нет стат. значимого изменения вероятности
                                 1: тест закончился, есть стат. значимое изменение вероятности
              res["result_s"] - список значений S(n) на момент длительности теста
+             res["test_index"] - список номеров тестов в моделировании: строки идут в порядке
+                                 окончания тестов, номер считается с нуля в пределах вызова
+                                 (при n_jobs - с учётом смещения части) и при counter_rng
+                                 передаётся в reconstruct_trajectory как test_index
+                                 вместе с тем же random_state
     """
-    if alternative == "two-sided":
-        return two_sided_simulation_sprt(p_x, p_y, iter_size, batch_size, p0, d, alpha, beta)
-    else:
-        return one_sided_simulation_sprt(p_x, p_y, iter_size, batch_size, p0, d, alpha, beta, alternative)
+    if counter_rng and not isinstance(random_state, CounterRandomState):
+        random_state = CounterRandomState(random_state)
+
+    if n_jobs is not None:
+        if checkpoint_path is not None:
+            raise ValueError("Контрольные точки не поддерживаются при n_jobs")
+
+        kwargs = dict(p_x=p_x, p_y=p_y, batch_size=batch_size, p0=p0, d=d, alpha=alpha, beta=beta,
+                      alternative=alternative, fused=fused, narrow_dtype=narrow_dtype, packed=packed,
+                      summary=summary, look_schedule=look_schedule,
+                      max_sample_size=max_sample_size, truncation_rule=truncation_rule,
+                      kernel_backend=kernel_backend)
+        if backend == "threads":
+            kwargs["profiler"] = profiler
+            if summary:
+                records = None
+            elif isinstance(records, np.ndarray):
+                records = check_records(records, iter_size, RECORD_DTYPE)
+            elif records is not None:
+                records = allocate_records(iter_size, RECORD_DTYPE, None if records is True else records)
+            with profile_run(profiler):
+                return threaded_simulation(simulation_sprt, iter_size,
+                                           random_state=random_state, n_jobs=n_jobs, chunk_size=chunk_size,
+                                           records=records, **kwargs)
+        elif backend == "processes":
+            if records is not None:
+                raise ValueError("Запись в массив записей не поддерживается в пуле процессов")
+            if profiler is not None:
+                raise ValueError("Профилирование не поддерживается в пуле процессов")
+            return process_simulation(simulation_sprt, iter_size, None if summary else RESULT_FIELDS,
+                                      random_state=random_state, n_jobs=n_jobs, chunk_size=chunk_size,
+                                      **kwargs)
+        else:
+            raise ValueError(f"Неправильный пул для моделирования: {backend}")
+
+    if random_state is not None and not isinstance(random_state, CounterRandomState):
+        random_state = np.random.default_rng(random_state)
+
+    checkpoint = None
+    if checkpoint_path is not None:
+        params = dict(p_x=p_x, p_y=p_y, iter_size=iter_size, batch_size=batch_size,
+                      p0=p0, d=d, alpha=alpha, beta=beta, alternative=alternative,
+                      fused=fused, narrow_dtype=narrow_dtype, packed=packed, summary=summary,
+                      records=records is not None)
+        if isinstance(records, (str, os.PathLike)):
+            params["records"] = os.fspath(records)
+        if look_schedule is not None:
+            params["look_schedule"] = normalize_look_schedule(look_schedule)
+        if max_sample_size is not None:
+            params["max_sample_size"] = int(max_sample_size)
+            params["truncation_rule"] = truncation_rule
+        if counter_rng:
+            params["counter_rng"] = True
+            params["random_state"] = random_state.seed
+        checkpoint = SimulationCheckpoint(checkpoint_path, params, checkpoint_every)
+
+    with profile_run(profiler):
+        if alternative == "two-sided":
+            return two_sided_simulation_sprt(p_x, p_y, iter_size, batch_size, p0, d, alpha, beta,
+                                             fused=fused, narrow_dtype=narrow_dtype, packed=packed,
+                                             random_state=random_state, summary=summary, records=records,
+                                             checkpoint=checkpoint, look_schedule=look_schedule,
+                                             max_sample_size=max_sample_size, truncation_rule=truncation_rule,
+                                             profiler=profiler, kernel_backend=kernel_backend)
+        else:
+            return one_sided_simulation_sprt(p_x, p_y, iter_size, batch_size, p0, d, alpha, beta, alternative,
+                                             fused=fused, narrow_dtype=narrow_dtype, packed=packed,
+                                             random_state=random_state, summary=summary, records=records,
+                                             checkpoint=checkpoint, look_schedule=look_schedule,
+                                             max_sample_size=max_sample_size, truncation_rule=truncation_rule,
+                                             profiler=profiler, kernel_backend=kernel_backend)
+
+
+def resume_simulation_sprt(checkpoint_path, checkpoint_every=1):
+    """
+    Продолжение прерванного моделирования с контрольной точки
+    с параметрами, сохранёнными в ней
+
+    :param checkpoint_path: путь к файлу контрольной точки
+    :param checkpoint_every: количество батчей между сохранениями контрольной точки
+    :return: результат simulation_sprt
+    """
+    params = read_checkpoint_params(checkpoint_path)
+    records = params.pop("records")
+    return simulation_sprt(**params,
+                           records=records or None,
+                           checkpoint_path=checkpoint_path,
+                           checkpoint_every=checkpoint_every)
+
+
+def reconstruct_trajectory(test_index, p_x, p_y, batch_size, p0, d, alpha, beta, alternative, random_state,
+                           narrow_dtype=False, look_schedule=None, max_sample_size=None,
+                           truncation_rule="curve"):
+    """
+    Восстановление траектории одного теста из моделирования с counter_rng
+
+    Выборки теста разыгрываются заново тем же генератором на основе счётчика
+    отдельно от остальных тестов, поэтому результат совпадает с результатом теста
+    в исходном моделировании, а траектории всех тестов хранить не нужно.
+    Параметры совпадают с параметрами simulation_sprt, кроме iter_size,
+    параметров пула и реализации (fused и packed не меняют результат)
+
+    :param test_index: номер теста в моделировании (поле test_index результата simulation_sprt)
+    :param p_x: реальное значение вероятности для первой вариации
+    :param p_y: реальное значение вероятности для второй вариации
+    :param batch_size: размер одного батча генерирования данных и моделирования
+    :param p0: значение вероятности при гипотезе
+    :param d: абсолютное значение MDE
+    :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+    :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
+    :param alternative: наименование альтернативы
+    :param random_state: seed моделирования или CounterRandomState
+    :param narrow_dtype: флаг использования узких типов данных
+    :param look_schedule: расписание просмотров
+    :param max_sample_size: максимальная длительность теста
+    :param truncation_rule: правило принятия решения при усечении из TRUNCATION_RULES
+    :return: словарь res
+             res["duration"] - длительность теста
+             res["result"] - результат теста, как в simulation_sprt
+             res["result_x_s"], res["result_y_s"] - количества "успехов" первой и второй выборок
+                                                    на момент длительности теста
+             res["sample_size"] - список количеств пар в моменты проверки границ
+                                  до длительности теста включительно
+             res["first_success_cnt"], res["second_success_cnt"] - списки количеств "успехов"
+                                                                   первой и второй выборок в эти моменты
+             res["one_sample_success_cnt"] - список количеств пар вида (1, 0) в эти моменты
+             res["one_sample_sample_size"] - список количеств несовпадающих пар в эти моменты
+             res["curve"] - словарь из списков значений логарифмического отношения правдоподобий
+                            в эти моменты по наименованиям односторонних проверок
+             res["bounds"] - словарь из нижней и верхней границ по тем же наименованиям
+    """
+    if not isinstance(random_state, CounterRandomState):
+        random_state = CounterRandomState(random_state)
+    random_state = random_state.shift(test_index)
+
+    res = simulation_sprt(p_x, p_y, 1, batch_size, p0, d, alpha, beta, alternative,
+                          narrow_dtype=narrow_dtype, random_state=random_state,
+                          look_schedule=look_schedule, max_sample_size=max_sample_size,
+                          truncation_rule=truncation_rule, counter_rng=True)
+    duration = int(res["duration"][0])
+
+    # Разыгрываем батчи теста заново до его длительности
+    # и собираем накопленные суммы в порядке PARTIAL_STATE_COLUMNS
+    count_list = []
+    total_count = np.zeros(5, dtype=np.int64)
+    total_look_cnt = 0
+    batch_index = 0
+    while total_count[0] < duration:
+        batch_random_state = random_state.for_batch([0], batch_index)
+        if look_schedule is None:
+            x = bernoulli_sample(p_x, [1, batch_size], random_state=batch_random_state)[0]
+            y = bernoulli_sample(p_y, [1, batch_size], random_state=batch_random_state)[0]
+            batch_count = np.stack([np.arange(1, batch_size + 1), np.cumsum(x), np.cumsum(y),
+                                    np.cumsum(x * (1 - y)), np.cumsum(x != y)], axis=1)
+        else:
+            look_list = get_look_sizes(look_schedule, total_look_cnt, batch_size)
+            if max_sample_size is not None:
+                look_list = np.minimum(look_list, max_sample_size)
+            look_list = look_list - total_count[0]
+            x_s_list, y_s_list, s_list, n_list = discordant_look_sample(p_x, p_y, look_list, 1,
+                                                                        random_state=batch_random_state)
+            batch_count = np.stack([look_list, x_s_list[0], y_s_list[0], s_list[0], n_list[0]], axis=1)
+            total_look_cnt += batch_size
+
+        count_list.append(total_count + batch_count)
+        total_count = count_list[-1][-1]
+        batch_index += 1
+
+    count_list = np.concatenate(count_list)
+    count_list = count_list[count_list[:, 0] <= duration]
+
+    sprt = BinaryTwoSampleSprt(p0, d, alpha, beta, alternative)
+    curve_dict = {}
+    bound_dict = {}
+    for one_sided_alternative, low_bound, high_bound in get_bounds(p0, d, alpha, beta, alternative, sample_cnt=2):
+        curve_dict[one_sided_alternative] = sprt.calc_one_sided_curve(count_list[:, 3], count_list[:, 4],
+                                                                      one_sided_alternative)
+        bound_dict[one_sided_alternative] = (low_bound, high_bound)
+
+    return {
+        "duration": duration,
+        "result": int(res["result"][0]),
+        "result_x_s": int(res["result_x_s"][0]),
+        "result_y_s": int(res["result_y_s"][0]),
+        "sample_size": count_list[:, 0],
+        "first_success_cnt": count_list[:, 1],
+        "second_success_cnt": count_list[:, 2],
+        "one_sample_success_cnt": count_list[:, 3],
+        "one_sample_sample_size": count_list[:, 4],
+        "curve": curve_dict,
+        "bounds": bound_dict
+    }
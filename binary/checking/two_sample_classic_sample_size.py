@@ -56,3 +56,59 @@ def classic_sample_size(p0, d, alpha, beta, alternative, first_prop=0.5):
         return [sample_size, sample_size]
     else:
         raise ValueError(f"Неправильная альтернатива: {alternative}")
+
+
+def one_sided_classic_sample_size_array(p_low, p_high, alpha_low, alpha_high, first_prop=0.5):
+    """
+    Расчёт размера выборки в классическом дизайне
+    двухвыборочного теста с фиксированной длительностью теста
+    и односторонней альтернативой для массивов значений,
+    аналог one_sided_classic_sample_size
+
+    :param p_low: массив нижних порогов вероятности
+    :param p_high: массив верхних порогов вероятности
+    :param alpha_low: вероятность ошибки для нижнего порога
+    :param alpha_high: вероятность ошибки для верхнего порога
+    :param first_prop: доля первой выборки, пока что = 0.5
+    :return: массив размеров выборки
+    """
+    p_low = np.asarray(p_low)
+    p_high = np.asarray(p_high)
+
+    assert np.all((0 <= p_low) & (p_low <= 1)), "Вероятности p_low вне [0, 1]"
+    assert np.all((0 <= p_high) & (p_high <= 1)), "Вероятности p_high вне [0, 1]"
+
+    quantile_factor = norm.ppf(1-alpha_low) + norm.ppf(1-alpha_high)
+    effect_size = 2 * (np.arcsin(np.sqrt(p_high)) - np.arcsin(np.sqrt(p_low)))
+
+    return np.ceil(2 * (quantile_factor**2) / (effect_size**2)).astype(np.int64)
+
+
+def classic_sample_size_array(p0, d, alpha, beta, alternative, first_prop=0.5):
+    """
+    Расчёт размера выборки в классическом дизайне
+    двухвыборочного теста с фиксированной длительностью теста
+    для массивов значений, аналог classic_sample_size
+
+    :param p0: массив значений вероятности при гипотезе
+    :param d: массив абсолютных значений MDE
+    :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+    :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
+    :param alternative: наименование альтернативы
+    :param first_prop: доля первой выборки, пока что = 0.5
+    :return: [массив размеров первой выборки, массив размеров второй выборки]
+    """
+    p0 = np.asarray(p0)
+    d = np.abs(np.asarray(d))
+
+    if alternative == "less":
+        sample_size = one_sided_classic_sample_size_array(p0 - d, p0, alpha, beta)
+    elif alternative == "greater":
+        sample_size = one_sided_classic_sample_size_array(p0, p0 + d, alpha, beta)
+    elif alternative == "two-sided":
+        sample_size = np.maximum(one_sided_classic_sample_size_array(p0 - d, p0, alpha/2, beta),
+                                 one_sided_classic_sample_size_array(p0, p0 + d, alpha/2, beta))
+    else:
+        raise ValueError(f"Неправильная альтернатива: {alternative}")
+
+    return [sample_size, sample_size]
@@ -1,12 +1,18 @@
 import numpy as np
 
 from binary.checking.one_sample_two_sided_sprt import one_sample_two_sided_sprt
-from binary.checking.tools import transform_two_sample_one_sided_mde, get_value_at_duration
+from binary.checking.bit_packing import packed_discordant_cumsum, packed_sum_at_duration
+from binary.checking.dtype_policy import get_count_dtype
+from binary.checking.profiling import profile_mark
+from binary.checking.tools import transform_two_sample_one_sided_mde, get_value_at_duration, \
+                                  get_sum_at_duration, get_discordant_cumsum
 
 
 def two_sample_two_sided_sprt(x, y, p0, d, alpha, beta,
                               greater_initial_curve=None, less_initial_curve=None,
-                              greater_stop_flg=None, less_stop_flg=None):
+                              greater_stop_flg=None, less_stop_flg=None,
+                              narrow_dtype=False,
+                              max_sample_size=None, truncation_rule="curve", kernel_backend=None):
     """
     Последовательный анализ в случае двухвыборочной задачи
     и двусторонней альтернативы
@@ -33,6 +39,14 @@ def two_sample_two_sided_sprt(x, y, p0, d, alpha, beta,
                              что в конкретном тесте проверка гипотезы p0 против p0 + d приостановлена
     :param less_stop_flg: список длины iter_size из флагов того,
                           что в конкретном тесте проверка гипотезы p0 - d против p0 приостановлена
+    :param narrow_dtype: флаг использования узких типов данных:
+                         накопленные суммы в int32, кривая в float32,
+                         если это позволяет величина границ
+    :param max_sample_size: максимальное количество пар от начала выборок,
+                            в которое тест усекается с решением по правилу truncation_rule,
+                            None - тест не усекается
+    :param truncation_rule: правило принятия решения при усечении из TRUNCATION_RULES
+    :param kernel_backend: вычислительный бэкенд ядра из KERNEL_BACKENDS, None - выбранный get_kernel_backend
     :return: словарь res
              res["duration"] - список длительностей теста
              res["result"] - список результатов теста
@@ -49,10 +63,11 @@ def two_sample_two_sided_sprt(x, y, p0, d, alpha, beta,
     """
 
     # Расчёт накопленной суммы S(n) из X(i) и Y(i), i <= n
-    x = np.array(x)
-    x_s_list = np.cumsum(x, axis=1)
-    y = np.array(y)
-    y_s_list = np.cumsum(y, axis=1)
+    count_dtype = get_count_dtype(narrow_dtype)
+    x = np.asarray(x)
+    x_s_list = np.cumsum(x, axis=1, dtype=count_dtype)
+    y = np.asarray(y)
+    y_s_list = np.cumsum(y, axis=1, dtype=count_dtype)
 
     # Определение параметров одновыборочного последовательного теста
     p0_transformed = 1 / 2
@@ -61,7 +76,8 @@ def two_sample_two_sided_sprt(x, y, p0, d, alpha, beta,
 
     # Преобразование двувыборочной задачи к одновыборочной
     z = x * (1 - y)
-    n_list = np.cumsum(np.where(x != y, 1, 0), axis=1)
+    n_list = np.cumsum(x != y, axis=1, dtype=count_dtype)
+    profile_mark("cumsum")
 
     # Вычисление результатов последовательного результата одновыборочной задачи
     one_sample_res = one_sample_two_sided_sprt(z, p0_transformed,
@@ -71,7 +87,11 @@ def two_sample_two_sided_sprt(x, y, p0, d, alpha, beta,
                                                less_initial_curve=less_initial_curve,
                                                greater_stop_flg=greater_stop_flg,
                                                less_stop_flg=less_stop_flg,
-                                               n_list=n_list)
+                                               n_list=n_list,
+                                               narrow_dtype=narrow_dtype,
+                                               max_sample_size=max_sample_size,
+                                               truncation_rule=truncation_rule,
+                                               kernel_backend=kernel_backend)
 
     # Значение S(n), где n - момент длительности теста
     result_x_s_list = get_value_at_duration(value_list=x_s_list,
@@ -89,3 +109,181 @@ def two_sample_two_sided_sprt(x, y, p0, d, alpha, beta,
         "greater_stop": one_sample_res["greater_stop"],
         "less_stop": one_sample_res["less_stop"]
     }
+
+
+def two_sample_two_sided_fused_sprt(x, y, p0, d, alpha, beta,
+                                    greater_initial_curve=None, less_initial_curve=None,
+                                    greater_stop_flg=None, less_stop_flg=None,
+                                    narrow_dtype=False, packed_sample_size=None,
+                                    max_sample_size=None, truncation_rule="curve", kernel_backend=None):
+    """
+    Последовательный анализ в случае двухвыборочной задачи
+    и двусторонней альтернативы
+    без построения матриц накопленных сумм каждой из выборок
+
+    Результат совпадает с two_sample_two_sided_sprt,
+    но в памяти хранятся только накопленные количества
+    несовпадающих пар и кривые логарифмического отношения правдоподобий
+
+    :param x: массив размера [iter_size, sample_size],
+              где каждая строка - значение первой выборки теста из {0, 1} размера sample_size,
+              а iter_size - количество итераций моделирования (тестов)
+    :param y: массив размера [iter_size, sample_size],
+              где каждая строка - значение второй выборки теста из {0, 1} размера sample_size,
+              а iter_size - количество итераций моделирования (тестов)
+    :param p0: значение вероятности при гипотезе
+    :param d: абсолютное значение MDE
+    :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+    :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
+    :param greater_initial_curve: список длины iter_size из значений
+                                  логарифмического отношения правдоподобий
+                                  к моменту применения последовательного анализа
+                                  при проверке гипотезы p0 против p0 + d приостановлена
+    :param less_initial_curve: список длины iter_size из значений
+                               логарифмического отношения правдоподобий
+                               к моменту применения последовательного анализа
+                               при проверке гипотезы p0 - d против p0 приостановлена
+    :param greater_stop_flg: список длины iter_size из флагов того,
+                             что в конкретном тесте проверка гипотезы p0 против p0 + d приостановлена
+    :param less_stop_flg: список длины iter_size из флагов того,
+                          что в конкретном тесте проверка гипотезы p0 - d против p0 приостановлена
+    :param narrow_dtype: флаг использования узких типов данных:
+                         накопленные суммы в int32, кривая в float32,
+                         если это позволяет величина границ
+    :param packed_sample_size: если задан, то x и y - выборки размера packed_sample_size,
+                               упакованные по 64 значения в машинное слово
+    :param max_sample_size: максимальное количество пар от начала выборок,
+                            в которое тест усекается с решением по правилу truncation_rule,
+                            None - тест не усекается
+    :param truncation_rule: правило принятия решения при усечении из TRUNCATION_RULES
+    :param kernel_backend: вычислительный бэкенд ядра из KERNEL_BACKENDS, None - выбранный get_kernel_backend
+    :return: словарь res того же вида, что и у two_sample_two_sided_sprt
+    """
+
+    # Определение параметров одновыборочного последовательного теста
+    p0_transformed = 1 / 2
+    d_low_transformed = transform_two_sample_one_sided_mde(p0, d, alternative="less")
+    d_high_transformed = transform_two_sample_one_sided_mde(p0, d, alternative="greater")
+
+    # Преобразование двувыборочной задачи к одновыборочной
+    if packed_sample_size is None:
+        x = np.asarray(x, dtype=bool)
+        y = np.asarray(y, dtype=bool)
+        s_list, n_list = get_discordant_cumsum(x, y)
+    else:
+        s_list, n_list = packed_discordant_cumsum(x, y, packed_sample_size)
+    profile_mark("cumsum")
+
+    # Вычисление результатов последовательного результата одновыборочной задачи
+    one_sample_res = one_sample_two_sided_sprt(None, p0_transformed,
+                                               [d_low_transformed, d_high_transformed],
+                                               alpha, beta,
+                                               greater_initial_curve=greater_initial_curve,
+                                               less_initial_curve=less_initial_curve,
+                                               greater_stop_flg=greater_stop_flg,
+                                               less_stop_flg=less_stop_flg,
+                                               n_list=n_list, s_list=s_list,
+                                               narrow_dtype=narrow_dtype,
+                                               max_sample_size=max_sample_size,
+                                               truncation_rule=truncation_rule,
+                                               kernel_backend=kernel_backend)
+    del s_list, n_list
+
+    # Значение S(n), где n - момент длительности теста
+    if packed_sample_size is None:
+        result_x_s_list = get_sum_at_duration(x, one_sample_res["duration"])
+        result_y_s_list = get_sum_at_duration(y, one_sample_res["duration"])
+    else:
+        result_x_s_list = packed_sum_at_duration(x, one_sample_res["duration"])
+        result_y_s_list = packed_sum_at_duration(y, one_sample_res["duration"])
+
+    return {
+        "duration": one_sample_res["duration"],
+        "result": one_sample_res["result"],
+        "result_x_s": result_x_s_list,
+        "result_y_s": result_y_s_list,
+        "greater_last_curve": one_sample_res["greater_last_curve"],
+        "less_last_curve": one_sample_res["less_last_curve"],
+        "greater_stop": one_sample_res["greater_stop"],
+        "less_stop": one_sample_res["less_stop"]
+    }
+
+
+def two_sample_two_sided_look_sprt(x_s_list, y_s_list, s_list, n_list, look_list, p0, d, alpha, beta,
+                                   greater_initial_curve=None, less_initial_curve=None,
+                                   greater_stop_flg=None, less_stop_flg=None,
+                                   narrow_dtype=False,
+                                   max_sample_size=None, truncation_rule="curve", kernel_backend=None):
+    """
+    Последовательный анализ в случае двухвыборочной задачи
+    и двусторонней альтернативы
+    с проверкой пересечения границ только в моменты просмотров
+
+    Все массивы содержат накопленные значения только в моменты просмотров,
+    поэтому объём памяти пропорционален количеству просмотров
+
+    :param x_s_list: массив размера [iter_size, look_cnt] накопленных сумм первой выборки
+    :param y_s_list: массив размера [iter_size, look_cnt] накопленных сумм второй выборки
+    :param s_list: массив размера [iter_size, look_cnt] накопленных количеств пар вида (1, 0)
+    :param n_list: массив размера [iter_size, look_cnt] накопленных количеств несовпадающих пар
+    :param look_list: возрастающий список количеств пар в моменты просмотров
+    :param p0: значение вероятности при гипотезе
+    :param d: абсолютное значение MDE
+    :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+    :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
+    :param greater_initial_curve: список длины iter_size из значений
+                                  логарифмического отношения правдоподобий
+                                  к моменту применения последовательного анализа
+                                  при проверке гипотезы p0 против p0 + d приостановлена
+    :param less_initial_curve: список длины iter_size из значений
+                               логарифмического отношения правдоподобий
+                               к моменту применения последовательного анализа
+                               при проверке гипотезы p0 - d против p0 приостановлена
+    :param greater_stop_flg: список длины iter_size из флагов того,
+                             что в конкретном тесте проверка гипотезы p0 против p0 + d приостановлена
+    :param less_stop_flg: список длины iter_size из флагов того,
+                          что в конкретном тесте проверка гипотезы p0 - d против p0 приостановлена
+    :param narrow_dtype: флаг расчёта кривой в float32,
+                         если это позволяет величина границ
+    :param max_sample_size: максимальное количество пар от начала выборок,
+                            в которое тест усекается с решением по правилу truncation_rule,
+                            None - тест не усекается
+    :param truncation_rule: правило принятия решения при усечении из TRUNCATION_RULES
+    :param kernel_backend: вычислительный бэкенд ядра из KERNEL_BACKENDS, None - выбранный get_kernel_backend
+    :return: словарь res того же вида, что и у two_sample_two_sided_sprt
+    """
+
+    # Определение параметров одновыборочного последовательного теста
+    p0_transformed = 1 / 2
+    d_low_transformed = transform_two_sample_one_sided_mde(p0, d, alternative="less")
+    d_high_transformed = transform_two_sample_one_sided_mde(p0, d, alternative="greater")
+
+    # Вычисление результатов последовательного результата одновыборочной задачи
+    one_sample_res = one_sample_two_sided_sprt(None, p0_transformed,
+                                               [d_low_transformed, d_high_transformed],
+                                               alpha, beta,
+                                               greater_initial_curve=greater_initial_curve,
+                                               less_initial_curve=less_initial_curve,
+                                               greater_stop_flg=greater_stop_flg,
+                                               less_stop_flg=less_stop_flg,
+                                               n_list=n_list, s_list=s_list,
+                                               narrow_dtype=narrow_dtype, look_list=look_list,
+                                               max_sample_size=max_sample_size, truncation_rule=truncation_rule,
+                                               kernel_backend=kernel_backend)
+
+    # Значение S(n), где n - момент длительности теста
+    result_x_s_list = get_value_at_duration(value_list=x_s_list,
+                                            duration_list=one_sample_res["look_duration"])
+    result_y_s_list = get_value_at_duration(value_list=y_s_list,
+                                            duration_list=one_sample_res["look_duration"])
+
+    return {
+        "duration": one_sample_res["duration"],
+        "result": one_sample_res["result"],
+        "result_x_s": result_x_s_list,
+        "result_y_s": result_y_s_list,
+        "greater_last_curve": one_sample_res["greater_last_curve"],
+        "less_last_curve": one_sample_res["less_last_curve"],
+        "greater_stop": one_sample_res["greater_stop"],
+        "less_stop": one_sample_res["less_stop"]
+    }
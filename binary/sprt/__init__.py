@@ -1,2 +1,8 @@
 from .one_sample_sprt import BinaryOneSampleSprt
 from .two_sample_sprt import BinaryTwoSampleSprt
+from .integer_thresholds import IntegerThresholds
+from .multi_arm_sprt import BinaryMultiArmSprt
+from .cusum_monitor import BinaryCusumMonitor
+from .mixture_sprt import BinaryMixtureSprt
+from .partial_state import SprtPartialState, merge_partial_states
+from .metrics import SprtMetrics
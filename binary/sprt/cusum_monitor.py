@@ -0,0 +1,183 @@
+import numpy as np
+
+from .one_sample_sprt import BinaryOneSampleSprt
+
+
+# Описания сигналов по наименованиям односторонних альтернатив
+ALARM_DESCS = {
+    "greater": "Сигнал: вероятность выросла до p0 + d",
+    "less": "Сигнал: вероятность упала до p0 - d"
+}
+
+
+class BinaryCusumMonitor(object):
+    def __init__(self, p0, d, threshold, alternative="less", metric_cnt=1):
+        """
+        Мониторинг разладки бернуллиевских метрик процедурой CUSUM (Пейджа)
+
+        Для каждой метрики накапливается статистика
+        W(n) = max(0, W(n - 1) + z(n)),
+        где z(n) - приращение логарифмического отношения правдоподобий
+        одновыборочного последовательного теста на элементе x(n),
+        и сигнал подаётся в момент, когда W(n) >= threshold.
+        Оценка момента разладки - последний размер выборки, при котором W(n) = 0.
+        Статистики всех метрик хранятся в массивах,
+        поэтому метрики можно обновлять как по одной, так и все сразу
+
+        :param p0: значение вероятности до разладки
+        :param d: абсолютное значение изменения вероятности при разладке
+        :param threshold: порог статистики CUSUM
+        :param alternative: наименование альтернативы
+                            greater: рост вероятности до p0 + d
+                            less: падение вероятности до p0 - d
+                            two-sided: оба направления, по отдельной статистике на каждое
+        :param metric_cnt: количество отслеживаемых метрик
+        """
+        if threshold <= 0:
+            raise ValueError(f"Неправильный порог статистики CUSUM: {threshold}")
+        if metric_cnt < 1:
+            raise ValueError(f"Неправильное количество метрик: {metric_cnt}")
+
+        # Параметры мониторинга
+        self.p0 = p0
+        self.d = np.abs(d)
+        self.threshold = threshold
+        self.alternative = alternative
+        self.metric_cnt = metric_cnt
+
+        # Тест для расчёта приращений логарифмического отношения правдоподобий
+        self.base_sprt = BinaryOneSampleSprt(p0, d)
+
+        if alternative == "two-sided":
+            self.side_list = ["greater", "less"]
+        elif alternative in ("greater", "less"):
+            self.side_list = [alternative]
+        else:
+            raise ValueError(f"Неправильная альтернатива: {alternative}")
+
+        # Приращения статистик по сторонам: столбец 0 - для x = 0, столбец 1 - для x = 1
+        self.increments = np.array([self.calc_increments(side) for side in self.side_list])
+
+        # Статистики CUSUM и оценки моментов разладки по сторонам и метрикам
+        self.statistic = np.zeros([len(self.side_list), metric_cnt])
+        self.changepoint = np.zeros([len(self.side_list), metric_cnt], dtype=np.int64)
+        self.sample_size = np.zeros(metric_cnt, dtype=np.int64)
+
+        # Сигналы
+        self.alarm_flg = np.zeros(metric_cnt, dtype=bool)
+        self.alarm_time = np.full(metric_cnt, -1, dtype=np.int64)
+        self.alarm_changepoint = np.full(metric_cnt, -1, dtype=np.int64)
+        self.alarm_desc_list = ["Мониторинг продолжается"] * metric_cnt
+
+    def calc_increments(self, alternative):
+        """
+        Функция для расчёта приращений статистики CUSUM
+
+        :param alternative: наименование односторонней альтернативы
+                            greater: рост вероятности до p0 + d
+                            less: падение вероятности до p0 - d
+        :return: приращение при x = 0, приращение при x = 1
+        """
+        # Логарифмическое отношение правдоподобий одновыборочного теста
+        # для альтернативы less положительно при p0, поэтому берётся с обратным знаком
+        sign = 1 if alternative == "greater" else -1
+        return sign * self.base_sprt.calc_one_sided_curve(np.array([0, 1]), 1, alternative)
+
+    def append(self, x, metric=0):
+        """
+        Добавление нового элемента выборки одной метрики
+
+        :param x: значение нового элемента выборки
+        :param metric: номер метрики
+        :return: описание состояния мониторинга метрики
+        """
+        if self.alarm_flg[metric]:
+            return self.alarm_desc_list[metric]
+
+        self.sample_size[metric] += 1
+        statistic = self.statistic[:, metric] + self.increments[:, x]
+        zero_flg = statistic <= 0
+        self.statistic[:, metric] = np.where(zero_flg, 0, statistic)
+        self.changepoint[zero_flg, metric] = self.sample_size[metric]
+
+        alarm_flg = self.statistic[:, metric] >= self.threshold
+        if alarm_flg.any():
+            self._alarm(np.array([metric]), alarm_flg[:, np.newaxis])
+
+        return self.alarm_desc_list[metric]
+
+    def append_list(self, x_list, metric=0):
+        """
+        Добавление списка из новых элементов выборки одной метрики
+
+        :param x_list: список значений новых элементов выборки
+        :param metric: номер метрики
+        :return: описание состояния мониторинга метрики
+        """
+        for x in x_list:
+            self.append(x, metric)
+
+        return self.alarm_desc_list[metric]
+
+    def append_batch(self, x, metric_index=None):
+        """
+        Добавление по одному новому элементу выборки сразу для нескольких метрик
+
+        :param x: массив значений новых элементов выборок
+        :param metric_index: массив различных номеров метрик того же размера, что и x,
+                             None - все метрики по порядку
+        :return: массив признаков сигнала по всем метрикам
+        """
+        x = np.asarray(x, dtype=np.int64)
+        metric_index = np.arange(self.metric_cnt) if metric_index is None else np.asarray(metric_index)
+
+        # Метрики с поданным сигналом не обновляются
+        active_flg = ~self.alarm_flg[metric_index]
+        x = x[active_flg]
+        metric_index = metric_index[active_flg]
+
+        self.sample_size[metric_index] += 1
+        statistic = self.statistic[:, metric_index] + self.increments[:, x]
+        zero_flg = statistic <= 0
+        self.statistic[:, metric_index] = np.where(zero_flg, 0, statistic)
+        self.changepoint[:, metric_index] = np.where(zero_flg, self.sample_size[metric_index],
+                                                     self.changepoint[:, metric_index])
+
+        alarm_flg = self.statistic[:, metric_index] >= self.threshold
+        alarm_metric_flg = alarm_flg.any(axis=0)
+        if alarm_metric_flg.any():
+            self._alarm(metric_index[alarm_metric_flg], alarm_flg[:, alarm_metric_flg])
+
+        return self.alarm_flg
+
+    def reset(self, metric=None):
+        """
+        Перезапуск мониторинга, например, после обработки сигнала
+
+        :param metric: номер или массив номеров метрик, None - все метрики
+        """
+        metric = slice(None) if metric is None else metric
+
+        self.statistic[:, metric] = 0
+        self.changepoint[:, metric] = 0
+        self.sample_size[metric] = 0
+        self.alarm_flg[metric] = False
+        self.alarm_time[metric] = -1
+        self.alarm_changepoint[metric] = -1
+        for metric_index in np.arange(self.metric_cnt)[metric].reshape(-1):
+            self.alarm_desc_list[metric_index] = "Мониторинг продолжается"
+
+    def _alarm(self, metric_index, alarm_flg):
+        """
+        Фиксация сигналов по метрикам metric_index,
+        alarm_flg - признаки превышения порога по сторонам для этих метрик
+        """
+        self.alarm_flg[metric_index] = True
+        self.alarm_time[metric_index] = self.sample_size[metric_index]
+
+        # При одновременном сигнале с обеих сторон выбирается сторона с большей статистикой
+        statistic = np.where(alarm_flg, self.statistic[:, metric_index], -np.inf)
+        side_index = np.argmax(statistic, axis=0)
+        self.alarm_changepoint[metric_index] = self.changepoint[side_index, metric_index]
+        for metric, side in zip(metric_index, side_index):
+            self.alarm_desc_list[metric] = ALARM_DESCS[self.side_list[side]]
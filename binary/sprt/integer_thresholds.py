@@ -0,0 +1,135 @@
+import numpy as np
+
+
+# Начальное количество значений длительности, для которых рассчитываются пороги
+DEFAULT_THRESHOLD_SIZE = 1024
+
+
+class IntegerThresholds(object):
+    """
+    Целочисленные пороги одностороннего последовательного теста
+
+    Логарифмическое отношение правдоподобий
+    S(n) * log(p_high / p_low) + (n - S(n)) * log((1 - p_high) / (1 - p_low))
+    линейно по S(n) и n, поэтому пересечение границ равносильно тому,
+    что S(n) лежит выше или ниже прямой по n:
+    S(n) > high_intercept + slope * n - пересечение верхней границы,
+    S(n) < low_intercept + slope * n - пересечение нижней границы.
+    Для каждого n заранее рассчитываются целые пороги:
+    reject[n] - наименьшее S(n), при котором пересекается верхняя граница,
+    accept[n] - наибольшее S(n), при котором пересекается нижняя граница,
+    и проверка пересечения сводится к сравнению целых чисел.
+    Пороги уточняются по тому же выражению кривой, что и в классах теста,
+    поэтому решения совпадают с расчётом через логарифмы.
+    Массивы порогов расширяются по мере роста длительности теста
+    """
+
+    def __init__(self, p_low, p_high, low_bound, high_bound, size=DEFAULT_THRESHOLD_SIZE):
+        """
+        :param p_low: нижний порог вероятности
+        :param p_high: верхний порог вероятности
+        :param low_bound: нижняя граница логарифмического отношения правдоподобий
+        :param high_bound: верхняя граница логарифмического отношения правдоподобий
+        :param size: начальное количество значений длительности
+        """
+        self.p_low = p_low
+        self.p_high = p_high
+        self.low_bound = low_bound
+        self.high_bound = high_bound
+
+        # Параметры прямых в координатах (n, S(n))
+        log_success = np.log(p_high / p_low)
+        log_failure = np.log((1 - p_high) / (1 - p_low))
+        self.slope = -log_failure / (log_success - log_failure)
+        self.low_intercept = low_bound / (log_success - log_failure)
+        self.high_intercept = high_bound / (log_success - log_failure)
+
+        self.accept = np.zeros(0, dtype=np.int64)
+        self.reject = np.zeros(0, dtype=np.int64)
+        self.extend(size)
+
+    def calc_curve(self, success_cnt, sample_size):
+        """
+        Значения логарифмического отношения правдоподобий,
+        то же выражение, что и в классах теста
+        """
+        return success_cnt * np.log(self.p_high / self.p_low) \
+            + (sample_size - success_cnt) * np.log((1 - self.p_high) / (1 - self.p_low))
+
+    def extend(self, size):
+        """
+        Расчёт порогов для длительностей от 0 до size - 1
+
+        :param size: количество значений длительности
+        """
+        if size <= len(self.reject):
+            return
+
+        n = np.arange(len(self.reject), size, dtype=np.int64)
+
+        # Наименьшее целое S(n) выше прямой, затем уточнение по кривой
+        reject = np.floor(self.high_intercept + self.slope * n).astype(np.int64) + 1
+        reject = self._fix_threshold(reject, n,
+                                     lambda s: self.calc_curve(s, n) > self.high_bound, step=-1)
+
+        # Наибольшее целое S(n) ниже прямой, затем уточнение по кривой
+        accept = np.ceil(self.low_intercept + self.slope * n).astype(np.int64) - 1
+        accept = self._fix_threshold(accept, n,
+                                     lambda s: self.calc_curve(s, n) < self.low_bound, step=1)
+
+        # Значения S(n) лежат в [0, n], поэтому пороги вне отрезка сжимаются к его краям
+        self.reject = np.concatenate([self.reject, np.clip(reject, 0, n + 1)])
+        self.accept = np.concatenate([self.accept, np.clip(accept, -1, n)])
+
+    def decide(self, success_cnt, sample_size):
+        """
+        Проверка пересечения границ
+
+        :param success_cnt: количество "успехов"
+        :param sample_size: размер выборки
+        :return: 1 - пересечение верхней границы,
+                 -1 - пересечение нижней границы,
+                 0 - тест продолжается
+        """
+        if sample_size >= len(self.reject):
+            self.extend(max(2 * len(self.reject), sample_size + 1))
+
+        if success_cnt >= self.reject[sample_size]:
+            return 1
+        elif success_cnt <= self.accept[sample_size]:
+            return -1
+        else:
+            return 0
+
+    def to_array(self, max_sample_size, dtype=None):
+        """
+        Экспорт порогов для длительностей от 0 до max_sample_size
+
+        :param max_sample_size: максимальная длительность
+        :param dtype: целочисленный тип,
+                      None - наименьший из int32 и int64, в который помещаются пороги
+        :return: массив размера [2, max_sample_size + 1]:
+                 строка 0 - пороги accept, строка 1 - пороги reject
+        """
+        self.extend(max_sample_size + 1)
+        if dtype is None:
+            dtype = np.int32 if max_sample_size + 1 <= np.iinfo(np.int32).max else np.int64
+        return np.stack([self.accept[:max_sample_size + 1],
+                         self.reject[:max_sample_size + 1]]).astype(dtype)
+
+    @staticmethod
+    def _fix_threshold(threshold, n, crossing_func, step):
+        """
+        Уточнение порогов по значениям кривой:
+        порог - крайнее значение S(n) с пересечением границы,
+        соседнее с ним в сторону step - без пересечения
+        """
+        for _ in range(n.size + 2):
+            # Сдвиг к прямой, пока соседнее значение тоже пересекает границу
+            inner_flg = crossing_func(threshold + step)
+            # Сдвиг от прямой, если само значение не пересекает границу
+            outer_flg = ~crossing_func(threshold)
+            if not np.any(inner_flg | outer_flg):
+                break
+            threshold = np.where(inner_flg, threshold + step, np.where(outer_flg, threshold - step, threshold))
+        return threshold
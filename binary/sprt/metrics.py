@@ -0,0 +1,296 @@
+import os
+import threading
+import weakref
+
+
+# Границы корзин гистограммы длительности пакетных вызовов в секундах
+LATENCY_BUCKETS = (1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 1e-1, 5e-1, 1.0, 5.0)
+
+# Описания метрик в порядке вывода: наименование, тип и справка
+METRIC_DESCRIPTIONS = (
+    ("sprt_append_total", "counter",
+     "Количество добавленных элементов выборки методами append и append_partial_state"),
+    ("sprt_batch_duration_seconds", "histogram",
+     "Длительность пакетных вызовов append_list и append_partial_state"),
+    ("sprt_decision_total", "counter",
+     "Количество переходов тестов к принятому решению"),
+    ("sprt_active_tests", "gauge",
+     "Количество продолжающихся тестов"),
+    ("sprt_decided_tests", "gauge",
+     "Количество остановленных тестов"),
+    ("sprt_buffer_length", "gauge",
+     "Количество элементов выборок без пары в буферах двухвыборочных тестов"),
+)
+
+# Наименования движков по классам теста
+ENGINE_NAMES = {
+    "BinaryOneSampleSprt": "one_sample",
+    "BinaryTwoSampleSprt": "two_sample",
+}
+
+
+class SprtMetrics(object):
+    """
+    Реестр метрик онлайн последовательных тестов
+
+    Тесты подключаются к реестру параметром metrics конструктора,
+    без него тест не обращается к метрикам, кроме одной проверки на None.
+    Количество добавленных элементов накапливается в регистраторе теста
+    без блокировки и переносится в реестр при удалении теста,
+    решения и длительности пакетных вызовов записываются в реестр в момент события,
+    а значения gauge - количества тестов и длины буферов - рассчитываются
+    по ещё существующим тестам в момент выгрузки, не нагружая append.
+    Метрики разделяются по дизайну теста: движку, p0, d, alpha, beta и альтернативе
+    """
+
+    def __init__(self, latency_buckets=LATENCY_BUCKETS):
+        """
+        :param latency_buckets: возрастающий список верхних границ корзин
+                                гистограммы длительности в секундах
+        """
+        latency_buckets = [float(bucket) for bucket in latency_buckets]
+        if len(latency_buckets) == 0 or latency_buckets != sorted(set(latency_buckets)):
+            raise ValueError(f"Неправильные границы корзин гистограммы: {latency_buckets}")
+
+        self.latency_buckets = tuple(latency_buckets)
+        self.counters = {}
+        self.histograms = {}
+        self.engines = weakref.WeakSet()
+        self.lock = threading.Lock()
+
+    def bind(self, engine):
+        """
+        Подключение теста к реестру
+
+        :param engine: объект теста BinaryOneSampleSprt или BinaryTwoSampleSprt
+        :return: регистратор событий теста SprtMetricsRecorder
+        """
+        recorder = SprtMetricsRecorder(self, get_design_labels(engine))
+        with self.lock:
+            self.engines.add(engine)
+
+        # При удалении теста его количество элементов переносится в реестр
+        weakref.finalize(engine, self.retire, recorder)
+        return recorder
+
+    def retire(self, recorder):
+        """
+        Перенос накопленных регистратором значений в реестр
+
+        :param recorder: регистратор событий удалённого теста
+        """
+        self.inc("sprt_append_total", recorder.labels, recorder.append_cnt)
+
+    def inc(self, name, labels, value=1):
+        """
+        Увеличение счётчика
+
+        :param name: наименование метрики
+        :param labels: кортеж пар (наименование метки, значение)
+        :param value: приращение
+        """
+        with self.lock:
+            key = (name, labels)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        """
+        Добавление наблюдения в гистограмму
+
+        :param name: наименование метрики
+        :param labels: кортеж пар (наименование метки, значение)
+        :param value: наблюдаемое значение
+        """
+        with self.lock:
+            key = (name, labels)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                # Количества по корзинам без накопления, сумма и количество наблюдений
+                histogram = self.histograms[key] = [[0] * len(self.latency_buckets), 0.0, 0]
+            for bucket_index, bucket in enumerate(self.latency_buckets):
+                if value <= bucket:
+                    histogram[0][bucket_index] += 1
+                    break
+            histogram[1] += value
+            histogram[2] += 1
+
+    def collect(self, engine_list):
+        """
+        Расчёт значений по существующим тестам
+
+        :param engine_list: список существующих тестов
+        :return: словарь количеств добавленных элементов
+                 и словарь значений gauge по ключам (наименование метрики, метки)
+        """
+        append_counters = {}
+        gauges = {}
+        for engine in engine_list:
+            labels = engine.metrics.labels
+            key = ("sprt_append_total", labels)
+            append_counters[key] = append_counters.get(key, 0) + engine.metrics.append_cnt
+
+            name = "sprt_active_tests" if engine.decision_desc == "Тест продолжается" else "sprt_decided_tests"
+            gauges[(name, labels)] = gauges.get((name, labels), 0) + 1
+
+            if hasattr(engine, "first_sample_buf"):
+                for buffer_name, buffer in [("first", engine.first_sample_buf), ("second", engine.second_sample_buf)]:
+                    key = ("sprt_buffer_length", labels + (("buffer", buffer_name),))
+                    gauges[key] = gauges.get(key, 0) + len(buffer)
+
+        return append_counters, gauges
+
+    def render(self):
+        """
+        Выгрузка метрик в текстовом формате Prometheus
+
+        :return: строка в формате text exposition 0.0.4
+        """
+        # Список удерживает существующие тесты, поэтому их значения
+        # не переносятся в реестр до окончания выгрузки и не учитываются дважды
+        with self.lock:
+            engine_list = list(self.engines)
+        append_counters, gauges = self.collect(engine_list)
+
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {key: [list(histogram[0]), histogram[1], histogram[2]]
+                          for key, histogram in self.histograms.items()}
+        for key, value in append_counters.items():
+            counters[key] = counters.get(key, 0) + value
+
+        line_list = []
+        for name, metric_type, help_text in METRIC_DESCRIPTIONS:
+            line_list.append(f"# HELP {name} {escape_help(help_text)}")
+            line_list.append(f"# TYPE {name} {metric_type}")
+
+            if metric_type == "histogram":
+                for (_, labels), (bucket_cnt_list, value_sum, value_cnt) \
+                        in sorted(item for item in histograms.items() if item[0][0] == name):
+                    cumulative_cnt = 0
+                    for bucket, bucket_cnt in zip(self.latency_buckets, bucket_cnt_list):
+                        cumulative_cnt += bucket_cnt
+                        line_list.append(format_sample(f"{name}_bucket", labels + (("le", format_value(bucket)),),
+                                                       cumulative_cnt))
+                    line_list.append(format_sample(f"{name}_bucket", labels + (("le", "+Inf"),), value_cnt))
+                    line_list.append(format_sample(f"{name}_sum", labels, value_sum))
+                    line_list.append(format_sample(f"{name}_count", labels, value_cnt))
+            else:
+                values = counters if metric_type == "counter" else gauges
+                for (_, labels), value in sorted(item for item in values.items() if item[0][0] == name):
+                    line_list.append(format_sample(name, labels, value))
+
+        return "\n".join(line_list) + "\n"
+
+    def write_textfile(self, path):
+        """
+        Запись метрик в файл для сбора локальным агентом
+        (например, textfile collector у node_exporter):
+        файл заменяется целиком, поэтому агент не читает его частично
+
+        :param path: путь к файлу с расширением .prom
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+class SprtMetricsRecorder(object):
+    """
+    Регистратор событий одного теста с заранее рассчитанными метками дизайна
+    """
+
+    def __init__(self, metrics, labels):
+        """
+        :param metrics: реестр метрик SprtMetrics
+        :param labels: кортеж пар (наименование метки, значение) дизайна теста
+        """
+        self.registry = metrics
+        self.labels = labels
+        self.append_cnt = 0
+
+    def on_append(self, cnt=1):
+        """
+        Добавление элементов выборки
+
+        :param cnt: количество добавленных элементов
+        """
+        self.append_cnt += int(cnt)
+
+    def on_batch(self, method, duration):
+        """
+        Завершение пакетного вызова
+
+        :param method: наименование метода
+        :param duration: длительность вызова в секундах
+        """
+        self.registry.observe("sprt_batch_duration_seconds", self.labels + (("method", method),), duration)
+
+    def on_decision(self, decision_desc):
+        """
+        Переход теста к принятому решению
+
+        :param decision_desc: описание принятого решения
+        """
+        self.registry.inc("sprt_decision_total", self.labels + (("decision", decision_desc),))
+
+
+def get_design_labels(engine):
+    """
+    Метки дизайна теста
+
+    :param engine: объект теста
+    :return: кортеж пар (наименование метки, значение)
+    """
+    return (
+        ("engine", ENGINE_NAMES.get(type(engine).__name__, type(engine).__name__)),
+        ("p0", format_value(engine.p0)),
+        ("d", format_value(engine.d)),
+        ("alpha", format_value(engine.alpha)),
+        ("beta", format_value(engine.beta)),
+        ("alternative", str(engine.alternative)),
+    )
+
+
+def format_value(value):
+    """
+    Запись числа в формате Prometheus
+
+    :param value: число
+    :return: строка
+    """
+    if isinstance(value, int):
+        return str(value)
+    value = float(value)
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def escape_help(text):
+    """
+    Экранирование текста справки метрики
+    """
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def escape_label_value(text):
+    """
+    Экранирование значения метки
+    """
+    return text.replace("\\", "\\\\").replace("\n", "\\n").replace("\"", "\\\"")
+
+
+def format_sample(name, labels, value):
+    """
+    Строка с одним значением метрики
+
+    :param name: наименование метрики
+    :param labels: кортеж пар (наименование метки, значение)
+    :param value: значение
+    :return: строка
+    """
+    label_desc = ",".join(f"{label}=\"{escape_label_value(label_value)}\"" for label, label_value in labels)
+    return f"{name}{{{label_desc}}} {format_value(value)}"
@@ -0,0 +1,182 @@
+import numpy as np
+
+
+# Описания решений по наименованиям альтернатив:
+# при пересечении границы и при усечении теста
+MIXTURE_DECISION_DESCS = {
+    "greater": ("Тест остановлен, справедлива альтернатива p > p0",
+                "Тест остановлен, справедлива гипотеза p <= p0"),
+    "less": ("Тест остановлен, справедлива альтернатива p < p0",
+             "Тест остановлен, справедлива гипотеза p >= p0"),
+    "two-sided": ("Тест остановлен, справедлива альтернатива p != p0",
+                  "Тест остановлен, справедлива гипотеза p = p0")
+}
+
+
+def get_prior_params(p0, d=None, prior_size=None):
+    """
+    Параметры бета-распределения значения вероятности при альтернативе
+    со средним p0 и суммой параметров prior_size
+
+    :param p0: значение вероятности при гипотезе
+    :param d: характерное абсолютное значение эффекта,
+              если prior_size не задан, то он подбирается так,
+              чтобы стандартное отклонение априорного распределения было равно d
+    :param prior_size: сумма параметров бета-распределения
+                       (размер априорной выборки)
+    :return: параметры a и b бета-распределения
+    """
+    if prior_size is None:
+        if d is None:
+            raise ValueError("Неправильные параметры априорного распределения: не задан ни d, ни prior_size")
+        # Дисперсия бета-распределения равна p0 (1 - p0) / (prior_size + 1)
+        prior_size = p0 * (1 - p0) / d**2 - 1
+    if prior_size <= 0:
+        raise ValueError(f"Неправильный размер априорной выборки: {prior_size}")
+
+    return prior_size * p0, prior_size * (1 - p0)
+
+
+def mixture_curve(success_cnt, sample_size, p0, prior_a, prior_b, alternative):
+    """
+    Логарифм отношения смешанного правдоподобия
+
+    Правдоподобие при альтернативе усредняется по бета-распределению
+    с параметрами prior_a и prior_b, для односторонних альтернатив
+    ограниченному на полуинтервал выше или ниже p0,
+    и выражается через бета-функцию и неполную бета-функцию:
+    B(a + S, b + n - S) / B(a, b) / (p0^S (1 - p0)^(n - S))
+
+    Robbins H.
+    Statistical methods related to the law of the iterated logarithm.
+    – The Annals of Mathematical Statistics, 1970. – Vol. 41, No. 5. – P. 1397-1409.
+
+    :param success_cnt: количество "успехов"
+    :param sample_size: размер выборки
+    :param p0: значение вероятности при гипотезе
+    :param prior_a: параметр a бета-распределения
+    :param prior_b: параметр b бета-распределения
+    :param alternative: наименование альтернативы: "less", "greater" или "two-sided"
+    :return: значения логарифма отношения смешанного правдоподобий
+    """
+    from scipy.special import betainc, betaincc, betaln
+
+    failure_cnt = sample_size - success_cnt
+    posterior_a = prior_a + success_cnt
+    posterior_b = prior_b + failure_cnt
+
+    curve = betaln(posterior_a, posterior_b) - betaln(prior_a, prior_b) \
+        - success_cnt * np.log(p0) - failure_cnt * np.log(1 - p0)
+
+    # Доли апостериорной и априорной масс по сторону альтернативы
+    if alternative == "greater":
+        mass_func = betaincc
+    elif alternative == "less":
+        mass_func = betainc
+    elif alternative == "two-sided":
+        return curve
+    else:
+        raise ValueError(f"Неправильная альтернатива: {alternative}")
+
+    with np.errstate(divide="ignore"):
+        return curve + np.log(mass_func(posterior_a, posterior_b, p0)) - np.log(mass_func(prior_a, prior_b, p0))
+
+
+class BinaryMixtureSprt(object):
+    def __init__(self, p0, d=None, alpha=0.05, alternative="two-sided", prior_size=None,
+                 initial_success_cnt=0, initial_sample_size=0, max_sample_size=None):
+        """
+        Последовательный анализ отношения смешанного правдоподобия
+        в случае одновыборочной задачи
+
+        Вместо фиксированного MDE правдоподобие при альтернативе
+        усредняется по бета-распределению значения вероятности,
+        поэтому тест останавливается рано при эффектах разного размера.
+        Тест останавливается с принятием альтернативы,
+        когда логарифм отношения смешанного правдоподобия не меньше log(1 / alpha),
+        по неравенству Вилля вероятность ошибки I рода не больше alpha.
+        Границы для принятия гипотезы нет, поэтому при заданном
+        max_sample_size в этот момент незаконченный тест принимает гипотезу
+
+        :param p0: значение вероятности при гипотезе
+        :param d: характерное абсолютное значение эффекта
+                  для подбора априорного распределения, если не задан prior_size
+        :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+        :param alternative: наименование альтернативы
+                            greater: правосторонняя альтернатива p > p0
+                            less: левосторонняя альтернатива p < p0
+                            two-sided: двусторонняя альтернатива p != p0
+        :param prior_size: сумма параметров бета-распределения со средним p0
+        :param initial_success_cnt: изначальное количество "успехов"
+        :param initial_sample_size: изначальный размер выборки
+        :param max_sample_size: максимальный размер выборки, при котором тест усекается
+                                с принятием гипотезы, None - тест не усекается
+        """
+        if alternative not in MIXTURE_DECISION_DESCS:
+            raise ValueError(f"Неправильная альтернатива: {alternative}")
+
+        # Параметры последовательного теста
+        self.p0 = p0
+        self.alpha = alpha
+        self.alternative = alternative
+        self.prior_a, self.prior_b = get_prior_params(p0, None if d is None else np.abs(d), prior_size)
+        self.high_bound = np.log(1 / alpha)
+        self.max_sample_size = max_sample_size
+
+        # Параметры текущего состояния теста
+        self.success_cnt = initial_success_cnt
+        self.sample_size = initial_sample_size
+
+        # Принятие решения
+        self.stop_success_cnt = self.success_cnt
+        self.stop_sample_size = self.sample_size
+        self.decision_desc = "Тест продолжается"
+
+    def calc_curve(self, success_cnt, sample_size):
+        """
+        Функция для расчёта значений логарифма отношения смешанного правдоподобия
+
+        :param success_cnt: количество "успехов"
+        :param sample_size: размер выборки
+        :return: значения логарифма отношения смешанного правдоподобия
+        """
+        return mixture_curve(success_cnt, sample_size, self.p0,
+                             self.prior_a, self.prior_b, self.alternative)
+
+    def append(self, x):
+        """
+        Добавление нового элемента выборки
+        с принятием решения о возможности
+        остановки последовательного теста
+
+        :param x: значение нового элемента выборки
+        :return: описание принятого решения
+        """
+        # Обновление общей статистики теста
+        self.success_cnt += x
+        self.sample_size += 1
+
+        # Если тест продолжается, обновляем расчёты
+        if self.decision_desc == "Тест продолжается":
+            self.stop_success_cnt = self.success_cnt
+            self.stop_sample_size = self.sample_size
+
+            alternative_desc, hypothesis_desc = MIXTURE_DECISION_DESCS[self.alternative]
+            if self.calc_curve(self.success_cnt, self.sample_size) >= self.high_bound:
+                self.decision_desc = alternative_desc
+            elif self.max_sample_size is not None and self.sample_size >= self.max_sample_size:
+                self.decision_desc = hypothesis_desc
+
+        return self.decision_desc
+
+    def append_list(self, x_list):
+        """
+        Добавление списка из новых элементов выборки
+
+        :param x_list: список значений новых элементов выборки
+        :return: описание принятого решения
+        """
+        for x in x_list:
+            self.append(x)
+
+        return self.decision_desc
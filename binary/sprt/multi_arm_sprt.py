@@ -0,0 +1,320 @@
+import numpy as np
+
+from .two_sample_sprt import BinaryTwoSampleSprt
+
+
+# Способы распределения уровня значимости между тестовыми вариациями:
+# bonferroni - alpha / arm_cnt,
+# sidak - 1 - (1 - alpha)^(1 / arm_cnt),
+# none - alpha для каждой вариации
+ALPHA_SPLITS = ("bonferroni", "sidak", "none")
+
+# Начальная длина буферов выборок, ожидающих составления пар
+DEFAULT_BUFFER_SIZE = 1024
+
+# Описания решений односторонних тестов
+# по наименованию альтернативы и пересечённой границе
+ONE_SIDED_DECISION_DESCS = {
+    ("greater", 1): "Тест остановлен, справедлива альтернатива p1 > p2",
+    ("greater", -1): "Тест остановлен, справедлива гипотеза p1 <= p2",
+    ("less", 1): "Тест остановлен, справедлива гипотеза p1 >= p2",
+    ("less", -1): "Тест остановлен, справедлива альтернатива p1 < p2"
+}
+
+
+class BinaryMultiArmSprt(object):
+    def __init__(self, p0, d, arm_cnt, alpha=0.05, beta=0.2, alternative="two-sided",
+                 alpha_split="bonferroni", buffer_size=DEFAULT_BUFFER_SIZE):
+        """
+        Последовательный анализ для нескольких тестовых вариаций с общей контрольной
+
+        Каждая тестовая вариация сравнивается с контрольной так же, как в BinaryTwoSampleSprt,
+        где первая выборка - тестовая вариация, а вторая - контрольная.
+        Контрольная выборка принимается один раз и хранится в общем буфере,
+        пары с ней составляются сразу для всех тестовых вариаций,
+        а статистики тестов хранятся в массивах по вариациям.
+        Вариация выбывает после принятия решения по ней,
+        и её данные больше не хранятся и не участвуют в расчётах
+
+        :param p0: значение вероятности при гипотезе
+        :param d: абсолютное значение MDE
+        :param arm_cnt: количество тестовых вариаций
+        :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+                      для всех тестовых вариаций
+        :param beta: ограничение на вероятность ошибки II рода (1 - мощность)
+                     для каждой тестовой вариации
+        :param alternative: наименование альтернативы
+                            less: правосторонняя альтернатива p1 < p2
+                            greater: левосторонняя альтернатива p1 > p2
+                            two-sided: двусторонняя альтернатива p1 != p2
+        :param alpha_split: способ распределения alpha между вариациями из ALPHA_SPLITS
+                            или список уровней значимости вариаций длины arm_cnt
+        :param buffer_size: начальная длина буферов выборок
+        """
+        if arm_cnt < 1:
+            raise ValueError(f"Неправильное количество тестовых вариаций: {arm_cnt}")
+
+        # Параметры последовательного теста
+        self.p0 = p0
+        self.d = np.abs(d)
+        self.arm_cnt = arm_cnt
+        self.alpha = alpha
+        self.beta = beta
+        self.alternative = alternative
+
+        # Уровни значимости тестовых вариаций
+        if isinstance(alpha_split, str):
+            if alpha_split == "bonferroni":
+                arm_alpha = alpha / arm_cnt
+            elif alpha_split == "sidak":
+                arm_alpha = 1 - (1 - alpha) ** (1 / arm_cnt)
+            elif alpha_split == "none":
+                arm_alpha = alpha
+            else:
+                raise ValueError(f"Неправильный способ распределения уровня значимости: {alpha_split}")
+            self.alpha_list = np.full(arm_cnt, arm_alpha)
+        else:
+            self.alpha_list = np.asarray(alpha_split, dtype=np.float64)
+            if self.alpha_list.shape != (arm_cnt,):
+                raise ValueError(f"Неправильный список уровней значимости: {alpha_split}")
+
+        # Тест одной пары вариаций для расчёта кривой и границ
+        self.pair_sprt = BinaryTwoSampleSprt(p0, d, alpha, beta, alternative)
+
+        # Границы односторонних тестов по вариациям
+        if alternative == "two-sided":
+            alpha_dict = {"greater": self.alpha_list / 2, "less": self.alpha_list / 2}
+        elif alternative in ("greater", "less"):
+            alpha_dict = {alternative: self.alpha_list}
+        else:
+            raise ValueError(f"Неправильная альтернатива: {alternative}")
+        self.bound_dict = {
+            one_sided_alternative: self.pair_sprt.calc_one_sided_bounds(one_sided_alpha, beta,
+                                                                        one_sided_alternative)
+            for one_sided_alternative, one_sided_alpha in alpha_dict.items()
+        }
+
+        # Общая статистика контрольной и тестовых вариаций
+        self.control_success_cnt = 0
+        self.control_sample_size = 0
+        self.treatment_success_cnt = np.zeros(arm_cnt, dtype=np.int64)
+        self.treatment_sample_size = np.zeros(arm_cnt, dtype=np.int64)
+
+        # Статистика составленных пар
+        self.pair_cnt = np.zeros(arm_cnt, dtype=np.int64)
+        self.pair_treatment_success_cnt = np.zeros(arm_cnt, dtype=np.int64)
+        self.pair_control_success_cnt = np.zeros(arm_cnt, dtype=np.int64)
+        self.one_sample_success_cnt = np.zeros(arm_cnt, dtype=np.int64)
+        self.one_sample_sample_size = np.zeros(arm_cnt, dtype=np.int64)
+
+        # Статистика пар до принятия решения
+        self.stop_pair_cnt = np.zeros(arm_cnt, dtype=np.int64)
+        self.stop_treatment_success_cnt = np.zeros(arm_cnt, dtype=np.int64)
+        self.stop_control_success_cnt = np.zeros(arm_cnt, dtype=np.int64)
+
+        # Принятие решения
+        self.active_flg = np.ones(arm_cnt, dtype=bool)
+        self.decision_desc_list = ["Тест продолжается"] * arm_cnt
+
+        # Признак остановки последовательного анализа
+        # для двусторонней альтернативы
+        self.greater_stop_flg = np.zeros(arm_cnt, dtype=bool)
+        self.less_stop_flg = np.zeros(arm_cnt, dtype=bool)
+
+        # Буферы значений, ожидающих составления пар:
+        # элемент i соответствует номеру buffer_offset + i в выборке
+        self.buffer_offset = 0
+        self.control_buffer = np.zeros(buffer_size, dtype=np.int8)
+        self.treatment_buffer = np.zeros([arm_cnt, buffer_size], dtype=np.int8)
+
+    def append_control(self, x):
+        """
+        Добавление нового элемента контрольной выборки
+        с составлением пар для всех продолжающихся тестовых вариаций
+
+        :param x: значение нового элемента контрольной выборки
+        :return: список описаний принятых решений по вариациям
+        """
+        index = self.control_sample_size
+        self.control_success_cnt += x
+        self.control_sample_size += 1
+
+        if not self.active_flg.any():
+            return self.decision_desc_list
+
+        self._reserve(index)
+        self.control_buffer[index - self.buffer_offset] = x
+
+        # Пары составляются со всеми продолжающимися вариациями,
+        # в которых уже есть элемент с тем же номером
+        arm_index = np.nonzero(self.active_flg & (self.treatment_sample_size > index))[0]
+        if len(arm_index) > 0:
+            self._append_pairs(arm_index, self.treatment_buffer[arm_index, index - self.buffer_offset], x)
+
+        return self.decision_desc_list
+
+    def append(self, x, arm):
+        """
+        Добавление нового элемента выборки тестовой вариации
+        с принятием решения о возможности остановки теста по ней
+
+        :param x: значение нового элемента выборки
+        :param arm: номер тестовой вариации
+        :return: описание принятого решения по вариации
+        """
+        index = self.treatment_sample_size[arm]
+        self.treatment_success_cnt[arm] += x
+        self.treatment_sample_size[arm] += 1
+
+        if not self.active_flg[arm]:
+            return self.decision_desc_list[arm]
+
+        self._reserve(index)
+        self.treatment_buffer[arm, index - self.buffer_offset] = x
+
+        if self.control_sample_size > index:
+            self._append_pairs(np.array([arm]), np.array([x]),
+                               self.control_buffer[index - self.buffer_offset])
+
+        return self.decision_desc_list[arm]
+
+    def append_control_list(self, x_list):
+        """
+        Добавление списка из новых элементов контрольной выборки
+
+        :param x_list: список значений новых элементов контрольной выборки
+        :return: список описаний принятых решений по вариациям
+        """
+        for x in x_list:
+            self.append_control(x)
+
+        return self.decision_desc_list
+
+    def append_list(self, x_list, arm):
+        """
+        Добавление списка из новых элементов выборки тестовой вариации
+
+        :param x_list: список значений новых элементов выборки
+        :param arm: номер тестовой вариации
+        :return: описание принятого решения по вариации
+        """
+        for x in x_list:
+            self.append(x, arm)
+
+        return self.decision_desc_list[arm]
+
+    def calc_one_sided_crossing(self, arm_index, alternative):
+        """
+        Функция для определения пересечения границ
+        для нескольких тестовых вариаций
+
+        :param arm_index: массив номеров тестовых вариаций
+        :param alternative: наименование односторонней альтернативы
+        :return: массив из 1 - пересечение верхней границы,
+                 -1 - пересечение нижней границы,
+                 0 - границы не пересечены
+        """
+        curve = self.pair_sprt.calc_one_sided_curve(self.one_sample_success_cnt[arm_index],
+                                                    self.one_sample_sample_size[arm_index],
+                                                    alternative)
+        low_bound, high_bound = self.bound_dict[alternative]
+
+        return np.where(curve > high_bound[arm_index], 1,
+                        np.where(curve < low_bound[arm_index], -1, 0))
+
+    def _append_pairs(self, arm_index, treatment_value, control_value):
+        """
+        Добавление составленных пар для тестовых вариаций arm_index
+        с принятием решений
+        """
+        treatment_value = np.asarray(treatment_value, dtype=np.int64)
+        control_value = int(control_value)
+
+        self.pair_cnt[arm_index] += 1
+        self.pair_treatment_success_cnt[arm_index] += treatment_value
+        self.pair_control_success_cnt[arm_index] += control_value
+
+        # Так как тесты ещё не остановлены,
+        # обновляем статистику тестов до принятого решения
+        self.stop_pair_cnt[arm_index] = self.pair_cnt[arm_index]
+        self.stop_treatment_success_cnt[arm_index] = self.pair_treatment_success_cnt[arm_index]
+        self.stop_control_success_cnt[arm_index] = self.pair_control_success_cnt[arm_index]
+
+        # Переход к одновыборочной задаче,
+        # кривая меняется только на несовпадающих парах
+        discordant_flg = treatment_value != control_value
+        arm_index = arm_index[discordant_flg]
+        self.one_sample_success_cnt[arm_index] += treatment_value[discordant_flg] * (1 - control_value)
+        self.one_sample_sample_size[arm_index] += 1
+
+        if len(arm_index) > 0:
+            self._decide(arm_index)
+
+    def _decide(self, arm_index):
+        """
+        Принятие решений по тестовым вариациям arm_index
+        """
+        if self.alternative != "two-sided":
+            crossing = self.calc_one_sided_crossing(arm_index, self.alternative)
+            for arm, arm_crossing in zip(arm_index[crossing != 0], crossing[crossing != 0]):
+                self.decision_desc_list[arm] = ONE_SIDED_DECISION_DESCS[(self.alternative, arm_crossing)]
+            self.active_flg[arm_index[crossing != 0]] = False
+            return
+
+        # Два последовательных анализа, как в BinaryTwoSampleSprt:
+        # p0 против p0+d (alternative = "greater"),
+        # p0-d против p0 (alternative = "less")
+        greater_crossing = self.calc_one_sided_crossing(arm_index, "greater")
+        less_crossing = self.calc_one_sided_crossing(arm_index, "less")
+        greater_stop_flg = self.greater_stop_flg[arm_index]
+        less_stop_flg = self.less_stop_flg[arm_index]
+
+        # Стат. значимый рост или падение, если проверка ранее не завершена
+        greater_flg = ~greater_stop_flg & (greater_crossing == 1)
+        less_flg = ~less_stop_flg & (less_crossing == -1)
+
+        # Пересечение границы, соответствующей p1 = p2, после завершения другой проверки
+        # или одновременно для обеих проверок
+        equal_flg = (greater_stop_flg & (less_crossing == 1)) \
+            | (less_stop_flg & (greater_crossing == -1)) \
+            | (~greater_stop_flg & (greater_crossing == -1) & ~less_stop_flg & (less_crossing == 1))
+
+        # Порядок приоритетов совпадает с порядком присваиваний в BinaryTwoSampleSprt
+        for arm, arm_greater_flg, arm_less_flg, arm_equal_flg in zip(arm_index, greater_flg, less_flg, equal_flg):
+            if arm_equal_flg:
+                self.decision_desc_list[arm] = "Тест остановлен, справедлива гипотеза p1 = p2"
+            elif arm_less_flg:
+                self.decision_desc_list[arm] = "Тест остановлен, справедлива альтернатива p1 < p2"
+            elif arm_greater_flg:
+                self.decision_desc_list[arm] = "Тест остановлен, справедлива альтернатива p1 > p2"
+
+        self.active_flg[arm_index[greater_flg | less_flg | equal_flg]] = False
+
+        # Завершаем проверки, для которых есть пересечение хотя бы одной из границ
+        self.greater_stop_flg[arm_index] |= greater_crossing != 0
+        self.less_stop_flg[arm_index] |= less_crossing != 0
+
+    def _reserve(self, index):
+        """
+        Подготовка буферов к записи элемента с номером index:
+        значения с номерами меньше наименьшего количества пар
+        среди продолжающихся вариаций отбрасываются,
+        а при нехватке места длина буферов удваивается
+        """
+        buffer_size = self.control_buffer.shape[0]
+        if index - self.buffer_offset < buffer_size:
+            return
+
+        offset = int(np.min(self.pair_cnt[self.active_flg], initial=self.control_sample_size))
+        shift = offset - self.buffer_offset
+        if index - offset >= buffer_size:
+            buffer_size = max(2 * buffer_size, index - offset + 1)
+
+        control_buffer = np.zeros(buffer_size, dtype=np.int8)
+        control_buffer[:self.control_buffer.shape[0] - shift] = self.control_buffer[shift:]
+        treatment_buffer = np.zeros([self.arm_cnt, buffer_size], dtype=np.int8)
+        treatment_buffer[:, :self.treatment_buffer.shape[1] - shift] = self.treatment_buffer[:, shift:]
+
+        self.buffer_offset = offset
+        self.control_buffer = control_buffer
+        self.treatment_buffer = treatment_buffer
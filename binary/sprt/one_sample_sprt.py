@@ -1,9 +1,18 @@
+import time
+
 import numpy as np
 
+from ..checking.look_schedule import is_look_size, normalize_look_schedule
+from ..checking.simulation_curve import TRUNCATION_RULES
+from .integer_thresholds import IntegerThresholds
+from .partial_state import SprtPartialState
+
 
 class BinaryOneSampleSprt(object):
     def __init__(self, p0, d, alpha=0.05, beta=0.2, alternative="two-sided",
-                 initial_success_cnt=0, initial_sample_size=0):
+                 initial_success_cnt=0, initial_sample_size=0, compiled=False,
+                 look_schedule=None, max_sample_size=None, truncation_rule="curve",
+                 metrics=None):
         """
         Последовательный анализ в случае одновыборочной задачи
 
@@ -17,6 +26,26 @@ class BinaryOneSampleSprt(object):
                             two-sided: двусторонняя альтернатива p != p0
         :param initial_success_cnt: изначальное количество "успехов"
         :param initial_sample_size: изначальный размер выборки
+        :param compiled: флаг принятия решений по заранее рассчитанным
+                         целочисленным порогам количества "успехов"
+                         вместо расчёта логарифмического отношения правдоподобий
+        :param look_schedule: расписание просмотров, только в которые
+                              проверяется пересечение границ:
+                              целое число k - просмотр после каждых k элементов выборки,
+                              возрастающий список размеров выборки в моменты просмотров,
+                              после последнего из них просмотры продолжаются
+                              с последним интервалом списка,
+                              None - проверка после каждого элемента выборки
+        :param max_sample_size: максимальный размер выборки, при котором тест усекается:
+                                если границы не пересечены, то решение принимается
+                                по правилу truncation_rule, None - тест не усекается
+        :param truncation_rule: правило принятия решения при усечении:
+                                "curve" - по знаку логарифмического отношения правдоподобий,
+                                "midpoint" - по середине между границами,
+                                "hypothesis" - в пользу гипотезы
+        :param metrics: реестр метрик SprtMetrics, в который тест сообщает
+                        о добавлении элементов, пакетных вызовах и принятом решении,
+                        None - метрики не собираются
         """
         # Параметры последовательного теста
         self.p0 = p0
@@ -39,6 +68,22 @@ class BinaryOneSampleSprt(object):
         self.greater_stop_flg = False
         self.less_stop_flg = False
 
+        # Целочисленные пороги односторонних тестов
+        self.thresholds = self.compile_thresholds() if compiled else None
+
+        # Расписание просмотров
+        self.look_schedule = normalize_look_schedule(look_schedule)
+        self.look_set = set(self.look_schedule) if isinstance(self.look_schedule, list) else None
+
+        # Усечение теста
+        if truncation_rule not in TRUNCATION_RULES:
+            raise ValueError(f"Неправильное правило усечения теста: {truncation_rule}")
+        self.max_sample_size = max_sample_size
+        self.truncation_rule = truncation_rule
+
+        # Регистратор метрик теста
+        self.metrics = None if metrics is None else metrics.bind(self)
+
     def calc_one_sided_probs(self, alternative):
         """
         Функция для расчёта базовых значений вероятностей (конверсий)
@@ -105,12 +150,120 @@ class BinaryOneSampleSprt(object):
 
         return curve
 
+    def compile_thresholds(self):
+        """
+        Функция для расчёта целочисленных порогов количества "успехов"
+        для односторонних тестов, из которых состоит последовательный тест
+
+        :return: словарь из IntegerThresholds по наименованиям односторонних альтернатив
+        """
+        if self.alternative == "two-sided":
+            alpha_dict = {"greater": self.alpha/2, "less": self.alpha/2}
+        else:
+            alpha_dict = {self.alternative: self.alpha}
+
+        return {
+            alternative: IntegerThresholds(*self.calc_one_sided_probs(alternative),
+                                           *self.calc_one_sided_bounds(alpha, self.beta, alternative))
+            for alternative, alpha in alpha_dict.items()
+        }
+
+    def export_thresholds(self, max_sample_size):
+        """
+        Функция для экспорта целочисленных порогов количества "успехов"
+
+        :param max_sample_size: максимальный размер выборки
+        :return: словарь из массивов размера [2, max_sample_size + 1]
+                 по наименованиям односторонних альтернатив:
+                 строка 0 - наибольшее количество "успехов" с пересечением нижней границы,
+                 строка 1 - наименьшее количество "успехов" с пересечением верхней границы
+        """
+        thresholds = self.thresholds if self.thresholds is not None else self.compile_thresholds()
+        return {
+            alternative: one_sided_thresholds.to_array(max_sample_size)
+            for alternative, one_sided_thresholds in thresholds.items()
+        }
+
+    def calc_one_sided_crossing(self, success_cnt, sample_size, alpha, alternative):
+        """
+        Функция для определения пересечения границ
+
+        :param success_cnt: количество "успехов"
+        :param sample_size: размер выборки
+        :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+        :param alternative: наименование односторонней альтернативы
+                            greater: правосторонняя альтернатива p > p0
+                            less: левосторонняя альтернатива p < p0
+        :return: 1 - пересечение верхней границы,
+                 -1 - пересечение нижней границы,
+                 0 - границы не пересечены
+        """
+        if self.thresholds is not None:
+            return self.thresholds[alternative].decide(success_cnt, sample_size)
+
+        curve = self.calc_one_sided_curve(success_cnt, sample_size, alternative)
+        low_bound, high_bound = self.calc_one_sided_bounds(alpha, self.beta, alternative)
+
+        if curve > high_bound:
+            return 1
+        elif curve < low_bound:
+            return -1
+        else:
+            return 0
+
+    def calc_terminal_crossing(self, success_cnt, sample_size, alpha, alternative):
+        """
+        Функция для принятия решения при усечении теста,
+        если границы не пересечены
+
+        :param success_cnt: количество "успехов"
+        :param sample_size: размер выборки
+        :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+        :param alternative: наименование односторонней альтернативы
+                            greater: правосторонняя альтернатива p > p0
+                            less: левосторонняя альтернатива p < p0
+        :return: 1 - решение, соответствующее верхней границе,
+                 -1 - решение, соответствующее нижней границе
+        """
+        if self.truncation_rule == "hypothesis":
+            # Гипотезе соответствует нижняя граница для "greater"
+            # и верхняя граница для "less"
+            return 1 if alternative == "less" else -1
+
+        curve = self.calc_one_sided_curve(success_cnt, sample_size, alternative)
+        if self.truncation_rule == "midpoint":
+            low_bound, high_bound = self.calc_one_sided_bounds(alpha, self.beta, alternative)
+            return 1 if curve > (low_bound + high_bound) / 2 else -1
+        return 1 if curve > 0 else -1
+
+    def is_look(self, sample_size):
+        """
+        Функция для определения, является ли момент просмотром,
+        в который проверяется пересечение границ
+
+        :param sample_size: размер выборки
+        :return: флаг просмотра
+        """
+        return is_look_size(self.look_schedule, sample_size, self.look_set)
+
     def append(self, x):
         """
         Добавление нового элемента выборки
         с принятием решения о возможности
         остановки последовательного теста
 
+        :param x: значение нового элемента выборки
+        :return: описание принятого решения
+        """
+        if self.metrics is not None:
+            self.metrics.on_append()
+        return self._append(x)
+
+    def _append(self, x):
+        """
+        Добавление нового элемента выборки, как в append,
+        без учёта в метриках добавленных элементов
+
         :param x: значение нового элемента выборки
         :return: описание принятого решения
         """
@@ -126,22 +279,31 @@ class BinaryOneSampleSprt(object):
             self.stop_success_cnt = self.success_cnt
             self.stop_sample_size = self.sample_size
 
+            # Вне моментов просмотров решение не принимается,
+            # кроме момента усечения теста
+            truncation_flg = self.max_sample_size is not None and self.sample_size >= self.max_sample_size
+            if not self.is_look(self.sample_size) and not truncation_flg:
+                return self.decision_desc
+
             if self.alternative != "two-sided":
                 # Если альтернатива одностороняя,
-                # то решение принимается по одному расчёту
-                # логарифмического отношения правдоподобий
-                curve = self.calc_one_sided_curve(self.success_cnt, self.sample_size, self.alternative)
-                low_bound, high_bound = self.calc_one_sided_bounds(self.alpha, self.beta, self.alternative)
+                # то решение принимается по одной проверке
+                # пересечения границ логарифмическим отношением правдоподобий
+                crossing = self.calc_one_sided_crossing(self.success_cnt, self.sample_size,
+                                                        self.alpha, self.alternative)
+                if truncation_flg and crossing == 0:
+                    crossing = self.calc_terminal_crossing(self.success_cnt, self.sample_size,
+                                                           self.alpha, self.alternative)
 
                 # Если значение логарифмического отношения правдоподобий
                 # пересекает одну из границ,
                 # тест останавливается с принятием решения
-                if curve > high_bound:
+                if crossing == 1:
                     if self.alternative == "greater":
                         self.decision_desc = "Тест остановлен, справедлива альтернатива p > p0"
                     else:
                         self.decision_desc = "Тест остановлен, справедлива гипотеза p >= p0"
-                elif curve < low_bound:
+                elif crossing == -1:
                     if self.alternative == "greater":
                         self.decision_desc = "Тест остановлен, справедлива гипотеза p <= p0"
                     else:
@@ -151,22 +313,30 @@ class BinaryOneSampleSprt(object):
                 # то мы параллельно "проводим" два последовательных анализа:
                 # p0 против p0+d (alternative = "greater"),
                 # p0-d против p0 (alternative = "less")
-                greater_curve = self.calc_one_sided_curve(self.success_cnt, self.sample_size, alternative="greater")
-                greater_low_bound, greater_high_bound = self.calc_one_sided_bounds(self.alpha/2, self.beta, alternative="greater")
-
-                less_curve = self.calc_one_sided_curve(self.success_cnt, self.sample_size, alternative="less")
-                less_low_bound, less_high_bound = self.calc_one_sided_bounds(self.alpha/2, self.beta, alternative="less")
+                greater_crossing = self.calc_one_sided_crossing(self.success_cnt, self.sample_size,
+                                                                self.alpha/2, alternative="greater")
+                less_crossing = self.calc_one_sided_crossing(self.success_cnt, self.sample_size,
+                                                             self.alpha/2, alternative="less")
+
+                # При усечении теста продолжающиеся проверки
+                # принимают решение по правилу усечения
+                if truncation_flg and greater_crossing == 0:
+                    greater_crossing = self.calc_terminal_crossing(self.success_cnt, self.sample_size,
+                                                                   self.alpha/2, alternative="greater")
+                if truncation_flg and less_crossing == 0:
+                    less_crossing = self.calc_terminal_crossing(self.success_cnt, self.sample_size,
+                                                                self.alpha/2, alternative="less")
 
                 # Если тест для alternative = "greater" ранее не завершён,
                 # а сейчас произошло пересечение верхней границы,
                 # то останавливаем тест с решением о стат. значимом росте
-                if not self.greater_stop_flg and greater_curve > greater_high_bound:
+                if not self.greater_stop_flg and greater_crossing == 1:
                     self.decision_desc = "Тест остановлен, справедлива альтернатива p > p0"
 
                 # Если тест для alternative = "less" ранее не завершён,
                 # а сейчас произошло пересечение нижней границы,
                 # то останавливаем тест с решением о стат. значимом падении
-                if not self.less_stop_flg and less_curve < less_low_bound:
+                if not self.less_stop_flg and less_crossing == -1:
                     self.decision_desc = "Тест остановлен, справедлива альтернатива p < p0"
 
                 # Если для какой-то из альтернатив тест был ранее завершён,
@@ -176,25 +346,29 @@ class BinaryOneSampleSprt(object):
                 # а сейчас для другой альтернативы
                 # есть пересечение границы, соответствующее p = p0,
                 # то мы можем завершить тест с принятием решения p = p0
-                if self.greater_stop_flg and less_curve > less_high_bound:
+                if self.greater_stop_flg and less_crossing == 1:
                     self.decision_desc = "Тест остановлен, справедлива гипотеза p = p0"
-                if self.less_stop_flg and greater_curve < greater_low_bound:
+                if self.less_stop_flg and greater_crossing == -1:
                     self.decision_desc = "Тест остановлен, справедлива гипотеза p = p0"
 
                 # Если ни для какой альтернативы тест ранее не был завершён,
                 # а сейчас для обеих альтернатив есть пересечение границы при p = p0,
                 # то мы можем завершить тест с принятием решения p = p0
-                if not self.greater_stop_flg and greater_curve < greater_low_bound \
-                    and self.less_stop_flg and less_curve > less_high_bound:
+                if not self.greater_stop_flg and greater_crossing == -1 \
+                    and not self.less_stop_flg and less_crossing == 1:
                     self.decision_desc = "Тест остановлен, справедлива гипотеза p = p0"
 
                 # Завершаем тест для тех альтернатив,
                 # для которых есть пересечение хотя бы одной из границ
-                if greater_curve > greater_high_bound or greater_curve < greater_low_bound:
+                if greater_crossing != 0:
                     self.greater_stop_flg = True
-                if less_curve > less_high_bound or less_curve < less_low_bound:
+                if less_crossing != 0:
                     self.less_stop_flg = True
 
+            # Переход теста к принятому решению
+            if self.metrics is not None and self.decision_desc != "Тест продолжается":
+                self.metrics.on_decision(self.decision_desc)
+
         return self.decision_desc
 
     def append_list(self, x_list):
@@ -207,8 +381,76 @@ class BinaryOneSampleSprt(object):
         :return: описание принятого решения
         """
 
+        start_time = time.perf_counter() if self.metrics is not None else None
+
         decision_desc = self.decision_desc
         for x in x_list:
             decision_desc = self.append(x)
 
+        if self.metrics is not None:
+            self.metrics.on_batch("append_list", time.perf_counter() - start_time)
+
         return decision_desc
+
+    def create_partial_state(self):
+        """
+        Создание пустого частичного состояния
+        для накопления окна выборки на узле сбора данных
+
+        :return: частичное состояние SprtPartialState
+        """
+        side_list = ["greater", "less"] if self.alternative == "two-sided" else [self.alternative]
+        return SprtPartialState({side: self.calc_one_sided_probs(side) for side in side_list}, sample_cnt=1)
+
+    def append_partial_state(self, state):
+        """
+        Добавление окна выборки по его частичному состоянию
+        с принятием решения о возможности
+        остановки последовательного теста
+
+        Решение и статистика до принятого решения совпадают
+        с добавлением элементов окна по одному
+
+        :param state: частичное состояние SprtPartialState окна,
+                      следующего за уже добавленными элементами выборки
+        :return: описание принятого решения
+        """
+        if self.look_schedule is not None or self.max_sample_size is not None:
+            raise ValueError("Неправильный тест для частичного состояния: "
+                             "расписание просмотров и усечение не поддерживаются")
+        if state.sample_cnt != 1 or state.side_probs != self.create_partial_state().side_probs:
+            raise ValueError("Неправильное частичное состояние: параметры теста не совпадают")
+
+        start_time = time.perf_counter() if self.metrics is not None else None
+
+        start_success_cnt = self.success_cnt
+        start_sample_size = self.sample_size
+
+        if self.decision_desc == "Тест продолжается":
+            alpha = self.alpha/2 if self.alternative == "two-sided" else self.alpha
+            bound_dict = {side: self.calc_one_sided_bounds(alpha, self.beta, side) for side in state.side_probs}
+            start = (start_sample_size, start_success_cnt, 0, start_success_cnt, start_sample_size)
+
+            # Границы могут пересекаться только в моменты записей частичного состояния,
+            # поэтому элементы на этих записях добавляются так же, как по одному:
+            # новый максимум кривой достигается на "успехе", новый минимум - на "неуспехе"
+            for record, high_flg in state.get_event_records(start, bound_dict, self.calc_one_sided_curve):
+                x = 1 if high_flg else 0
+                self.success_cnt = start_success_cnt + record[1] - x
+                self.sample_size = start_sample_size + record[0] - 1
+                self._append(x)
+                if self.decision_desc != "Тест продолжается":
+                    break
+
+        # Обновление общей статистики теста
+        self.success_cnt = start_success_cnt + state.total[1]
+        self.sample_size = start_sample_size + state.total[0]
+        if self.decision_desc == "Тест продолжается":
+            self.stop_success_cnt = self.success_cnt
+            self.stop_sample_size = self.sample_size
+
+        if self.metrics is not None:
+            self.metrics.on_append(state.total[0])
+            self.metrics.on_batch("append_partial_state", time.perf_counter() - start_time)
+
+        return self.decision_desc
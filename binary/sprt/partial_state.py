@@ -0,0 +1,245 @@
+import numpy as np
+
+
+# Столбцы записей частичного состояния: накопленные с начала окна
+# размер выборки (количество пар), количества "успехов" первой и второй выборок,
+# количество "успехов" и размер выборки одновыборочной задачи
+PARTIAL_STATE_COLUMNS = ("sample_size", "first_success_cnt", "second_success_cnt",
+                         "one_sample_success_cnt", "one_sample_sample_size")
+
+
+class SprtPartialState(object):
+    """
+    Частичное состояние последовательного теста по окну выборки
+
+    Узлы сбора данных накапливают частичные состояния независимо,
+    а узел принятия решений объединяет их и применяет к тесту по порядку окон
+    методом append_partial_state классов теста.
+    Кроме итоговых количеств по окну, для каждой односторонней проверки
+    хранятся записи о моментах, в которые логарифмическое отношение правдоподобий
+    с начала окна впервые поднимается выше всех предыдущих значений
+    или опускается ниже всех предыдущих значений.
+    Первое пересечение границы внутри окна при любом значении кривой в его начале
+    происходит в одну из таких записей, поэтому по ним решение принимается так же,
+    как при добавлении элементов выборки по одному.
+    Для случайного блуждания количество записей растёт не быстрее корня из размера окна
+    """
+
+    def __init__(self, side_probs, sample_cnt=1):
+        """
+        :param side_probs: словарь из нижнего и верхнего порогов вероятности
+                           по наименованиям односторонних проверок теста
+        :param sample_cnt: количество выборок: 1 - элементы выборки,
+                           2 - пары элементов первой и второй выборок
+        """
+        if sample_cnt not in (1, 2):
+            raise ValueError(f"Неправильное количество выборок: {sample_cnt}")
+
+        self.side_probs = {side: (float(p_low), float(p_high)) for side, (p_low, p_high) in side_probs.items()}
+        self.sample_cnt = sample_cnt
+
+        # Итоговые количества по окну в порядке PARTIAL_STATE_COLUMNS
+        self.total = [0] * len(PARTIAL_STATE_COLUMNS)
+
+        # Записи о новых максимумах и минимумах кривой по односторонним проверкам
+        # и значения этих экстремумов с начала окна
+        self.max_records = {side: [] for side in self.side_probs}
+        self.min_records = {side: [] for side in self.side_probs}
+        self.max_curve = {side: 0.0 for side in self.side_probs}
+        self.min_curve = {side: 0.0 for side in self.side_probs}
+
+    def calc_curve(self, success_cnt, sample_size, side):
+        """
+        Функция для расчёта значений логарифмического отношения правдоподобий
+        по количествам с начала окна
+
+        :param success_cnt: количество "успехов" одновыборочной задачи
+        :param sample_size: размер выборки одновыборочной задачи
+        :param side: наименование односторонней проверки
+        :return: значения логарифмического отношения правдоподобий
+        """
+        p_low, p_high = self.side_probs[side]
+        return success_cnt * np.log(p_high / p_low) \
+            + (sample_size - success_cnt) * np.log((1 - p_high) / (1 - p_low))
+
+    def append(self, x):
+        """
+        Добавление нового элемента выборки одновыборочного теста
+
+        :param x: значение нового элемента выборки
+        """
+        if self.sample_cnt != 1:
+            raise ValueError("Неправильное количество выборок: для двух выборок используется append_pair")
+
+        self.total[0] += 1
+        self.total[1] += x
+        self.total[3] += x
+        self.total[4] += 1
+        self._update_records()
+
+    def append_pair(self, x, y):
+        """
+        Добавление новой пары элементов двухвыборочного теста
+
+        :param x: значение нового элемента первой выборки
+        :param y: значение нового элемента второй выборки
+        """
+        if self.sample_cnt != 2:
+            raise ValueError("Неправильное количество выборок: для одной выборки используется append")
+
+        self.total[0] += 1
+        self.total[1] += x
+        self.total[2] += y
+
+        # Переход к одновыборочной задаче:
+        # кривая меняется только на несовпадающих парах
+        if x != y:
+            self.total[3] += x
+            self.total[4] += 1
+            self._update_records()
+
+    def append_list(self, x_list, y_list=None):
+        """
+        Добавление списка из новых элементов выборки
+        или, для двух выборок, списков из элементов пар
+
+        :param x_list: список значений новых элементов (первой) выборки
+        :param y_list: список значений новых элементов второй выборки той же длины
+        """
+        if self.sample_cnt == 1:
+            for x in x_list:
+                self.append(x)
+        else:
+            for x, y in zip(x_list, y_list):
+                self.append_pair(x, y)
+
+    def merge(self, other):
+        """
+        Объединение с частичным состоянием следующего окна
+
+        :param other: частичное состояние окна, следующего сразу за этим
+        :return: частичное состояние объединённого окна
+        """
+        if other.side_probs != self.side_probs or other.sample_cnt != self.sample_cnt:
+            raise ValueError("Неправильное частичное состояние: параметры теста не совпадают")
+
+        res = SprtPartialState(self.side_probs, self.sample_cnt)
+        res.total = [value + other_value for value, other_value in zip(self.total, other.total)]
+
+        for side in self.side_probs:
+            # Значения кривой следующего окна сдвигаются на значение в конце этого окна,
+            # и остаются только записи, превосходящие экстремумы этого окна
+            shift = self.calc_curve(self.total[3], self.total[4], side)
+            res.max_records[side] = self.max_records[side] + [
+                self._shift_record(record) for record in other.max_records[side]
+                if shift + self.calc_curve(record[3], record[4], side) > self.max_curve[side]
+            ]
+            res.min_records[side] = self.min_records[side] + [
+                self._shift_record(record) for record in other.min_records[side]
+                if shift + self.calc_curve(record[3], record[4], side) < self.min_curve[side]
+            ]
+            res.max_curve[side] = max(self.max_curve[side], shift + other.max_curve[side])
+            res.min_curve[side] = min(self.min_curve[side], shift + other.min_curve[side])
+
+        return res
+
+    def get_event_records(self, start, bound_dict, curve_func):
+        """
+        Моменты внутри окна, в которые впервые пересекаются границы
+        односторонних проверок при заданных количествах в начале окна
+
+        :param start: количества в начале окна в порядке PARTIAL_STATE_COLUMNS
+        :param bound_dict: словарь из нижней и верхней границ по наименованиям односторонних проверок
+        :param curve_func: функция расчёта кривой curve_func(success_cnt, sample_size, side)
+                           по количествам с начала теста, та же, что и в классе теста
+        :return: возрастающий по размеру выборки список записей из накопленных с начала окна
+                 количеств, на последнем элементе которых впервые пересекается граница
+                 хотя бы одной из проверок, и флагов пересечения на новом максимуме кривой
+        """
+        event_dict = {}
+        for side, (low_bound, high_bound) in bound_dict.items():
+            side_event_list = []
+            for record_list, high_flg in [(self.max_records[side], True), (self.min_records[side], False)]:
+                if len(record_list) == 0:
+                    continue
+                record_array = np.array(record_list, dtype=np.int64)
+                curve = curve_func(start[3] + record_array[:, 3], start[4] + record_array[:, 4], side)
+                crossing_flg = curve > high_bound if high_flg else curve < low_bound
+                if crossing_flg.any():
+                    side_event_list.append((record_list[int(np.argmax(crossing_flg))], high_flg))
+
+            # Для каждой проверки учитывается только первое пересечение
+            if len(side_event_list) > 0:
+                record, high_flg = min(side_event_list, key=lambda event: event[0][0])
+                event_dict[record[0]] = (record, high_flg)
+
+        return [event_dict[sample_size] for sample_size in sorted(event_dict)]
+
+    def to_dict(self):
+        """
+        Представление частичного состояния из встроенных типов
+        для передачи между узлами
+
+        :return: словарь с параметрами и записями частичного состояния
+        """
+        return {
+            "side_probs": {side: list(probs) for side, probs in self.side_probs.items()},
+            "sample_cnt": self.sample_cnt,
+            "total": [int(value) for value in self.total],
+            "max_records": {side: [list(map(int, record)) for record in record_list]
+                            for side, record_list in self.max_records.items()},
+            "min_records": {side: [list(map(int, record)) for record in record_list]
+                            for side, record_list in self.min_records.items()},
+            "max_curve": {side: float(value) for side, value in self.max_curve.items()},
+            "min_curve": {side: float(value) for side, value in self.min_curve.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, state_dict):
+        """
+        Восстановление частичного состояния из представления to_dict
+
+        :param state_dict: словарь с параметрами и записями частичного состояния
+        :return: частичное состояние
+        """
+        res = cls(state_dict["side_probs"], state_dict["sample_cnt"])
+        res.total = list(state_dict["total"])
+        res.max_records = {side: [tuple(record) for record in record_list]
+                           for side, record_list in state_dict["max_records"].items()}
+        res.min_records = {side: [tuple(record) for record in record_list]
+                           for side, record_list in state_dict["min_records"].items()}
+        res.max_curve = dict(state_dict["max_curve"])
+        res.min_curve = dict(state_dict["min_curve"])
+        return res
+
+    def _update_records(self):
+        """
+        Запись нового максимума или минимума кривой после добавления элемента
+        """
+        for side in self.side_probs:
+            curve = self.calc_curve(self.total[3], self.total[4], side)
+            if curve > self.max_curve[side]:
+                self.max_curve[side] = curve
+                self.max_records[side].append(tuple(self.total))
+            elif curve < self.min_curve[side]:
+                self.min_curve[side] = curve
+                self.min_records[side].append(tuple(self.total))
+
+    def _shift_record(self, record):
+        """
+        Перевод записи следующего окна в количества с начала этого окна
+        """
+        return tuple(value + total for value, total in zip(record, self.total))
+
+
+def merge_partial_states(state_list):
+    """
+    Объединение частичных состояний последовательных окон
+
+    :param state_list: список частичных состояний в порядке окон
+    :return: частичное состояние объединённого окна
+    """
+    res = state_list[0]
+    for state in state_list[1:]:
+        res = res.merge(state)
+    return res
@@ -1,12 +1,20 @@
+import time
+
 import numpy as np
 
+from ..checking.look_schedule import is_look_size, normalize_look_schedule
+from ..checking.simulation_curve import TRUNCATION_RULES
+from .integer_thresholds import IntegerThresholds
+from .partial_state import SprtPartialState
+
 
 class BinaryTwoSampleSprt(object):
     def __init__(self, p0, d, alpha=0.05, beta=0.2, alternative="two-sided",
                  initial_first_success_cnt=0, initial_first_sample_size=0,
                  initial_second_success_cnt=0, initial_second_sample_size=0,
                  initial_one_sample_success_cnt=0,
-                 initial_one_sample_sample_size=0):
+                 initial_one_sample_sample_size=0, compiled=False, look_schedule=None,
+                 max_sample_size=None, truncation_rule="curve", metrics=None):
         """
         Последовательный анализ в случае двухвыборочной задачи
 
@@ -22,6 +30,27 @@ class BinaryTwoSampleSprt(object):
         :param initial_first_sample_size: изначальный размер первой выборки
         :param initial_second_success_cnt: изначальное количество "успехов" во второй выборке
         :param initial_second_sample_size: изначальный размер второй выборки
+        :param compiled: флаг принятия решений по заранее рассчитанным
+                         целочисленным порогам количества несовпадающих пар вида (1, 0)
+                         вместо расчёта логарифмического отношения правдоподобий
+        :param look_schedule: расписание просмотров, только в которые
+                              проверяется пересечение границ:
+                              целое число k - просмотр после каждых k пар элементов выборок,
+                              возрастающий список количеств пар в моменты просмотров,
+                              после последнего из них просмотры продолжаются
+                              с последним интервалом списка,
+                              None - проверка после каждой пары
+        :param max_sample_size: максимальное количество пар элементов выборок,
+                                при котором тест усекается:
+                                если границы не пересечены, то решение принимается
+                                по правилу truncation_rule, None - тест не усекается
+        :param truncation_rule: правило принятия решения при усечении:
+                                "curve" - по знаку логарифмического отношения правдоподобий,
+                                "midpoint" - по середине между границами,
+                                "hypothesis" - в пользу гипотезы
+        :param metrics: реестр метрик SprtMetrics, в который тест сообщает
+                        о добавлении элементов, пакетных вызовах и принятом решении,
+                        None - метрики не собираются
         """
         # Параметры последовательного теста
         self.p0 = p0
@@ -57,6 +86,22 @@ class BinaryTwoSampleSprt(object):
         self.greater_stop_flg = False
         self.less_stop_flg = False
 
+        # Целочисленные пороги односторонних тестов по несовпадающим парам
+        self.thresholds = self.compile_thresholds() if compiled else None
+
+        # Расписание просмотров
+        self.look_schedule = normalize_look_schedule(look_schedule)
+        self.look_set = set(self.look_schedule) if isinstance(self.look_schedule, list) else None
+
+        # Усечение теста
+        if truncation_rule not in TRUNCATION_RULES:
+            raise ValueError(f"Неправильное правило усечения теста: {truncation_rule}")
+        self.max_sample_size = max_sample_size
+        self.truncation_rule = truncation_rule
+
+        # Регистратор метрик теста
+        self.metrics = None if metrics is None else metrics.bind(self)
+
     def transform_two_sample_one_sided_mde(self, p_low, p_high):
         """
         Функция, вычисляющая MDE для одновыборочной задачи
@@ -145,12 +190,121 @@ class BinaryTwoSampleSprt(object):
 
         return curve
 
+    def compile_thresholds(self):
+        """
+        Функция для расчёта целочисленных порогов количества несовпадающих пар вида (1, 0)
+        для односторонних тестов, из которых состоит последовательный тест
+
+        :return: словарь из IntegerThresholds по наименованиям односторонних альтернатив
+        """
+        if self.alternative == "two-sided":
+            alpha_dict = {"greater": self.alpha/2, "less": self.alpha/2}
+        else:
+            alpha_dict = {self.alternative: self.alpha}
+
+        return {
+            alternative: IntegerThresholds(*self.calc_one_sided_probs(alternative),
+                                           *self.calc_one_sided_bounds(alpha, self.beta, alternative))
+            for alternative, alpha in alpha_dict.items()
+        }
+
+    def export_thresholds(self, max_sample_size):
+        """
+        Функция для экспорта целочисленных порогов количества несовпадающих пар вида (1, 0)
+
+        :param max_sample_size: максимальное количество несовпадающих пар
+        :return: словарь из массивов размера [2, max_sample_size + 1]
+                 по наименованиям односторонних альтернатив:
+                 строка 0 - наибольшее количество пар вида (1, 0) с пересечением нижней границы,
+                 строка 1 - наименьшее количество пар вида (1, 0) с пересечением верхней границы
+        """
+        thresholds = self.thresholds if self.thresholds is not None else self.compile_thresholds()
+        return {
+            alternative: one_sided_thresholds.to_array(max_sample_size)
+            for alternative, one_sided_thresholds in thresholds.items()
+        }
+
+    def calc_one_sided_crossing(self, success_cnt, sample_size, alpha, alternative):
+        """
+        Функция для определения пересечения границ
+
+        :param success_cnt: количество "успехов"
+        :param sample_size: размер выборки
+        :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+        :param alternative: наименование односторонней альтернативы
+                            greater: правосторонняя альтернатива p > p0
+                            less: левосторонняя альтернатива p < p0
+        :return: 1 - пересечение верхней границы,
+                 -1 - пересечение нижней границы,
+                 0 - границы не пересечены
+        """
+        if self.thresholds is not None:
+            return self.thresholds[alternative].decide(success_cnt, sample_size)
+
+        curve = self.calc_one_sided_curve(success_cnt, sample_size, alternative)
+        low_bound, high_bound = self.calc_one_sided_bounds(alpha, self.beta, alternative)
+
+        if curve > high_bound:
+            return 1
+        elif curve < low_bound:
+            return -1
+        else:
+            return 0
+
+    def calc_terminal_crossing(self, success_cnt, sample_size, alpha, alternative):
+        """
+        Функция для принятия решения при усечении теста,
+        если границы не пересечены
+
+        :param success_cnt: количество несовпадающих пар вида (1, 0)
+        :param sample_size: количество несовпадающих пар
+        :param alpha: ограничение на вероятность ошибки I рода (уровень значимости)
+        :param alternative: наименование односторонней альтернативы
+                            less: правосторонняя альтернатива p1 < p2
+                            greater: левосторонняя альтернатива p1 > p2
+        :return: 1 - решение, соответствующее верхней границе,
+                 -1 - решение, соответствующее нижней границе
+        """
+        if self.truncation_rule == "hypothesis":
+            # Гипотезе соответствует нижняя граница для "greater"
+            # и верхняя граница для "less"
+            return 1 if alternative == "less" else -1
+
+        curve = self.calc_one_sided_curve(success_cnt, sample_size, alternative)
+        if self.truncation_rule == "midpoint":
+            low_bound, high_bound = self.calc_one_sided_bounds(alpha, self.beta, alternative)
+            return 1 if curve > (low_bound + high_bound) / 2 else -1
+        return 1 if curve > 0 else -1
+
+    def is_look(self, sample_size):
+        """
+        Функция для определения, является ли момент просмотром,
+        в который проверяется пересечение границ
+
+        :param sample_size: количество пар элементов выборок
+        :return: флаг просмотра
+        """
+        return is_look_size(self.look_schedule, sample_size, self.look_set)
+
     def append(self, x, first_sample_flg):
         """
         Добавление нового элемента выборки
         с принятием решения о возможности
         остановки последовательного теста
 
+        :param x: значение нового элемента выборки
+        :param first_sample_flg: флаг того, что x из первой выборки
+        :return: описание принятого решения
+        """
+        if self.metrics is not None:
+            self.metrics.on_append()
+        return self._append(x, first_sample_flg)
+
+    def _append(self, x, first_sample_flg):
+        """
+        Добавление нового элемента выборки, как в append,
+        без учёта в метриках добавленных элементов
+
         :param x: значение нового элемента выборки
         :param first_sample_flg: флаг того, что x из первой выборки
         :return: описание принятого решения
@@ -192,26 +346,36 @@ class BinaryTwoSampleSprt(object):
                 self.one_sample_success_cnt += first_value * (1 - second_value)
                 self.one_sample_sample_size += 1 if first_value != second_value else 0
 
+                # Вне моментов просмотров решение не принимается,
+                # кроме момента усечения теста
+                pair_cnt = min(self.first_sample_size, self.second_sample_size)
+                truncation_flg = self.max_sample_size is not None and pair_cnt >= self.max_sample_size
+                if not self.is_look(pair_cnt) and not truncation_flg:
+                    return self.decision_desc
+
                 if self.alternative != "two-sided":
                     # Если альтернатива одностороняя,
-                    # то решение принимается по одному расчёту
-                    # логарифмического отношения правдоподобий
-                    curve = self.calc_one_sided_curve(self.one_sample_success_cnt,
-                                                      self.one_sample_sample_size,
-                                                      self.alternative)
-                    low_bound, high_bound = self.calc_one_sided_bounds(self.alpha,
-                                                                       self.beta,
-                                                                       self.alternative)
+                    # то решение принимается по одной проверке
+                    # пересечения границ логарифмическим отношением правдоподобий
+                    crossing = self.calc_one_sided_crossing(self.one_sample_success_cnt,
+                                                            self.one_sample_sample_size,
+                                                            self.alpha,
+                                                            self.alternative)
+                    if truncation_flg and crossing == 0:
+                        crossing = self.calc_terminal_crossing(self.one_sample_success_cnt,
+                                                               self.one_sample_sample_size,
+                                                               self.alpha,
+                                                               self.alternative)
 
                     # Если значение логарифмического отношения правдоподобий
                     # пересекает одну из границ,
                     # тест останавливается с принятием решения
-                    if curve > high_bound:
+                    if crossing == 1:
                         if self.alternative == "greater":
                             self.decision_desc = "Тест остановлен, справедлива альтернатива p1 > p2"
                         else:
                             self.decision_desc = "Тест остановлен, справедлива гипотеза p1 >= p2"
-                    elif curve < low_bound:
+                    elif crossing == -1:
                         if self.alternative == "greater":
                             self.decision_desc = "Тест остановлен, справедлива гипотеза p1 <= p2"
                         else:
@@ -221,30 +385,38 @@ class BinaryTwoSampleSprt(object):
                     # то мы параллельно "проводим" два последовательных анализа:
                     # p0 против p0+d (alternative = "greater"),
                     # p0-d против p0 (alternative = "less")
-                    greater_curve = self.calc_one_sided_curve(self.one_sample_success_cnt,
-                                                              self.one_sample_sample_size,
-                                                              alternative="greater")
-                    greater_low_bound, greater_high_bound = self.calc_one_sided_bounds(self.alpha/2,
-                                                                                       self.beta,
-                                                                                       alternative="greater")
-
-                    less_curve = self.calc_one_sided_curve(self.one_sample_success_cnt,
-                                                           self.one_sample_sample_size,
-                                                           alternative="less")
-                    less_low_bound, less_high_bound = self.calc_one_sided_bounds(self.alpha/2,
-                                                                                 self.beta,
-                                                                                 alternative="less")
+                    greater_crossing = self.calc_one_sided_crossing(self.one_sample_success_cnt,
+                                                                    self.one_sample_sample_size,
+                                                                    self.alpha/2,
+                                                                    alternative="greater")
+                    less_crossing = self.calc_one_sided_crossing(self.one_sample_success_cnt,
+                                                                 self.one_sample_sample_size,
+                                                                 self.alpha/2,
+                                                                 alternative="less")
+
+                    # При усечении теста продолжающиеся проверки
+                    # принимают решение по правилу усечения
+                    if truncation_flg and greater_crossing == 0:
+                        greater_crossing = self.calc_terminal_crossing(self.one_sample_success_cnt,
+                                                                       self.one_sample_sample_size,
+                                                                       self.alpha/2,
+                                                                       alternative="greater")
+                    if truncation_flg and less_crossing == 0:
+                        less_crossing = self.calc_terminal_crossing(self.one_sample_success_cnt,
+                                                                    self.one_sample_sample_size,
+                                                                    self.alpha/2,
+                                                                    alternative="less")
 
                     # Если тест для alternative = "greater" ранее не завершён,
                     # а сейчас произошло пересечение верхней границы,
                     # то останавливаем тест с решением о стат. значимом росте
-                    if not self.greater_stop_flg and greater_curve > greater_high_bound:
+                    if not self.greater_stop_flg and greater_crossing == 1:
                         self.decision_desc = "Тест остановлен, справедлива альтернатива p1 > p2"
 
                     # Если тест для alternative = "less" ранее не завершён,
                     # а сейчас произошло пересечение нижней границы,
                     # то останавливаем тест с решением о стат. значимом падении
-                    if not self.less_stop_flg and less_curve < less_low_bound:
+                    if not self.less_stop_flg and less_crossing == -1:
                         self.decision_desc = "Тест остановлен, справедлива альтернатива p1 < p2"
 
                     # Если для какой-то из альтернатив тест был ранее завершён,
@@ -254,25 +426,29 @@ class BinaryTwoSampleSprt(object):
                     # а сейчас для другой альтернативы
                     # есть пересечение границы, соответствующее p1 = p2,
                     # то мы можем завершить тест с принятием решения p1 = p2
-                    if self.greater_stop_flg and less_curve > less_high_bound:
+                    if self.greater_stop_flg and less_crossing == 1:
                         self.decision_desc = "Тест остановлен, справедлива гипотеза p1 = p2"
-                    if self.less_stop_flg and greater_curve < greater_low_bound:
+                    if self.less_stop_flg and greater_crossing == -1:
                         self.decision_desc = "Тест остановлен, справедлива гипотеза p1 = p2"
 
                     # Если ни для какой альтернативы тест ранее не был завершён,
                     # а сейчас для обеих альтернатив есть пересечение границы при p1 = p2,
                     # то мы можем завершить тест с принятием решения p1 = p2
-                    if not self.greater_stop_flg and greater_curve < greater_low_bound \
-                        and self.less_stop_flg and less_curve > less_high_bound:
+                    if not self.greater_stop_flg and greater_crossing == -1 \
+                        and not self.less_stop_flg and less_crossing == 1:
                         self.decision_desc = "Тест остановлен, справедлива гипотеза p1 = p2"
 
                     # Завершаем тест для тех альтернатив,
                     # для которых есть пересечение хотя бы одной из границ
-                    if greater_curve > greater_high_bound or greater_curve < greater_low_bound:
+                    if greater_crossing != 0:
                         self.greater_stop_flg = True
-                    if less_curve > less_high_bound or less_curve < less_low_bound:
+                    if less_crossing != 0:
                         self.less_stop_flg = True
 
+            # Переход теста к принятому решению
+            if self.metrics is not None and self.decision_desc != "Тест продолжается":
+                self.metrics.on_decision(self.decision_desc)
+
         return self.decision_desc
 
     def append_list(self, x_list, y_list):
@@ -286,10 +462,94 @@ class BinaryTwoSampleSprt(object):
         :return: описание принятого решения
         """
 
+        start_time = time.perf_counter() if self.metrics is not None else None
+
         decision_desc = self.decision_desc
         for x in x_list:
             decision_desc = self.append(x, first_sample_flg=True)
         for y in y_list:
             decision_desc = self.append(y, first_sample_flg=False)
 
+        if self.metrics is not None:
+            self.metrics.on_batch("append_list", time.perf_counter() - start_time)
+
         return decision_desc
+
+    def create_partial_state(self):
+        """
+        Создание пустого частичного состояния
+        для накопления окна пар элементов выборок на узле сбора данных
+
+        :return: частичное состояние SprtPartialState
+        """
+        side_list = ["greater", "less"] if self.alternative == "two-sided" else [self.alternative]
+        return SprtPartialState({side: self.calc_one_sided_probs(side) for side in side_list}, sample_cnt=2)
+
+    def append_partial_state(self, state):
+        """
+        Добавление окна пар элементов выборок по его частичному состоянию
+        с принятием решения о возможности
+        остановки последовательного теста
+
+        Решение и статистика до принятого решения совпадают
+        с добавлением пар окна по одной (сначала элемент первой выборки, затем второй)
+
+        :param state: частичное состояние SprtPartialState окна пар,
+                      следующего за уже добавленными парами
+        :return: описание принятого решения
+        """
+        if self.look_schedule is not None or self.max_sample_size is not None:
+            raise ValueError("Неправильный тест для частичного состояния: "
+                             "расписание просмотров и усечение не поддерживаются")
+        if state.sample_cnt != 2 or state.side_probs != self.create_partial_state().side_probs:
+            raise ValueError("Неправильное частичное состояние: параметры теста не совпадают")
+        if len(self.first_sample_buf) > 0 or len(self.second_sample_buf) > 0:
+            raise ValueError("Неправильное состояние теста: есть элементы выборок без пары")
+
+        start_time = time.perf_counter() if self.metrics is not None else None
+
+        start = (min(self.first_sample_size, self.second_sample_size),
+                 self.first_success_cnt, self.second_success_cnt,
+                 self.one_sample_success_cnt, self.one_sample_sample_size)
+        start_first_sample_size = self.first_sample_size
+        start_second_sample_size = self.second_sample_size
+
+        if self.decision_desc == "Тест продолжается":
+            alpha = self.alpha/2 if self.alternative == "two-sided" else self.alpha
+            bound_dict = {side: self.calc_one_sided_bounds(alpha, self.beta, side) for side in state.side_probs}
+
+            # Границы могут пересекаться только в моменты записей частичного состояния,
+            # поэтому пары на этих записях добавляются так же, как по одной:
+            # новый максимум кривой достигается на паре (1, 0), новый минимум - на паре (0, 1)
+            for record, high_flg in state.get_event_records(start, bound_dict, self.calc_one_sided_curve):
+                x, y = (1, 0) if high_flg else (0, 1)
+                self.first_success_cnt = start[1] + record[1] - x
+                self.second_success_cnt = start[2] + record[2] - y
+                self.first_sample_size = start_first_sample_size + record[0] - 1
+                self.second_sample_size = start_second_sample_size + record[0] - 1
+                self.one_sample_success_cnt = start[3] + record[3] - x
+                self.one_sample_sample_size = start[4] + record[4] - 1
+                self._append(x, first_sample_flg=True)
+                self._append(y, first_sample_flg=False)
+                if self.decision_desc != "Тест продолжается":
+                    break
+
+        # Обновление общей статистики теста
+        self.first_success_cnt = start[1] + state.total[1]
+        self.second_success_cnt = start[2] + state.total[2]
+        self.first_sample_size = start_first_sample_size + state.total[0]
+        self.second_sample_size = start_second_sample_size + state.total[0]
+        if self.decision_desc == "Тест продолжается":
+            self.one_sample_success_cnt = start[3] + state.total[3]
+            self.one_sample_sample_size = start[4] + state.total[4]
+            self.stop_first_success_cnt = self.first_success_cnt
+            self.stop_first_sample_size = self.first_sample_size
+            self.stop_second_success_cnt = self.second_success_cnt
+            self.stop_second_sample_size = self.second_sample_size
+
+        if self.metrics is not None:
+            # Окно из total[0] пар - это вдвое больше элементов выборок
+            self.metrics.on_append(2 * state.total[0])
+            self.metrics.on_batch("append_partial_state", time.perf_counter() - start_time)
+
+        return self.decision_desc